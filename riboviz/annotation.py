@@ -0,0 +1,447 @@
+"""
+Parsed ORF GFF annotation cache-related constants and functions.
+
+A GFF file is parsed once into two column-oriented tables:
+
+* Features (:py:const:`FEATURES_HEADER` plus attribute columns): one
+  row per feature, in GFF file order. Columns are named as those of
+  the data frame returned by ``readGFFAsDf`` in
+  ``rscripts/read_count_functions.R``.
+* Genes (:py:const:`GENES_HEADER`): one row per gene, identified by
+  a primary ID attribute (e.g. ``Name``), in order of each gene's
+  first feature, with the gene's CDS start and end and its UTR5, CDS
+  and UTR3 widths.
+
+Tables are cached in an HDF5 file, in a cache directory (e.g. the
+workflow's index directory), named after a key which is a SHA-256
+digest of both the content of the GFF file and the attributes parsed
+(see :py:func:`get_cache_key`). Within the HDF5 file each column is a
+dataset within a :py:const:`FEATURES` or :py:const:`GENES` group.
+Cache files are written to a temporary file and then renamed, so a
+cache file exists only if it was written successfully. Concurrent
+processes coordinate via a lock file (see
+:py:func:`riboviz.index_cache.lock_entry`), so that the same GFF file
+is not parsed more than once.
+
+Features can be read from the cache as tuples, as returned by
+:py:func:`riboviz.gff_utils.read_gff_features` (see
+:py:func:`read_gff_features`). Tables can also be exported as
+tab-separated values files (see :py:func:`write_annotation_tsv`), for
+use by R scripts.
+"""
+import collections
+import hashlib
+import os
+import os.path
+import tempfile
+from riboviz import gff_utils
+from riboviz import index_cache
+from riboviz import provenance
+from riboviz import utils
+from riboviz.lazy_import import lazy_import
+
+h5py = lazy_import("h5py")
+pd = lazy_import("pandas")
+
+FORMAT_VERSION = 1
+""" Cache file format version, part of the cache key. """
+CACHE_FILE_FORMAT = "{}.annotation.h5"
+""" Cache file name format. """
+FEATURES = "features"
+""" Cache file features group name. """
+GENES = "genes"
+""" Cache file genes group name. """
+COLUMNS = "columns"
+""" Cache file group attribute with column names in order. """
+GFF_FILE = "gff_file"
+""" Cache file attribute. """
+GFF_DIGEST = "gff_sha256"
+""" Cache file attribute. """
+PRIMARY_ID = "primary_id"
+""" Cache file attribute. """
+VERSION = "format_version"
+""" Cache file attribute. """
+DEFAULT_ATTRIBUTES = ["ID", "Name"]
+""" GFF attributes always included in features. """
+
+SEQNAMES = "seqnames"
+""" Features and genes column name. """
+START = "start"
+""" Features column name. """
+END = "end"
+""" Features column name. """
+WIDTH = "width"
+""" Features column name. """
+STRAND = "strand"
+""" Features and genes column name. """
+TYPE = "type"
+""" Features column name. """
+FEATURES_HEADER = [SEQNAMES, START, END, WIDTH, STRAND, TYPE]
+""" Features column names, excluding attribute columns. """
+GENE = "gene"
+""" Genes column name. """
+CDS_START = "cds_start"
+""" Genes column name. """
+CDS_END = "cds_end"
+""" Genes column name. """
+UTR5_WIDTH = "utr5_width"
+""" Genes column name. """
+CDS_WIDTH = "cds_width"
+""" Genes column name. """
+UTR3_WIDTH = "utr3_width"
+""" Genes column name. """
+GENES_HEADER = [GENE, SEQNAMES, STRAND, CDS_START, CDS_END,
+                UTR5_WIDTH, CDS_WIDTH, UTR3_WIDTH]
+""" Genes column names. """
+
+AnnotationTuple = collections.namedtuple(
+    "AnnotationTuple", ["features", "genes"])
+"""
+Parsed GFF annotation.
+
+* ``features``: features (:py:const:`FEATURES_HEADER` plus attribute \
+  columns) (pandas.core.frame.DataFrame)
+* ``genes``: genes (:py:const:`GENES_HEADER`) \
+  (pandas.core.frame.DataFrame)
+"""
+
+
+def get_attributes(primary_id=gff_utils.DEFAULT_PRIMARY_ID, secondary_id=None):
+    """
+    Get GFF attributes to include in features:
+    :py:const:`DEFAULT_ATTRIBUTES` plus the primary and, if
+    provided, secondary ID attributes.
+
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Attributes
+    :rtype: list(str or unicode)
+    """
+    attributes = list(DEFAULT_ATTRIBUTES)
+    for attribute in [primary_id, secondary_id]:
+        if attribute is not None and attribute not in attributes:
+            attributes.append(attribute)
+    return attributes
+
+
+def get_genes(features, primary_id=gff_utils.DEFAULT_PRIMARY_ID):
+    """
+    Get genes from features. Features without a primary ID are
+    ignored. A gene's CDS start and end are the minimum start and
+    maximum end of its ``CDS`` features, or 0 if it has none. Its
+    widths are the sums of the widths of its ``UTR5``, ``CDS`` and
+    ``UTR3`` features.
+
+    :param features: Features
+    :type features: pandas.core.frame.DataFrame
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :return: Genes
+    :rtype: pandas.core.frame.DataFrame
+    """
+    features = features[features[primary_id] != ""]
+    groups = features.groupby(primary_id, sort=False)
+    genes = groups[[SEQNAMES, STRAND]].first()
+    cds = features[features[TYPE] == gff_utils.CDS].groupby(primary_id)
+    genes[CDS_START] = cds[START].min()
+    genes[CDS_END] = cds[END].max()
+    for column, feature_type in [(UTR5_WIDTH, gff_utils.UTR5),
+                                 (CDS_WIDTH, gff_utils.CDS),
+                                 (UTR3_WIDTH, gff_utils.UTR3)]:
+        genes[column] = features[features[TYPE] == feature_type].\
+            groupby(primary_id)[WIDTH].sum()
+    genes = genes.fillna(0).rename_axis(GENE).reset_index()
+    for column in GENES_HEADER[3:]:
+        genes[column] = genes[column].astype("int64")
+    return genes[GENES_HEADER]
+
+
+def parse_annotation(gff_file, primary_id=gff_utils.DEFAULT_PRIMARY_ID,
+                     secondary_id=None):
+    """
+    Parse a GFF2/GFF3 file into features and genes. Features have
+    an attribute column for each attribute returned by
+    :py:func:`get_attributes`, with value ``""`` if a feature does not
+    have that attribute.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Annotation
+    :rtype: AnnotationTuple
+    :raise AssertionError: if a feature has less than 9 columns
+    """
+    attributes = get_attributes(primary_id, secondary_id)
+    rows = [[seqname, start, end, end - start + 1, strand, feature_type] +
+            [feature_attributes.get(attribute, "")
+             for attribute in attributes]
+            for seqname, feature_type, start, end, strand, feature_attributes
+            in gff_utils.read_gff_features(gff_file)]
+    features = pd.DataFrame(rows, columns=FEATURES_HEADER + attributes)
+    for column in [START, END, WIDTH]:
+        features[column] = features[column].astype("int64")
+    return AnnotationTuple(features, get_genes(features, primary_id))
+
+
+def get_cache_key(gff_digest, primary_id=gff_utils.DEFAULT_PRIMARY_ID,
+                  secondary_id=None):
+    """
+    Get cache key for an annotation parsed from a GFF file.
+
+    :param gff_digest: SHA-256 digest of GFF file content
+    :type gff_digest: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Key, as a hexadecimal string
+    :rtype: str or unicode
+    """
+    key = "{}\n{}\n{}\n{}".format(
+        gff_digest, primary_id,
+        ",".join(get_attributes(primary_id, secondary_id)),
+        FORMAT_VERSION)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_cache_file(cache_dir, key):
+    """
+    Get cache file for a key.
+
+    :param cache_dir: Cache directory
+    :type cache_dir: str or unicode
+    :param key: Key
+    :type key: str or unicode
+    :return: File
+    :rtype: str or unicode
+    """
+    return os.path.join(cache_dir, CACHE_FILE_FORMAT.format(key))
+
+
+def write_table(h5, name, df):
+    """
+    Write a data frame into an HDF5 group, one dataset per column.
+    String columns are written as variable-length UTF-8 strings.
+
+    :param h5: HDF5 file
+    :type h5: h5py.File
+    :param name: Group name
+    :type name: str or unicode
+    :param df: Data frame
+    :type df: pandas.core.frame.DataFrame
+    """
+    group = h5.create_group(name)
+    group.attrs[COLUMNS] = list(df.columns)
+    for column in df.columns:
+        values = df[column].values
+        if values.dtype.kind == "O":
+            group.create_dataset(column,
+                                 data=values.astype(str).astype(object),
+                                 dtype=h5py.string_dtype())
+        else:
+            group.create_dataset(column, data=values)
+
+
+def read_table(h5, name):
+    """
+    Read a data frame written by :py:func:`write_table` from an HDF5
+    group.
+
+    :param h5: HDF5 file
+    :type h5: h5py.File
+    :param name: Group name
+    :type name: str or unicode
+    :return: Data frame
+    :rtype: pandas.core.frame.DataFrame
+    """
+    group = h5[name]
+    data = collections.OrderedDict()
+    for column in group.attrs[COLUMNS]:
+        dataset = group[column]
+        if h5py.check_string_dtype(dataset.dtype) is not None:
+            data[column] = dataset.asstr()[:]
+        else:
+            data[column] = dataset[:]
+    return pd.DataFrame(data)
+
+
+def write_annotation(annotation, h5_file, gff_file="", gff_digest="",
+                     primary_id=gff_utils.DEFAULT_PRIMARY_ID):
+    """
+    Write an annotation to an HDF5 file. The file is written to a
+    temporary file, in the same directory, which is then renamed.
+
+    :param annotation: Annotation
+    :type annotation: AnnotationTuple
+    :param h5_file: HDF5 file
+    :type h5_file: str or unicode
+    :param gff_file: GFF file annotation was parsed from
+    :type gff_file: str or unicode
+    :param gff_digest: SHA-256 digest of GFF file content
+    :type gff_digest: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    """
+    h5_dir = os.path.dirname(os.path.abspath(h5_file))
+    tmp_fd, tmp_file = tempfile.mkstemp(
+        prefix="{}.".format(os.path.basename(h5_file)), dir=h5_dir)
+    os.close(tmp_fd)
+    try:
+        with h5py.File(tmp_file, "w") as h5:
+            h5.attrs[GFF_FILE] = os.path.abspath(gff_file) \
+                if gff_file else ""
+            h5.attrs[GFF_DIGEST] = gff_digest
+            h5.attrs[PRIMARY_ID] = primary_id
+            h5.attrs[VERSION] = FORMAT_VERSION
+            write_table(h5, FEATURES, annotation.features)
+            write_table(h5, GENES, annotation.genes)
+        os.replace(tmp_file, h5_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def load_annotation(h5_file):
+    """
+    Load an annotation from an HDF5 file written by
+    :py:func:`write_annotation`.
+
+    :param h5_file: HDF5 file
+    :type h5_file: str or unicode
+    :return: Annotation
+    :rtype: AnnotationTuple
+    :raise FileNotFoundError: if ``h5_file`` cannot be found
+    """
+    if not os.path.exists(h5_file):
+        raise FileNotFoundError(h5_file)
+    with h5py.File(h5_file, "r") as h5:
+        return AnnotationTuple(read_table(h5, FEATURES),
+                               read_table(h5, GENES))
+
+
+def cache_annotation(gff_file, cache_dir,
+                     primary_id=gff_utils.DEFAULT_PRIMARY_ID,
+                     secondary_id=None):
+    """
+    Parse a GFF file and write the annotation into a cache directory,
+    unless it is already cached. A lock is held on the cache entry
+    while checking for, and writing, the cache file.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param cache_dir: Cache directory
+    :type cache_dir: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Cache file and whether it was already cached
+    :rtype: tuple(str or unicode, bool)
+    :raise FileNotFoundError: if ``gff_file`` cannot be found
+    :raise AssertionError: if a feature has less than 9 columns
+    """
+    gff_digest = utils.get_file_digest(gff_file)
+    key = get_cache_key(gff_digest, primary_id, secondary_id)
+    cache_file = get_cache_file(cache_dir, key)
+    if os.path.exists(cache_file):
+        return cache_file, True
+    os.makedirs(cache_dir, exist_ok=True)
+    with index_cache.lock_entry(cache_dir, key):
+        if os.path.exists(cache_file):
+            return cache_file, True
+        annotation = parse_annotation(gff_file, primary_id, secondary_id)
+        write_annotation(annotation, cache_file, gff_file, gff_digest,
+                         primary_id)
+    return cache_file, False
+
+
+def get_annotation(gff_file, cache_dir=None,
+                   primary_id=gff_utils.DEFAULT_PRIMARY_ID, secondary_id=None):
+    """
+    Get the annotation for a GFF file, from a cache directory if
+    provided (see :py:func:`cache_annotation`), else by parsing the
+    GFF file.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param cache_dir: Cache directory
+    :type cache_dir: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Annotation
+    :rtype: AnnotationTuple
+    :raise FileNotFoundError: if ``gff_file`` cannot be found
+    :raise AssertionError: if a feature has less than 9 columns
+    """
+    if cache_dir is None:
+        return parse_annotation(gff_file, primary_id, secondary_id)
+    cache_file, _ = cache_annotation(gff_file, cache_dir, primary_id,
+                                     secondary_id)
+    return load_annotation(cache_file)
+
+
+def read_gff_features(gff_file, cache_dir=None,
+                      primary_id=gff_utils.DEFAULT_PRIMARY_ID,
+                      secondary_id=None):
+    """
+    Read features from a GFF2/GFF3 file, as
+    :py:func:`riboviz.gff_utils.read_gff_features` does, from a cache
+    directory if provided (see :py:func:`get_annotation`), else by
+    parsing the GFF file. Features read from the cache have only the
+    attributes returned by :py:func:`get_attributes`.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param cache_dir: Cache directory
+    :type cache_dir: str or unicode
+    :param primary_id: Primary ID attribute
+    :type primary_id: str or unicode
+    :param secondary_id: Secondary ID attribute
+    :type secondary_id: str or unicode
+    :return: Features, each a tuple of sequence name, feature type, \
+    1-indexed start, 1-indexed end, strand and attributes
+    :rtype: list(tuple(str or unicode, str or unicode, int, int, \
+    str or unicode, dict))
+    :raise FileNotFoundError: if ``gff_file`` cannot be found
+    :raise AssertionError: if a feature has less than 9 columns
+    """
+    if cache_dir is None:
+        return gff_utils.read_gff_features(gff_file)
+    features = get_annotation(gff_file, cache_dir, primary_id,
+                              secondary_id).features
+    attributes = list(features.columns[len(FEATURES_HEADER):])
+    return [(seqname, feature_type, int(start), int(end), strand,
+             {attribute: value
+              for attribute, value in zip(attributes, values)
+              if value != ""})
+            for seqname, feature_type, start, end, strand, *values
+            in zip(features[SEQNAMES], features[TYPE],
+                   features[START], features[END], features[STRAND],
+                   *[features[attribute] for attribute in attributes])]
+
+
+def write_annotation_tsv(annotation, features_tsv=None, genes_tsv=None):
+    """
+    Write features and/or genes to tab-separated values files.
+
+    :param annotation: Annotation
+    :type annotation: AnnotationTuple
+    :param features_tsv: Features file
+    :type features_tsv: str or unicode
+    :param genes_tsv: Genes file
+    :type genes_tsv: str or unicode
+    """
+    for tsv_file, df in [(features_tsv, annotation.features),
+                         (genes_tsv, annotation.genes)]:
+        if not tsv_file:
+            continue
+        with open(tsv_file, "w") as f:
+            f.write(provenance.get_provenance(__file__))
+            df.to_csv(f, sep="\t", index=False)
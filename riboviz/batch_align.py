@@ -0,0 +1,214 @@
+"""
+Batched alignment constants and functions.
+
+A batched alignment aligns the reads of several samples using a
+single ``hisat2`` invocation, so the index is loaded once for all the
+samples, rather than once per sample. ``hisat2`` is given the sample
+FASTQ files as a comma-separated list (``-U <FASTQ>,<FASTQ>,...``)
+and is run with ``--reorder``, so that SAM records are output in the
+same order as the reads in the FASTQ files. ``hisat2`` is also run
+without ``--no-unal``, so that every read has at least one SAM
+record, and without ``--un``.
+
+The SAM output is then split into sample-specific SAM files by
+:py:func:`split_alignment`. As records are in input order, the
+sample FASTQ files are read in step with the SAM records, each read
+being matched to its primary SAM record and any secondary or
+supplementary SAM records that follow. This yields:
+
+* A SAM file for each sample, holding the SAM header and the records
+  for that sample's reads. Unaligned records can be omitted,
+  equivalent to ``hisat2 --no-unal``.
+* A FASTQ file for each sample, holding the sample's unaligned reads,
+  copied verbatim from the sample FASTQ file, equivalent to ``hisat2
+  --un``.
+
+Reads are matched to samples by position, rather than by tagging
+read names with sample names, since ``hisat2`` derives the
+pseudo-random seed it uses for each read from the read's name. Tagging
+read names could therefore change which alignments are reported for
+reads with several equally-good alignments. The SAM records for each
+sample are the same as those that would be output by a ``hisat2``
+invocation for that sample alone, run with ``--reorder``. Only the
+command line recorded in the ``@PG`` header differs.
+"""
+import gzip
+import sys
+from riboviz import fastq
+
+SAM_FLAG_UNMAPPED = 0x4
+""" SAM flag for unmapped segments. """
+SAM_FLAG_NOT_PRIMARY = 0x100 | 0x800
+""" SAM flags for secondary and supplementary alignments. """
+NUM_READS = "num_reads"
+""" Batch alignment summary key. """
+NUM_ALIGNED = "num_aligned"
+""" Batch alignment summary key. """
+NUM_UNALIGNED = "num_unaligned"
+""" Batch alignment summary key. """
+
+
+def open_fastq(file_name):
+    """
+    Open a FASTQ file for reading. GZIPped FASTQ files can be handled
+    too.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :return: File
+    :rtype: io.TextIOWrapper
+    """
+    if fastq.is_fastq_gz(file_name):
+        return gzip.open(file_name, "rt")
+    return open(file_name, "r")
+
+
+def read_fastq_record(fastq_file):
+    """
+    Read a FASTQ record, as four lines.
+
+    :param fastq_file: FASTQ file
+    :type fastq_file: io.TextIOWrapper
+    :return: List of four lines or ``None`` if at end of file
+    :rtype: list(str or unicode)
+    :raise AssertionError: if the record is incomplete
+    """
+    header = fastq_file.readline()
+    if not header:
+        return None
+    record = [header] + [fastq_file.readline() for _ in range(3)]
+    assert record[-1], "Incomplete FASTQ record: {}".format(header)
+    return record
+
+
+def get_read_name(name):
+    """
+    Get read name as it appears in SAM files output by ``hisat2``,
+    that is, up to the first whitespace and without any trailing
+    ``/1``, ``/2`` or ``/3`` mate suffix.
+
+    :param name: Read name (FASTQ header without leading ``@``, or \
+    SAM ``QNAME``)
+    :type name: str or unicode
+    :return: Read name
+    :rtype: str or unicode
+    """
+    name = name.split(None, 1)[0] if name.strip() else ""
+    if len(name) >= 2 and name[-2] == "/" and name[-1] in "123":
+        name = name[:-2]
+    return name
+
+
+def split_alignment(fastq_files,
+                    sam_in,
+                    sam_files,
+                    unaligned_files,
+                    is_no_unal=False):
+    """
+    Split SAM records output by a batched ``hisat2`` invocation into
+    sample-specific SAM files and sample-specific FASTQ files of
+    unaligned reads. See module documentation.
+
+    :param fastq_files: Sample FASTQ files, in the order given to \
+    ``hisat2``
+    :type fastq_files: list(str or unicode)
+    :param sam_in: SAM input, as output by ``hisat2 --reorder``
+    :type sam_in: io.TextIOBase
+    :param sam_files: Sample SAM files (output)
+    :type sam_files: list(str or unicode)
+    :param unaligned_files: Sample unaligned FASTQ files (output)
+    :type unaligned_files: list(str or unicode)
+    :param is_no_unal: Omit unaligned records from sample SAM files?
+    :type is_no_unal: bool
+    :return: Summary for each sample, with keys \
+    :py:const:`NUM_READS`, :py:const:`NUM_ALIGNED`, \
+    :py:const:`NUM_UNALIGNED`
+    :rtype: list(dict)
+    :raise AssertionError: if the number of output files does not \
+    match the number of FASTQ files, or if the SAM records do not \
+    match the reads in the FASTQ files
+    """
+    assert len(fastq_files) == len(sam_files) == len(unaligned_files), \
+        "Numbers of FASTQ, SAM and unaligned FASTQ files differ"
+    header = []
+    line = sam_in.readline()
+    while line.startswith("@"):
+        header.append(line)
+        line = sam_in.readline()
+    summaries = []
+    for fastq_file, sam_file, unaligned_file in zip(fastq_files,
+                                                    sam_files,
+                                                    unaligned_files):
+        summary = {NUM_READS: 0, NUM_ALIGNED: 0, NUM_UNALIGNED: 0}
+        with open_fastq(fastq_file) as fastq_in, \
+                open(sam_file, "w") as sam_out, \
+                open(unaligned_file, "w") as unaligned_out:
+            sam_out.writelines(header)
+            record = read_fastq_record(fastq_in)
+            while record is not None:
+                read_name = get_read_name(record[0][1:])
+                assert line, "No SAM record for read {} in {}".format(
+                    read_name, fastq_file)
+                fields = line.split("\t", 2)
+                flag = int(fields[1])
+                assert not flag & SAM_FLAG_NOT_PRIMARY and \
+                    get_read_name(fields[0]) == read_name, \
+                    "SAM record {} does not match read {} in {}".format(
+                        fields[0], read_name, fastq_file)
+                summary[NUM_READS] += 1
+                is_unaligned = flag & SAM_FLAG_UNMAPPED
+                if is_unaligned:
+                    summary[NUM_UNALIGNED] += 1
+                    unaligned_out.writelines(record)
+                else:
+                    summary[NUM_ALIGNED] += 1
+                if not (is_unaligned and is_no_unal):
+                    sam_out.write(line)
+                line = sam_in.readline()
+                while line and \
+                        int(line.split("\t", 2)[1]) & SAM_FLAG_NOT_PRIMARY:
+                    sam_out.write(line)
+                    line = sam_in.readline()
+                record = read_fastq_record(fastq_in)
+        summaries.append(summary)
+    assert not line, "SAM record {} does not match any read".format(
+        line.split("\t", 1)[0])
+    return summaries
+
+
+def split_alignment_file(fastq_files,
+                         sam_file_in,
+                         sam_files,
+                         unaligned_files,
+                         is_no_unal=False):
+    """
+    Split SAM records output by a batched ``hisat2`` invocation into
+    sample-specific SAM files and sample-specific FASTQ files of
+    unaligned reads, and print a summary for each sample. See
+    :py:func:`split_alignment`.
+
+    :param fastq_files: Sample FASTQ files, in the order given to \
+    ``hisat2``
+    :type fastq_files: list(str or unicode)
+    :param sam_file_in: SAM input file, as output by ``hisat2 \
+    --reorder``, or ``-`` for standard input
+    :type sam_file_in: str or unicode
+    :param sam_files: Sample SAM files (output)
+    :type sam_files: list(str or unicode)
+    :param unaligned_files: Sample unaligned FASTQ files (output)
+    :type unaligned_files: list(str or unicode)
+    :param is_no_unal: Omit unaligned records from sample SAM files?
+    :type is_no_unal: bool
+    :raise AssertionError: see :py:func:`split_alignment`
+    """
+    if sam_file_in == "-":
+        summaries = split_alignment(fastq_files, sys.stdin, sam_files,
+                                    unaligned_files, is_no_unal)
+    else:
+        with open(sam_file_in, "r") as sam_in:
+            summaries = split_alignment(fastq_files, sam_in, sam_files,
+                                        unaligned_files, is_no_unal)
+    for fastq_file, summary in zip(fastq_files, summaries):
+        print("{}: {} reads, {} aligned, {} unaligned".format(
+            fastq_file, summary[NUM_READS], summary[NUM_ALIGNED],
+            summary[NUM_UNALIGNED]))
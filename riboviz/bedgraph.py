@@ -1,7 +1,29 @@
 """
 Bedgraph-related constants and functions.
+
+:py:func:`write_bedgraphs` provides a native alternative to running
+``bedtools genomecov -ibam <BAM> -trackline -bga -5 -strand <+|->``
+once per strand. It scans a BAM file once, counting the 5' ends of
+the reads on both strands at the same time, and writes bedGraphs for
+both strands. The bedGraphs are the same as those output by
+``bedtools genomecov``, namely:
+
+* Every mapped read (including secondary alignments) is counted.
+* The 5' end of a read on the plus strand is its leftmost aligned
+  position and that of a read on the minus strand is its rightmost
+  aligned position.
+* Each reference is covered by data rows, including rows with zero
+  counts. Adjacent positions with the same count are merged into a
+  single row.
+* References are written in the order they appear in the BAM file
+  header, except that references with no reads on a strand are
+  written after all the references with reads on that strand.
 """
-import pandas as pd
+import multiprocessing
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pysam = lazy_import("pysam")
 
 BEDGRAPH_EXT = "bedgraph"
 """ File extension. """
@@ -11,6 +33,16 @@ TRACK_PREFIX = "track type=bedGraph"
 """ Track line prefix. """
 COLUMNS = ["Chromosome", "Start", "End", "Data"]
 """ Column names. """
+GROUPS_PER_PROCESS = 4
+"""
+Number of groups of references, per process, to split references
+into when counting reads in parallel.
+"""
+READS_PER_CHUNK = 65536
+"""
+Number of 5' end positions to buffer before adding these to the
+counts, when scanning a BAM file which is not indexed.
+"""
 
 
 def load_bedgraph(bed_file):
@@ -38,11 +70,11 @@ def load_bedgraph(bed_file):
     """
     with open(bed_file) as f:
         track = f.readline()
-    assert track.startswith(TRACK_PREFIX),\
+    assert track.startswith(TRACK_PREFIX), \
         "Invalid bedgraph file: %s. Invalid track line: %s"\
         % (bed_file, track)
     data = pd.read_csv(bed_file, sep="\t", header=None, skiprows=1)
-    assert data.shape[1] == len(COLUMNS),\
+    assert data.shape[1] == len(COLUMNS), \
         "Invalid bedgraph file: %s. Expected 4 columns, found %d"\
         % (bed_file, data.shape[1])
     data.columns = COLUMNS
@@ -63,11 +95,246 @@ def equal_bedgraph(file1, file2):
     """
     (track1, data1) = load_bedgraph(file1)
     (track2, data2) = load_bedgraph(file2)
-    assert track1 == track2,\
+    assert track1 == track2, \
         "Unequal bedGraph tracks: %s (%s), %s (%s)"\
         % (file1, track1, file2, track2)
-    assert data1.shape[0] == data2.shape[0],\
+    assert data1.shape[0] == data2.shape[0], \
         "Unequal bedGraph rows: %s (%d), %s (%d)"\
         % (file1, data1.shape[0], file2, data2.shape[0])
-    assert data1.equals(data2),\
+    assert data1.equals(data2), \
         "Unequal bedGraph data: %s, %s" % (file1, file2)
+
+
+def count_5p_ends(bam, reference, length):
+    """
+    Count the 5' ends of the mapped reads aligned to a reference, for
+    each strand. The BAM file must be indexed.
+
+    :param bam: BAM file
+    :type bam: pysam.AlignmentFile
+    :param reference: Reference name
+    :type reference: str or unicode
+    :param length: Reference length
+    :type length: int
+    :return: Counts at each position of the reference for the plus \
+    and minus strands
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    plus = []
+    minus = []
+    for read in bam.fetch(reference):
+        if read.is_unmapped:
+            continue
+        if read.is_reverse:
+            minus.append(read.reference_end - 1)
+        else:
+            plus.append(read.reference_start)
+    return (positions_to_counts(plus, length),
+            positions_to_counts(minus, length))
+
+
+def positions_to_counts(positions, length):
+    """
+    Count the number of occurrences of each position in a reference.
+
+    :param positions: Positions (0-indexed)
+    :type positions: list(int)
+    :param length: Reference length
+    :type length: int
+    :return: Counts at each position of the reference
+    :rtype: numpy.ndarray
+    """
+    counts = np.bincount(np.asarray(positions, dtype=np.int64),
+                         minlength=length)
+    return counts[:length]
+
+
+def counts_to_bedgraph(reference, counts):
+    """
+    Convert counts at each position of a reference into bedGraph
+    data rows, where adjacent positions with the same count are merged
+    into a single row.
+
+    :param reference: Reference name
+    :type reference: str or unicode
+    :param counts: Counts at each position of the reference
+    :type counts: numpy.ndarray
+    :return: bedGraph data rows
+    :rtype: str or unicode
+    """
+    length = len(counts)
+    if length == 0:
+        return ""
+    changes = np.flatnonzero(np.diff(counts)) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [length]))
+    return "".join(["{}\t{}\t{}\t{}\n".format(reference, start, end,
+                                              int(count))
+                    for start, end, count in zip(starts, ends,
+                                                 counts[starts])])
+
+
+def count_references(bam_file, references):
+    """
+    Count the 5' ends of the mapped reads aligned to each of a list
+    of references, for each strand, and convert the counts into
+    bedGraph data rows. The BAM file must be indexed.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param references: Reference names and lengths
+    :type references: list(tuple(str or unicode, int))
+    :return: For each reference, plus strand bedGraph data rows, \
+    minus strand bedGraph data rows, whether the reference has reads \
+    on the plus strand, whether the reference has reads on the minus \
+    strand
+    :rtype: list(tuple(str or unicode, str or unicode, bool, bool))
+    """
+    results = []
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        for reference, length in references:
+            plus, minus = count_5p_ends(bam, reference, length)
+            results.append((counts_to_bedgraph(reference, plus),
+                            counts_to_bedgraph(reference, minus),
+                            bool(plus.any()),
+                            bool(minus.any())))
+    return results
+
+
+def count_unindexed(bam_file):
+    """
+    Count the 5' ends of the mapped reads aligned to each reference,
+    for each strand, and convert the counts into bedGraph data rows,
+    by scanning a BAM file which need not be indexed.
+
+    The counts for all references are held in one array per strand,
+    with each reference at an offset in the array. The 5' end
+    positions of the reads are buffered, :py:const:`READS_PER_CHUNK`
+    at a time, and then added to the counts using ``numpy.add.at``.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :return: See :py:func:`count_references`
+    :rtype: list(tuple(str or unicode, str or unicode, bool, bool))
+    """
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        references = list(zip(bam.references, bam.lengths))
+        offsets = [0]
+        for _, length in references:
+            offsets.append(offsets[-1] + length)
+        plus = np.zeros(offsets[-1], dtype=np.int64)
+        minus = np.zeros(offsets[-1], dtype=np.int64)
+        positions = np.empty(READS_PER_CHUNK, dtype=np.int64)
+        is_reverse = np.empty(READS_PER_CHUNK, dtype=bool)
+        num_positions = 0
+        for read in bam.fetch(until_eof=True):
+            if read.is_unmapped:
+                continue
+            offset = offsets[read.reference_id]
+            if read.is_reverse:
+                positions[num_positions] = offset + read.reference_end - 1
+                is_reverse[num_positions] = True
+            else:
+                positions[num_positions] = offset + read.reference_start
+                is_reverse[num_positions] = False
+            num_positions += 1
+            if num_positions == READS_PER_CHUNK:
+                add_positions(plus, minus, positions, is_reverse)
+                num_positions = 0
+        add_positions(plus, minus, positions[:num_positions],
+                      is_reverse[:num_positions])
+    results = []
+    for index, (reference, _) in enumerate(references):
+        plus_counts = plus[offsets[index]:offsets[index + 1]]
+        minus_counts = minus[offsets[index]:offsets[index + 1]]
+        results.append((counts_to_bedgraph(reference, plus_counts),
+                        counts_to_bedgraph(reference, minus_counts),
+                        bool(plus_counts.any()),
+                        bool(minus_counts.any())))
+    return results
+
+
+def add_positions(plus, minus, positions, is_reverse):
+    """
+    Add 5' end positions to plus and minus strand counts.
+
+    :param plus: Plus strand counts, updated in place
+    :type plus: numpy.ndarray
+    :param minus: Minus strand counts, updated in place
+    :type minus: numpy.ndarray
+    :param positions: Positions (0-indexed)
+    :type positions: numpy.ndarray
+    :param is_reverse: Whether each position is on the minus strand
+    :type is_reverse: numpy.ndarray
+    """
+    np.add.at(plus, positions[~is_reverse], 1)
+    np.add.at(minus, positions[is_reverse], 1)
+
+
+def write_bedgraph(bedgraph_file, rows, is_reads):
+    """
+    Write a bedGraph file, with a track definition line, writing data
+    rows for references with reads first, then data rows for
+    references without reads.
+
+    :param bedgraph_file: bedGraph file
+    :type bedgraph_file: str or unicode
+    :param rows: bedGraph data rows for each reference
+    :type rows: list(str or unicode)
+    :param is_reads: Whether each reference has reads
+    :type is_reads: list(bool)
+    """
+    with open(bedgraph_file, "w") as f:
+        f.write(TRACK_PREFIX + "\n")
+        for reference_rows, is_reference_reads in zip(rows, is_reads):
+            if is_reference_reads:
+                f.write(reference_rows)
+        for reference_rows, is_reference_reads in zip(rows, is_reads):
+            if not is_reference_reads:
+                f.write(reference_rows)
+
+
+def write_bedgraphs(bam_file, plus_bedgraph_file, minus_bedgraph_file,
+                    num_processes=1):
+    """
+    Scan a BAM file once, counting the 5' ends of reads on both
+    strands, and write bedGraph files for the plus and minus
+    strands. See module documentation.
+
+    If the BAM file is indexed and ``num_processes`` is greater than
+    1 then the references are split into groups and the reads of each
+    group are counted in parallel using a pool of ``num_processes``
+    processes.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param plus_bedgraph_file: Plus strand bedGraph file (output)
+    :type plus_bedgraph_file: str or unicode
+    :param minus_bedgraph_file: Minus strand bedGraph file (output)
+    :type minus_bedgraph_file: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :raise FileNotFoundError: if ``bam_file`` cannot be found
+    """
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        references = list(zip(bam.references, bam.lengths))
+        is_indexed = bam.has_index()
+    if not is_indexed:
+        results = count_unindexed(bam_file)
+    elif num_processes > 1 and len(references) > 1:
+        num_groups = min(len(references),
+                         num_processes * GROUPS_PER_PROCESS)
+        group_size = -(-len(references) // num_groups)
+        groups = [references[i:i + group_size]
+                  for i in range(0, len(references), group_size)]
+        with multiprocessing.Pool(num_processes) as pool:
+            group_results = pool.starmap(
+                count_references, [(bam_file, group) for group in groups])
+        results = [result for group_result in group_results
+                   for result in group_result]
+    else:
+        results = count_references(bam_file, references)
+    plus_rows, minus_rows, is_plus_reads, is_minus_reads = \
+        zip(*results) if results else ([], [], [], [])
+    write_bedgraph(plus_bedgraph_file, plus_rows, is_plus_reads)
+    write_bedgraph(minus_bedgraph_file, minus_rows, is_minus_reads)
@@ -1,58 +1,399 @@
 """
 FASTA and GFF compatibility functions.
+
+The ``CDS`` features of a GFF file are read into memory, grouped by
+sequence name. The FASTA file is then read once, one sequence at a
+time, and the CDSs of each sequence are extracted and checked, in
+parallel, using a lookup table of codon codes.
+
+If a cache directory is provided then ``CDS`` features are read from
+a parsed annotation cached there, which is created if it does not
+exist (see :py:mod:`riboviz.annotation`), rather than from the GFF
+file.
 """
+import collections
+import functools
+import gzip
+import multiprocessing
 import warnings
-from Bio.Seq import Seq
-import gffutils
+from riboviz import annotation
+from riboviz import gff_utils
+from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+SEQID = "SeqID"
+""" Report column name (sequence name). """
+FEATURE_ID = "FeatureID"
+""" Report column name (CDS ``ID`` or ``Name`` attribute). """
+START = "Start"
+""" Report column name (CDS 1-indexed start). """
+END = "End"
+""" Report column name (CDS 1-indexed end). """
+STRAND = "Strand"
+""" Report column name (CDS strand). """
+LENGTH = "Length"
+""" Report column name (CDS length). """
+ISSUE = "Issue"
+""" Report column name (issue). """
+DETAIL = "Detail"
+""" Report column name (issue details). """
+HEADER = [SEQID, FEATURE_ID, START, END, STRAND, LENGTH, ISSUE, DETAIL]
+""" Report column names. """
+MISSING_SEQUENCE = "MissingSequence"
+""" Issue: CDS sequence is not in FASTA file. """
+OUT_OF_RANGE = "OutOfRange"
+""" Issue: CDS extends beyond end of its sequence. """
+INCOMPLETE_CODON = "IncompleteCodon"
+""" Issue: CDS length is not divisible by 3. """
+NO_START_CODON = "NoStartCodon"
+""" Issue: CDS does not begin with a start codon. """
+NO_STOP_CODON = "NoStopCodon"
+""" Issue: CDS does not end with a stop codon. """
+INTERNAL_STOP_CODON = "InternalStopCodon"
+""" Issue: CDS has stop codons before its end. """
+ISSUES = [MISSING_SEQUENCE, OUT_OF_RANGE, INCOMPLETE_CODON,
+          NO_START_CODON, NO_STOP_CODON, INTERNAL_STOP_CODON]
+""" Issues, in the order they are reported for each CDS. """
+ISSUE_MESSAGES = {
+    MISSING_SEQUENCE: "{} not found in FASTA file.",
+    OUT_OF_RANGE: "{} has CDS beyond end of sequence.",
+    NO_START_CODON: "{} doesn't start with ATG.",
+    NO_STOP_CODON: "{} doesn't stop at end.",
+    INTERNAL_STOP_CODON: "{} has internal STOP."
+}
+""" Messages printed by :py:func:`check_fasta_gff` for each issue. """
+INCOMPLETE_CODON_WARNING = "{} has length that isn't divisible by 3"
+""" Warning raised by :py:func:`check_fasta_gff` for incomplete codons. """
+START_CODON = "ATG"
+""" Start codon. """
+STOP_CODONS = ["TAA", "TAG", "TGA", "TAR", "TRA"]
+"""
+Stop codons, including those with IUPAC ambiguity codes whose every
+expansion is a stop codon.
+"""
+CODON_BASES = "ACGTR"
+"""
+Bases distinguished by the codon lookup table. ``U`` is treated as
+``T`` and every other character as unknown.
+"""
+ID_ATTRIBUTES = ["ID", "Name"]
+""" GFF attributes used, in order of preference, as CDS IDs. """
+COMPLEMENT = bytes.maketrans(b"ACGTURYKMBVDHNacgturykmbvdhn",
+                             b"TGCAAYRMKVBHDNtgcaayrmkvbhdn")
+""" Nucleotide complement translation table. """
+SEQUENCES_PER_TASK = 16
+""" Number of sequences submitted at a time to each process. """
+
+CdsTuple = collections.namedtuple(
+    "CdsTuple", ["index", "seqname", "feature_id", "start", "end",
+                 "strand"])
+"""
+CDS feature:
+
+* ``index``: Index of CDS in GFF file (int).
+* ``seqname``: Sequence name (str or unicode).
+* ``feature_id``: CDS ``ID`` or ``Name`` attribute, or ``""`` (str
+  or unicode).
+* ``start``: 1-indexed start (int).
+* ``end``: 1-indexed end (int).
+* ``strand``: Strand (str or unicode).
+"""
+
+
+def read_cds_features(gff_file, cache_dir=None):
+    """
+    Read ``CDS`` features from a GFF2/GFF3 file, or from its parsed
+    annotation in a cache directory (see
+    :py:func:`riboviz.annotation.read_gff_features`), and group these by
+    sequence name.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param cache_dir: Parsed annotation cache directory
+    :type cache_dir: str or unicode
+    :return: CDS features, in GFF file order, keyed by sequence name
+    :rtype: collections.OrderedDict(str or unicode -> list(CdsTuple))
+    """
+    features = collections.OrderedDict()
+    index = 0
+    for seqname, feature_type, start, end, strand, attributes in \
+            annotation.read_gff_features(gff_file, cache_dir):
+        if feature_type != gff_utils.CDS:
+            continue
+        feature_id = next((attributes[key] for key in ID_ATTRIBUTES
+                           if key in attributes), "")
+        features.setdefault(seqname, []).append(
+            CdsTuple(index, seqname, feature_id, start, end, strand))
+        index += 1
+    return features
+
 
+def read_fasta(fasta_file):
+    """
+    Read sequences from a FASTA file, which may be compressed
+    (``.gz``), one at a time. Sequence names are the text following
+    ``>`` up to the first whitespace.
+
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :return: Sequence names and sequences
+    :rtype: generator(tuple(str or unicode, bytes))
+    """
+    open_file = gzip.open if fasta_file.endswith(".gz") else open
+    name = None
+    lines = []
+    with open_file(fasta_file, "rb") as f:
+        for line in f:
+            if line.startswith(b">"):
+                if name is not None:
+                    yield name, b"".join(lines)
+                name = line[1:].split(maxsplit=1)[0].decode() \
+                    if line[1:].strip() else ""
+                lines = []
+            elif name is not None:
+                lines.append(line.strip())
+    if name is not None:
+        yield name, b"".join(lines)
+
+
+@functools.lru_cache(maxsize=None)
+def get_codon_tables():
+    """
+    Get lookup tables for codons. Each base is mapped to a code using
+    :py:const:`CODON_BASES` and each codon to the code
+    ``(36 * base1) + (6 * base2) + base3``.
+
+    :return: Base code for every byte value, codon code of \
+    :py:const:`START_CODON` and whether each codon code is one of \
+    :py:const:`STOP_CODONS`
+    :rtype: tuple(numpy.ndarray, int, numpy.ndarray)
+    """
+    unknown = len(CODON_BASES)
+    base_codes = np.full(256, unknown, dtype=np.int16)
+    for code, base in enumerate(CODON_BASES):
+        base_codes[ord(base)] = code
+        base_codes[ord(base.lower())] = code
+    base_codes[ord("U")] = base_codes[ord("u")] = CODON_BASES.index("T")
+
+    def get_codon_code(codon):
+        return sum(CODON_BASES.index(base) * (6 ** (2 - position))
+                   for position, base in enumerate(codon))
+    is_stop = np.zeros(6 ** 3, dtype=bool)
+    is_stop[[get_codon_code(codon) for codon in STOP_CODONS]] = True
+    return base_codes, get_codon_code(START_CODON), is_stop
 
-def check_fasta_gff(fasta, gff):
+
+def get_cds_sequence(sequence, cds):
+    """
+    Get the sequence of a CDS, reverse complemented if the CDS is on
+    the minus strand.
+
+    :param sequence: Sequence
+    :type sequence: bytes
+    :param cds: CDS
+    :type cds: CdsTuple
+    :return: CDS sequence
+    :rtype: bytes
+    """
+    cds_sequence = sequence[cds.start - 1:cds.end]
+    if cds.strand == "-":
+        cds_sequence = cds_sequence.translate(COMPLEMENT)[::-1]
+    return cds_sequence
+
+
+def check_cds(cds_sequence):
+    """
+    Check that a CDS begins with a start codon, ends with a stop
+    codon and has no internal stop codons. If the CDS length is not
+    divisible by 3 then its last codon is incomplete, so is not a
+    stop codon.
+
+    :param cds_sequence: CDS sequence
+    :type cds_sequence: bytes
+    :return: Issues, each a tuple of one of :py:const:`ISSUES` and \
+    details
+    :rtype: list(tuple(str or unicode, str or unicode))
+    """
+    issues = []
+    length = len(cds_sequence)
+    num_codons, remainder = divmod(length, 3)
+    if remainder:
+        issues.append((INCOMPLETE_CODON, str(length)))
+    base_codes, start_code, is_stop = get_codon_tables()
+    codes = base_codes[np.frombuffer(cds_sequence, dtype=np.uint8)]
+    codes = codes[:num_codons * 3].reshape(-1, 3)
+    codons = codes[:, 0] * 36 + codes[:, 1] * 6 + codes[:, 2]
+    stops = is_stop[codons]
+    if num_codons == 0 or codons[0] != start_code:
+        issues.append((NO_START_CODON, cds_sequence[:3].decode()))
+    if remainder or num_codons == 0 or not stops[-1]:
+        last_codon = num_codons if remainder else max(num_codons - 1, 0)
+        issues.append((NO_STOP_CODON,
+                       cds_sequence[last_codon * 3:].decode()))
+    # Without a complete last codon every complete codon is internal.
+    internal = stops if remainder else stops[:-1]
+    if internal.any():
+        issues.append((INTERNAL_STOP_CODON,
+                       ",".join(str(codon + 1) for codon in
+                                np.flatnonzero(internal))))
+    return issues
+
+
+def check_sequence(sequence, features):
+    """
+    Check the CDSs of a sequence.
+
+    :param sequence: Sequence
+    :type sequence: bytes
+    :param features: CDSs of the sequence
+    :type features: list(CdsTuple)
+    :return: Issues, each a tuple of CDS index in GFF file and \
+    report row with values for :py:const:`HEADER`
+    :rtype: list(tuple(int, list))
+    """
+    rows = []
+    for cds in features:
+        if cds.end > len(sequence):
+            issues = [(OUT_OF_RANGE, str(len(sequence)))]
+        else:
+            issues = check_cds(get_cds_sequence(sequence, cds))
+        for issue, detail in issues:
+            rows.append((cds.index,
+                         [cds.seqname, cds.feature_id, cds.start, cds.end,
+                          cds.strand, cds.end - cds.start + 1, issue,
+                          detail]))
+    return rows
+
+
+def _check_sequence(args):
+    """
+    Call :py:func:`check_sequence`.
+
+    :param args: :py:func:`check_sequence` arguments
+    :type args: tuple
+    :return: Issues
+    :rtype: list(tuple(int, list))
+    """
+    return check_sequence(*args)
+
+
+def check_fasta_gff_issues(fasta, gff, num_processes=1, cache_dir=None):
     """
     Check FASTA and GFF files for compatibility. Check that:
 
-    * The beginning of every CDS is a start codon (ATG; translates to
-      ``M``).
-    * The stop of every CDS is a stop codon (TAG, TGA, TAA; translates
-      to ``*``)
+    * The sequence of every CDS is in the FASTA file.
+    * The beginning of every CDS is a start codon (ATG).
+    * The end of every CDS is a stop codon (TAG, TGA, TAA).
     * There are no stop codons internal to the CDS.
+    * The length of every CDS is divisible by 3.
 
     Some unusual genes (e.g. frameshifts) might not have this.
 
-    Information is currently printed to standard output.
+    :param fasta: FASTA file
+    :type fasta: str or unicode
+    :param gff: GFF2/GFF3 file
+    :type gff: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param cache_dir: Parsed annotation cache directory
+    :type cache_dir: str or unicode
+    :return: Issues, with columns :py:const:`HEADER`, in GFF file \
+    order then :py:const:`ISSUES` order
+    :rtype: pandas.core.frame.DataFrame
+    """
+    features = read_cds_features(gff, cache_dir)
+    found = set()
+
+    def get_tasks():
+        for name, sequence in read_fasta(fasta):
+            if name in features and name not in found:
+                found.add(name)
+                yield sequence, features[name]
+    if num_processes > 1:
+        with multiprocessing.Pool(processes=num_processes) as pool:
+            results = list(pool.imap(_check_sequence, get_tasks(),
+                                     chunksize=SEQUENCES_PER_TASK))
+    else:
+        results = [check_sequence(*task) for task in get_tasks()]
+    rows = [row for sequence_rows in results for row in sequence_rows]
+    for name in features:
+        if name in found:
+            continue
+        for cds in features[name]:
+            rows.append((cds.index,
+                         [cds.seqname, cds.feature_id, cds.start, cds.end,
+                          cds.strand, cds.end - cds.start + 1,
+                          MISSING_SEQUENCE, ""]))
+    # Sort by CDS index, preserving order of issues for each CDS.
+    rows.sort(key=lambda row: row[0])
+    return pd.DataFrame([row for _, row in rows], columns=HEADER)
+
+
+def check_fasta_gff(fasta, gff, num_processes=1, cache_dir=None):
+    """
+    Check FASTA and GFF files for compatibility (see
+    :py:func:`check_fasta_gff_issues`) and print any issues to
+    standard output. A warning is raised for each CDS whose length is
+    not divisible by 3.
 
     :param fasta: FASTA file
     :type fasta: str or unicode
-    :param gff: GFF file
+    :param gff: GFF2/GFF3 file
     :type gff: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param cache_dir: Parsed annotation cache directory
+    :type cache_dir: str or unicode
+    :return: Issues, see :py:func:`check_fasta_gff_issues`
+    :rtype: pandas.core.frame.DataFrame
     """
     print(("Checking fasta file " + fasta))
     print(("with gff file " + gff))
-    gffdb = gffutils.create_db(gff,
-                               dbfn='test.db',
-                               force=True,
-                               keep_order=True,
-                               merge_strategy='merge',
-                               sort_attribute_values=True)
-    for cds_coord in gffdb.features_of_type('CDS'):
-        # for all CDS entries in gff,
-        # print(cds_coord.seqid)
-        # extract CDS
-        try:
-            cds_seq = cds_coord.sequence(fasta)
-        except Exception as e:
-            print(str(e))
-            continue
-        cds_len_remainder = len(cds_seq) % 3
-        if cds_len_remainder != 0:
-            warnings.warn(
-                cds_coord.seqid + " has length that isn't divisible by 3")
-            cds_seq += ("N" * (3 - cds_len_remainder))
-
-        cds_trans = Seq(cds_seq).translate()
-
-        if cds_trans[0] != "M":
-            print((cds_coord.seqid + " doesn't start with ATG."))
-        if cds_trans[-1] != "*":
-            print((cds_coord.seqid + " doesn't stop at end."))
-        if any([L == "*" for L in cds_trans[:-1]]):
-            print((cds_coord.seqid + " has internal STOP."))
+    issues = check_fasta_gff_issues(fasta, gff, num_processes, cache_dir)
+    for seqid, issue in zip(issues[SEQID], issues[ISSUE]):
+        if issue == INCOMPLETE_CODON:
+            warnings.warn(INCOMPLETE_CODON_WARNING.format(seqid))
+        else:
+            print(ISSUE_MESSAGES[issue].format(seqid))
+    return issues
+
+
+def write_issues(issues, tsv_file):
+    """
+    Write issues to a tab-separated values file.
+
+    :param issues: Issues, see :py:func:`check_fasta_gff_issues`
+    :type issues: pandas.core.frame.DataFrame
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    """
+    with open(tsv_file, "w") as f:
+        f.write(provenance.get_provenance(__file__))
+        issues.to_csv(f, sep="\t", index=False)
+
+
+def check_fasta_gff_to_tsv(fasta, gff, tsv_file, num_processes=1,
+                           cache_dir=None):
+    """
+    Check FASTA and GFF files for compatibility (see
+    :py:func:`check_fasta_gff_issues`) and write the issues to a
+    tab-separated values file.
+
+    :param fasta: FASTA file
+    :type fasta: str or unicode
+    :param gff: GFF2/GFF3 file
+    :type gff: str or unicode
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param cache_dir: Parsed annotation cache directory
+    :type cache_dir: str or unicode
+    :return: Issues, see :py:func:`check_fasta_gff_issues`
+    :rtype: pandas.core.frame.DataFrame
+    """
+    issues = check_fasta_gff_issues(fasta, gff, num_processes, cache_dir)
+    write_issues(issues, tsv_file)
+    return issues
@@ -0,0 +1,342 @@
+"""
+Codon-specific ribosome density constants and functions.
+
+:py:func:`calculate_codon_densities` provides a native alternative to
+``CalculateCodonSpecificRibosomeDensity`` in
+``stats_figs_block_functions.R``. Rather than looking up each codon
+position one at a time, three times, it:
+
+* Reads the ribogrids of all genes into a single array, via
+  :py:class:`riboviz.ribogrid_reader.RibogridReader`.
+* Maps reads of lengths 28, 29 and 30 to codons, for all genes at
+  once, using cumulative sums, as ``GetCodonPositionReads`` does for
+  each gene.
+* Trims the first :py:const:`NUM_TRIMMED_CODONS` codons and the stop
+  codon of each gene, drops genes with too few codons or reads, and
+  normalises each gene's codon counts by their mean, giving one flat
+  array of normalised densities and the offset of each gene within it.
+* Converts the codon positions into indices into the flat array
+  and computes the mean density at each codon, for the A, P and E
+  sites, with ``numpy.bincount``.
+
+Codon positions are read from a tab-separated values file with
+columns :py:const:`CODON`, :py:const:`GENE` and :py:const:`POSITION`,
+one row per codon occurrence, where positions are 1-indexed codon
+positions after the first :py:const:`NUM_TRIMMED_CODONS` codons. An
+``.RData`` file with a ``codon_pos`` object, as used by
+``generate_stats_figs.R``, can be converted into this format using
+``rscripts/codon_positions_to_tsv.R``.
+"""
+from riboviz import provenance
+from riboviz import ribogrid_reader
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+CODON = "Codon"
+""" Codon positions file column name. """
+GENE = "Gene"
+""" Codon positions file column name. """
+POSITION = "Position"
+""" Codon positions file column name. """
+A_SITE = "A"
+""" ``codon_ribodens.tsv`` column name. """
+P_SITE = "P"
+""" ``codon_ribodens.tsv`` column name. """
+E_SITE = "E"
+""" ``codon_ribodens.tsv`` column name. """
+SITE_OFFSETS = {A_SITE: 0, P_SITE: 1, E_SITE: 2}
+""" Offset, in codons, of each site from a codon position. """
+CODON_READ_LENGTHS = [(28, 1), (29, 1), (30, 0)]
+"""
+Read lengths mapped to codons and the offset, in positions, of each
+read length's first codon.
+"""
+LEFT_OFFSET = 15
+"""
+Number of positions before the end of the left buffer at which codon
+mapping starts.
+"""
+RIGHT_OFFSET = 11
+"""
+Number of positions after the start of the right buffer at which
+codon mapping ends.
+"""
+NUM_TRIMMED_CODONS = 200
+""" Number of codons trimmed from the start of each gene. """
+DEFAULT_COUNT_THRESHOLD = 64
+""" Default minimum number of reads in a gene's trimmed codons. """
+FLOAT_FORMAT = "%.15g"
+"""
+Format of floating point values, matching the precision of R's
+``write.table``.
+"""
+
+
+def load_codon_positions(codon_positions_file):
+    """
+    Load codon positions. See module documentation.
+
+    :param codon_positions_file: Codon positions TSV file
+    :type codon_positions_file: str or unicode
+    :return: Codon positions
+    :rtype: pandas.core.frame.DataFrame
+    """
+    return pd.read_csv(codon_positions_file, sep="\t", comment="#",
+                       dtype={CODON: str, GENE: str, POSITION: np.int64})
+
+
+def get_codon_position_reads(counts, offsets, num_positions, left, right,
+                             min_read_length):
+    """
+    Map reads of lengths 28, 29 and 30 to codons for several genes,
+    as ``GetCodonPositionReads`` does for each gene. This includes
+    reproducing how R recycles shorter vectors and returns ``NA`` for
+    out-of-range indices, which arises if the number of positions
+    considered is not a multiple of 3 plus 1.
+
+    :param counts: Counts, with one row per read length and one \
+    column per position, with the positions of the genes \
+    concatenated
+    :type counts: numpy.ndarray
+    :param offsets: Column at which each gene starts
+    :type offsets: numpy.ndarray
+    :param num_positions: Number of positions of each gene
+    :type num_positions: numpy.ndarray
+    :param left: 1-indexed position from which to map reads
+    :type left: int
+    :param right: Number of positions, at the end of each gene, to \
+    exclude
+    :type right: int
+    :param min_read_length: Read length of first row of ``counts``
+    :type min_read_length: int
+    :return: Codon counts, ``NaN`` where R would return ``NA``, for \
+    all genes concatenated, and number of codons of each gene
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    :raise AssertionError: if ``counts`` has no rows for any of \
+    the read lengths mapped to codons
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_positions = np.asarray(num_positions, dtype=np.int64)
+    rows = [length - min_read_length for length, _ in CODON_READ_LENGTHS]
+    assert min(rows) >= 0 and max(rows) < counts.shape[0], \
+        "Read lengths {} are not in counts for minimum read length {}"\
+        .format([length for length, _ in CODON_READ_LENGTHS],
+                min_read_length)
+    num_subset = np.maximum(num_positions - right - left + 1, 0)
+    num_by_shift = {shift: -(-np.maximum(num_subset - shift, 0) // 3)
+                    for _, shift in CODON_READ_LENGTHS}
+    num_codons = np.maximum(
+        np.max(list(num_by_shift.values()), axis=0) - 1, 0)
+    gene_starts = np.concatenate(([0], np.cumsum(num_codons)))
+    gene_of = np.repeat(np.arange(len(num_codons)), num_codons)
+    codon = np.arange(gene_starts[-1]) - gene_starts[gene_of]
+    codon_counts = np.zeros(len(codon), dtype=np.float64)
+    for (_, shift), row in zip(CODON_READ_LENGTHS, rows):
+        cumsum = np.concatenate(([0], np.cumsum(counts[row],
+                                                dtype=np.int64)))
+        num_shift = np.maximum(num_by_shift[shift][gene_of], 1)
+        index = 3 * (codon % num_shift)
+        is_valid = index + 2 < num_subset[gene_of] - shift
+        start = offsets[gene_of] + left - 1 + shift + index
+        start = np.where(is_valid, start, 0)
+        sums = cumsum[start + 3] - cumsum[start]
+        codon_counts += np.where(is_valid, sums, np.nan)
+    return codon_counts, num_codons
+
+
+def get_normalised_densities(codon_counts, num_codons, count_threshold):
+    """
+    Trim the first :py:const:`NUM_TRIMMED_CODONS` codons and the stop
+    codon from each gene's codon counts, drop genes with
+    :py:const:`NUM_TRIMMED_CODONS` or fewer sense codons, or fewer
+    than ``count_threshold`` reads in their trimmed codons, and
+    normalise each remaining gene's trimmed codon counts by their
+    mean.
+
+    :param codon_counts: Codon counts of all genes concatenated, \
+    see :py:func:`get_codon_position_reads`
+    :type codon_counts: numpy.ndarray
+    :param num_codons: Number of codons of each gene
+    :type num_codons: numpy.ndarray
+    :param count_threshold: Minimum number of reads in a gene's \
+    trimmed codons
+    :type count_threshold: int
+    :return: Normalised densities of the remaining genes \
+    concatenated, the indices of the remaining genes, and the offset \
+    and number of trimmed codons of each remaining gene in the \
+    normalised densities
+    :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray, \
+    numpy.ndarray)
+    """
+    num_codons = np.asarray(num_codons, dtype=np.int64)
+    gene_starts = np.concatenate(([0], np.cumsum(num_codons)))[:-1]
+    is_long = num_codons > NUM_TRIMMED_CODONS + 1
+    genes = np.flatnonzero(is_long)
+    num_trimmed = num_codons[genes] - NUM_TRIMMED_CODONS - 1
+    trimmed_starts = np.concatenate(([0], np.cumsum(num_trimmed)))
+    gene_of = np.repeat(np.arange(len(genes)), num_trimmed)
+    codon = np.arange(trimmed_starts[-1]) - trimmed_starts[gene_of]
+    trimmed = codon_counts[gene_starts[genes][gene_of] +
+                           NUM_TRIMMED_CODONS + codon]
+    if len(genes):
+        sums = np.add.reduceat(trimmed, trimmed_starts[:-1])
+    else:
+        sums = np.zeros(0)
+    is_counted = sums >= count_threshold
+    means = sums / np.maximum(num_trimmed, 1)
+    is_kept = is_counted[gene_of]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        densities = trimmed[is_kept] / means[gene_of][is_kept]
+    num_trimmed = num_trimmed[is_counted]
+    return (densities,
+            genes[is_counted],
+            np.concatenate(([0], np.cumsum(num_trimmed)))[:-1],
+            num_trimmed)
+
+
+def get_site_means(densities, density_offsets, num_densities,
+                   codon_ids, gene_ids, positions, num_codons):
+    """
+    Compute the mean normalised density at each codon, for each of
+    the A, P and E sites. Positions outside a gene, genes without
+    densities, and ``NaN`` densities are ignored, as
+    ``CalculateCodonSpecificRibosomeDensity`` does. A codon with no
+    densities has mean ``NaN``.
+
+    :param densities: Normalised densities, see \
+    :py:func:`get_normalised_densities`
+    :type densities: numpy.ndarray
+    :param density_offsets: Offset of each gene in ``densities``
+    :type density_offsets: numpy.ndarray
+    :param num_densities: Number of densities of each gene
+    :type num_densities: numpy.ndarray
+    :param codon_ids: Index of codon of each codon position
+    :type codon_ids: numpy.ndarray
+    :param gene_ids: Index of gene, into ``density_offsets``, of \
+    each codon position, or -1 if the gene has no densities
+    :type gene_ids: numpy.ndarray
+    :param positions: 1-indexed position of each codon position
+    :type positions: numpy.ndarray
+    :param num_codons: Number of codons
+    :type num_codons: int
+    :return: Means for each site
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    # Genes without densities are given 0 densities.
+    gene_ids = np.where(gene_ids >= 0, gene_ids, len(num_densities))
+    num_densities = np.append(num_densities, 0)
+    density_offsets = np.append(density_offsets, 0)
+    means = {}
+    for site, site_offset in SITE_OFFSETS.items():
+        site_positions = positions + site_offset
+        is_valid = (site_positions >= 1) & \
+            (site_positions <= num_densities[gene_ids])
+        index = density_offsets[gene_ids] + site_positions - 1
+        values = densities[index[is_valid]]
+        is_number = ~np.isnan(values)
+        site_codons = codon_ids[is_valid][is_number]
+        totals = np.bincount(site_codons, weights=values[is_number],
+                             minlength=num_codons)
+        totals_count = np.bincount(site_codons, minlength=num_codons)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means[site] = totals / totals_count
+    return means
+
+
+def calculate_codon_densities(h5_file, codon_positions, dataset="data",
+                              buffer=250, min_read_length=10,
+                              count_threshold=DEFAULT_COUNT_THRESHOLD,
+                              genes=None):
+    """
+    Calculate the codon-specific mean ribosome densities at the A, P
+    and E sites. See module documentation.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param codon_positions: Codon positions, see \
+    :py:func:`load_codon_positions`
+    :type codon_positions: pandas.core.frame.DataFrame
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param buffer: Length of flanking region around the CDS
+    :type buffer: int
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param count_threshold: Minimum number of reads in a gene's \
+    trimmed codons
+    :type count_threshold: int
+    :param genes: Primary gene IDs, or ``None`` for all genes
+    :type genes: list(str or unicode)
+    :return: Means at A, P and E sites, one row per codon, sorted by \
+    codon
+    :rtype: pandas.core.frame.DataFrame
+    """
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        if genes is None:
+            genes = reader.genes
+        counts, offsets = reader.read_all(genes)
+    num_positions = np.diff(np.concatenate((offsets, [counts.shape[1]])))
+    codon_counts, num_codons = get_codon_position_reads(
+        counts, offsets, num_positions, buffer - LEFT_OFFSET,
+        buffer + RIGHT_OFFSET, min_read_length)
+    densities, kept, density_offsets, num_densities = \
+        get_normalised_densities(codon_counts, num_codons,
+                                 count_threshold)
+    codons = sorted(codon_positions[CODON].unique())
+    codon_ids = pd.Index(codons).get_indexer(codon_positions[CODON])
+    gene_ids = pd.Index(np.asarray(genes)[kept]).get_indexer(
+        codon_positions[GENE])
+    means = get_site_means(densities, density_offsets, num_densities,
+                           codon_ids, gene_ids,
+                           codon_positions[POSITION].to_numpy(),
+                           len(codons))
+    data = pd.DataFrame(means, columns=list(SITE_OFFSETS))
+    data.insert(0, CODON, codons)
+    return data
+
+
+def codon_densities_to_tsv(h5_file, t_rna_file, codon_positions_file,
+                           tsv_file, dataset="data", buffer=250,
+                           min_read_length=10,
+                           count_threshold=DEFAULT_COUNT_THRESHOLD):
+    """
+    Calculate the codon-specific mean ribosome densities at the A, P
+    and E sites and write these, alongside the tRNA estimates, to a
+    tab-separated values file, with a provenance header, as
+    ``generate_stats_figs.R`` writes ``codon_ribodens.tsv``.
+
+    As in ``CalculateCodonSpecificRibosomeDensity``, the rows of the
+    tRNA estimates are assumed to be sorted by codon.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param t_rna_file: tRNA estimates TSV file
+    :type t_rna_file: str or unicode
+    :param codon_positions_file: Codon positions TSV file
+    :type codon_positions_file: str or unicode
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param buffer: Length of flanking region around the CDS
+    :type buffer: int
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param count_threshold: Minimum number of reads in a gene's \
+    trimmed codons
+    :type count_threshold: int
+    :raise AssertionError: if the number of tRNA estimates and \
+    codons differ
+    """
+    t_rnas = pd.read_csv(t_rna_file, sep=r"\s+", comment="#")
+    means = calculate_codon_densities(
+        h5_file, load_codon_positions(codon_positions_file), dataset,
+        buffer, min_read_length, count_threshold)
+    assert len(t_rnas) == len(means), \
+        "Number of tRNA estimates ({}) and codons ({}) differ".format(
+            len(t_rnas), len(means))
+    data = pd.concat([t_rnas, means[list(SITE_OFFSETS)]], axis=1)
+    provenance.write_provenance_header(__file__, tsv_file)
+    data.to_csv(tsv_file, mode='a', sep="\t", index=False,
+                float_format=FLOAT_FORMAT, na_rep="NA")
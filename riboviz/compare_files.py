@@ -1,6 +1,7 @@
 """
 Compare files for equality.
 """
+import multiprocessing
 import os
 import os.path
 from riboviz import bedgraph
@@ -10,8 +11,53 @@ from riboviz import hisat2
 from riboviz import sam_bam
 from riboviz import utils
 
+_DIGESTS = {}
+"""
+Cache of file digests keyed by absolute file name, size and
+modification time. This is not shared with worker processes, so
+:py:func:`compare_files_parallel` calculates digests in the calling
+process.
+"""
+
+
+def get_digest(file_name):
+    """
+    Get SHA-256 digest of a file (see
+    :py:func:`riboviz.utils.get_file_digest`). Digests are
+    cached and reused while a file's size and modification time are
+    unchanged.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :return: Digest
+    :rtype: str or unicode
+    """
+    stat = os.stat(file_name)
+    key = (os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns)
+    if key not in _DIGESTS:
+        _DIGESTS[key] = utils.get_file_digest(file_name)
+    return _DIGESTS[key]
+
+
+def identical_files(file1, file2):
+    """
+    Check if two files have identical content. File sizes are
+    compared first and digests (see :py:func:`get_digest`) only if
+    the sizes are equal.
+
+    :param file1: File name
+    :type file1: str or unicode
+    :param file2: File name
+    :type file2: str or unicode
+    :return: ``True`` if files have identical content
+    :rtype: bool
+    """
+    if os.path.getsize(file1) != os.path.getsize(file2):
+        return False
+    return get_digest(file1) == get_digest(file2)
+
 
-def compare_files(file1, file2, compare_names=True):
+def compare_files(file1, file2, compare_names=True, skip_identical=False):
     """
     Compare two files for equality. The following functions are used
     to compare each type of file:
@@ -26,12 +72,18 @@ def compare_files(file1, file2, compare_names=True):
     * ``sam``: :py:func:`riboviz.sam_bam.equal_sam`
     * ``tsv``: :py:func:`riboviz.utils.equal_tsv`
 
+    If ``skip_identical`` is ``True`` then files with identical
+    content (see :py:func:`identical_files`) are deemed equal without
+    using the above functions.
+
     :param file1: File name
     :type file1: str or unicode
     :param file2: File name
     :type file2: str or unicode
     :param compare_names: Compare file names?
     :type: bool
+    :param skip_identical: Deem files with identical content equal?
+    :type skip_identical: bool
     :raise AssertionError: If one or other file does not exist, \
     is a directory or their contents differ
     """
@@ -41,6 +93,8 @@ def compare_files(file1, file2, compare_names=True):
     assert not os.path.isdir(file2), "Directory: %s" % file2
     if compare_names:
         utils.equal_file_names(file1, file2)
+    if skip_identical and identical_files(file1, file2):
+        return
     ext = utils.get_file_ext(file1)
     if ext.endswith(tuple(["pdf"])):
         utils.equal_file_names(file1, file2)
@@ -60,3 +114,77 @@ def compare_files(file1, file2, compare_names=True):
         fastq.equal_fastq(file1, file2)
     else:
         assert False, "Unknown file type: " + ext
+
+
+def _compare_files(args):
+    """
+    Call :py:func:`compare_files` and return any ``AssertionError``
+    message, or other exception, as a string.
+
+    :param args: :py:func:`compare_files` arguments
+    :type args: tuple
+    :return: ``None`` if the files are equal, else a message
+    :rtype: str or unicode
+    """
+    try:
+        compare_files(*args)
+    except Exception as e:  # pylint: disable=broad-except
+        return "{}: {}".format(type(e).__name__, e)
+    return None
+
+
+def compare_files_parallel(file_pairs, compare_names=True,
+                           skip_identical=True, num_processes=1):
+    """
+    Compare pairs of files for equality, in parallel, using
+    :py:func:`compare_files`. The largest files are compared first to
+    balance the work across processes.
+
+    If ``skip_identical`` is ``True`` then pairs of files with
+    identical content (see :py:func:`identical_files`) are found
+    first, in the calling process, so each file's digest is
+    calculated once and cached for later calls to
+    :py:func:`identical_files`. Only the remaining pairs are compared
+    in parallel.
+
+    :param file_pairs: Pairs of file names
+    :type file_pairs: list(tuple(str or unicode, str or unicode))
+    :param compare_names: Compare file names?
+    :type: bool
+    :param skip_identical: Deem files with identical content equal?
+    :type skip_identical: bool
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :return: For each pair of files, ``None`` if the files are \
+    equal, else a message describing why they are not
+    :rtype: list(str or unicode)
+    """
+    def get_size(pair):
+        return sum(os.path.getsize(file_name) for file_name in pair
+                   if os.path.isfile(file_name))
+
+    def is_identical(pair):
+        return all(os.path.isfile(file_name) for file_name in pair) and \
+            identical_files(*pair)
+    results = [None] * len(file_pairs)
+    pending = []
+    for index, pair in enumerate(file_pairs):
+        if skip_identical and is_identical(pair):
+            results[index] = _compare_files(
+                tuple(pair) + (compare_names, True))
+        else:
+            pending.append(index)
+    order = sorted(pending,
+                   key=lambda index: get_size(file_pairs[index]),
+                   reverse=True)
+    # Remaining pairs are known not to be identical.
+    args = [tuple(file_pairs[index]) + (compare_names, False)
+            for index in order]
+    if num_processes > 1 and len(args) > 1:
+        with multiprocessing.Pool(processes=num_processes) as pool:
+            messages = pool.map(_compare_files, args, chunksize=1)
+    else:
+        messages = [_compare_files(arg) for arg in args]
+    for index, message in zip(order, messages):
+        results[index] = message
+    return results
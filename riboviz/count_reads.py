@@ -48,7 +48,6 @@ import glob
 import os
 import os.path
 import yaml
-import pandas as pd
 from riboviz import demultiplex_fastq
 from riboviz import fastq
 from riboviz import params
@@ -58,8 +57,10 @@ from riboviz import sample_sheets
 from riboviz import trim_5p_mismatch
 from riboviz import utils
 from riboviz import workflow_files
+from riboviz.lazy_import import lazy_import
 from riboviz.tools import demultiplex_fastq as demultiplex_fastq_tools_module
 from riboviz.tools import trim_5p_mismatch as trim_5p_mismatch_tools_module
+pd = lazy_import("pandas")
 
 SAMPLE_NAME = "SampleName"
 """ Column name. """
@@ -523,9 +524,9 @@ def count_reads(config_file, input_dir, tmp_dir, output_dir, reads_file):
     """
     reads_df = count_reads_df(config_file, input_dir, tmp_dir,
                               output_dir)
-    provenance.write_provenance_header(__file__, reads_file)
-    reads_df[list(reads_df.columns)].to_csv(
-        reads_file, mode='a', sep="\t", index=False)
+    with open(reads_file, 'w') as f:
+        f.write(provenance.get_provenance(__file__))
+        reads_df[list(reads_df.columns)].to_csv(f, sep="\t", index=False)
 
 
 def equal_read_counts(file1, file2, comment="#"):
@@ -83,14 +83,15 @@ import os.path
 from random import choices
 from random import seed
 import shutil
-import pandas as pd
-from Bio import SeqIO
-from Bio.Seq import Seq
-from Bio.SeqRecord import SeqRecord
 from riboviz import barcodes_umis
 from riboviz import demultiplex_fastq
 from riboviz import fastq
 from riboviz import sample_sheets
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
+SeqIO = lazy_import("Bio.SeqIO")
+BioSeq = lazy_import("Bio.Seq")
+BioSeqRecord = lazy_import("Bio.SeqRecord")
 
 QUALITY_MEDIUM = list(range(30, 41))
 """ List of medium quality scores. """
@@ -137,10 +138,10 @@ def make_fastq_record(name, reads, scores=None, qualities=QUALITY_MEDIUM):
     """
     if scores is None:
         scores = simulate_quality(len(reads), qualities=qualities)
-    record = SeqRecord(Seq(reads),
-                       id=name,
-                       name=name,
-                       description=name)
+    record = BioSeqRecord.SeqRecord(BioSeq.Seq(reads),
+                                    id=name,
+                                    name=name,
+                                    description=name)
     record.letter_annotations["phred_quality"] = scores
     return record
 
@@ -3,8 +3,9 @@ FASTQ-related constants and functions.
 """
 import gzip
 import os.path
-from Bio import SeqIO
 from riboviz import utils
+from riboviz.lazy_import import lazy_import
+SeqIO = lazy_import("Bio.SeqIO")
 
 FASTQ_EXT = "fastq"
 """ File extension. """
@@ -0,0 +1,73 @@
+"""
+GFF-related constants and functions.
+"""
+import urllib.parse
+
+UTR5 = "UTR5"
+""" GFF UTR5 feature type. """
+CDS = "CDS"
+""" GFF CDS feature type. """
+UTR3 = "UTR3"
+""" GFF UTR3 feature type. """
+DEFAULT_PRIMARY_ID = "gene_id"
+"""
+Default GFF attribute used to identify genes, as used by
+``bam_to_h5.R``.
+"""
+
+
+def parse_gff_attributes(attributes):
+    """
+    Parse GFF3 (``key=value;...``) or GFF2 (``key "value"; ...``)
+    attributes.
+
+    :param attributes: Attributes
+    :type attributes: str or unicode
+    :return: Attributes
+    :rtype: dict
+    """
+    values = {}
+    for attribute in attributes.strip().split(";"):
+        attribute = attribute.strip()
+        if not attribute:
+            continue
+        if "=" in attribute:
+            key, value = attribute.split("=", 1)
+            value = urllib.parse.unquote(value)
+        else:
+            key, _, value = attribute.partition(" ")
+            value = value.strip().strip('"')
+        values[key.strip()] = value
+    return values
+
+
+def read_gff_features(gff_file):
+    """
+    Read features from a GFF2/GFF3 file.
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :return: Features, each a tuple of sequence name, feature type, \
+    1-indexed start, 1-indexed end, strand and attributes
+    :rtype: list(tuple(str or unicode, str or unicode, int, int, \
+    str or unicode, dict))
+    :raise AssertionError: if a feature has less than 9 columns
+    """
+    features = []
+    with open(gff_file) as f:
+        for line in f:
+            if line.startswith("##FASTA"):
+                break
+            if line.startswith("#") or not line.strip():
+                continue
+            columns = line.rstrip("\n").split("\t")
+            assert len(columns) >= 9, \
+                "Invalid GFF file: %s. Expected 9 columns, found %d: %s" \
+                % (gff_file, len(columns), line)
+            features.append((columns[0],
+                             columns[2],
+                             int(columns[3]),
+                             int(columns[4]),
+                             columns[6],
+                             parse_gff_attributes(columns[8])))
+    return features
@@ -0,0 +1,309 @@
+"""
+H5 writer for per-gene ribogrids.
+
+:py:func:`write_genes` writes one group per gene with a ribogrid
+dataset and attributes, in the layout described in
+:py:mod:`riboviz.ribogrid`. Genes are written in batches. For each
+batch, the ribogrid chunks are compressed in a pool of processes and
+written directly into the H5 file, bypassing HDF5's own (serial)
+compression, and the groups, datasets and attributes of the batch are
+then created in a single pass. Chunks whose values are all zero are
+not written as HDF5 reads them as the dataset's fill value, zero.
+
+The following compression filters are supported:
+
+* ``gzip``: compressed in parallel. Files can be read by any HDF5
+  reader, including ``rhdf5`` as used by ``read_count_functions.R``.
+* ``lzf``: compressed by HDF5 when written. Files can be read by
+  ``h5py`` and by ``rhdf5`` if ``rhdf5filters`` is installed.
+* ``blosc``: compressed by HDF5 when written. Requires the optional
+  ``hdf5plugin`` package. Files can be read by readers with the Blosc
+  filter, for example ``rhdf5`` with ``rhdf5filters`` installed.
+* ``none``: no compression.
+"""
+import multiprocessing
+import zlib
+from riboviz.lazy_import import lazy_import
+h5py = lazy_import("h5py")
+np = lazy_import("numpy")
+
+GZIP = "gzip"
+""" gzip compression filter. """
+LZF = "lzf"
+""" LZF compression filter. """
+BLOSC = "blosc"
+""" Blosc compression filter. """
+NONE = "none"
+""" No compression. """
+COMPRESSIONS = [GZIP, LZF, BLOSC, NONE]
+""" Supported compression filters. """
+DEFAULT_COMPRESSION = GZIP
+""" Default compression filter, as used by ``bam_to_h5.R``. """
+DEFAULT_COMPRESSION_LEVEL = 7
+""" Default gzip compression level, as used by ``bam_to_h5.R``. """
+DEFAULT_CHUNK_LENGTHS = 1
+"""
+Default number of read lengths per chunk. With all positions in a
+chunk, this is the chunk shape used by ``bam_to_h5.R``.
+"""
+BATCH_SIZE = 256
+""" Number of genes to compress and write per batch. """
+
+
+def get_compression_filter(compression, compression_level):
+    """
+    Get ``h5py`` compression filter arguments.
+
+    :param compression: Compression filter, one of \
+    :py:const:`COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :return: ``h5py.Group.create_dataset`` keyword arguments
+    :rtype: dict
+    :raise AssertionError: if ``compression`` is not supported or \
+    ``blosc`` is requested but ``hdf5plugin`` is not installed
+    """
+    assert compression in COMPRESSIONS,\
+        "Unsupported compression: %s. Expected one of %s"\
+        % (compression, ", ".join(COMPRESSIONS))
+    if compression == GZIP:
+        return {"compression": GZIP,
+                "compression_opts": compression_level}
+    if compression == LZF:
+        return {"compression": LZF}
+    if compression == BLOSC:
+        try:
+            import hdf5plugin
+        except ImportError as e:
+            raise AssertionError(
+                "blosc compression requires hdf5plugin: %s" % str(e))
+        return dict(hdf5plugin.Blosc())
+    return {}
+
+
+def get_chunk_shape(shape, chunk_positions=None,
+                    chunk_lengths=DEFAULT_CHUNK_LENGTHS):
+    """
+    Get the chunk shape for a ribogrid dataset.
+
+    :param shape: Dataset shape (positions, read lengths)
+    :type shape: tuple(int, int)
+    :param chunk_positions: Maximum number of positions per chunk, \
+    or ``None`` for all positions
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :return: Chunk shape
+    :rtype: tuple(int, int)
+    """
+    num_positions, num_lengths = shape
+    if chunk_positions is not None:
+        num_positions = min(num_positions, chunk_positions)
+    return (max(num_positions, 1),
+            max(min(num_lengths, chunk_lengths), 1))
+
+
+def compress_chunks(data, chunks, compression_level):
+    """
+    Split a dataset into chunks and compress each chunk, in the same
+    way as the HDF5 ``deflate`` filter. Chunks at the edges of the
+    dataset are padded with zeros. Chunks whose values are all zero
+    are omitted.
+
+    :param data: Dataset
+    :type data: numpy.ndarray
+    :param chunks: Chunk shape
+    :type chunks: tuple(int, int)
+    :param compression_level: Compression level
+    :type compression_level: int
+    :return: Offset of each chunk and its compressed bytes
+    :rtype: list(tuple(tuple(int, int), bytes))
+    """
+    compressed = []
+    chunk = np.zeros(chunks, dtype=data.dtype)
+    for row in range(0, data.shape[0], chunks[0]):
+        for column in range(0, data.shape[1], chunks[1]):
+            block = data[row:row + chunks[0], column:column + chunks[1]]
+            if not block.any():
+                continue
+            chunk.fill(0)
+            chunk[:block.shape[0], :block.shape[1]] = block
+            compressed.append(((row, column),
+                               zlib.compress(chunk.tobytes(),
+                                             compression_level)))
+    return compressed
+
+
+def compress_gene(gene, data, chunks, compression_level):
+    """
+    Compress the chunks of a gene's dataset. See
+    :py:func:`compress_chunks`.
+
+    :param gene: Gene path
+    :type gene: str or unicode
+    :param data: Dataset
+    :type data: numpy.ndarray
+    :param chunks: Chunk shape
+    :type chunks: tuple(int, int)
+    :param compression_level: Compression level
+    :type compression_level: int
+    :return: Gene path and compressed chunks
+    :rtype: tuple(str or unicode, list(tuple(tuple(int, int), bytes)))
+    """
+    return (gene, compress_chunks(data, chunks, compression_level))
+
+
+def write_batch(h5, batch, compressed, data_name, chunk_positions,
+                chunk_lengths, compression_filter):
+    """
+    Create the groups, datasets and attributes for a batch of genes.
+
+    :param h5: H5 file
+    :type h5: h5py.File
+    :param batch: Genes, each a tuple of group path, dataset and \
+    attributes
+    :type batch: list(tuple(str or unicode, numpy.ndarray, dict))
+    :param compressed: Compressed chunks for each group path, or \
+    ``None`` if HDF5 is to compress the datasets
+    :type compressed: dict
+    :param data_name: Dataset name within each group
+    :type data_name: str or unicode
+    :param chunk_positions: Maximum number of positions per chunk
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :param compression_filter: ``h5py`` compression filter arguments
+    :type compression_filter: dict
+    """
+    for path, data, attributes in batch:
+        group = h5.create_group(path)
+        for name, value in attributes.items():
+            group.attrs.create(name, value)
+        chunks = get_chunk_shape(data.shape, chunk_positions,
+                                 chunk_lengths)
+        if compressed is None:
+            group.create_dataset(data_name,
+                                 data=data,
+                                 chunks=chunks,
+                                 **compression_filter)
+            continue
+        dataset = group.create_dataset(data_name,
+                                       shape=data.shape,
+                                       dtype=data.dtype,
+                                       chunks=chunks,
+                                       **compression_filter)
+        for offset, chunk in compressed[path]:
+            dataset.id.write_direct_chunk(offset, chunk)
+
+
+def write_compressed_batch(h5, batch, pool, is_compress, data_name,
+                           chunk_positions, chunk_lengths,
+                           compression_filter, compression_level):
+    """
+    Compress the datasets for a batch of genes, if required, then
+    write the batch. See :py:func:`write_batch`.
+
+    :param h5: H5 file
+    :type h5: h5py.File
+    :param batch: Genes, see :py:func:`write_batch`
+    :type batch: list(tuple(str or unicode, numpy.ndarray, dict))
+    :param pool: Pool of processes, or ``None`` to compress in this \
+    process
+    :type pool: multiprocessing.Pool
+    :param is_compress: Compress datasets before writing?
+    :type is_compress: bool
+    :param data_name: Dataset name within each group
+    :type data_name: str or unicode
+    :param chunk_positions: Maximum number of positions per chunk
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :param compression_filter: ``h5py`` compression filter arguments
+    :type compression_filter: dict
+    :param compression_level: Compression level
+    :type compression_level: int
+    """
+    compressed = None
+    if is_compress:
+        arguments = [(path, data,
+                      get_chunk_shape(data.shape, chunk_positions,
+                                      chunk_lengths),
+                      compression_level)
+                     for path, data, _ in batch]
+        if pool is None:
+            compressed = dict(compress_gene(*argument)
+                              for argument in arguments)
+        else:
+            compressed = dict(pool.starmap(compress_gene, arguments))
+    write_batch(h5, batch, compressed, data_name, chunk_positions,
+                chunk_lengths, compression_filter)
+
+
+def write_genes(h5_file, genes, data_name, links=None,
+                num_processes=1, compression=DEFAULT_COMPRESSION,
+                compression_level=DEFAULT_COMPRESSION_LEVEL,
+                chunk_positions=None,
+                chunk_lengths=DEFAULT_CHUNK_LENGTHS,
+                batch_size=BATCH_SIZE):
+    """
+    Write per-gene datasets and attributes to an H5 file, in batches.
+    See module documentation.
+
+    :param h5_file: H5 file (output)
+    :type h5_file: str or unicode
+    :param genes: Genes, each a tuple of group path, dataset and \
+    attributes (name to ``numpy.ndarray``). Datasets must have two \
+    dimensions.
+    :type genes: iterable(tuple(str or unicode, numpy.ndarray, dict))
+    :param data_name: Dataset name within each group
+    :type data_name: str or unicode
+    :param links: External links to create, from link name to \
+    object path within ``h5_file``
+    :type links: dict(str or unicode -> str or unicode)
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param compression: Compression filter, one of \
+    :py:const:`COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Maximum number of positions (rows) per \
+    chunk, or ``None`` for all positions
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths (columns) \
+    per chunk
+    :type chunk_lengths: int
+    :param batch_size: Number of genes per batch
+    :type batch_size: int
+    :raise AssertionError: if ``compression`` is not supported
+    """
+    compression_filter = get_compression_filter(compression,
+                                                compression_level)
+    is_compress = compression == GZIP
+    pool = None
+    if is_compress and num_processes > 1:
+        pool = multiprocessing.Pool(num_processes)
+    try:
+        with h5py.File(h5_file, "w") as h5:
+            batch = []
+            for gene in genes:
+                batch.append(gene)
+                if len(batch) < batch_size:
+                    continue
+                write_compressed_batch(h5, batch, pool, is_compress,
+                                       data_name, chunk_positions,
+                                       chunk_lengths, compression_filter,
+                                       compression_level)
+                batch = []
+            if batch:
+                write_compressed_batch(h5, batch, pool, is_compress,
+                                       data_name, chunk_positions,
+                                       chunk_lengths, compression_filter,
+                                       compression_level)
+            for name, path in (links or {}).items():
+                h5[name] = h5py.ExternalLink(h5_file, path)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
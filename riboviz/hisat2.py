@@ -6,3 +6,8 @@ HT2_EXT = "ht2"
 """ File extension. """
 HT2_FORMAT = "{}.{:0>1d}." + HT2_EXT
 """ File name format. """
+NUM_HT2_FILES = 8
+"""
+Number of index files built by ``hisat2-build`` for small indices
+(``<prefix>.1.ht2``, ..., ``<prefix>.8.ht2``).
+"""
@@ -0,0 +1,250 @@
+"""
+HISAT2 index cache-related constants and functions.
+
+An index cache is a directory, which can be shared across workflow
+runs and configurations, holding HISAT2 indices built by
+``hisat2-build``. Each set of indices is held in an entry directory,
+named after a key which is a SHA-256 digest of both the content of
+the FASTA file from which the indices were built and the version of
+``hisat2-build`` used to build them (see :py:func:`get_cache_key`). An
+index directory does not hold copies of cached indices, rather it
+holds symbolic links to the index files within a cache entry (see
+:py:func:`link_indices`).
+
+Within an entry directory, index files are named using the prefix
+:py:const:`INDEX_PREFIX` (e.g. ``index.1.ht2``) and a metadata file,
+:py:const:`METADATA_FILE`, records the FASTA file and ``hisat2-build``
+version. Entries are built in a temporary directory and then renamed,
+so an entry directory exists only if its indices were built
+successfully.
+
+Concurrent workflow runs coordinate via a lock file, ``<key>.lock``,
+in the cache directory (see :py:func:`lock_entry`), so that the same
+indices are not built more than once.
+"""
+import contextlib
+import fcntl
+import glob
+import hashlib
+import os
+import os.path
+import re
+import shutil
+import tempfile
+import yaml
+from riboviz import hisat2
+
+INDEX_PREFIX = "index"
+""" Prefix of index files within a cache entry. """
+METADATA_FILE = "metadata.yaml"
+""" Cache entry metadata file name. """
+LOCK_EXT = "lock"
+""" Cache entry lock file extension. """
+FASTA = "fasta"
+""" Cache entry metadata key. """
+FASTA_DIGEST = "fasta_sha256"
+""" Cache entry metadata key. """
+HISAT2_BUILD_VERSION = "hisat2_build_version"
+""" Cache entry metadata key. """
+VERSION_REGEXP = re.compile(r"version\s+(\S+)")
+""" Regular expression for ``hisat2-build --version`` version. """
+DRY_RUN_KEY = "DRY_RUN"
+"""
+Placeholder key used to name the cache entry directory in commands
+recorded during dry runs, for which keys are not calculated.
+"""
+
+
+def parse_hisat2_build_version(output):
+    """
+    Parse version of ``hisat2-build`` from the output of
+    ``hisat2-build --version``. This is the value following
+    ``version`` in the first line of the output or, if there is no
+    such value, the whole of the first line.
+
+    :param output: Output of ``hisat2-build --version``
+    :type output: str or unicode
+    :return: Version
+    :rtype: str or unicode
+    """
+    lines = output.splitlines()
+    first_line = lines[0].strip() if lines else ""
+    match = VERSION_REGEXP.search(first_line)
+    if match:
+        return match.group(1)
+    return first_line
+
+
+def get_cache_key(fasta_digest, version):
+    """
+    Get cache key for indices built from a FASTA file by a given
+    version of ``hisat2-build``.
+
+    :param fasta_digest: SHA-256 digest of FASTA file content
+    :type fasta_digest: str or unicode
+    :param version: ``hisat2-build`` version
+    :type version: str or unicode
+    :return: Key, as a hexadecimal string
+    :rtype: str or unicode
+    """
+    key = "{}\n{}".format(fasta_digest, version)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_entry_dir(cache_dir, key):
+    """
+    Get cache entry directory for a key.
+
+    :param cache_dir: Index cache directory
+    :type cache_dir: str or unicode
+    :param key: Key
+    :type key: str or unicode
+    :return: Directory
+    :rtype: str or unicode
+    """
+    return os.path.join(cache_dir, key)
+
+
+def is_cached(entry_dir):
+    """
+    Check if a cache entry exists.
+
+    :param entry_dir: Cache entry directory
+    :type entry_dir: str or unicode
+    :return: ``True`` if the entry directory and its metadata file \
+    exist
+    :rtype: bool
+    """
+    return os.path.exists(os.path.join(entry_dir, METADATA_FILE))
+
+
+@contextlib.contextmanager
+def lock_entry(cache_dir, key):
+    """
+    Acquire an exclusive lock on a cache entry, blocking until any
+    other process holding the lock releases it. The lock is released
+    on exit from the context.
+
+    :param cache_dir: Index cache directory
+    :type cache_dir: str or unicode
+    :param key: Key
+    :type key: str or unicode
+    """
+    lock_file = os.path.join(cache_dir, "{}.{}".format(key, LOCK_EXT))
+    with open(lock_file, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def create_entry_tmp_dir(cache_dir, key):
+    """
+    Create a temporary directory, within the cache directory, into
+    which indices can be built before being added to the cache by
+    :py:func:`add_entry`.
+
+    :param cache_dir: Index cache directory
+    :type cache_dir: str or unicode
+    :param key: Key
+    :type key: str or unicode
+    :return: Directory
+    :rtype: str or unicode
+    """
+    return tempfile.mkdtemp(prefix="{}.".format(key), dir=cache_dir)
+
+
+def add_entry(tmp_dir, entry_dir, fasta, fasta_digest, version):
+    """
+    Write cache entry metadata file into a temporary directory holding
+    newly-built indices, then rename the temporary directory to be the
+    cache entry directory. Any existing, incomplete, cache entry
+    directory is removed. This should be called only when a lock is
+    held on the entry (see :py:func:`lock_entry`).
+
+    :param tmp_dir: Temporary directory with indices
+    :type tmp_dir: str or unicode
+    :param entry_dir: Cache entry directory
+    :type entry_dir: str or unicode
+    :param fasta: FASTA file indices were built from
+    :type fasta: str or unicode
+    :param fasta_digest: SHA-256 digest of FASTA file content
+    :type fasta_digest: str or unicode
+    :param version: ``hisat2-build`` version
+    :type version: str or unicode
+    """
+    metadata = {FASTA: os.path.abspath(fasta),
+                FASTA_DIGEST: fasta_digest,
+                HISAT2_BUILD_VERSION: version}
+    with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+        yaml.dump(metadata, f, default_flow_style=False)
+    if os.path.exists(entry_dir):
+        shutil.rmtree(entry_dir)
+    os.rename(tmp_dir, entry_dir)
+
+
+def get_index_files(entry_dir):
+    """
+    Get index files within a cache entry directory.
+
+    :param entry_dir: Cache entry directory
+    :type entry_dir: str or unicode
+    :return: Index files, sorted by name
+    :rtype: list(str or unicode)
+    """
+    pattern = os.path.join(
+        entry_dir, "{}.*.{}*".format(INDEX_PREFIX, hisat2.HT2_EXT))
+    return sorted(glob.glob(pattern))
+
+
+def get_links(entry_dir, index_dir, ht_prefix, index_files=None):
+    """
+    Get symbolic links to be created in an index directory, one for
+    each index file in a cache entry, where each link has the name of
+    the index file, with :py:const:`INDEX_PREFIX` replaced by
+    ``ht_prefix``.
+
+    :param entry_dir: Cache entry directory
+    :type entry_dir: str or unicode
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param ht_prefix: Prefix of HT2 index files
+    :type ht_prefix: str or unicode
+    :param index_files: Index files in cache entry directory. If \
+    ``None`` then :py:func:`get_index_files` is used or, if the entry \
+    does not exist, the names of the files that ``hisat2-build`` \
+    builds for small indices are assumed
+    :type index_files: list(str or unicode)
+    :return: List of (index file, link) pairs, where each index file \
+    is an absolute path
+    :rtype: list(tuple(str or unicode, str or unicode))
+    """
+    if index_files is None:
+        index_files = get_index_files(entry_dir)
+        if not index_files:
+            index_files = [
+                os.path.join(entry_dir,
+                             hisat2.HT2_FORMAT.format(INDEX_PREFIX, index))
+                for index in range(1, hisat2.NUM_HT2_FILES + 1)]
+    links = []
+    for index_file in index_files:
+        suffix = os.path.basename(index_file)[len(INDEX_PREFIX):]
+        link = os.path.join(index_dir, ht_prefix + suffix)
+        links.append((os.path.abspath(index_file), link))
+    return links
+
+
+def link_indices(links):
+    """
+    Create symbolic links to index files, replacing any existing
+    files or links.
+
+    :param links: List of (index file, link) pairs (see \
+    :py:func:`get_links`)
+    :type links: list(tuple(str or unicode, str or unicode))
+    """
+    for index_file, link in links:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(index_file, link)
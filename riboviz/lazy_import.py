@@ -0,0 +1,82 @@
+"""
+Lazy import of modules.
+
+Importing pandas, NumPy, pysam, h5py and Biopython dominates the
+start-up time of the command-line tools in :py:mod:`riboviz.tools`,
+yet many invocations, for example those with ``--help``, or tools
+that only need some of these modules, never use them. Modules which
+use these packages therefore refer to them via proxies returned by
+:py:func:`lazy_import`, for example::
+
+    from riboviz.lazy_import import lazy_import
+    pd = lazy_import("pandas")
+    SeqIO = lazy_import("Bio.SeqIO")
+
+The module is imported when an attribute of the proxy is first
+accessed. Proxies must not be used at module import time, for
+example in constants or default argument values, or the benefit is
+lost.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Proxy for a module that is imported when one of its attributes
+    is first accessed. The module's attributes are then copied into
+    the proxy so subsequent accesses are not delegated.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: Module name
+        :type name: str or unicode
+        """
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def load(self):
+        """
+        Import the module, if not already imported.
+
+        :return: Module
+        :rtype: module
+        """
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(
+                {name: value for name, value in module.__dict__.items()
+                 if name not in ["__name__", "__spec__", "__loader__"]})
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+    def __dir__(self):
+        return dir(self.load())
+
+    def __repr__(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            return "<lazy module '{}' (not loaded)>".format(self.__name__)
+        return repr(module)
+
+
+def lazy_import(name):
+    """
+    Get a proxy for a module that imports the module when one of its
+    attributes is first accessed. If the module has already been
+    imported, the module itself is returned.
+
+    :param name: Module name e.g. ``pandas``, ``Bio.SeqIO``
+    :type name: str or unicode
+    :return: Module or proxy
+    :rtype: module or LazyModule
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,12 +1,35 @@
 """
 Python ``logging``-related constants and functions.
+
+Optionally, log records can also be written, as JSON objects, one per
+line, to a JSON-lines file (see :py:func:`configure_json_logging`).
+Each record has the fields :py:const:`JSON_FIELDS` including the
+sample, workflow step and tool, if any, current when the record was
+logged (see :py:func:`log_context`) and elapsed times. Records are
+put on a queue by the logging thread and written to the file by a
+separate thread, so logging does not block on file I/O.
+
+Records of the outcome and resource usage of each command run by a
+workflow step are logged to :py:const:`STEPS_LOGGER`, which only
+writes to the JSON-lines file. JSON-lines files from many runs or
+samples can be loaded and summarised using
+:py:func:`load_json_logs` and :py:func:`summarise_json_logs`.
 """
+import atexit
+import contextlib
+import contextvars
+import copy
 import datetime
+import json
 import logging
 import logging.config
 import logging.handlers
 import os
+import queue
+import time
 import yaml
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
 
 DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "logging.yaml")
 """ Default logging configuration file name. """
@@ -14,6 +37,86 @@ LOG_CONFIG_ENV = "RIBOVIZ_LOG_CONFIG"
 """ Logging environment variable. """
 LOG_FILE = "riboviz.log"
 """ Default log file nmae. """
+JSON_LOG_ENV = "RIBOVIZ_JSON_LOG"
+""" JSON-lines log file environment variable. """
+STEPS_LOGGER = "riboviz.steps"
+"""
+Logger for outcome and resource usage of commands run by workflow
+steps. This logger does not propagate records to the root logger.
+"""
+TIME = "time"
+""" JSON-lines log field (ISO 8601 time record was logged). """
+LEVEL = "level"
+""" JSON-lines log field (level name). """
+LOGGER_NAME = "logger"
+""" JSON-lines log field (logger name). """
+MESSAGE = "message"
+""" JSON-lines log field (message). """
+PROCESS = "process"
+""" JSON-lines log field (process ID). """
+SAMPLE = "sample"
+""" JSON-lines log field (sample name). """
+STEP = "step"
+""" JSON-lines log field (workflow step name). """
+TOOL = "tool"
+""" JSON-lines log field (tool name). """
+ELAPSED = "elapsed"
+""" JSON-lines log field (seconds since logging was loaded). """
+SAMPLE_ELAPSED = "sample_elapsed"
+""" JSON-lines log field (seconds since sample context started). """
+STEP_ELAPSED = "step_elapsed"
+""" JSON-lines log field (seconds since step context started). """
+EXCEPTION = "exception"
+""" JSON-lines log field (exception and traceback). """
+DATA = "data"
+"""
+JSON-lines log field (additional values, from a ``data`` dictionary
+passed via the ``extra`` argument of logging calls).
+"""
+JSON_FIELDS = [TIME, LEVEL, LOGGER_NAME, MESSAGE, PROCESS, SAMPLE, STEP,
+               TOOL, ELAPSED, SAMPLE_ELAPSED, STEP_ELAPSED, EXCEPTION, DATA]
+""" JSON-lines log fields. """
+CONTEXT_FIELDS = [SAMPLE, STEP, TOOL]
+""" Fields that can be set using :py:func:`log_context`. """
+DURATION = "duration"
+""" :py:const:`STEPS_LOGGER` ``data`` key (wall time in seconds). """
+EXIT_CODE = "exit_code"
+""" :py:const:`STEPS_LOGGER` ``data`` key (exit code). """
+MAX_RSS = "max_rss"
+""" :py:const:`STEPS_LOGGER` ``data`` key (maximum RSS in KB). """
+READ_BYTES = "read_bytes"
+""" :py:const:`STEPS_LOGGER` ``data`` key (bytes read). """
+WRITE_BYTES = "write_bytes"
+""" :py:const:`STEPS_LOGGER` ``data`` key (bytes written). """
+NUM_RECORDS = "NumRecords"
+""" :py:func:`summarise_json_logs` column name. """
+NUM_SAMPLES = "NumSamples"
+""" :py:func:`summarise_json_logs` column name. """
+NUM_FAILED = "NumFailed"
+""" :py:func:`summarise_json_logs` column name. """
+TOTAL_DURATION = "TotalDuration"
+""" :py:func:`summarise_json_logs` column name. """
+MEAN_DURATION = "MeanDuration"
+""" :py:func:`summarise_json_logs` column name. """
+MAX_DURATION = "MaxDuration"
+""" :py:func:`summarise_json_logs` column name. """
+MAX_MAX_RSS = "MaxMaxRSS"
+""" :py:func:`summarise_json_logs` column name. """
+SUMMARY_HEADER = [STEP, TOOL, NUM_RECORDS, NUM_SAMPLES, NUM_FAILED,
+                  TOTAL_DURATION, MEAN_DURATION, MAX_DURATION,
+                  MAX_MAX_RSS]
+""" :py:func:`summarise_json_logs` column names. """
+
+_JSON_HANDLERS = {}
+"""
+Queue handlers and listeners created by
+:py:func:`configure_json_logging`, keyed by absolute file path.
+"""
+_LOG_CONTEXT = contextvars.ContextVar("riboviz_log_context", default={})
+"""
+Current sample, step and tool, and the times at which these were
+set, see :py:func:`log_context`.
+"""
 
 
 class TimestampedFileHandler(logging.FileHandler):
@@ -47,7 +150,8 @@ class TimestampedFileHandler(logging.FileHandler):
 def configure_logging(config_path=DEFAULT_CONFIG,
                       env_key=LOG_CONFIG_ENV,
                       level=logging.INFO,
-                      log_file=LOG_FILE):
+                      log_file=LOG_FILE,
+                      json_env_key=JSON_LOG_ENV):
     """
     Configure Python logging.
 
@@ -62,12 +166,21 @@ def configure_logging(config_path=DEFAULT_CONFIG,
     If neither is defined then basic logging is configured, at
     the default level provided, ``level``, into ``log_file``.
 
+    If an environment variable, whose name is in ``json_env_key``, is
+    set then records are also written to the JSON-lines file at the
+    location specified by the environment variable (see
+    :py:func:`configure_json_logging`).
+
     :param config_path: YAML logging configuration file
     :type config_path: str or unicode
     :param env_key: Environment variable name
     :type env_key: str or unicode
     :param level: Default logging level if no configuration file
     :type level: int
+    :param log_file: Log file if no configuration file
+    :type log_file: str or unicode
+    :param json_env_key: JSON-lines log file environment variable name
+    :type json_env_key: str or unicode
     """
     path = config_path
     env_path = os.getenv(env_key, None)
@@ -82,3 +195,330 @@ def configure_logging(config_path=DEFAULT_CONFIG,
             level=level,
             filename=log_file,
             format='%(asctime)s:%(name)s:%(levelname)s: %(message)s')
+    json_log_file = os.getenv(json_env_key, None)
+    if json_log_file:
+        configure_json_logging(json_log_file, level)
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """
+    Context manager which sets fields, any of
+    :py:const:`CONTEXT_FIELDS`, which are added to JSON-lines log
+    records logged in the current thread, or task, while the context
+    is active. Contexts can be nested, for example::
+
+        with log_context(sample="WTnone"):
+            with log_context(step="map_to_orf", tool="hisat2"):
+                ...
+
+    The time at which each field is set is recorded, so the time
+    elapsed since the sample or step was entered is included in log
+    records. If a nested context sets a field to the value it already
+    has then the time at which it was first set is kept, so the time
+    elapsed since a step was entered is not reset by, for example,
+    each command run by the step.
+
+    :param fields: Fields and values
+    :type fields: dict
+    :raise AssertionError: if any field is not in \
+    :py:const:`CONTEXT_FIELDS`
+    """
+    unknown = set(fields) - set(CONTEXT_FIELDS)
+    assert not unknown, "Unknown log context fields: {}".format(
+        ", ".join(sorted(unknown)))
+    context = dict(_LOG_CONTEXT.get())
+    now = time.time()
+    for field, value in fields.items():
+        if context.get(field) != value or \
+           field + "_start" not in context:
+            context[field + "_start"] = now
+        context[field] = value
+    token = _LOG_CONTEXT.set(context)
+    try:
+        yield
+    finally:
+        _LOG_CONTEXT.reset(token)
+
+
+def get_context_field(field):
+    """
+    Get the value of a field set by :py:func:`log_context` in the
+    current thread, or task.
+
+    :param field: Field, one of :py:const:`CONTEXT_FIELDS`
+    :type field: str or unicode
+    :return: Value or ``None`` if the field is not set
+    :rtype: str or unicode
+    """
+    return _LOG_CONTEXT.get().get(field)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Filter which adds the fields set by :py:func:`log_context`, and
+    elapsed times, as attributes to each log record. It must be
+    applied in the thread that logs the record, so is added to the
+    handler that puts records on a queue.
+    """
+
+    def filter(self, record):
+        """
+        Add fields to a log record.
+
+        :param record: Log record
+        :type record: logging.LogRecord
+        :return: ``True``
+        :rtype: bool
+        """
+        context = _LOG_CONTEXT.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        record.elapsed = record.relativeCreated / 1000.0
+        for field, elapsed in [(SAMPLE, SAMPLE_ELAPSED),
+                               (STEP, STEP_ELAPSED)]:
+            start = context.get(field + "_start")
+            setattr(record, elapsed,
+                    None if start is None else record.created - start)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formatter which formats a log record as a JSON object, on a
+    single line, with fields :py:const:`JSON_FIELDS`.
+    """
+
+    def format(self, record):
+        """
+        Format a log record.
+
+        :param record: Log record
+        :type record: logging.LogRecord
+        :return: JSON object
+        :rtype: str or unicode
+        """
+        values = {
+            TIME: datetime.datetime.fromtimestamp(
+                record.created).astimezone().isoformat(),
+            LEVEL: record.levelname,
+            LOGGER_NAME: record.name,
+            MESSAGE: record.getMessage(),
+            PROCESS: record.process
+        }
+        for field in CONTEXT_FIELDS + [ELAPSED, SAMPLE_ELAPSED,
+                                       STEP_ELAPSED]:
+            values[field] = getattr(record, field, None)
+        exception = record.exc_text
+        if record.exc_info:
+            exception = self.formatException(record.exc_info)
+        values[EXCEPTION] = exception
+        values[DATA] = getattr(record, DATA, None)
+        return json.dumps(values, default=str)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler which adds fields using :py:class:`ContextFilter`
+    and keeps the message and exception separate when preparing a
+    record for the queue.
+    """
+
+    def __init__(self, log_queue):
+        """
+        :param log_queue: Queue
+        :type log_queue: queue.SimpleQueue
+        """
+        super().__init__(log_queue)
+        self.addFilter(ContextFilter())
+
+    def prepare(self, record):
+        """
+        Prepare a record for the queue, merging its message and
+        arguments and formatting any exception.
+
+        :param record: Log record
+        :type record: logging.LogRecord
+        :return: Log record
+        :rtype: logging.LogRecord
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_json_logging(json_log_file, level=logging.INFO):
+    """
+    Add a handler, to the root logger and :py:const:`STEPS_LOGGER`,
+    which writes log records to a JSON-lines file, appending to the
+    file if it exists. Records are formatted using
+    :py:class:`JsonLinesFormatter`.
+
+    Records are put on a queue, by :py:class:`ContextQueueHandler`
+    and written by a ``logging.handlers.QueueListener`` in a separate
+    thread. The listener is stopped, and any queued records written,
+    on exit, or by :py:func:`stop_json_logging`.
+
+    If this function has already been called for ``json_log_file``
+    then its handler is re-added to the loggers, if it was removed
+    by a subsequent logging configuration, and no new handler is
+    created.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    :param level: Logging level
+    :type level: int
+    :return: Queue handler and listener
+    :rtype: tuple(ContextQueueHandler, \
+    logging.handlers.QueueListener)
+    """
+    key = os.path.abspath(json_log_file)
+    steps_logger = logging.getLogger(STEPS_LOGGER)
+    steps_logger.propagate = False
+    steps_logger.disabled = False
+    if key in _JSON_HANDLERS:
+        handler, listener = _JSON_HANDLERS[key]
+        for logger in [logging.getLogger(), steps_logger]:
+            if handler not in logger.handlers:
+                logger.addHandler(handler)
+        return handler, listener
+    log_queue = queue.SimpleQueue()
+    file_handler = logging.FileHandler(json_log_file, mode="a",
+                                       encoding="utf8", delay=True)
+    file_handler.setFormatter(JsonLinesFormatter())
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    handler = ContextQueueHandler(log_queue)
+    handler.setLevel(level)
+    logging.getLogger().addHandler(handler)
+    steps_logger.setLevel(level)
+    steps_logger.addHandler(handler)
+    listener.start()
+    if not _JSON_HANDLERS:
+        atexit.register(stop_json_logging)
+    _JSON_HANDLERS[key] = (handler, listener)
+    return handler, listener
+
+
+def stop_json_logging(json_log_file=None):
+    """
+    Remove handlers added by :py:func:`configure_json_logging`, and
+    stop their listeners, writing any queued records. If no handlers
+    remain then :py:const:`STEPS_LOGGER` propagates records again.
+
+    :param json_log_file: JSON-lines log file, if ``None`` then all \
+    handlers are removed
+    :type json_log_file: str or unicode
+    """
+    if json_log_file is None:
+        keys = list(_JSON_HANDLERS)
+    else:
+        keys = [os.path.abspath(json_log_file)]
+    for key in keys:
+        if key not in _JSON_HANDLERS:
+            continue
+        handler, listener = _JSON_HANDLERS.pop(key)
+        for logger in [logging.getLogger(),
+                       logging.getLogger(STEPS_LOGGER)]:
+            logger.removeHandler(handler)
+        listener.stop()
+        for file_handler in listener.handlers:
+            file_handler.close()
+    if not _JSON_HANDLERS:
+        logging.getLogger(STEPS_LOGGER).propagate = True
+
+
+def log_step(step, tool, result, log_file=None):
+    """
+    Log the outcome and resource usage of a command run by a workflow
+    step to :py:const:`STEPS_LOGGER`, if it has been configured not
+    to propagate records to the root logger (for example by
+    :py:func:`configure_json_logging`), with a ``data`` dictionary
+    with keys :py:const:`DURATION`, :py:const:`EXIT_CODE`,
+    :py:const:`MAX_RSS`, :py:const:`READ_BYTES` and
+    :py:const:`WRITE_BYTES`.
+
+    The record's step, if not ``None``, and tool are ``step`` and
+    ``tool``. This should be called within the context in which the
+    command was run (see :py:func:`log_context`) so the record's step
+    elapsed time is the time since the step was entered.
+
+    :param step: Workflow step name
+    :type step: str or unicode
+    :param tool: Tool name
+    :type tool: str or unicode
+    :param result: Outcome and resource usage of command
+    :type result: riboviz.process_utils.PipelineStageTuple
+    :param log_file: Log file for the command
+    :type log_file: str or unicode
+    """
+    logger = logging.getLogger(STEPS_LOGGER)
+    if logger.propagate:
+        # Not configured, so avoid adding records to other logs.
+        return
+    extra = {TOOL: tool,
+             DATA: {DURATION: result.wall_time,
+                    EXIT_CODE: result.exit_code,
+                    MAX_RSS: result.max_rss,
+                    READ_BYTES: result.read_bytes,
+                    WRITE_BYTES: result.write_bytes}}
+    if step is not None:
+        extra[STEP] = step
+    logger.info("Step %s ran %s in %.3fs, exit code %d. Log: %s",
+                step, tool, result.wall_time, result.exit_code,
+                log_file, extra=extra)
+
+
+def load_json_logs(json_log_files):
+    """
+    Load JSON-lines log files. Lines that are not valid JSON objects
+    are skipped.
+
+    :param json_log_files: JSON-lines log files
+    :type json_log_files: list(str or unicode)
+    :return: Log records, with columns :py:const:`JSON_FIELDS`
+    :rtype: pandas.core.frame.DataFrame
+    """
+    records = []
+    for json_log_file in json_log_files:
+        with open(json_log_file, encoding="utf8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    return pd.DataFrame(records, columns=JSON_FIELDS)
+
+
+def summarise_json_logs(records):
+    """
+    Summarise the outcome and resource usage of the commands run by
+    each workflow step and tool, across samples, from records logged
+    by :py:func:`log_step`.
+
+    :param records: Log records, see :py:func:`load_json_logs`
+    :type records: pandas.core.frame.DataFrame
+    :return: Summary, with columns :py:const:`SUMMARY_HEADER`, one \
+    row per step and tool
+    :rtype: pandas.core.frame.DataFrame
+    """
+    records = records[(records[LOGGER_NAME] == STEPS_LOGGER) &
+                      records[DATA].apply(lambda data: isinstance(
+                          data, dict) and DURATION in data)]
+    rows = []
+    for (step, tool), group in records.groupby([STEP, TOOL], sort=True):
+        durations = group[DATA].apply(lambda data: data[DURATION])
+        rows.append([
+            step, tool, len(group), group[SAMPLE].nunique(),
+            int(group[DATA].apply(
+                lambda data: data.get(EXIT_CODE, 0) != 0).sum()),
+            durations.sum(), durations.mean(), durations.max(),
+            group[DATA].apply(lambda data: data.get(MAX_RSS, 0)).max()])
+    return pd.DataFrame(rows, columns=SUMMARY_HEADER)
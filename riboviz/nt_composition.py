@@ -0,0 +1,316 @@
+"""
+Position-specific nucleotide composition constants and functions.
+
+:py:func:`calculate_nt_frequencies` provides a native alternative to
+``CalculateBiasesInNucleotideComposition`` in
+``stats_figs_block_functions.R``, which, for each read length,
+frame and gene, converts reads to ranges and extracts the sequences
+they cover to build a consensus matrix.
+
+Instead, the ORF FASTA sequences are encoded once, as ``uint8``
+codes, into an array aligned with the positions of the genes'
+ribogrids, read via
+:py:class:`riboviz.ribogrid_reader.RibogridReader`. Then, for each
+read length, the nonzero counts are found and the codes covered by
+each read, at each position within the read, are gathered, by
+indexing into the array of codes, and counted, weighted by the
+number of reads, using :py:func:`numpy.bincount`, giving position x
+nucleotide counts for each frame in a single pass over all genes.
+
+Genes can be split into groups, each processed by a separate
+process, to bound memory use and to use several cores.
+
+The frequencies are the same as those calculated by
+``generate_stats_figs.R``.
+"""
+import functools
+import multiprocessing
+from riboviz import provenance
+from riboviz import ribogrid_reader
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+SeqIO = lazy_import("Bio.SeqIO")
+
+LENGTH = "Length"
+""" ``pos_sp_nt_freq.tsv`` column name. """
+POSITION = "Position"
+""" ``pos_sp_nt_freq.tsv`` column name. """
+FRAME = "Frame"
+""" ``pos_sp_nt_freq.tsv`` column name. """
+NUCLEOTIDES = ["A", "C", "G", "T"]
+""" Nucleotides, and ``pos_sp_nt_freq.tsv`` column names. """
+HEADER = [LENGTH, POSITION, FRAME] + NUCLEOTIDES
+""" ``pos_sp_nt_freq.tsv`` column names. """
+NUM_FRAMES = 3
+""" Number of frames. """
+OTHER_CODE = len(NUCLEOTIDES)
+""" Code of characters other than ``A``, ``C``, ``G`` and ``T``. """
+SIGNIFICANT_DIGITS = 3
+""" Significant digits of frequencies, as in ``generate_stats_figs.R``. """
+FLOAT_FORMAT = "%.15g"
+"""
+Format of floating point values, matching the precision of R's
+``write.table``.
+"""
+BLOCK_SIZE = 2 ** 20
+"""
+Maximum number of (read, position within read) pairs to gather at
+once.
+"""
+GROUPS_PER_PROCESS = 4
+"""
+Number of groups of genes, per process, to split genes into when
+calculating counts in parallel.
+"""
+
+
+def load_fasta_sequences(fasta_file):
+    """
+    Load sequences from a FASTA file, named as
+    ``Biostrings::readDNAStringSet`` names them.
+
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :return: Sequences
+    :rtype: dict(str or unicode -> bytes)
+    """
+    return {record.description: bytes(record.seq)
+            for record in SeqIO.parse(fasta_file, "fasta")}
+
+
+@functools.lru_cache(maxsize=None)
+def get_nt_codes():
+    """
+    Get the code of each byte: its index into :py:const:`NUCLEOTIDES`,
+    ignoring case, or :py:const:`OTHER_CODE`.
+
+    :return: Codes, indexed by byte
+    :rtype: numpy.ndarray
+    """
+    nt_codes = np.full(256, OTHER_CODE, dtype=np.uint8)
+    for code, nt in enumerate(NUCLEOTIDES):
+        nt_codes[ord(nt)] = code
+        nt_codes[ord(nt.lower())] = code
+    return nt_codes
+
+
+def encode_sequences(sequences, num_positions):
+    """
+    Encode sequences into a single array of codes, indices into
+    :py:const:`NUCLEOTIDES` or :py:const:`OTHER_CODE`, with each
+    sequence truncated, or padded with :py:const:`OTHER_CODE`, to the
+    number of positions of its gene.
+
+    :param sequences: Sequences
+    :type sequences: list(bytes)
+    :param num_positions: Number of positions of each gene
+    :type num_positions: list(int)
+    :return: Codes
+    :rtype: numpy.ndarray
+    """
+    codes = np.full(int(np.sum(num_positions)), OTHER_CODE, dtype=np.uint8)
+    nt_codes = get_nt_codes()
+    offset = 0
+    for sequence, num in zip(sequences, num_positions):
+        sequence = np.frombuffer(sequence[:num], dtype=np.uint8)
+        codes[offset:offset + len(sequence)] = nt_codes[sequence]
+        offset += num
+    return codes
+
+
+def count_read_length_nts(counts, codes, offsets, num_positions,
+                          read_length):
+    """
+    Count the nucleotides at each position within reads of a single
+    length, for reads starting in each frame, as
+    ``GetNTReadPosition`` and ``cons_mat`` do for each gene. Reads
+    whose 5' ends map within ``read_length`` positions of the end of
+    a gene are ignored. A read's frame is its 1-indexed 5' position
+    modulo 3.
+
+    :param counts: Counts of reads of this length, with the \
+    positions of the genes concatenated
+    :type counts: numpy.ndarray
+    :param codes: Codes, see :py:func:`encode_sequences`
+    :type codes: numpy.ndarray
+    :param offsets: Position at which each gene starts
+    :type offsets: numpy.ndarray
+    :param num_positions: Number of positions of each gene
+    :type num_positions: numpy.ndarray
+    :param read_length: Read length
+    :type read_length: int
+    :return: Counts, with shape (frame, position within read, \
+    nucleotide)
+    :rtype: numpy.ndarray
+    """
+    starts = np.flatnonzero(counts)
+    genes = np.searchsorted(offsets, starts, side="right") - 1
+    positions = starts - offsets[genes]
+    is_included = positions < num_positions[genes] - read_length
+    starts = starts[is_included]
+    weights = counts[starts].astype(np.float64)
+    frames = (positions[is_included] + 1) % NUM_FRAMES
+    bin_offsets = np.arange(read_length) * (OTHER_CODE + 1)
+    nt_counts = np.zeros(NUM_FRAMES * read_length * (OTHER_CODE + 1))
+    block = max(BLOCK_SIZE // read_length, 1)
+    for i in range(0, len(starts), block):
+        read_codes = codes[starts[i:i + block, None] +
+                           np.arange(read_length)]
+        bins = (frames[i:i + block, None] * read_length *
+                (OTHER_CODE + 1)) + bin_offsets + read_codes
+        nt_counts += np.bincount(
+            bins.ravel(),
+            weights=np.repeat(weights[i:i + block], read_length),
+            minlength=len(nt_counts))
+    return nt_counts.reshape(NUM_FRAMES, read_length,
+                             OTHER_CODE + 1)[:, :, :OTHER_CODE]
+
+
+def count_nts_group(h5_file, dataset, genes, sequences, min_read_length,
+                    max_read_length):
+    """
+    Count the nucleotides at each position within reads, for each
+    read length and frame, for a group of genes. See
+    :py:func:`count_read_length_nts`.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param genes: Primary or secondary gene IDs
+    :type genes: list(str or unicode)
+    :param sequences: Sequence of each gene
+    :type sequences: list(bytes)
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param max_read_length: Maximum read length in H5 file
+    :type max_read_length: int
+    :return: Counts for each read length, with shape (frame, \
+    position within read, nucleotide)
+    :rtype: list(numpy.ndarray)
+    """
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        counts, offsets = reader.read_all(genes)
+    num_positions = np.diff(np.append(offsets, counts.shape[1]))
+    codes = encode_sequences(sequences, num_positions)
+    return [count_read_length_nts(counts[row], codes, offsets,
+                                  num_positions, read_length)
+            for row, read_length in enumerate(
+                range(min_read_length, max_read_length + 1))]
+
+
+def signif(values, digits=SIGNIFICANT_DIGITS):
+    """
+    Round values to significant digits, as R's ``signif`` does.
+
+    :param values: Values
+    :type values: numpy.ndarray
+    :param digits: Significant digits
+    :type digits: int
+    :return: Rounded values
+    :rtype: numpy.ndarray
+    """
+    format_str = "%.{}g".format(digits)
+    return np.array([float(format_str % value)
+                     for value in np.ravel(values)]).reshape(
+                         np.shape(values))
+
+
+def calculate_nt_frequencies(h5_file, orf_fasta_file, dataset="data",
+                             min_read_length=10, max_read_length=50,
+                             genes=None, num_processes=1):
+    """
+    Calculate the frequency of each nucleotide at each position
+    within reads, for each read length and frame, across all genes,
+    as ``CalculateBiasesInNucleotideComposition`` does. See module
+    documentation.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param orf_fasta_file: ORF FASTA file
+    :type orf_fasta_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param max_read_length: Maximum read length in H5 file
+    :type max_read_length: int
+    :param genes: Primary or secondary gene IDs, or ``None`` for all \
+    names at the root of the H5 file that have sequences in \
+    ``orf_fasta_file``
+    :type genes: list(str or unicode)
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :return: Frequencies, with columns :py:const:`HEADER`, with rows \
+    ordered by read length, frame then position
+    :rtype: pandas.core.frame.DataFrame
+    :raise KeyError: if any gene has no sequence or is not in the file
+    """
+    sequences = load_fasta_sequences(orf_fasta_file)
+    if genes is None:
+        with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+            genes = [gene for gene in sorted(reader.gene_index)
+                     if gene in sequences]
+    num_groups = max(min(len(genes), num_processes * GROUPS_PER_PROCESS),
+                     1)
+    group_size = max(-(-len(genes) // num_groups), 1)
+    groups = [(h5_file, dataset, genes[i:i + group_size],
+               [sequences[gene] for gene in genes[i:i + group_size]],
+               min_read_length, max_read_length)
+              for i in range(0, len(genes), group_size)]
+    if num_processes > 1 and len(groups) > 1:
+        with multiprocessing.Pool(num_processes) as pool:
+            group_counts = pool.starmap(count_nts_group, groups)
+    else:
+        group_counts = [count_nts_group(*group) for group in groups]
+    rows = []
+    for index, read_length in enumerate(range(min_read_length,
+                                              max_read_length + 1)):
+        nt_counts = sum((counts[index] for counts in group_counts),
+                        np.zeros((NUM_FRAMES, read_length,
+                                  len(NUCLEOTIDES))))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            frequencies = nt_counts / nt_counts.sum(axis=2,
+                                                    keepdims=True)
+        frequencies = signif(np.nan_to_num(frequencies))
+        for frame in range(NUM_FRAMES):
+            data = pd.DataFrame(frequencies[frame], columns=NUCLEOTIDES)
+            data.insert(0, LENGTH, read_length)
+            data.insert(1, POSITION, np.arange(1, read_length + 1))
+            data.insert(2, FRAME, frame)
+            rows.append(data)
+    return pd.concat(rows, ignore_index=True)
+
+
+def nt_frequencies_to_tsv(h5_file, orf_fasta_file, tsv_file,
+                          dataset="data", min_read_length=10,
+                          max_read_length=50, num_processes=1):
+    """
+    Calculate position-specific nucleotide frequencies, see
+    :py:func:`calculate_nt_frequencies`, and write these to a
+    tab-separated values file, with a provenance header, as
+    ``generate_stats_figs.R`` writes ``pos_sp_nt_freq.tsv``.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param orf_fasta_file: ORF FASTA file
+    :type orf_fasta_file: str or unicode
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param max_read_length: Maximum read length in H5 file
+    :type max_read_length: int
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    frequencies = calculate_nt_frequencies(h5_file, orf_fasta_file,
+                                           dataset, min_read_length,
+                                           max_read_length,
+                                           num_processes=num_processes)
+    provenance.write_provenance_header(__file__, tsv_file)
+    frequencies.to_csv(tsv_file, mode='a', sep="\t", index=False,
+                       float_format=FLOAT_FORMAT)
@@ -6,6 +6,8 @@ INPUT_DIR = "dir_in"
 """ Input directory. """
 INDEX_DIR = "dir_index"
 """ Index files directory. """
+INDEX_CACHE_DIR = "dir_index_cache"
+""" Shared index cache directory. """
 TMP_DIR = "dir_tmp"
 """ Intermediate files directory. """
 OUTPUT_DIR = "dir_out"
@@ -58,6 +60,8 @@ ORF_INDEX_PREFIX = "orf_index_prefix"
 """ rRNA index file name prefix. """
 RRNA_INDEX_PREFIX = "rrna_index_prefix"
 """ ORF index file name prefix. """
+BATCH_ALIGN = "batch_align"
+""" Align all samples using one aligner invocation per index flag. """
 
 ADAPTERS = "adapters"
 """ Illumina sequencing adapter to remove. """
@@ -90,6 +94,20 @@ RPF = "rpf"
 """ Is the dataset an RPF or mRNA dataset? """
 STOP_IN_CDS = "stop_in_cds"
 """ Are stop codons part of the CDS annotations in GFF? """
+NATIVE_BAM_TO_H5 = "native_bam_to_h5"
+""" Make H5 files using the native Python engine flag. """
+NATIVE_COLLATE_TPMS = "native_collate_tpms"
+""" Collate TPMs using the native Python engine flag. """
+NATIVE_POS_SP_NT_FREQ = "native_pos_sp_nt_freq"
+"""
+Calculate position-specific nucleotide frequencies using the native
+Python engine flag.
+"""
+STATS_BLOCKS = "stats_blocks"
+"""
+Run ``generate_stats_figs.R`` analyses as separate blocks, skipping
+unchanged blocks, flag.
+"""
 COUNT_READS = "count_reads"
 """
 Scan input, temporary and output files and produce counts of reads in
@@ -0,0 +1,681 @@
+"""
+Three-nucleotide periodicity and read frame constants and functions.
+
+:py:func:`calculate_three_nucleotide_periodicity` provides a native
+alternative to ``CalculateThreeNucleotidePeriodicity`` in
+``stats_figs_block_functions.R``, and
+:py:func:`calculate_gene_read_frames` provides a native alternative
+to ``CalculateGeneReadFrames``. Rather than iterating over genes, and
+over frames, both read the ribogrids of many genes into a single
+array, via :py:class:`riboviz.ribogrid_reader.RibogridReader`, and
+then compute, for all genes at once:
+
+* Sums of counts in windows around start and stop codons, using
+  flat indices into the array of all counts.
+* Counts at A-sites, by shifting the counts of each read length by
+  its A-site displacement, as ``CalcAsiteFixed`` does.
+* Counts in each frame of each codon, and sums by frame, as
+  ``SumByFrame`` and ``GatherByFrameCodon`` do.
+* One-sided paired Wilcoxon signed-rank tests that frame 0 has more
+  reads than frames 1 and 2, with a normal approximation and
+  continuity correction, as ``wilcox.test(..., alternative =
+  "greater", paired = TRUE, exact = FALSE)`` does in
+  ``WilcoxTestFrame``. Ranks are computed for all genes in a single
+  sort.
+* Combined p-values, using Stouffer's method, as
+  ``combinePValuesStouffer`` does.
+
+Read frames can be calculated in parallel, with genes split into
+groups each processed by a separate process.
+
+The values are the same as those calculated by
+``generate_stats_figs.R``, except that windows extending beyond the
+end of a gene are padded with zeros, where ``generate_stats_figs.R``
+fails.
+"""
+import math
+import multiprocessing
+import os
+import statistics
+from riboviz import annotation
+from riboviz import provenance
+from riboviz import ribogrid_reader
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+POS = "Pos"
+""" ``3nt_periodicity.tsv`` column name. """
+COUNTS = "Counts"
+""" ``3nt_periodicity.tsv`` column name. """
+END = "End"
+""" ``3nt_periodicity.tsv`` column name. """
+END_5 = "5'"
+""" ``3nt_periodicity.tsv`` ``End`` value. """
+END_3 = "3'"
+""" ``3nt_periodicity.tsv`` ``End`` value. """
+PERIODICITY_HEADER = [POS, COUNTS, END]
+""" ``3nt_periodicity.tsv`` column names. """
+GENE = "gene"
+""" ``3ntframe_bygene.tsv`` column name. """
+CT_FR0 = "Ct_fr0"
+""" ``3ntframe_bygene.tsv`` column name. """
+CT_FR1 = "Ct_fr1"
+""" ``3ntframe_bygene.tsv`` column name. """
+CT_FR2 = "Ct_fr2"
+""" ``3ntframe_bygene.tsv`` column name. """
+PVAL_FR0VS1 = "pval_fr0vs1"
+""" ``3ntframe_bygene.tsv`` column name. """
+PVAL_FR0VS2 = "pval_fr0vs2"
+""" ``3ntframe_bygene.tsv`` column name. """
+PVAL_FR0VSBOTH = "pval_fr0vsboth"
+""" ``3ntframe_bygene.tsv`` column name. """
+FRAMES_HEADER = [GENE, CT_FR0, CT_FR1, CT_FR2,
+                 PVAL_FR0VS1, PVAL_FR0VS2, PVAL_FR0VSBOTH]
+""" ``3ntframe_bygene.tsv`` column names. """
+READ_LENGTH = "read_length"
+""" A-site displacement file column name. """
+ASITE_DISPLACEMENT = "asite_displacement"
+""" A-site displacement file column name. """
+DEFAULT_ASITE_DISPLACEMENTS = {28: 15, 29: 15, 30: 15}
+""" Default A-site displacement of each read length. """
+DEFAULT_NNT_BUFFER = 25
+""" Default number of nucleotides of UTR in metagene windows. """
+DEFAULT_NNT_GENE = 50
+""" Default number of nucleotides of gene in metagene windows. """
+CDS = "CDS"
+""" GFF CDS feature type. """
+NAME = "Name"
+""" GFF attribute with gene name. """
+FLOAT_FORMAT = "%.15g"
+"""
+Format of floating point values, matching the precision of R's
+``write.table``.
+"""
+PERIODICITY_TSV = "3nt_periodicity.tsv"
+""" Three-nucleotide periodicity file name. """
+FRAMES_TSV = "3ntframe_bygene.tsv"
+""" Read frames file name. """
+GROUPS_PER_PROCESS = 4
+"""
+Number of groups of genes, per process, to split genes into when
+calculating read frames in parallel.
+"""
+
+
+def load_asite_displacements(asite_disp_length_file):
+    """
+    Load A-site displacements for read lengths from a
+    tab-separated values file with columns :py:const:`READ_LENGTH`
+    and :py:const:`ASITE_DISPLACEMENT`.
+
+    :param asite_disp_length_file: A-site displacement file
+    :type asite_disp_length_file: str or unicode
+    :return: A-site displacement of each read length
+    :rtype: dict(int -> int)
+    """
+    data = pd.read_csv(asite_disp_length_file, sep="\t", comment="#")
+    return dict(zip(data[READ_LENGTH].astype(int),
+                    data[ASITE_DISPLACEMENT].astype(int)))
+
+
+def read_cds_features(gff_file, cache_dir=None):
+    """
+    Read CDS features from a GFF2/GFF3 file or, if ``cache_dir`` is
+    provided, from the annotation cache (see
+    :py:func:`riboviz.annotation.read_gff_features`).
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param cache_dir: Annotation cache directory, or ``None``
+    :type cache_dir: str or unicode
+    :return: CDS features, each a tuple of sequence name, gene name \
+    (``Name`` attribute, or ``None`` if absent), 1-indexed start, \
+    1-indexed end and strand
+    :rtype: list(tuple(str or unicode, str or unicode, int, int, \
+    str or unicode))
+    """
+    return [(seqname, attributes.get(NAME), start, end, strand)
+            for seqname, feature_type, start, end, strand, attributes
+            in annotation.read_gff_features(gff_file, cache_dir)
+            if feature_type == CDS]
+
+
+def get_cds_ends(cds_features):
+    """
+    Get the start and end of the CDS of each gene, on the ``+``
+    strand, keyed by ``Name``, as ``GetCDS5start`` and ``GetCDS3end``
+    do.
+
+    :param cds_features: CDS features, see \
+    :py:func:`read_cds_features`
+    :type cds_features: list(tuple)
+    :return: 1-indexed start and end of each gene's CDS
+    :rtype: dict(str or unicode -> tuple(int, int))
+    """
+    ends = {}
+    for _, name, start, end, strand in cds_features:
+        if name is None or strand != "+":
+            continue
+        if name in ends:
+            ends[name] = (min(ends[name][0], start),
+                          max(ends[name][1], end))
+        else:
+            ends[name] = (start, end)
+    return ends
+
+
+def normal_sf(z):
+    """
+    Get the upper tail probability of the standard normal
+    distribution, as ``pnorm(z, lower.tail = FALSE)`` does.
+
+    :param z: Values
+    :type z: numpy.ndarray
+    :return: Probabilities
+    :rtype: numpy.ndarray
+    """
+    z = np.asarray(z, dtype=np.float64)
+    return 0.5 * np.vectorize(math.erfc, otypes=[np.float64])(
+        z / math.sqrt(2)) if z.size else z.copy()
+
+
+def normal_ppf(p):
+    """
+    Get the quantiles of the standard normal distribution, as
+    ``qnorm(p)`` does.
+
+    :param p: Probabilities
+    :type p: numpy.ndarray
+    :return: Quantiles, ``-inf`` for 0, ``inf`` for 1 and ``NaN`` \
+    for ``NaN``
+    :rtype: numpy.ndarray
+    """
+    normal = statistics.NormalDist()
+
+    def ppf(value):
+        if np.isnan(value):
+            return np.nan
+        if value <= 0:
+            return -np.inf
+        if value >= 1:
+            return np.inf
+        return normal.inv_cdf(value)
+    p = np.asarray(p, dtype=np.float64)
+    return np.vectorize(ppf, otypes=[np.float64])(p) if p.size \
+        else p.copy()
+
+
+def combine_p_values_stouffer(p_values):
+    """
+    Combine p-values using Stouffer's inverse normal method
+    (1-sided), as ``combinePValuesStouffer`` does.
+
+    :param p_values: p-values, one row per test
+    :type p_values: numpy.ndarray
+    :return: Combined p-values
+    :rtype: numpy.ndarray
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    z = normal_ppf(p_values).sum(axis=1) / math.sqrt(p_values.shape[1])
+    return normal_sf(-z)
+
+
+def combine_p_values_fisher(p_values):
+    """
+    Combine p-values using Fisher's method (1-sided), as
+    ``combinePValuesFisher`` does. As the chi-squared distribution
+    has an even number of degrees of freedom its upper tail
+    probability is calculated exactly.
+
+    :param p_values: p-values, one row per test
+    :type p_values: numpy.ndarray
+    :return: Combined p-values
+    :rtype: numpy.ndarray
+    """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    half_statistic = -np.log(p_values).sum(axis=1)
+    terms = np.ones_like(half_statistic)
+    total = np.ones_like(half_statistic)
+    for i in range(1, p_values.shape[1]):
+        terms = terms * half_statistic / i
+        total = total + terms
+    with np.errstate(invalid="ignore"):
+        return np.exp(-half_statistic) * total
+
+
+def wilcoxon_greater(differences, groups, num_groups):
+    """
+    Run one-sided paired Wilcoxon signed-rank tests, that the
+    differences are greater than 0, for several groups of
+    differences at once, with a normal approximation and continuity
+    correction, as ``wilcox.test(x, y, alternative = "greater",
+    paired = TRUE, exact = FALSE)`` does for ``differences = x - y``.
+    ``NaN`` and zero differences are omitted.
+
+    :param differences: Differences
+    :type differences: numpy.ndarray
+    :param groups: Group of each difference
+    :type groups: numpy.ndarray
+    :param num_groups: Number of groups
+    :type num_groups: int
+    :return: p-value of each group
+    :rtype: numpy.ndarray
+    """
+    differences = np.asarray(differences, dtype=np.float64)
+    groups = np.asarray(groups, dtype=np.int64)
+    is_used = ~np.isnan(differences) & (differences != 0)
+    differences = differences[is_used]
+    groups = groups[is_used]
+    magnitudes = np.abs(differences)
+    order = np.lexsort((magnitudes, groups))
+    sorted_groups = groups[order]
+    sorted_magnitudes = magnitudes[order]
+    num = np.bincount(groups, minlength=num_groups).astype(np.float64)
+    group_starts = np.concatenate(([0], np.cumsum(num)))[:-1].astype(
+        np.int64)
+    # Tied runs: consecutive equal magnitudes within a group.
+    is_run_start = np.ones(len(order), dtype=bool)
+    is_run_start[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | \
+        (sorted_magnitudes[1:] != sorted_magnitudes[:-1])
+    run_starts = np.flatnonzero(is_run_start)
+    run_sizes = np.diff(np.append(run_starts, len(order)))
+    run_groups = sorted_groups[run_starts]
+    # Average 1-indexed rank within each group for each tied run.
+    run_ranks = run_starts - group_starts[run_groups] + \
+        (run_sizes + 1) / 2
+    ranks = np.empty(len(order), dtype=np.float64)
+    ranks[order] = np.repeat(run_ranks, run_sizes)
+    statistic = np.bincount(groups, weights=ranks * (differences > 0),
+                            minlength=num_groups)
+    ties = np.bincount(run_groups,
+                       weights=run_sizes.astype(np.float64) ** 3 -
+                       run_sizes,
+                       minlength=num_groups)
+    z = statistic - num * (num + 1) / 4
+    sigma = np.sqrt(num * (num + 1) * (2 * num + 1) / 24 - ties / 48)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (z - 0.5) / sigma
+    return normal_sf(z)
+
+
+def get_asite_counts(counts, offsets, num_positions, min_read_length,
+                     asite_displacements):
+    """
+    Get the counts at A-sites, for several genes, by shifting the
+    counts of each read length by its A-site displacement and summing
+    these, as ``CalcAsiteFixed`` does for each gene.
+
+    :param counts: Counts, with one row per read length and one \
+    column per position, with the positions of the genes \
+    concatenated
+    :type counts: numpy.ndarray
+    :param offsets: Column at which each gene starts
+    :type offsets: numpy.ndarray
+    :param num_positions: Number of positions of each gene
+    :type num_positions: numpy.ndarray
+    :param min_read_length: Read length of first row of ``counts``
+    :type min_read_length: int
+    :param asite_displacements: A-site displacement of each read \
+    length
+    :type asite_displacements: dict(int -> int)
+    :return: Counts at A-sites, with the positions of the genes \
+    concatenated
+    :rtype: numpy.ndarray
+    :raise AssertionError: if ``counts`` has no row for a read length
+    """
+    num_positions = np.asarray(num_positions, dtype=np.int64)
+    position = np.arange(counts.shape[1]) - np.repeat(
+        np.asarray(offsets, dtype=np.int64), num_positions)
+    asite_counts = np.zeros(counts.shape[1], dtype=np.int64)
+    for read_length, displacement in asite_displacements.items():
+        row = read_length - min_read_length
+        assert 0 <= row < counts.shape[0], \
+            "Read length {} is not in counts for minimum read length {}"\
+            .format(read_length, min_read_length)
+        shifted = np.zeros(counts.shape[1], dtype=np.int64)
+        if displacement < counts.shape[1]:
+            shifted[displacement:] = counts[
+                row, :counts.shape[1] - displacement]
+        shifted[position < displacement] = 0
+        asite_counts += shifted
+    return asite_counts
+
+
+def get_gene_read_frames(asite_counts, offsets, num_positions, lefts,
+                         rights):
+    """
+    Get the counts of reads in each frame, and test that frame 0 has
+    more reads than frames 1 and 2, for several CDSs at once, as
+    ``GetGeneReadFrame`` does for each CDS.
+
+    :param asite_counts: Counts at A-sites, see \
+    :py:func:`get_asite_counts`
+    :type asite_counts: numpy.ndarray
+    :param offsets: Position, in ``asite_counts``, at which the gene \
+    of each CDS starts
+    :type offsets: numpy.ndarray
+    :param num_positions: Number of positions of the gene of each CDS
+    :type num_positions: numpy.ndarray
+    :param lefts: 1-indexed start of each CDS
+    :type lefts: numpy.ndarray
+    :param rights: 1-indexed end of each CDS
+    :type rights: numpy.ndarray
+    :return: Read frames with columns :py:const:`FRAMES_HEADER` \
+    except :py:const:`GENE`, one row per CDS
+    :rtype: pandas.core.frame.DataFrame
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    num_positions = np.asarray(num_positions, dtype=np.int64)
+    lefts = np.asarray(lefts, dtype=np.int64)
+    rights = np.asarray(rights, dtype=np.int64)
+    num_cds = len(lefts)
+    num_codons = np.maximum((rights - lefts) // 3 + 1, 0)
+    cds_of = np.repeat(np.arange(num_cds), num_codons)
+    codon = np.arange(num_codons.sum()) - np.repeat(
+        np.concatenate(([0], np.cumsum(num_codons)))[:-1], num_codons)
+    frame0 = lefts[cds_of] + 3 * codon
+    frames = []
+    for frame in range(3):
+        position = frame0 + frame
+        is_valid = position <= num_positions[cds_of]
+        index = np.where(is_valid, offsets[cds_of] + position - 1, 0)
+        frames.append(np.where(is_valid, asite_counts[index], np.nan))
+    frame_counts = {column: np.bincount(cds_of, weights=values,
+                                        minlength=num_cds)
+                    for column, values in zip([CT_FR0, CT_FR1, CT_FR2],
+                                              frames)}
+    pval_fr0vs1 = wilcoxon_greater(frames[0] - frames[1], cds_of,
+                                   num_cds)
+    pval_fr0vs2 = wilcoxon_greater(frames[0] - frames[2], cds_of,
+                                   num_cds)
+    return pd.DataFrame(
+        {**frame_counts,
+         PVAL_FR0VS1: pval_fr0vs1,
+         PVAL_FR0VS2: pval_fr0vs2,
+         PVAL_FR0VSBOTH: combine_p_values_stouffer(
+             np.column_stack((pval_fr0vs1, pval_fr0vs2)))},
+        columns=FRAMES_HEADER[1:])
+
+
+def calculate_gene_read_frames_group(h5_file, dataset, cds_features,
+                                     min_read_length,
+                                     asite_displacements):
+    """
+    Calculate the read frames of a group of CDSs. See
+    :py:func:`calculate_gene_read_frames`.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param cds_features: CDS features, each a tuple of gene, \
+    1-indexed start and 1-indexed end
+    :type cds_features: list(tuple(str or unicode, int, int))
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param asite_displacements: A-site displacement of each read \
+    length
+    :type asite_displacements: dict(int -> int)
+    :return: Read frames
+    :rtype: pandas.core.frame.DataFrame
+    """
+    genes = list(dict.fromkeys(gene for gene, _, _ in cds_features))
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        counts, offsets = reader.read_all(genes)
+    num_positions = np.diff(np.append(offsets, counts.shape[1]))
+    asite_counts = get_asite_counts(counts, offsets, num_positions,
+                                    min_read_length, asite_displacements)
+    gene_index = {gene: index for index, gene in enumerate(genes)}
+    cds_genes = np.array([gene_index[gene] for gene, _, _ in cds_features],
+                         dtype=np.int64)
+    frames = get_gene_read_frames(
+        asite_counts, offsets[cds_genes], num_positions[cds_genes],
+        [left for _, left, _ in cds_features],
+        [right for _, _, right in cds_features])
+    frames.insert(0, GENE, [gene for gene, _, _ in cds_features])
+    return frames
+
+
+def calculate_gene_read_frames(h5_file, cds_features, dataset="data",
+                               min_read_length=10,
+                               asite_displacements=None,
+                               num_processes=1):
+    """
+    Calculate the counts of reads in each frame of each CDS, and test
+    that frame 0 has more reads than frames 1 and 2, as
+    ``CalculateGeneReadFrames`` does. See module documentation.
+
+    As in ``CalculateGeneReadFrames``, CDSs are identified by their
+    sequence names. CDSs whose sequence names are not in the H5 file
+    are omitted.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param cds_features: CDS features, see \
+    :py:func:`read_cds_features`
+    :type cds_features: list(tuple)
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param asite_displacements: A-site displacement of each read \
+    length (if ``None`` then \
+    :py:const:`DEFAULT_ASITE_DISPLACEMENTS` is used)
+    :type asite_displacements: dict(int -> int)
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :return: Read frames, with columns :py:const:`FRAMES_HEADER`, one \
+    row per CDS
+    :rtype: pandas.core.frame.DataFrame
+    """
+    if asite_displacements is None:
+        asite_displacements = DEFAULT_ASITE_DISPLACEMENTS
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        cds_features = [(reader.get_gene(seqname), start, end)
+                        for seqname, _, start, end, _ in cds_features
+                        if seqname in reader.gene_index]
+    if not cds_features:
+        return pd.DataFrame(columns=FRAMES_HEADER)
+    if num_processes > 1 and len(cds_features) > 1:
+        num_groups = min(len(cds_features),
+                         num_processes * GROUPS_PER_PROCESS)
+        group_size = -(-len(cds_features) // num_groups)
+        groups = [cds_features[i:i + group_size]
+                  for i in range(0, len(cds_features), group_size)]
+        with multiprocessing.Pool(num_processes) as pool:
+            group_frames = pool.starmap(
+                calculate_gene_read_frames_group,
+                [(h5_file, dataset, group, min_read_length,
+                  asite_displacements) for group in groups])
+        return pd.concat(group_frames, ignore_index=True)
+    return calculate_gene_read_frames_group(
+        h5_file, dataset, cds_features, min_read_length,
+        asite_displacements)
+
+
+def get_window_counts(counts, offsets, num_positions, starts, width):
+    """
+    Sum the counts in windows of several genes, padding windows that
+    extend beyond the ends of genes with zeros.
+
+    :param counts: Counts, with one row per read length and one \
+    column per position, with the positions of the genes \
+    concatenated
+    :type counts: numpy.ndarray
+    :param offsets: Column at which each gene starts
+    :type offsets: numpy.ndarray
+    :param num_positions: Number of positions of each gene
+    :type num_positions: numpy.ndarray
+    :param starts: 1-indexed position at which each gene's window \
+    starts
+    :type starts: numpy.ndarray
+    :param width: Number of positions in each window
+    :type width: int
+    :return: Sums, with one row per read length and one column per \
+    window position
+    :rtype: numpy.ndarray
+    """
+    columns = np.asarray(starts, dtype=np.int64)[:, None] + \
+        np.arange(width)
+    is_valid = (columns >= 1) & \
+        (columns <= np.asarray(num_positions, dtype=np.int64)[:, None])
+    index = np.asarray(offsets, dtype=np.int64)[:, None] + columns - 1
+    sums = np.zeros((counts.shape[0], width), dtype=np.int64)
+    for position in range(width):
+        sums[:, position] = counts[:, index[is_valid[:, position],
+                                            position]].sum(axis=1)
+    return sums
+
+
+def calculate_start_stop_counts(h5_file, cds_ends, dataset="data",
+                                nnt_buffer=DEFAULT_NNT_BUFFER,
+                                nnt_gene=DEFAULT_NNT_GENE, genes=None):
+    """
+    Sum the counts, for each read length, of all genes in windows
+    from ``nnt_buffer`` positions before the start codon to
+    ``nnt_gene`` positions from the start codon, and from
+    ``nnt_gene`` positions up to the end of the stop codon to
+    ``nnt_buffer`` positions after it, as
+    ``AllGenes5StartPositionLengthCountsTibble`` and
+    ``AllGenes3EndPositionLengthCountsTibble`` do.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param cds_ends: Start and end of each gene's CDS, see \
+    :py:func:`get_cds_ends`
+    :type cds_ends: dict(str or unicode -> tuple(int, int))
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param nnt_buffer: Number of nucleotides of UTR in windows
+    :type nnt_buffer: int
+    :param nnt_gene: Number of nucleotides of gene in windows
+    :type nnt_gene: int
+    :param genes: Primary or secondary gene IDs, or ``None`` for all \
+    names at the root of the H5 file that are in ``cds_ends``
+    :type genes: list(str or unicode)
+    :return: Sums around start codons and around stop codons, with \
+    one row per read length and one column per window position
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    :raise KeyError: if any gene is not in ``cds_ends`` or the file
+    """
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        if genes is None:
+            genes = [gene for gene in sorted(reader.gene_index)
+                     if gene in cds_ends]
+        counts, offsets = reader.read_all(genes)
+    num_positions = np.diff(np.append(offsets, counts.shape[1]))
+    ends = np.array([cds_ends[gene] for gene in genes],
+                    dtype=np.int64).reshape(-1, 2)
+    width = nnt_buffer + nnt_gene
+    start_counts = get_window_counts(counts, offsets, num_positions,
+                                     ends[:, 0] - nnt_buffer, width)
+    stop_counts = get_window_counts(counts, offsets, num_positions,
+                                    ends[:, 1] - nnt_gene + 1, width)
+    return start_counts, stop_counts
+
+
+def calculate_three_nucleotide_periodicity(
+        h5_file, cds_ends, dataset="data", nnt_buffer=DEFAULT_NNT_BUFFER,
+        nnt_gene=DEFAULT_NNT_GENE, genes=None):
+    """
+    Sum the counts, of all read lengths, of all genes, at each
+    position around start and stop codons, as
+    ``CalculateThreeNucleotidePeriodicity`` does. See
+    :py:func:`calculate_start_stop_counts`.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param cds_ends: Start and end of each gene's CDS, see \
+    :py:func:`get_cds_ends`
+    :type cds_ends: dict(str or unicode -> tuple(int, int))
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param nnt_buffer: Number of nucleotides of UTR in windows
+    :type nnt_buffer: int
+    :param nnt_gene: Number of nucleotides of gene in windows
+    :type nnt_gene: int
+    :param genes: Primary or secondary gene IDs, or ``None`` for all \
+    names at the root of the H5 file that are in ``cds_ends``
+    :type genes: list(str or unicode)
+    :return: Counts, with columns :py:const:`PERIODICITY_HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    """
+    start_counts, stop_counts = calculate_start_stop_counts(
+        h5_file, cds_ends, dataset, nnt_buffer, nnt_gene, genes)
+    width = nnt_buffer + nnt_gene
+    return pd.DataFrame(
+        {POS: np.concatenate((np.arange(width) - nnt_buffer + 1,
+                              np.arange(width) - nnt_gene + 1)),
+         COUNTS: np.concatenate((start_counts.sum(axis=0),
+                                 stop_counts.sum(axis=0))),
+         END: [END_5] * width + [END_3] * width},
+        columns=PERIODICITY_HEADER)
+
+
+def write_tsv(data, tsv_file):
+    """
+    Write data to a tab-separated values file, with a provenance
+    header, as ``generate_stats_figs.R`` writes its TSV files.
+
+    :param data: Data
+    :type data: pandas.core.frame.DataFrame
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    """
+    provenance.write_provenance_header(__file__, tsv_file)
+    data.to_csv(tsv_file, mode='a', sep="\t", index=False,
+                float_format=FLOAT_FORMAT, na_rep="NA")
+
+
+def periodicity_to_tsv(h5_file, orf_gff_file, output_dir,
+                       output_prefix="", dataset="data",
+                       min_read_length=10, nnt_buffer=DEFAULT_NNT_BUFFER,
+                       nnt_gene=DEFAULT_NNT_GENE,
+                       asite_disp_length_file=None, num_processes=1,
+                       cache_dir=None):
+    """
+    Calculate three-nucleotide periodicity and write it to
+    :py:const:`PERIODICITY_TSV` and, if an A-site displacement file
+    is provided, calculate read frames and write these to
+    :py:const:`FRAMES_TSV`, as ``generate_stats_figs.R`` does. The
+    GFF file is read once for both.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param orf_gff_file: GFF2/GFF3 file
+    :type orf_gff_file: str or unicode
+    :param output_dir: Output directory
+    :type output_dir: str or unicode
+    :param output_prefix: Prefix for output file names
+    :type output_prefix: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param min_read_length: Minimum read length in H5 file
+    :type min_read_length: int
+    :param nnt_buffer: Number of nucleotides of UTR in windows
+    :type nnt_buffer: int
+    :param nnt_gene: Number of nucleotides of gene in windows
+    :type nnt_gene: int
+    :param asite_disp_length_file: A-site displacement file, or \
+    ``None``
+    :type asite_disp_length_file: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param cache_dir: Annotation cache directory, or ``None``, see \
+    :py:func:`read_cds_features`
+    :type cache_dir: str or unicode
+    """
+    cds_features = read_cds_features(orf_gff_file, cache_dir)
+    periodicity = calculate_three_nucleotide_periodicity(
+        h5_file, get_cds_ends(cds_features), dataset, nnt_buffer,
+        nnt_gene)
+    write_tsv(periodicity,
+              os.path.join(output_dir, output_prefix + PERIODICITY_TSV))
+    if asite_disp_length_file is None:
+        return
+    frames = calculate_gene_read_frames(
+        h5_file, cds_features, dataset, min_read_length,
+        load_asite_displacements(asite_disp_length_file),
+        num_processes)
+    write_tsv(frames, os.path.join(output_dir, output_prefix + FRAMES_TSV))
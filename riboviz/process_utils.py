@@ -1,11 +1,85 @@
 """
 Python ``subprocess``-related functions.
 """
+import collections
+import contextvars
+import csv
+import os
+import resource
+import signal
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import traceback
+from riboviz import logging_utils
 from riboviz import utils
 
 
+PipelineStageTuple = collections.namedtuple(
+    "PipelineStageTuple", ["stage",
+                           "exit_code",
+                           "wall_time",
+                           "user_time",
+                           "system_time",
+                           "max_rss",
+                           "read_bytes",
+                           "write_bytes"])
+"""
+Outcome and resource usage of a command, or of a single stage of a
+pipeline run by :py:func:`run_pipeline`.
+
+* ``stage``: Command and arguments (``list(str or unicode)``) or \
+  Python function.
+* ``exit_code``: Exit code. For commands killed by a signal this is \
+  the negated signal number, as for ``subprocess.Popen.returncode``.
+  For Python functions this is 0 on success, 1 if the function raised
+  an exception or ``-SIGPIPE`` if the following stage closed its input
+  early.
+* ``wall_time``: Elapsed time (seconds).
+* ``user_time``: User CPU time (seconds).
+* ``system_time``: System CPU time (seconds).
+* ``max_rss``: Maximum resident set size (KB). For Python functions \
+  this is that of the Python process.
+* ``read_bytes``: Bytes read from storage, derived from the number \
+  of block input operations (see :py:const:`BLOCK_SIZE`).
+* ``write_bytes``: Bytes written to storage, derived from the number \
+  of block output operations (see :py:const:`BLOCK_SIZE`).
+"""
+
+BLOCK_SIZE = 512
+"""
+Size, in bytes, of the blocks counted by ``ru_inblock`` and
+``ru_oublock`` in ``resource.getrusage`` and ``os.wait4`` results.
+"""
+
+STEP = "Step"
+""" Resource usage file column name. """
+LOG_FILE = "LogFile"
+""" Resource usage file column name. """
+COMMAND = "Command"
+""" Resource usage file column name. """
+EXIT_CODE = "ExitCode"
+""" Resource usage file column name. """
+WALL_TIME = "WallTime"
+""" Resource usage file column name. """
+USER_TIME = "UserTime"
+""" Resource usage file column name. """
+SYSTEM_TIME = "SystemTime"
+""" Resource usage file column name. """
+MAX_RSS = "MaxRSS"
+""" Resource usage file column name. """
+READ_BYTES = "ReadBytes"
+""" Resource usage file column name. """
+WRITE_BYTES = "WriteBytes"
+""" Resource usage file column name. """
+USAGE_HEADER = [STEP, LOG_FILE, COMMAND, EXIT_CODE, WALL_TIME,
+                USER_TIME, SYSTEM_TIME, MAX_RSS, READ_BYTES,
+                WRITE_BYTES]
+""" Resource usage file header. """
+
+
 def run_command(cmd, out=sys.stdout, err=sys.stderr):
     """
     Run operating system command via Python ``subprocess``.
@@ -16,10 +90,32 @@ def run_command(cmd, out=sys.stdout, err=sys.stderr):
     :type out: _io.TextIOWrapper
     :param err: Standard error desination (``sys.stderr`` or file)
     :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of command
+    :rtype: PipelineStageTuple
     :raise AssertionError: If the command returns a non-zero exit code
     """
-    exit_code = subprocess.call(cmd, stdout=out, stderr=err)
-    assert exit_code == 0, "%s failed with exit code %d" % (cmd, exit_code)
+    result = _run_command(cmd, out, err)
+    check_command(result)
+    return result
+
+
+def _run_command(cmd, out=sys.stdout, err=sys.stderr):
+    """
+    Run operating system command via Python ``subprocess``, see
+    :py:func:`run_command`, without checking its exit code.
+
+    :param cmd: Commnand and arguments
+    :type cmd: list(str or unicode)
+    :param out: Standard output desination (``sys.stdout`` or file)
+    :type out: _io.TextIOWrapper
+    :param err: Standard error desination (``sys.stderr`` or file)
+    :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of command
+    :rtype: PipelineStageTuple
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=out, stderr=err)
+    return _wait_command(process, start)
 
 
 def run_redirect_command(cmd, out, err=sys.stderr):
@@ -34,26 +130,51 @@ def run_redirect_command(cmd, out, err=sys.stderr):
     :type out: str or unicode
     :param err: Standard error desination (``sys.stderr`` or file)
     :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of command
+    :rtype: PipelineStageTuple
     :raise FileNotFoundError: if the command to run cannot be found
     :raise AssertionError: If the command returns a non-zero exit code
     """
-    p = subprocess.Popen(cmd,
-                         stdout=subprocess.PIPE,
-                         stderr=subprocess.PIPE)
-    p_out, p_err = p.communicate()
-    exit_code = p.returncode
+    result = _run_redirect_command(cmd, out, err)
+    check_command(result)
+    return result
+
+
+def _run_redirect_command(cmd, out, err=sys.stderr):
+    """
+    Run operating system command via Python ``subprocess`` and
+    redirect output to a file, see :py:func:`run_redirect_command`,
+    without checking its exit code.
+
+    :param cmd: Commnand and arguments
+    :type cmd: list(str or unicode)
+    :param out: Output file name
+    :type out: str or unicode
+    :param err: Standard error desination (``sys.stderr`` or file)
+    :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of command
+    :rtype: PipelineStageTuple
+    :raise FileNotFoundError: if the command to run cannot be found
+    """
+    start = time.perf_counter()
     with open(out, "wb") as f:
-        f.write(p_out)
-    # communicate() returns bytes, so convert to string.
+        process = subprocess.Popen(cmd,
+                                   stdout=f,
+                                   stderr=subprocess.PIPE)
+        p_err = process.stderr.read()
+        process.stderr.close()
+        result = _wait_command(process, start)
+    # Standard error is read as bytes, so convert to string.
     err.write(p_err.decode('utf-8'))
-    assert exit_code == 0, "%s failed with exit code %d" % (cmd, exit_code)
+    return result
 
 
 def run_pipe_command(cmd1, cmd2, out=sys.stdout, err=sys.stderr):
     """
     Run operating system command via Python ``subprocess`` and pipe
-    output into another command. Uses pattern suggested by:
-    https://docs.python.org/2/library/subprocess.html#replacing-shell-pipeline
+    output into another command. The standard error of ``cmd2`` is
+    written to ``err`` after that of ``cmd1``. Uses
+    :py:func:`run_pipeline`.
 
     :param cmd1: Commnand and arguments
     :type cmd1: list(str or unicode)
@@ -63,30 +184,497 @@ def run_pipe_command(cmd1, cmd2, out=sys.stdout, err=sys.stderr):
     :type out: _io.TextIOWrapper
     :param err: Standard error desination (``sys.stderr`` or file)
     :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of each command
+    :rtype: list(PipelineStageTuple)
     :raise FileNotFoundError: if the commands to run cannot be found
     :raise AssertionError: If the commands return a non-zero exit code
     """
-    process1 = subprocess.Popen(cmd1,
-                                stdout=subprocess.PIPE,
-                                stderr=err)
-    process2 = subprocess.Popen(cmd2,
-                                stdin=process1.stdout,
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE)
-    process1.stdout.close()
-    p_out, p_err = process2.communicate()
-    out.write(p_out.decode('utf-8'))
-    err.write(p_err.decode('utf-8'))
-    exit_code = process2.returncode
-    assert exit_code == 0, ("%s | %s failed with exit code %d"
-                            % (cmd1, cmd2, exit_code))
+    results = _run_pipe_command(cmd1, cmd2, out, err)
+    check_pipeline(results)
+    return results
+
+
+def _run_pipe_command(cmd1, cmd2, out=sys.stdout, err=sys.stderr):
+    """
+    Run operating system command via Python ``subprocess`` and pipe
+    output into another command, see :py:func:`run_pipe_command`,
+    without checking their exit codes.
+
+    :param cmd1: Commnand and arguments
+    :type cmd1: list(str or unicode)
+    :param cmd2: Commnand and arguments
+    :type cmd2: list(str or unicode)
+    :param out: Standard output desination (``sys.stdout`` or file)
+    :type out: _io.TextIOWrapper
+    :param err: Standard error desination (``sys.stderr`` or file)
+    :type err: _io.TextIOWrapper
+    :return: Outcome and resource usage of each command
+    :rtype: list(PipelineStageTuple)
+    :raise FileNotFoundError: if the commands to run cannot be found
+    """
+    with tempfile.TemporaryFile("w+") as err2:
+        results = _start_pipeline([cmd1, cmd2], out, [err, err2])
+        err2.seek(0)
+        err.write(err2.read())
+    return results
+
+
+def check_command(result):
+    """
+    Check that a command completed successfully.
+
+    :param result: Outcome of command
+    :type result: PipelineStageTuple
+    :raise AssertionError: If the command returned a non-zero exit code
+    """
+    assert result.exit_code == 0, "%s failed with exit code %d" % (
+        result.stage, result.exit_code)
+
+
+def _exit_code(status):
+    """
+    Convert a status returned by ``os.wait4`` into an exit code
+    consistent with ``subprocess.Popen.returncode``.
+
+    :param status: Status
+    :type status: int
+    :return: Exit code, or negated signal number if killed by a signal
+    :rtype: int
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _thread_usage():
+    """
+    Get resource usage of the current thread. If this is not
+    supported by the operating system then the resource usage of the
+    current process is returned.
+
+    :return: Resource usage
+    :rtype: resource.struct_rusage
+    """
+    if hasattr(resource, "RUSAGE_THREAD"):
+        return resource.getrusage(resource.RUSAGE_THREAD)
+    return resource.getrusage(resource.RUSAGE_SELF)
+
+
+def _max_rss_kb(usage):
+    """
+    Get maximum resident set size from resource usage in KB. Linux
+    reports this in KB but macOS reports it in bytes.
+
+    :param usage: Resource usage
+    :type usage: resource.struct_rusage
+    :return: Maximum resident set size (KB)
+    :rtype: int
+    """
+    if sys.platform == "darwin":
+        return usage.ru_maxrss // 1024
+    return usage.ru_maxrss
+
+
+def _wait_command(process, start):
+    """
+    Wait for a process to complete and get its exit code and resource
+    usage.
+
+    ``os.wait4`` is used, rather than ``subprocess.Popen.wait``, so
+    that the resource usage of the process itself can be recorded.
+
+    :param process: Process
+    :type process: subprocess.Popen
+    :param start: Start time (from ``time.perf_counter``)
+    :type start: float
+    :return: Outcome and resource usage of command
+    :rtype: PipelineStageTuple
+    """
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = _exit_code(status)
+    return PipelineStageTuple(process.args,
+                              process.returncode,
+                              time.perf_counter() - start,
+                              usage.ru_utime,
+                              usage.ru_stime,
+                              _max_rss_kb(usage),
+                              usage.ru_inblock * BLOCK_SIZE,
+                              usage.ru_oublock * BLOCK_SIZE)
+
+
+def _wait_stage(process, start, results, index):
+    """
+    Wait for a process started by :py:func:`run_pipeline` to complete
+    and record its exit code and resource usage in ``results``. See
+    :py:func:`_wait_command`.
+
+    :param process: Process
+    :type process: subprocess.Popen
+    :param start: Start time (from ``time.perf_counter``)
+    :type start: float
+    :param results: Results, one per stage
+    :type results: list(PipelineStageTuple)
+    :param index: Index of stage in ``results``
+    :type index: int
+    """
+    results[index] = _wait_command(process, start)
+
+
+def _run_function(function, in_fd, out_fd, err, start, results, index):
+    """
+    Run a Python function stage of a pipeline run by
+    :py:func:`run_pipeline` and record its exit code and resource
+    usage in ``results``.
+
+    :param function: Function which takes a binary file handle \
+    (or ``None`` if it is the first stage) and yields ``bytes``
+    :type function: callable
+    :param in_fd: File descriptor for input, or ``None``
+    :type in_fd: int
+    :param out_fd: File descriptor for output
+    :type out_fd: int
+    :param err: Standard error desination
+    :type err: _io.TextIOWrapper
+    :param start: Start time (from ``time.perf_counter``)
+    :type start: float
+    :param results: Results, one per stage
+    :type results: list(PipelineStageTuple)
+    :param index: Index of stage in ``results``
+    :type index: int
+    """
+    usage_start = _thread_usage()
+    exit_code = 0
+    out_handle = open(out_fd, "wb")
+    in_handle = None
+    if in_fd is not None:
+        in_handle = open(in_fd, "rb")
+    try:
+        with out_handle:
+            for data in function(in_handle):
+                out_handle.write(data)
+    except BrokenPipeError:
+        exit_code = -signal.SIGPIPE
+    except Exception:
+        exit_code = 1
+        err.write(traceback.format_exc())
+        err.flush()
+    finally:
+        if in_handle is not None:
+            in_handle.close()
+    usage = _thread_usage()
+    results[index] = PipelineStageTuple(
+        function,
+        exit_code,
+        time.perf_counter() - start,
+        usage.ru_utime - usage_start.ru_utime,
+        usage.ru_stime - usage_start.ru_stime,
+        _max_rss_kb(usage),
+        (usage.ru_inblock - usage_start.ru_inblock) * BLOCK_SIZE,
+        (usage.ru_oublock - usage_start.ru_oublock) * BLOCK_SIZE)
+
+
+def _get_fileno(handle):
+    """
+    Get file descriptor of a file handle, if it has one.
+
+    :param handle: File handle
+    :type handle: _io.TextIOWrapper
+    :return: File descriptor or ``None``
+    :rtype: int
+    """
+    try:
+        return handle.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _start_pipeline(stages, out, errs):
+    """
+    Run a pipeline of stages, see :py:func:`run_pipeline`, without
+    checking the exit codes of the stages.
+
+    :param stages: Commands and arguments or Python functions
+    :type stages: list(list(str or unicode) or callable)
+    :param out: Standard output desination (``sys.stdout`` or file)
+    :type out: _io.TextIOWrapper
+    :param errs: Standard error desinations, one per stage
+    :type errs: list(_io.TextIOWrapper)
+    :return: Outcome of each stage
+    :rtype: list(PipelineStageTuple)
+    :raise FileNotFoundError: if a command to run cannot be found
+    """
+    num_stages = len(stages)
+    results = [None] * num_stages
+    threads = []
+    # Pipes between adjacent stages. Commands read from and write
+    # to these directly so no data is copied via Python between
+    # successive commands.
+    pipes = [os.pipe() for _ in range(num_stages - 1)]
+    out_fd = _get_fileno(out)
+    sink_fd = None
+    if out_fd is None:
+        # out has no file descriptor, so pump output via a pipe.
+        sink_fd, out_fd = os.pipe()
+        owned_out_fd = out_fd
+    else:
+        out.flush()
+        owned_out_fd = os.dup(out_fd)
+    in_fds = [None] + [read_fd for read_fd, _ in pipes]
+    out_fds = [write_fd for _, write_fd in pipes] + [owned_out_fd]
+    open_fds = set(in_fds[1:] + out_fds)
+    try:
+        for index, stage in enumerate(stages):
+            start = time.perf_counter()
+            if callable(stage):
+                # Run in a copy of the current context so records
+                # logged by the function have the log context.
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(_run_function, stage, in_fds[index],
+                          out_fds[index], errs[index], start, results,
+                          index))
+                open_fds.discard(in_fds[index])
+                open_fds.discard(out_fds[index])
+            else:
+                errs[index].flush()
+                process = subprocess.Popen(stage,
+                                           stdin=in_fds[index],
+                                           stdout=out_fds[index],
+                                           stderr=errs[index])
+                for fd in [in_fds[index], out_fds[index]]:
+                    if fd is not None:
+                        os.close(fd)
+                        open_fds.discard(fd)
+                thread = threading.Thread(
+                    target=_wait_stage,
+                    args=(process, start, results, index))
+            thread.start()
+            threads.append(thread)
+    finally:
+        # Closing any unused pipe ends causes already-started stages
+        # to see end-of-file or a broken pipe, should a later stage
+        # fail to start.
+        for fd in open_fds:
+            os.close(fd)
+        if sink_fd is not None:
+            with open(sink_fd, "rb") as sink:
+                for data in iter(lambda: sink.read(65536), b""):
+                    out.write(data.decode("utf-8"))
+        for thread in threads:
+            thread.join()
+    return results
+
+
+def _stage_to_str(stage):
+    """
+    Get a printable representation of a pipeline stage.
+
+    :param stage: Command and arguments or Python function
+    :type stage: list(str or unicode) or callable
+    :return: Command as a string or function name
+    :rtype: str or unicode
+    """
+    if callable(stage):
+        return stage.__name__
+    return utils.list_to_str(stage)
+
+
+def check_pipeline(results):
+    """
+    Check that every stage of a pipeline completed successfully.
+
+    :param results: Outcome of each stage
+    :type results: list(PipelineStageTuple)
+    :raise AssertionError: If any stage returned a non-zero exit code
+    """
+    failed = [result for result in results if result.exit_code != 0]
+    assert not failed, "%s failed with exit code(s) %s" % (
+        " | ".join([_stage_to_str(result.stage) for result in results]),
+        ", ".join(["%s: %d" % (_stage_to_str(result.stage),
+                               result.exit_code)
+                   for result in failed]))
+
+
+def run_pipeline(stages, out=sys.stdout, errs=None):
+    """
+    Run a pipeline of any number of operating system commands, via
+    Python ``subprocess``, and Python functions, piping the output of
+    each stage into the next.
+
+    Adjacent commands are connected by operating system pipes, so
+    data passes directly between them. A Python function stage is run
+    in its own thread. It is called with a binary file handle from
+    which its input can be read (or ``None`` if it is the first stage)
+    and must return an iterable (e.g. be a generator) of ``bytes``
+    which are written to the next stage.
+
+    Each stage has its own standard error destination and its own exit
+    code, elapsed time and CPU time, which are returned.
+
+    :param stages: Commands and arguments or Python functions
+    :type stages: list(list(str or unicode) or callable)
+    :param out: Standard output desination (``sys.stdout`` or file)
+    :type out: _io.TextIOWrapper
+    :param errs: Standard error desinations, one per stage \
+    (``sys.stderr`` or file). If ``None`` then ``sys.stderr`` is used \
+    for every stage
+    :type errs: list(_io.TextIOWrapper)
+    :return: Outcome of each stage
+    :rtype: list(PipelineStageTuple)
+    :raise ValueError: If ``stages`` is empty or ``errs`` and \
+    ``stages`` differ in length
+    :raise FileNotFoundError: if a command to run cannot be found
+    :raise AssertionError: If any stage returns a non-zero exit code
+    """
+    if not stages:
+        raise ValueError("No pipeline stages were provided")
+    if errs is None:
+        errs = [sys.stderr] * len(stages)
+    if len(errs) != len(stages):
+        raise ValueError(
+            "Number of standard error destinations (%d) differs from "
+            "number of stages (%d)" % (len(errs), len(stages)))
+    results = _start_pipeline(stages, out, errs)
+    check_pipeline(results)
+    return results
+
+
+def pipeline_to_str(cmds, out=None):
+    """
+    Convert commands to a bash pipeline e.g. ``cmd1 | cmd2 | cmd3 >
+    out``.
+
+    :param cmds: Commands and arguments
+    :type cmds: list(list(str or unicode))
+    :param out: Output file name or ``None``
+    :type out: str or unicode
+    :return: bash pipeline
+    :rtype: str or unicode
+    """
+    pipeline = " | ".join([utils.list_to_str(cmd) for cmd in cmds])
+    if out is not None:
+        pipeline += " > %s" % out
+    return pipeline
+
+
+def write_usage(usage_file, results, step=None, log_file=None):
+    """
+    Append the outcome and resource usage of commands or pipeline
+    stages to a file of tab-separated values, with columns
+    :py:const:`USAGE_HEADER`. If the file does not exist or is empty
+    then the header is written first.
+
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param results: Outcome and resource usage of each command
+    :type results: list(PipelineStageTuple)
+    :param step: Name of workflow step which ran the commands
+    :type step: str or unicode
+    :param log_file: Log file for the commands
+    :type log_file: str or unicode
+    """
+    rows = [[step if step is not None else "",
+             log_file if log_file is not None else "",
+             _stage_to_str(result.stage),
+             result.exit_code,
+             "%.3f" % result.wall_time,
+             "%.3f" % result.user_time,
+             "%.3f" % result.system_time,
+             result.max_rss,
+             result.read_bytes,
+             result.write_bytes] for result in results]
+    is_new = not os.path.exists(usage_file) or \
+        os.path.getsize(usage_file) == 0
+    with open(usage_file, "a", newline="") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        if is_new:
+            writer.writerow(USAGE_HEADER)
+        writer.writerows(rows)
+
+
+def get_tool_name(stage):
+    """
+    Get a short name for the tool run by a command or pipeline stage.
+    This is the Python function name, the module name for commands
+    run via ``python -m``, or else the base name of the executable.
+
+    :param stage: Command and arguments or Python function
+    :type stage: list(str or unicode) or callable
+    :return: Tool name e.g. ``hisat2``, ``riboviz.tools.count_reads``
+    :rtype: str or unicode
+    """
+    if callable(stage):
+        return stage.__name__
+    if "-m" in stage[1:-1] and \
+       os.path.basename(stage[0]).startswith("python"):
+        return stage[stage.index("-m") + 1]
+    return os.path.basename(stage[0])
+
+
+def log_context(stages, step=None):
+    """
+    Get a log context (see
+    :py:func:`riboviz.logging_utils.log_context`) for running
+    commands or pipeline stages, with the tool names of the stages
+    (see :py:func:`get_tool_name`), joined by ``|``, and the name of
+    the workflow step which runs them, if not ``None``.
+
+    :param stages: Commands and arguments or Python functions
+    :type stages: list(list(str or unicode) or callable)
+    :param step: Name of workflow step
+    :type step: str or unicode
+    :return: Log context
+    :rtype: contextlib._GeneratorContextManager
+    """
+    fields = {logging_utils.TOOL: "|".join(get_tool_name(stage)
+                                           for stage in stages)}
+    if step is not None:
+        fields[logging_utils.STEP] = step
+    return logging_utils.log_context(**fields)
+
+
+def get_step(step=None):
+    """
+    Get the name of the workflow step running commands: ``step``, if
+    not ``None``, or else the step of the current log context (see
+    :py:func:`riboviz.logging_utils.log_context`), which is set while
+    a workflow step runs.
+
+    :param step: Name of workflow step
+    :type step: str or unicode
+    :return: Name of workflow step or ``None`` if there is none
+    :rtype: str or unicode
+    """
+    if step is not None:
+        return step
+    return logging_utils.get_context_field(logging_utils.STEP)
+
+
+def log_usage(results, step=None, log_file=None):
+    """
+    Log the outcome and resource usage of commands or pipeline stages
+    to :py:const:`riboviz.logging_utils.STEPS_LOGGER` (see
+    :py:func:`riboviz.logging_utils.log_step`).
+
+    :param results: Outcome and resource usage of each command
+    :type results: list(PipelineStageTuple)
+    :param step: Name of workflow step which ran the commands
+    :type step: str or unicode
+    :param log_file: Log file for the commands
+    :type log_file: str or unicode
+    """
+    for result in results:
+        logging_utils.log_step(step, get_tool_name(result.stage),
+                               result, log_file)
 
 
 def run_logged_command(cmd,
                        log_file,
                        cmd_file=None,
                        dry_run=False,
-                       cmd_to_log=None):
+                       cmd_to_log=None,
+                       usage_file=None,
+                       step=None):
     """
     Run operating system command via Python ``subprocess`` and capture
     standard output and standard error into a log file. Uses
@@ -104,6 +692,11 @@ def run_logged_command(cmd,
     ``subprocess``, ``cmd_to_log`` can be used to provide the version
     of the command that needs to be inserted into the ``cmd_file``.
 
+    If ``usage_file`` is not ``None`` then the outcome and resource
+    usage of the command are appended to ``usage_file`` (see
+    :py:func:`write_usage`). These are also logged (see
+    :py:func:`log_usage`).
+
     :param cmd: Commnand and arguments
     :type cmd: list(str or unicode)
     :param log_file: Log file
@@ -114,6 +707,15 @@ def run_logged_command(cmd,
     :type dry_run: bool
     :param cmd_to_log: Command to log
     :type cmd_to_log: list(str or unicode)
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param step: Name of workflow step, recorded in ``usage_file`` \
+    and logs, or ``None`` for the step of the current log context \
+    (see :py:func:`get_step`)
+    :type step: str or unicode
+    :return: Outcome and resource usage of command or ``None`` if \
+    ``dry_run``
+    :rtype: PipelineStageTuple
     :raise FileNotFoundError: if the command to run cannot be found
     :raise AssertionError: If the command returns a non-zero exit code
     """
@@ -125,16 +727,25 @@ def run_logged_command(cmd,
         with open(cmd_file, "a") as f:
             f.write(cmd_to_log_str + "\n")
     if dry_run:
-        return
-    with open(log_file, "a") as f:
-        run_command(cmd, f, f)
+        return None
+    step = get_step(step)
+    with log_context([cmd], step):
+        with open(log_file, "a") as f:
+            result = _run_command(cmd, f, f)
+        if usage_file is not None:
+            write_usage(usage_file, [result], step, log_file)
+        log_usage([result], step, log_file)
+    check_command(result)
+    return result
 
 
 def run_logged_redirect_command(cmd,
                                 out,
                                 log_file,
                                 cmd_file=None,
-                                dry_run=False):
+                                dry_run=False,
+                                usage_file=None,
+                                step=None):
     """
     Run operating system command via Python ``subprocess`` and
     redirect output to a file and capture standard error into a log
@@ -147,6 +758,11 @@ def run_logged_redirect_command(cmd,
     to the operating system. Using this with ``cmd_file`` allows a
     record of the command that *would* be submitted to be made.
 
+    If ``usage_file`` is not ``None`` then the outcome and resource
+    usage of the command are appended to ``usage_file`` (see
+    :py:func:`write_usage`). These are also logged (see
+    :py:func:`log_usage`).
+
     :param cmd: Commnand and arguments
     :type cmd: list(str or unicode)
     :param out: Output file name
@@ -157,6 +773,15 @@ def run_logged_redirect_command(cmd,
     :type cmd_file: str or unicode
     :param dry_run: Do not submit command to operating system?
     :type dry_run: bool
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param step: Name of workflow step, recorded in ``usage_file`` \
+    and logs, or ``None`` for the step of the current log context \
+    (see :py:func:`get_step`)
+    :type step: str or unicode
+    :return: Outcome and resource usage of command or ``None`` if \
+    ``dry_run``
+    :rtype: PipelineStageTuple
     :raise FileNotFoundError: if the command to run cannot be found
     :raise AssertionError: If the command returns a non-zero exit code
     """
@@ -164,16 +789,25 @@ def run_logged_redirect_command(cmd,
         with open(cmd_file, "a") as f:
             f.write(("%s > %s\n" % (utils.list_to_str(cmd), out)))
     if dry_run:
-        return
-    with open(log_file, "a") as f:
-        run_redirect_command(cmd, out, f)
+        return None
+    step = get_step(step)
+    with log_context([cmd], step):
+        with open(log_file, "a") as f:
+            result = _run_redirect_command(cmd, out, f)
+        if usage_file is not None:
+            write_usage(usage_file, [result], step, log_file)
+        log_usage([result], step, log_file)
+    check_command(result)
+    return result
 
 
 def run_logged_pipe_command(cmd1,
                             cmd2,
                             log_file,
                             cmd_file=None,
-                            dry_run=False):
+                            dry_run=False,
+                            usage_file=None,
+                            step=None):
     """
     Run operating system command via Python ``subprocess`` and pipe
     output into another command and capture standard output and
@@ -186,6 +820,11 @@ def run_logged_pipe_command(cmd1,
     to the operating system. Using this with ``cmd_file`` allows a
     record of the command that *would* be submitted to be made.
 
+    If ``usage_file`` is not ``None`` then the outcome and resource
+    usage of each command are appended to ``usage_file`` (see
+    :py:func:`write_usage`). These are also logged (see
+    :py:func:`log_usage`).
+
     :param cmd1: Commnand and arguments
     :type cmd1: list(str or unicode)
     :param cmd2: Commnand and arguments
@@ -196,6 +835,15 @@ def run_logged_pipe_command(cmd1,
     :type cmd_file: str or unicode
     :param dry_run: Do not submit command to operating system?
     :type dry_run: bool
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param step: Name of workflow step, recorded in ``usage_file`` \
+    and logs, or ``None`` for the step of the current log context \
+    (see :py:func:`get_step`)
+    :type step: str or unicode
+    :return: Outcome and resource usage of each command or ``None`` \
+    if ``dry_run``
+    :rtype: list(PipelineStageTuple)
     :raise FileNotFoundError: if the commands to run cannot be found
     :raise AssertionError: If the commands return a non-zero exit code
     """
@@ -204,6 +852,119 @@ def run_logged_pipe_command(cmd1,
             f.write(("%s | %s\n" % (utils.list_to_str(cmd1),
                                     utils.list_to_str(cmd2))))
     if dry_run:
-        return
-    with open(log_file, "a") as f:
-        run_pipe_command(cmd1, cmd2, f, f)
+        return None
+    step = get_step(step)
+    with log_context([cmd1, cmd2], step):
+        with open(log_file, "a") as f:
+            results = _run_pipe_command(cmd1, cmd2, f, f)
+        if usage_file is not None:
+            write_usage(usage_file, results, step, log_file)
+        log_usage(results, step, log_file)
+    check_pipeline(results)
+    return results
+
+
+def run_logged_pipeline(stages,
+                        log_file,
+                        cmd_file=None,
+                        dry_run=False,
+                        out=None,
+                        cmds_to_log=None,
+                        usage_file=None,
+                        step=None):
+    """
+    Run a pipeline of operating system commands and Python functions
+    and capture standard output and the standard error of each stage
+    into a log file. Uses :py:func:`run_pipeline`.
+
+    The standard error of each stage is captured separately and is
+    appended to the log file, stage by stage, once the pipeline has
+    completed, followed by the exit code, elapsed time and CPU time of
+    each stage.
+
+    If ``out`` is not ``None`` then the standard output of the last
+    stage is written to ``out``, otherwise it is captured into the log
+    file.
+
+    If ``cmd_file`` is not ``None`` then an equivalent bash pipeline
+    is recorded into ``cmd_file``. ``cmds_to_log`` can be used to
+    provide, for each stage, the version of the command that needs to
+    be inserted into the ``cmd_file``. A command to log must be
+    provided for each Python function stage. ``None`` can be used for
+    other stages, in which case the stage itself is logged.
+
+    If ``dry_run`` is ``True`` then the pipeline will not be run.
+
+    If ``usage_file`` is not ``None`` then the outcome and resource
+    usage of each stage are appended to ``usage_file`` (see
+    :py:func:`write_usage`). These are also logged (see
+    :py:func:`log_usage`).
+
+    :param stages: Commands and arguments or Python functions
+    :type stages: list(list(str or unicode) or callable)
+    :param log_file: Log file
+    :type log_file: str or unicode
+    :param cmd_file: Bash commands file
+    :type cmd_file: str or unicode
+    :param dry_run: Do not run pipeline?
+    :type dry_run: bool
+    :param out: Output file name
+    :type out: str or unicode
+    :param cmds_to_log: Commands to log
+    :type cmds_to_log: list(list(str or unicode))
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param step: Name of workflow step, recorded in ``usage_file`` \
+    and logs, or ``None`` for the step of the current log context \
+    (see :py:func:`get_step`)
+    :type step: str or unicode
+    :return: Outcome of each stage or ``None`` if ``dry_run``
+    :rtype: list(PipelineStageTuple)
+    :raise ValueError: If there is no command to log for a Python \
+    function stage
+    :raise FileNotFoundError: if a command to run cannot be found
+    :raise AssertionError: If any stage returns a non-zero exit code
+    """
+    if cmd_file is not None:
+        if cmds_to_log is None:
+            cmds_to_log = [None] * len(stages)
+        cmds = []
+        for stage, cmd_to_log in zip(stages, cmds_to_log):
+            if cmd_to_log is None:
+                if callable(stage):
+                    raise ValueError(
+                        "No command to log for Python function %s"
+                        % stage.__name__)
+                cmd_to_log = stage
+            cmds.append(cmd_to_log)
+        with open(cmd_file, "a") as f:
+            f.write(pipeline_to_str(cmds, out) + "\n")
+    if dry_run:
+        return None
+    step = get_step(step)
+    with log_context(stages, step):
+        errs = [tempfile.TemporaryFile("w+") for _ in stages]
+        try:
+            with open(log_file, "a") as log:
+                if out is None:
+                    results = _start_pipeline(stages, log, errs)
+                else:
+                    with open(out, "wb") as out_handle:
+                        results = _start_pipeline(stages, out_handle, errs)
+                for err in errs:
+                    err.seek(0)
+                    log.write(err.read())
+                for index, result in enumerate(results):
+                    log.write(
+                        "Stage %d: exit code %d, wall time %.3fs, "
+                        "user time %.3fs, system time %.3fs\n"
+                        % (index + 1, result.exit_code, result.wall_time,
+                           result.user_time, result.system_time))
+        finally:
+            for err in errs:
+                err.close()
+        if usage_file is not None:
+            write_usage(usage_file, results, step, log_file)
+        log_usage(results, step, log_file)
+    check_pipeline(results)
+    return results
@@ -1,21 +1,66 @@
 """
 Provenance-related functions.
+
+Version information is resolved, using the ``git`` package, at most
+once per process for each directory, and cached. The ``git`` package
+is only imported when version information is first resolved. For
+installs that are not Git repositories, version information can
+instead be provided via the environment variable
+:py:const:`VERSION_ENV`.
 """
 from datetime import datetime
+import functools
+import os
 import os.path
-from io import StringIO
-import git
-import git.exc
+
+VERSION_ENV = "RIBOVIZ_VERSION"
+"""
+Environment variable which, if set, provides version information,
+instead of the ``git`` package.
+"""
+UNKNOWN_VERSION = "unknown"
+""" Version information if none is available. """
+
+
+@functools.lru_cache(maxsize=None)
+def get_directory_version(location):
+    """
+    Get version information about a directory using the ``git``
+    package. Results are cached, so the Git repository is queried at
+    most once per process for each directory.
+
+    :param location: Directory
+    :type location: str or unicode
+    :return: Version information, ``commit <HASH> date <DATE>``, or \
+    :py:const:`UNKNOWN_VERSION`
+    :rtype: str or unicode
+    """
+    import git
+    import git.exc
+    try:
+        repository = git.Repo(location,
+                              search_parent_directories=True)
+        sha = repository.head.object.hexsha
+        time = repository.head.commit.authored_datetime
+        version = "commit {} date {}".format(sha, str(time))
+    except (git.exc.InvalidGitRepositoryError,  # pylint: disable=E1101
+            git.exc.NoSuchPathError,  # pylint: disable=E1101
+            ValueError):
+        version = UNKNOWN_VERSION
+    return version
 
 
 def get_version(file_path=__file__):
     """
-    Get version information about ``file_path`` using the ``git``
-    package.
+    Get version information about ``file_path``.
 
-    If ``file_path`` is within the scope of a Git repository then a
-    string including the Git commit hash and date of ``HEAD`` is
-    returned. The message has format ``commit <HASH> date <DATE>``.
+    If the environment variable :py:const:`VERSION_ENV` is set then
+    its value is returned.
+
+    Otherwise, if ``file_path`` is within the scope of a Git
+    repository then a string including the Git commit hash and date
+    of ``HEAD`` is returned. The message has format ``commit <HASH>
+    date <DATE>``. See :py:func:`get_directory_version`.
 
     If ``file_path`` is not within the scope of a Git repository then
     the string ``unknown`` is returned.
@@ -25,16 +70,65 @@ def get_version(file_path=__file__):
     :return: Version information
     :rtype: str or unicode
     """
-    location = os.path.dirname(os.path.abspath(file_path))
-    try:
-        repository = git.Repo(location,
-                              search_parent_directories=True)
-        sha = repository.head.object.hexsha
-        time = repository.head.commit.authored_datetime
-        version = "commit {} date {}".format(sha, str(time))
-    except git.exc.InvalidGitRepositoryError:  # pylint: disable=E1101
-        version = "unknown"
-    return version
+    version = os.environ.get(VERSION_ENV)
+    if version:
+        return version
+    return get_directory_version(
+        os.path.dirname(os.path.abspath(file_path)))
+
+
+@functools.lru_cache(maxsize=None)
+def get_provenance_template(file_path, prefix="# ", eol="\n"):
+    """
+    Get a provenance header template with a ``{date}`` placeholder
+    for the date and all other content, including version
+    information, filled in. See :py:func:`write_provenance`. Results
+    are cached.
+
+    :param file_path: File path
+    :type file_path: str or unicode
+    :param prefix: Prefix for each line e.g. a comment symbol
+    :type prefix: str or unicode
+    :param eol: End of line character
+    :type eol: str or unicode
+    :return: Provenance header template
+    :rtype: str or unicode
+    """
+    def escape(value):
+        return str(value).replace("{", "{{").replace("}", "}}")
+    lines = ["Created by: RiboViz", "Date: {date}"]
+    import __main__
+    if hasattr(__main__, "__file__"):
+        lines.append("Command-line tool: {}".format(
+            escape(__main__.__file__)))
+    lines.append("File: {}".format(escape(file_path)))
+    lines.append("Version: {}".format(escape(get_version(file_path))))
+    return "".join(escape(prefix) + line + escape(eol) for line in lines)
+
+
+def get_provenance(file_path, prefix="# ", eol="\n"):
+    """
+    Get a provenance header, with the current date, as a string.
+    See :py:func:`write_provenance`.
+
+    The header can be written to a file before any other content,
+    without the file being reopened, for example::
+
+        with open(tsv_file, "w") as f:
+            f.write(provenance.get_provenance(__file__))
+            data.to_csv(f, sep="\\t", index=False)
+
+    :param file_path: File path
+    :type file_path: str or unicode
+    :param prefix: Prefix for each line e.g. a comment symbol
+    :type prefix: str or unicode
+    :param eol: End of line character
+    :type eol: str or unicode
+    :return: Provenance header
+    :rtype: str or unicode
+    """
+    return get_provenance_template(file_path, prefix, eol).format(
+        date=datetime.today())
 
 
 def write_provenance(file_handle, file_path, prefix="# ", eol="\n"):
@@ -64,15 +158,7 @@ def write_provenance(file_handle, file_path, prefix="# ", eol="\n"):
     :param eol: End of line character
     :type eol: str or unicode
     """
-    file_handle.write("{}Created by: RiboViz{}".format(prefix, eol))
-    file_handle.write("{}Date: {}{}".format(prefix, datetime.today(), eol))
-    import __main__
-    if hasattr(__main__, "__file__"):
-        file_handle.write("{}Command-line tool: {}{}".format(
-            prefix, __main__.__file__, eol))
-    file_handle.write("{}File: {}{}".format(prefix, file_path, eol))
-    file_handle.write("{}Version: {}{}".format(
-        prefix, get_version(file_path), eol))
+    file_handle.write(get_provenance(file_path, prefix, eol))
 
 
 def write_provenance_header(file_path, provenance_file, prefix="# "):
@@ -105,7 +191,4 @@ def write_provenance_to_str(file_path, eol="\n"):
     :return: Provenance header as a string
     :rtype: str or unicode
     """
-    with StringIO() as s:
-        write_provenance(s, file_path, "", eol)
-        provenance = s.getvalue()
-    return provenance
+    return get_provenance(file_path, "", eol)
@@ -0,0 +1,137 @@
+"""
+Resource usage-related constants and functions.
+
+A resource usage file, written by
+:py:func:`riboviz.process_utils.write_usage`, is a TSV file with one
+row per command submitted to the operating system and columns
+(:py:const:`riboviz.process_utils.USAGE_HEADER`):
+
+* ``Step``: Workflow step (name of the :py:mod:`riboviz.workflow`
+  function which ran the command).
+* ``LogFile``: Log file for the command. For sample-specific steps
+  this is within a sample-specific logs directory.
+* ``Command``: Command.
+* ``ExitCode``: Exit code.
+* ``WallTime``: Elapsed time (seconds).
+* ``UserTime``: User CPU time (seconds).
+* ``SystemTime``: System CPU time (seconds).
+* ``MaxRSS``: Maximum resident set size (KB).
+* ``ReadBytes``: Bytes read from storage.
+* ``WriteBytes``: Bytes written to storage.
+
+On Linux, ``MaxRSS`` for a command is never less than the resident
+set size of the Python process which ran it, as Linux carries over
+the memory high-water mark of a process from before it executes the
+command. ``MaxRSS`` is therefore only informative for commands that
+use more memory than the workflow itself, which includes the aligners,
+``samtools``, ``umi_tools`` and the R scripts.
+
+A resource usage summary file, written by :py:func:`summarise_usage`,
+is a TSV file with one row per workflow step, summarising usage
+across all the commands run by that step, across all samples, with
+columns:
+
+* ``Step``: Workflow step.
+* ``NumCommands``: Number of commands run.
+* ``TotalWallTime``: Total elapsed time (seconds).
+* ``MaxWallTime``: Maximum elapsed time of any command (seconds).
+* ``TotalUserTime``: Total user CPU time (seconds).
+* ``TotalSystemTime``: Total system CPU time (seconds).
+* ``MaxRSS``: Maximum resident set size of any command (KB).
+* ``TotalReadBytes``: Total bytes read from storage.
+* ``TotalWriteBytes``: Total bytes written to storage.
+"""
+from riboviz import process_utils
+from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
+
+NUM_COMMANDS = "NumCommands"
+""" Resource usage summary file column name. """
+TOTAL_WALL_TIME = "TotalWallTime"
+""" Resource usage summary file column name. """
+MAX_WALL_TIME = "MaxWallTime"
+""" Resource usage summary file column name. """
+TOTAL_USER_TIME = "TotalUserTime"
+""" Resource usage summary file column name. """
+TOTAL_SYSTEM_TIME = "TotalSystemTime"
+""" Resource usage summary file column name. """
+TOTAL_READ_BYTES = "TotalReadBytes"
+""" Resource usage summary file column name. """
+TOTAL_WRITE_BYTES = "TotalWriteBytes"
+""" Resource usage summary file column name. """
+SUMMARY_HEADER = [process_utils.STEP, NUM_COMMANDS, TOTAL_WALL_TIME,
+                  MAX_WALL_TIME, TOTAL_USER_TIME, TOTAL_SYSTEM_TIME,
+                  process_utils.MAX_RSS, TOTAL_READ_BYTES,
+                  TOTAL_WRITE_BYTES]
+""" Resource usage summary file header. """
+
+
+def load_usage(usage_file, delimiter="\t", comment="#"):
+    """
+    Load a resource usage file.
+
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param delimiter: Delimiter
+    :type delimiter: str or unicode
+    :param comment: Comment prefix
+    :type comment: str or unicode
+    :return: Resource usage
+    :rtype: pandas.core.frame.DataFrame
+    :raise AssertionError: If any column in \
+    :py:const:`riboviz.process_utils.USAGE_HEADER` is missing
+    """
+    usage = pd.read_csv(usage_file,
+                        delimiter=delimiter,
+                        comment=comment,
+                        keep_default_na=False)
+    for column in process_utils.USAGE_HEADER:
+        assert column in usage.columns,\
+            "Missing column {} in {}".format(column, usage_file)
+    return usage
+
+
+def summarise_usage_df(usage):
+    """
+    Summarise resource usage by workflow step, across all commands
+    run by each step.
+
+    :param usage: Resource usage
+    :type usage: pandas.core.frame.DataFrame
+    :return: Resource usage summary, with columns \
+    :py:const:`SUMMARY_HEADER`, ordered by the first occurrence of \
+    each step in ``usage``
+    :rtype: pandas.core.frame.DataFrame
+    """
+    groups = usage.groupby(process_utils.STEP, sort=False)
+    summary = pd.DataFrame({
+        NUM_COMMANDS: groups[process_utils.COMMAND].count(),
+        TOTAL_WALL_TIME: groups[process_utils.WALL_TIME].sum(),
+        MAX_WALL_TIME: groups[process_utils.WALL_TIME].max(),
+        TOTAL_USER_TIME: groups[process_utils.USER_TIME].sum(),
+        TOTAL_SYSTEM_TIME: groups[process_utils.SYSTEM_TIME].sum(),
+        process_utils.MAX_RSS: groups[process_utils.MAX_RSS].max(),
+        TOTAL_READ_BYTES: groups[process_utils.READ_BYTES].sum(),
+        TOTAL_WRITE_BYTES: groups[process_utils.WRITE_BYTES].sum()
+    })
+    summary = summary.reset_index()
+    return summary[SUMMARY_HEADER]
+
+
+def summarise_usage(usage_file, summary_file):
+    """
+    Summarise resource usage by workflow step and write the summary,
+    with a provenance header, to a file of tab-separated values. See
+    :py:func:`summarise_usage_df`.
+
+    :param usage_file: Resource usage file
+    :type usage_file: str or unicode
+    :param summary_file: Resource usage summary file
+    :type summary_file: str or unicode
+    """
+    usage = load_usage(usage_file)
+    summary = summarise_usage_df(usage)
+    provenance.write_provenance_header(__file__, summary_file)
+    summary.to_csv(summary_file, mode='a', sep="\t", index=False,
+                   float_format="%.3f")
@@ -0,0 +1,678 @@
+"""
+Ribogrid-related constants and functions.
+
+A ribogrid is a matrix of counts of the reads whose 5' ends map to
+each nucleotide position of a gene (including its flanking regions),
+for each read length. Ribogrids for every gene in a GFF file are
+saved in an H5 file with layout:
+
+* ``/<gene>/<dataset>/reads/data``: ribogrid, with one row per
+  position and one column per read length.
+* ``/<gene>/<dataset>/reads`` attributes: ``reads_total``,
+  ``buffer_left``, ``buffer_right``, ``start_codon_pos``,
+  ``stop_codon_pos``, ``reads_by_len``, ``lengths``.
+* ``/<secondary_id>``: external link to ``/<gene>``, if a secondary
+  gene ID is used and differs from the primary gene ID.
+
+:py:func:`bam_to_h5` provides a native alternative to
+``bam_to_h5.R``. Rather than querying the BAM file once per gene,
+it scans a sorted BAM file once. Genes are indexed by sequence name
+and the reads of each sequence are sorted by their 5' ends so the
+reads of each gene can be found by binary search and binned by
+position and read length into a preallocated matrix. Reads are
+handled in the same way as ``bam_to_h5.R``:
+
+* The 5' end of a read on the plus strand is its leftmost aligned
+  position and that of a read on the minus strand is its leftmost
+  aligned position plus its query width (including soft-clipped
+  bases) less one.
+* Only reads on the same strand as a gene, which overlap the gene
+  and its flanking regions, are counted. As ``bam_to_h5.R`` queries
+  the BAM file once per exon, a read is counted once for each exon
+  of a gene that it overlaps.
+* For genes on the minus strand, the flanking regions are swapped
+  and the ribogrid positions are reversed so the ribogrid runs from
+  5' to 3'.
+* If the GFF file contains UTR5, CDS and UTR3 elements per gene,
+  then the UTR5 and UTR3 widths are used as the flanking regions,
+  otherwise ``buffer`` is used.
+"""
+import collections
+import multiprocessing
+from riboviz import annotation
+from riboviz import gff_utils
+from riboviz import h5_writer
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pysam = lazy_import("pysam")
+
+READS = "reads"
+""" H5 group, within a gene's dataset group, holding reads. """
+DATA = "data"
+""" H5 dataset, within a ``reads`` group, holding the ribogrid. """
+READS_FORMAT = "{}/{}/" + READS
+""" Format of path to ``reads`` group, given gene and dataset. """
+READS_TOTAL = "reads_total"
+""" H5 attribute: total number of reads. """
+BUFFER_LEFT = "buffer_left"
+""" H5 attribute: length of left flanking region. """
+BUFFER_RIGHT = "buffer_right"
+""" H5 attribute: length of right flanking region. """
+START_CODON_POS = "start_codon_pos"
+""" H5 attribute: start codon positions. """
+STOP_CODON_POS = "stop_codon_pos"
+""" H5 attribute: stop codon positions. """
+READS_BY_LEN = "reads_by_len"
+""" H5 attribute: number of reads of each read length. """
+LENGTHS = "lengths"
+""" H5 attribute: read lengths. """
+GROUPS_PER_PROCESS = 4
+"""
+Number of groups of sequences, per process, to split sequences into
+when counting reads in parallel.
+"""
+
+GeneLocationTuple = collections.namedtuple(
+    "GeneLocationTuple", ["gene",
+                          "secondary_id",
+                          "seqname",
+                          "strand",
+                          "ranges",
+                          "positions",
+                          "start_codon_pos",
+                          "stop_codon_pos"])
+"""
+Location of a gene:
+
+* ``gene``: primary gene ID (str or unicode).
+* ``secondary_id``: secondary gene ID (str or unicode) or ``None``.
+* ``seqname``: sequence name (str or unicode).
+* ``strand``: ``+``, ``-`` or ``None``, if the gene has features on
+  both strands.
+* ``ranges``: 1-indexed start and end positions of the gene's
+  features, including flanking regions (list(tuple(int, int))).
+* ``positions``: 1-indexed positions covered by ``ranges``, in
+  ascending order (numpy.ndarray).
+* ``start_codon_pos``: start codon positions in the ribogrid
+  (list(int)).
+* ``stop_codon_pos``: stop codon positions in the ribogrid
+  (list(int)).
+"""
+
+
+def get_covered_positions(ranges):
+    """
+    Get positions covered by exactly one of a list of ranges. If any
+    range starts before position 1, all positions from the earliest
+    start to 0 are included.
+
+    :param ranges: 1-indexed start and end positions
+    :type ranges: list(tuple(int, int))
+    :return: positions, in ascending order
+    :rtype: numpy.ndarray
+    """
+    min_start = min(start for start, _ in ranges)
+    max_end = max(end for _, end in ranges)
+    coverage = np.zeros(max_end - min_start + 1, dtype=np.int64)
+    for start, end in ranges:
+        coverage[start - min_start:end - min_start + 1] += 1
+    positions = np.flatnonzero(coverage == 1) + min_start
+    if min_start < 1:
+        positions = np.union1d(np.arange(min_start, 1), positions)
+    return positions
+
+
+def get_gene_location(gene, secondary_id, features, is_riboviz_gff,
+                      buffer, stop_in_cds):
+    """
+    Get the location of a gene, its flanking regions and its start
+    and stop codons.
+
+    :param gene: Primary gene ID
+    :type gene: str or unicode
+    :param secondary_id: Secondary gene ID
+    :type secondary_id: str or unicode
+    :param features: Gene's features, see \
+    :py:func:`riboviz.gff_utils.read_gff_features`
+    :type features: list(tuple)
+    :param is_riboviz_gff: Do ``features`` include UTR5, CDS and UTR3 \
+    elements?
+    :type is_riboviz_gff: bool
+    :param buffer: Length of flanking region around the CDS, if \
+    ``is_riboviz_gff`` is ``False``
+    :type buffer: int
+    :param stop_in_cds: Are stop codons part of the CDS, if \
+    ``is_riboviz_gff`` is ``False``?
+    :type stop_in_cds: bool
+    :return: Gene location
+    :rtype: GeneLocationTuple
+    """
+    if is_riboviz_gff:
+        left = sum(end - start + 1
+                   for _, feature_type, start, end, _, _ in features
+                   if feature_type == gff_utils.UTR5)
+        right = sum(end - start + 1
+                    for _, feature_type, start, end, _, _ in features
+                    if feature_type == gff_utils.UTR3)
+        utr3_starts = [start
+                       for _, feature_type, start, _, _, _ in features
+                       if feature_type == gff_utils.UTR3]
+        features = [feature for feature in features
+                    if feature[1] == gff_utils.CDS]
+    else:
+        left = buffer
+        right = buffer
+    ranges = [(start, end) for _, _, start, end, _, _ in features]
+    strands = set(strand for _, _, _, _, strand, _ in features)
+    strand = strands.pop() if len(strands) == 1 else None
+    gene_length = sum(end - start + 1 for start, end in ranges)
+    num_positions = gene_length + left + right
+    if strand == "-":
+        left, right = right, left
+    min_start = min(start for start, _ in ranges)
+    max_end = max(end for _, end in ranges)
+    ranges = [(start - left if start == min_start else start,
+               end + right if end == max_end else end)
+              for start, end in ranges]
+    positions = get_covered_positions(ranges)
+    if is_riboviz_gff:
+        start_codon_loc = min_start
+        if utr3_starts:
+            stop_codon_loc = min(utr3_starts) - 3
+        else:
+            stop_codon_loc = max_end - 2
+    else:
+        start_codon_loc = buffer + 1
+        offset = 2 if stop_in_cds else -1
+        stop_codon_loc = num_positions - buffer - offset
+    return GeneLocationTuple(
+        gene,
+        secondary_id,
+        features[0][0],
+        strand,
+        ranges,
+        positions,
+        list(range(start_codon_loc, start_codon_loc + 3)),
+        list(range(stop_codon_loc, stop_codon_loc + 3)))
+
+
+def get_gene_locations(gff_file, primary_id=gff_utils.DEFAULT_PRIMARY_ID,
+                       secondary_id=None, is_riboviz_gff=True,
+                       buffer=250, stop_in_cds=False, cache_dir=None):
+    """
+    Get the locations of the genes in a GFF2/GFF3 file, in the order
+    in which each gene first appears. If ``cache_dir`` is provided
+    then the GFF file's features are read from the cache (see
+    :py:func:`riboviz.annotation.read_gff_features`).
+
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param primary_id: Attribute with primary gene IDs
+    :type primary_id: str or unicode
+    :param secondary_id: Attribute with secondary gene IDs, or ``None``
+    :type secondary_id: str or unicode
+    :param is_riboviz_gff: Does the GFF file contain UTR5, CDS and \
+    UTR3 elements per gene? If not, only CDS elements are used.
+    :type is_riboviz_gff: bool
+    :param buffer: Length of flanking region around the CDS, if \
+    ``is_riboviz_gff`` is ``False``
+    :type buffer: int
+    :param stop_in_cds: Are stop codons part of the CDS, if \
+    ``is_riboviz_gff`` is ``False``?
+    :type stop_in_cds: bool
+    :param cache_dir: Annotation cache directory, or ``None``
+    :type cache_dir: str or unicode
+    :return: Gene locations
+    :rtype: list(GeneLocationTuple)
+    :raise AssertionError: if a feature has no ``primary_id`` \
+    attribute or a gene has no CDS
+    """
+    gene_features = collections.OrderedDict()
+    for feature in annotation.read_gff_features(gff_file, cache_dir,
+                                                primary_id,
+                                                secondary_id):
+        if not is_riboviz_gff and feature[1] != gff_utils.CDS:
+            continue
+        attributes = feature[5]
+        assert primary_id in attributes,\
+            "Invalid GFF file: %s. Feature has no %s attribute: %s"\
+            % (gff_file, primary_id, str(feature))
+        gene_features.setdefault(attributes[primary_id],
+                                 []).append(feature)
+    locations = []
+    for gene, features in gene_features.items():
+        assert any(feature[1] == gff_utils.CDS for feature in features),\
+            "Invalid GFF file: %s. Gene has no CDS: %s" % (gff_file, gene)
+        gene_secondary_id = None
+        if secondary_id is not None:
+            gene_secondary_id = features[0][5].get(secondary_id)
+        locations.append(get_gene_location(gene,
+                                           gene_secondary_id,
+                                           features,
+                                           is_riboviz_gff,
+                                           buffer,
+                                           stop_in_cds))
+    return locations
+
+
+def index_gene_locations(locations):
+    """
+    Index gene locations by sequence name, with the genes of each
+    sequence ordered by their first position.
+
+    :param locations: Gene locations
+    :type locations: list(GeneLocationTuple)
+    :return: Gene locations, keyed by sequence name
+    :rtype: dict(str or unicode -> list(GeneLocationTuple))
+    """
+    index = collections.OrderedDict()
+    for location in locations:
+        index.setdefault(location.seqname, []).append(location)
+    for seqname in index:
+        index[seqname].sort(key=lambda location: location.positions[0])
+    return index
+
+
+def reads_to_arrays(is_reverse, starts, ends, widths):
+    """
+    Convert reads aligned to a sequence into arrays, one set per
+    strand, sorted by the 5' ends of the reads.
+
+    :param is_reverse: Is each read on the minus strand?
+    :type is_reverse: list(bool)
+    :param starts: 1-indexed leftmost aligned position of each read
+    :type starts: list(int)
+    :param ends: 1-indexed rightmost aligned position of each read
+    :type ends: list(int)
+    :param widths: Query width of each read
+    :type widths: list(int)
+    :return: 5' ends, starts, ends and widths of reads on the plus \
+    (``+``) and minus (``-``) strands
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    is_reverse = np.asarray(is_reverse, dtype=bool)
+    reads = np.array([starts, ends, widths], dtype=np.int64)
+    strand_reads = {}
+    for strand, is_strand in [("+", ~is_reverse), ("-", is_reverse)]:
+        starts, ends, widths = reads[:, is_strand]
+        if strand == "+":
+            five_prime = starts
+        else:
+            five_prime = starts + widths - 1
+        order = np.argsort(five_prime, kind="stable")
+        strand_reads[strand] = np.array(
+            [five_prime, starts, ends, widths])[:, order]
+    return strand_reads
+
+
+def count_gene_reads(location, strand_reads, lengths):
+    """
+    Count the reads whose 5' ends map to each position of a gene, for
+    each read length. A read is counted once for each of the gene's
+    ranges that it overlaps.
+
+    :param location: Gene location
+    :type location: GeneLocationTuple
+    :param strand_reads: Reads aligned to the gene's sequence, see \
+    :py:func:`reads_to_arrays`, or ``None`` if there are none
+    :type strand_reads: dict(str or unicode -> numpy.ndarray)
+    :param lengths: Read lengths, in ascending order with no gaps
+    :type lengths: numpy.ndarray
+    :return: Counts, with one row per read length and one column \
+    per position, from 5' to 3'
+    :rtype: numpy.ndarray
+    """
+    positions = location.positions
+    counts = np.zeros((len(lengths), len(positions)), dtype=np.int32)
+    if strand_reads is None or location.strand not in strand_reads:
+        return counts
+    reads = strand_reads[location.strand]
+    lower = np.searchsorted(reads[0], positions[0], side="left")
+    upper = np.searchsorted(reads[0], positions[-1], side="right")
+    five_prime, starts, ends, widths = reads[:, lower:upper]
+    is_counted = (widths >= lengths[0]) & (widths <= lengths[-1])
+    num_overlaps = np.zeros(len(five_prime), dtype=np.int64)
+    for start, end in location.ranges:
+        num_overlaps += (starts <= end) & (ends >= start)
+    is_counted &= num_overlaps > 0
+    columns = np.searchsorted(positions, five_prime)
+    is_counted &= positions[np.minimum(columns,
+                                       len(positions) - 1)] == five_prime
+    bins = (widths[is_counted] - lengths[0]) * len(positions) + \
+        columns[is_counted]
+    counts = np.bincount(bins, weights=num_overlaps[is_counted],
+                         minlength=counts.size).reshape(
+                             counts.shape).astype(np.int32)
+    if location.strand == "-":
+        counts = counts[:, ::-1]
+    return counts
+
+
+def count_sequence_reads(locations, strand_reads, lengths):
+    """
+    Count the reads whose 5' ends map to each position of each of a
+    list of genes on the same sequence, for each read length.
+
+    :param locations: Gene locations
+    :type locations: list(GeneLocationTuple)
+    :param strand_reads: Reads aligned to the sequence, see \
+    :py:func:`reads_to_arrays`, or ``None`` if there are none
+    :type strand_reads: dict(str or unicode -> numpy.ndarray)
+    :param lengths: Read lengths, in ascending order with no gaps
+    :type lengths: numpy.ndarray
+    :return: Counts for each gene, keyed by primary gene ID, see \
+    :py:func:`count_gene_reads`
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    return {location.gene: count_gene_reads(location, strand_reads,
+                                            lengths)
+            for location in locations}
+
+
+def get_read(read):
+    """
+    Get the strand, 1-indexed leftmost and rightmost aligned
+    positions and query width of a read.
+
+    :param read: Read
+    :type read: pysam.AlignedSegment
+    :return: Is the read on the minus strand?, leftmost aligned \
+    position, rightmost aligned position, query width
+    :rtype: tuple(bool, int, int, int)
+    """
+    return (read.is_reverse,
+            read.reference_start + 1,
+            read.reference_end,
+            read.infer_query_length())
+
+
+def count_sequences(bam_file, index, seqnames, lengths):
+    """
+    Count the reads whose 5' ends map to each position of each gene
+    on each of a list of sequences, for each read length. The BAM file
+    must be indexed.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param index: Gene locations, see :py:func:`index_gene_locations`
+    :type index: dict(str or unicode -> list(GeneLocationTuple))
+    :param seqnames: Sequence names
+    :type seqnames: list(str or unicode)
+    :param lengths: Read lengths, in ascending order with no gaps
+    :type lengths: numpy.ndarray
+    :return: Counts for each gene, see :py:func:`count_gene_reads`
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    counts = {}
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        for seqname in seqnames:
+            reads = [get_read(read) for read in bam.fetch(seqname)
+                     if not read.is_unmapped]
+            counts.update(count_sequence_reads(
+                index[seqname],
+                reads_to_arrays(*zip(*reads)) if reads else None,
+                lengths))
+    return counts
+
+
+def count_unindexed(bam_file, index, lengths):
+    """
+    Count the reads whose 5' ends map to each position of each gene,
+    for each read length, by scanning a BAM file, sorted by
+    coordinate, which need not be indexed.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param index: Gene locations, see :py:func:`index_gene_locations`
+    :type index: dict(str or unicode -> list(GeneLocationTuple))
+    :param lengths: Read lengths, in ascending order with no gaps
+    :type lengths: numpy.ndarray
+    :return: Counts for each gene, see :py:func:`count_gene_reads`
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    :raise AssertionError: if the BAM file is not sorted by \
+    coordinate
+    """
+    counts = {}
+    done = set()
+    seqname = None
+    reads = []
+
+    def flush():
+        if seqname in index:
+            counts.update(count_sequence_reads(
+                index[seqname],
+                reads_to_arrays(*zip(*reads)) if reads else None,
+                lengths))
+        done.add(seqname)
+
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        for read in bam.fetch(until_eof=True):
+            if read.is_unmapped:
+                continue
+            if read.reference_name != seqname:
+                flush()
+                seqname = read.reference_name
+                assert seqname not in done,\
+                    "BAM file is not sorted by coordinate: %s" % bam_file
+                reads = []
+            reads.append(get_read(read))
+        flush()
+    for seqname, locations in index.items():
+        if seqname not in done:
+            counts.update(count_sequence_reads(locations, None, lengths))
+    return counts
+
+
+def count_reads(bam_file, locations, min_read_length=10,
+                max_read_length=50, num_processes=1):
+    """
+    Scan a BAM file, sorted by coordinate, once and count the reads
+    whose 5' ends map to each position of each gene, for each read
+    length. See module documentation.
+
+    If the BAM file is indexed and ``num_processes`` is greater than
+    1 then the sequences are split into groups and the reads of each
+    group are counted in parallel using a pool of ``num_processes``
+    processes.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param locations: Gene locations
+    :type locations: list(GeneLocationTuple)
+    :param min_read_length: Minimum read length
+    :type min_read_length: int
+    :param max_read_length: Maximum read length
+    :type max_read_length: int
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :return: Counts for each gene, see :py:func:`count_gene_reads`
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    :raise FileNotFoundError: if ``bam_file`` cannot be found
+    :raise AssertionError: if the BAM file is not indexed and is \
+    not sorted by coordinate
+    """
+    lengths = np.arange(min_read_length, max_read_length + 1)
+    index = index_gene_locations(locations)
+    with pysam.AlignmentFile(bam_file, "rb") as bam:
+        is_indexed = bam.has_index()
+        bam_seqnames = set(bam.references)
+    if not is_indexed:
+        return count_unindexed(bam_file, index, lengths)
+    seqnames = [seqname for seqname in index if seqname in bam_seqnames]
+    counts = {}
+    for seqname in index:
+        if seqname not in bam_seqnames:
+            counts.update(count_sequence_reads(index[seqname], None,
+                                               lengths))
+    if num_processes > 1 and len(seqnames) > 1:
+        num_groups = min(len(seqnames), num_processes * GROUPS_PER_PROCESS)
+        group_size = -(-len(seqnames) // num_groups)
+        groups = [seqnames[i:i + group_size]
+                  for i in range(0, len(seqnames), group_size)]
+        with multiprocessing.Pool(num_processes) as pool:
+            group_counts = pool.starmap(
+                count_sequences,
+                [(bam_file, {seqname: index[seqname] for seqname in group},
+                  group, lengths)
+                 for group in groups])
+        for group_count in group_counts:
+            counts.update(group_count)
+    else:
+        counts.update(count_sequences(bam_file, index, seqnames, lengths))
+    return counts
+
+
+def get_gene_attributes(location, counts, lengths):
+    """
+    Get the H5 attributes of a gene's ribogrid, as 2-dimensional
+    int32 arrays, as written by ``bam_to_h5.R``.
+
+    :param location: Gene location
+    :type location: GeneLocationTuple
+    :param counts: Counts, see :py:func:`count_gene_reads`
+    :type counts: numpy.ndarray
+    :param lengths: Read lengths
+    :type lengths: numpy.ndarray
+    :return: Attributes
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    num_positions = counts.shape[1]
+    attributes = [
+        (READS_TOTAL, [counts.sum()]),
+        (BUFFER_LEFT, [location.start_codon_pos[0] - 1]),
+        (BUFFER_RIGHT, [num_positions - location.stop_codon_pos[2]]),
+        (START_CODON_POS, location.start_codon_pos),
+        (STOP_CODON_POS, location.stop_codon_pos),
+        (LENGTHS, lengths),
+        (READS_BY_LEN, counts.sum(axis=1))]
+    return {name: np.asarray(value, dtype=np.int32).reshape(-1, 1)
+            for name, value in attributes}
+
+
+def write_h5(h5_file, locations, counts, dataset="data",
+             min_read_length=10, max_read_length=50, num_processes=1,
+             compression=h5_writer.DEFAULT_COMPRESSION,
+             compression_level=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+             chunk_positions=None,
+             chunk_lengths=h5_writer.DEFAULT_CHUNK_LENGTHS):
+    """
+    Write ribogrids for each gene to an H5 file, using
+    :py:func:`riboviz.h5_writer.write_genes`. See module
+    documentation. Ribogrids are written transposed, with one row per
+    position, as ``bam_to_h5.R`` does. If a gene has a secondary gene
+    ID that differs from its primary gene ID then an external link to
+    the gene is created, named after the secondary gene ID, as
+    ``bam_to_h5.R`` does.
+
+    :param h5_file: H5 file (output)
+    :type h5_file: str or unicode
+    :param locations: Gene locations
+    :type locations: list(GeneLocationTuple)
+    :param counts: Counts for each gene, see :py:func:`count_reads`
+    :type counts: dict(str or unicode -> numpy.ndarray)
+    :param dataset: Dataset name
+    :type dataset: str or unicode
+    :param min_read_length: Minimum read length
+    :type min_read_length: int
+    :param max_read_length: Maximum read length
+    :type max_read_length: int
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param compression: Compression filter, one of \
+    :py:const:`riboviz.h5_writer.COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Maximum number of positions per chunk, \
+    or ``None`` for all positions
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :raise AssertionError: if ``compression`` is not supported
+    """
+    lengths = np.arange(min_read_length, max_read_length + 1)
+    genes = ((READS_FORMAT.format(location.gene, dataset),
+              np.ascontiguousarray(counts[location.gene].T),
+              get_gene_attributes(location, counts[location.gene],
+                                  lengths))
+             for location in locations)
+    links = {}
+    for location in locations:
+        if location.secondary_id is not None and \
+           location.secondary_id != location.gene and \
+           location.secondary_id not in links:
+            links[location.secondary_id] = location.gene
+    h5_writer.write_genes(h5_file, genes, DATA, links, num_processes,
+                          compression, compression_level,
+                          chunk_positions, chunk_lengths)
+
+
+def bam_to_h5(bam_file, h5_file, orf_gff_file, min_read_length=10,
+              max_read_length=50, buffer=250,
+              primary_id=gff_utils.DEFAULT_PRIMARY_ID, secondary_id=None,
+              dataset="data", is_riboviz_gff=True, stop_in_cds=False,
+              num_processes=1,
+              compression=h5_writer.DEFAULT_COMPRESSION,
+              compression_level=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+              chunk_positions=None,
+              chunk_lengths=h5_writer.DEFAULT_CHUNK_LENGTHS,
+              cache_dir=None):
+    """
+    Scan a BAM file, sorted by coordinate, once and write the
+    ribogrid of each gene in a GFF2/GFF3 file to an H5 file. See
+    module documentation.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param h5_file: H5 file (output)
+    :type h5_file: str or unicode
+    :param orf_gff_file: GFF2/GFF3 file for ORFs
+    :type orf_gff_file: str or unicode
+    :param min_read_length: Minimum read length
+    :type min_read_length: int
+    :param max_read_length: Maximum read length
+    :type max_read_length: int
+    :param buffer: Length of flanking region around the CDS, if \
+    ``is_riboviz_gff`` is ``False``
+    :type buffer: int
+    :param primary_id: Attribute with primary gene IDs
+    :type primary_id: str or unicode
+    :param secondary_id: Attribute with secondary gene IDs, or ``None``
+    :type secondary_id: str or unicode
+    :param dataset: Dataset name
+    :type dataset: str or unicode
+    :param is_riboviz_gff: Does the GFF file contain UTR5, CDS and \
+    UTR3 elements per gene?
+    :type is_riboviz_gff: bool
+    :param stop_in_cds: Are stop codons part of the CDS, if \
+    ``is_riboviz_gff`` is ``False``?
+    :type stop_in_cds: bool
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param compression: Compression filter, one of \
+    :py:const:`riboviz.h5_writer.COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Maximum number of positions per chunk, \
+    or ``None`` for all positions
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :param cache_dir: Annotation cache directory, or ``None``, see \
+    :py:func:`get_gene_locations`
+    :type cache_dir: str or unicode
+    :raise FileNotFoundError: if ``bam_file`` or ``orf_gff_file`` \
+    cannot be found
+    :raise AssertionError: if the GFF file is invalid, the BAM \
+    file is not indexed and is not sorted by coordinate or \
+    ``compression`` is not supported
+    """
+    locations = get_gene_locations(orf_gff_file, primary_id,
+                                   secondary_id, is_riboviz_gff,
+                                   buffer, stop_in_cds, cache_dir)
+    counts = count_reads(bam_file, locations, min_read_length,
+                         max_read_length, num_processes)
+    write_h5(h5_file, locations, counts, dataset, min_read_length,
+             max_read_length, num_processes, compression,
+             compression_level, chunk_positions, chunk_lengths)
@@ -0,0 +1,368 @@
+"""
+Ribogrid H5 file reader.
+
+:py:class:`RibogridReader` reads ribogrids from H5 files with either
+the per-gene layout (see :py:mod:`riboviz.ribogrid`) or the columnar
+layout (see :py:mod:`riboviz.ribogrid_store`). It supports:
+
+* Gene lookup by primary or secondary gene ID.
+* A least-recently-used cache of decompressed ribogrids, bounded by
+  a memory limit, so that analyses that each request the same genes
+  read each gene from disk once.
+* Memory-mapped access to uncompressed, contiguous datasets, which
+  are then read without being cached.
+* Bulk reading of all ribogrids into a single preallocated array.
+* Windows around start and stop codons, as returned by
+  ``GetGeneDatamatrix5start`` and ``GetGeneDatamatrix3end`` in
+  ``read_count_functions.R``.
+
+Ribogrids are returned with one row per read length and one column
+per position, from 5' to 3', as ``rhdf5::h5read`` returns them, and
+are read-only as they may be shared via the cache.
+"""
+import collections
+from riboviz import ribogrid
+from riboviz import ribogrid_store
+from riboviz.lazy_import import lazy_import
+h5py = lazy_import("h5py")
+np = lazy_import("numpy")
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+""" Default memory limit, in bytes, of the ribogrid cache. """
+
+
+def get_dataset_memmap(h5_file, dataset):
+    """
+    Get a read-only memory map of an H5 dataset, if the dataset is
+    uncompressed and stored contiguously.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param dataset: Dataset
+    :type dataset: h5py.Dataset
+    :return: Memory map or ``None`` if the dataset cannot be memory \
+    mapped
+    :rtype: numpy.memmap
+    """
+    if dataset.chunks is not None or dataset.compression is not None:
+        return None
+    offset = dataset.id.get_offset()
+    if offset is None:
+        return None
+    return np.memmap(h5_file, mode="r", dtype=dataset.dtype,
+                     offset=offset, shape=dataset.shape)
+
+
+class RibogridReader:
+    """
+    Reader for ribogrid H5 files. See module documentation. Can be
+    used as a context manager::
+
+        with RibogridReader("sample.h5") as reader:
+            counts = reader.get_gene_datamatrix("YAL003W")
+    """
+
+    def __init__(self, h5_file, dataset="data",
+                 cache_bytes=DEFAULT_CACHE_BYTES, is_mmap=True):
+        """
+        Open a ribogrid H5 file and index its genes.
+
+        :param h5_file: H5 file
+        :type h5_file: str or unicode
+        :param dataset: Dataset name, for the per-gene layout
+        :type dataset: str or unicode
+        :param cache_bytes: Memory limit, in bytes, of the ribogrid \
+        cache
+        :type cache_bytes: int
+        :param is_mmap: Memory map uncompressed, contiguous datasets?
+        :type is_mmap: bool
+        """
+        self.h5_file = h5_file
+        self.dataset = dataset
+        self.cache_bytes = cache_bytes
+        self.is_mmap = is_mmap
+        self.cache = collections.OrderedDict()
+        self.cached_bytes = 0
+        self.attributes = {}
+        self.h5 = h5py.File(h5_file, "r")
+        self.is_columnar = ribogrid_store.GROUP in self.h5 and \
+            self.h5[ribogrid_store.GROUP].attrs.get(
+                ribogrid_store.FORMAT_ATTR) == ribogrid_store.FORMAT
+        self.store = None
+        self.store_data = None
+        self.gene_index = {}
+        if self.is_columnar:
+            self.h5.close()
+            self.store = ribogrid_store.ColumnarRibogrid(h5_file)
+            self.h5 = self.store.h5
+            self.genes = list(self.store.genes)
+            self.gene_index = {gene: self.store.genes[index]
+                               for gene, index in
+                               self.store.gene_index.items()}
+            data = self.store.group[ribogrid_store.DATA]
+            if is_mmap:
+                self.store_data = get_dataset_memmap(h5_file, data)
+            return
+        self.genes = []
+        for name in self.h5:
+            link = self.h5.get(name, getlink=True)
+            if isinstance(link, h5py.ExternalLink):
+                self.gene_index[name] = link.path.strip("/")
+            else:
+                self.genes.append(name)
+                self.gene_index[name] = name
+
+    def close(self):
+        """
+        Close the file and clear the cache.
+        """
+        self.cache.clear()
+        self.cached_bytes = 0
+        if self.store is not None:
+            self.store.close()
+        else:
+            self.h5.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_gene(self, gene):
+        """
+        Get the primary gene ID of a gene.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Primary gene ID
+        :rtype: str or unicode
+        :raise KeyError: if ``gene`` is not in the file
+        """
+        return self.gene_index[gene]
+
+    def read_gene_datamatrix(self, gene):
+        """
+        Read a gene's ribogrid from the file, bypassing the cache.
+
+        :param gene: Primary gene ID
+        :type gene: str or unicode
+        :return: Counts, with one row per read length and one column \
+        per position
+        :rtype: numpy.ndarray
+        """
+        if self.is_columnar:
+            index = self.store.get_index(gene)
+            offset = self.store.offsets[index]
+            end = offset + self.store.num_positions[index]
+            if self.store_data is not None:
+                return self.store_data[:, offset:end]
+            return self.store.group[ribogrid_store.DATA][:, offset:end]
+        data = self.h5[ribogrid.READS_FORMAT.format(gene, self.dataset)][
+            ribogrid.DATA]
+        if self.is_mmap:
+            mmap = get_dataset_memmap(self.h5_file, data)
+            if mmap is not None:
+                return mmap.T
+        return data[()].T
+
+    def get_gene_datamatrix(self, gene):
+        """
+        Get a gene's ribogrid, from the cache if present. Memory-mapped
+        ribogrids are not cached.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Counts, with one row per read length and one column \
+        per position (read-only)
+        :rtype: numpy.ndarray
+        :raise KeyError: if ``gene`` is not in the file
+        """
+        gene = self.get_gene(gene)
+        if gene in self.cache:
+            self.cache.move_to_end(gene)
+            return self.cache[gene]
+        counts = self.read_gene_datamatrix(gene)
+        if isinstance(counts, np.memmap):
+            return counts
+        counts = np.ascontiguousarray(counts)
+        counts.setflags(write=False)
+        if counts.nbytes <= self.cache_bytes:
+            self.cache[gene] = counts
+            self.cached_bytes += counts.nbytes
+            while self.cached_bytes > self.cache_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= evicted.nbytes
+        return counts
+
+    def get_gene_attributes(self, gene):
+        """
+        Get a gene's attributes. Attributes are cached.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Attributes, flattened
+        :rtype: dict(str or unicode -> numpy.ndarray)
+        :raise KeyError: if ``gene`` is not in the file
+        """
+        gene = self.get_gene(gene)
+        if gene not in self.attributes:
+            if self.is_columnar:
+                attributes = self.store.get_gene_attributes(gene)
+            else:
+                reads = self.h5[ribogrid.READS_FORMAT.format(gene,
+                                                             self.dataset)]
+                attributes = {name: value.flatten()
+                              for name, value in reads.attrs.items()}
+            self.attributes[gene] = attributes
+        return self.attributes[gene]
+
+    def get_attribute_columns(self, names, genes=None):
+        """
+        Get the values of several attributes for several genes in one
+        pass, bypassing the attribute cache. For the columnar layout
+        the values are taken from each attribute's column.
+
+        :param names: Attribute names
+        :type names: list(str or unicode)
+        :param genes: Primary or secondary gene IDs, or ``None`` for \
+        all genes
+        :type genes: list(str or unicode)
+        :return: Values for each attribute, one row per gene
+        :rtype: dict(str or unicode -> numpy.ndarray)
+        :raise KeyError: if any gene is not in the file or any name \
+        is not an attribute
+        """
+        if genes is None:
+            genes = self.genes
+        genes = [self.get_gene(gene) for gene in genes]
+        if self.is_columnar:
+            indices = [self.store.get_index(gene) for gene in genes]
+            return {name: self.store.get_column(name)[indices].reshape(
+                len(genes), -1) for name in names}
+        # Use the low-level API as h5py.AttributeManager adds
+        # significant overhead per attribute read.
+        values = {name: [] for name in names}
+        for gene in genes:
+            reads = h5py.h5o.open(self.h5.id, ribogrid.READS_FORMAT.format(
+                gene, self.dataset).encode())
+            for name in names:
+                attr = h5py.h5a.open(reads, name.encode())
+                value = np.empty(attr.shape, dtype=attr.dtype)
+                attr.read(value)
+                values[name].append(value.flatten())
+        return {name: np.vstack(value) if value else
+                np.zeros((0, 1), dtype=np.int32)
+                for name, value in values.items()}
+
+    def read_all(self, genes=None):
+        """
+        Read the ribogrids of several genes into a single preallocated
+        array, bypassing the cache.
+
+        :param genes: Primary or secondary gene IDs, or ``None`` for \
+        all genes
+        :type genes: list(str or unicode)
+        :return: Counts, with one row per read length and one column \
+        per position, with the positions of the genes concatenated, \
+        and the column at which each gene starts
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        :raise KeyError: if any gene is not in the file
+        """
+        if genes is None:
+            genes = self.genes
+        genes = [self.get_gene(gene) for gene in genes]
+        if self.is_columnar:
+            if genes == self.store.genes:
+                return (self.store.read_all(), self.store.offsets.copy())
+            num_positions = [
+                self.store.num_positions[self.store.get_index(gene)]
+                for gene in genes]
+            num_lengths = len(self.store.lengths)
+        else:
+            shapes = [self.h5[ribogrid.READS_FORMAT.format(
+                gene, self.dataset)][ribogrid.DATA].shape
+                      for gene in genes]
+            num_positions = [shape[0] for shape in shapes]
+            num_lengths = shapes[0][1] if shapes else 0
+        offsets = np.concatenate(
+            ([0], np.cumsum(num_positions, dtype=np.int64)))
+        counts = np.zeros((num_lengths, offsets[-1]), dtype=np.int32)
+        for gene, offset, end in zip(genes, offsets[:-1], offsets[1:]):
+            if gene in self.cache:
+                counts[:, offset:end] = self.cache[gene]
+            else:
+                counts[:, offset:end] = self.read_gene_datamatrix(gene)
+        return (counts, offsets[:-1])
+
+    def get_gene_datamatrix_5start(self, gene, posn_5start, n_buffer,
+                                   nnt_gene):
+        """
+        Get a window of a gene's ribogrid from ``n_buffer`` positions
+        before the start codon to ``nnt_gene`` positions from the start
+        codon, padding with zeros at the 5' end if there are fewer than
+        ``n_buffer`` positions before the start codon, as
+        ``GetGeneDatamatrix5start`` does.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :param posn_5start: 1-indexed position of start codon
+        :type posn_5start: int
+        :param n_buffer: Number of positions before start codon
+        :type n_buffer: int
+        :param nnt_gene: Number of positions from start codon
+        :type nnt_gene: int
+        :return: Counts, with one row per read length and \
+        ``n_buffer + nnt_gene`` columns
+        :rtype: numpy.ndarray
+        :raise KeyError: if ``gene`` is not in the file
+        """
+        counts = self.get_gene_datamatrix(gene)
+        if posn_5start > n_buffer:
+            left = posn_5start - n_buffer - 1
+            padding = 0
+        else:
+            left = 0
+            padding = n_buffer - posn_5start + 1
+        right = posn_5start + nnt_gene - 1
+        window = np.zeros((counts.shape[0], padding + right - left),
+                          dtype=counts.dtype)
+        window[:, padding:] = counts[:, left:right]
+        return window
+
+    def get_gene_datamatrix_3end(self, gene, posn_3end, n_buffer,
+                                 nnt_gene):
+        """
+        Get a window of a gene's ribogrid from ``nnt_gene`` positions
+        up to the end of the stop codon to ``n_buffer`` positions after
+        it, padding with zeros at the 3' end if there are fewer than
+        ``n_buffer`` positions after the stop codon, as
+        ``GetGeneDatamatrix3end`` does.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :param posn_3end: 1-indexed position of end of stop codon
+        :type posn_3end: int
+        :param n_buffer: Number of positions after stop codon
+        :type n_buffer: int
+        :param nnt_gene: Number of positions up to end of stop codon
+        :type nnt_gene: int
+        :return: Counts, with one row per read length and \
+        ``nnt_gene + n_buffer`` columns
+        :rtype: numpy.ndarray
+        :raise KeyError: if ``gene`` is not in the file
+        """
+        counts = self.get_gene_datamatrix(gene)
+        num_positions = counts.shape[1]
+        left = posn_3end - nnt_gene
+        n_utr3 = num_positions - posn_3end
+        if n_utr3 >= n_buffer:
+            right = posn_3end + n_buffer
+            padding = 0
+        else:
+            right = num_positions
+            padding = n_buffer - n_utr3
+        window = np.zeros((counts.shape[0], right - left + padding),
+                          dtype=counts.dtype)
+        window[:, :right - left] = counts[:, left:right]
+        return window
@@ -0,0 +1,463 @@
+"""
+Columnar ribogrid store.
+
+The per-gene H5 layout (see :py:mod:`riboviz.ribogrid`) stores one
+small dataset, and one set of attributes, per gene, so scanning all
+the genes in a file means opening every gene's group. The columnar
+layout stores the ribogrids of all genes in a single ``ribogrid``
+group:
+
+* ``data``: int32 matrix with one row per read length and one column
+  per position, with the positions of all genes concatenated. Each
+  gene's columns run from 5' to 3' as in the per-gene layout.
+* ``genes``: primary gene IDs.
+* ``secondary_ids``: secondary gene IDs (empty if none).
+* ``offsets``: column of ``data`` at which each gene starts.
+* ``num_positions``: number of columns of ``data`` for each gene.
+* ``lengths``: read lengths.
+* ``reads_total``, ``buffer_left``, ``buffer_right``: one value per
+  gene.
+* ``start_codon_pos``, ``stop_codon_pos``: three values per gene.
+* ``reads_by_len``: one value per gene per read length.
+
+The ``ribogrid`` group has attributes ``dataset``, the dataset name of
+the per-gene layout, and ``format``, :py:const:`FORMAT`.
+
+:py:class:`ColumnarRibogrid` reads the columnar layout.
+:py:func:`per_gene_to_columnar` and :py:func:`columnar_to_per_gene`
+convert between the layouts.
+"""
+from riboviz import h5_writer
+from riboviz import ribogrid
+from riboviz.lazy_import import lazy_import
+h5py = lazy_import("h5py")
+np = lazy_import("numpy")
+
+GROUP = "ribogrid"
+""" H5 group holding the columnar store. """
+FORMAT = "columnar-1"
+""" Columnar store format identifier. """
+FORMAT_ATTR = "format"
+""" Group attribute with :py:const:`FORMAT`. """
+DATASET_ATTR = "dataset"
+""" Group attribute with per-gene layout dataset name. """
+DATA = "data"
+""" Concatenated ribogrid matrix. """
+GENES = "genes"
+""" Primary gene IDs. """
+SECONDARY_IDS = "secondary_ids"
+""" Secondary gene IDs. """
+OFFSETS = "offsets"
+""" Column at which each gene starts. """
+NUM_POSITIONS = "num_positions"
+""" Number of columns for each gene. """
+SCALAR_COLUMNS = [ribogrid.READS_TOTAL,
+                  ribogrid.BUFFER_LEFT,
+                  ribogrid.BUFFER_RIGHT]
+""" Per-gene attributes with one value per gene. """
+CODON_COLUMNS = [ribogrid.START_CODON_POS, ribogrid.STOP_CODON_POS]
+""" Per-gene attributes with three values per gene. """
+CHUNK_POSITIONS = 4096
+""" Number of positions per chunk of the concatenated matrix. """
+
+
+def is_columnar(h5_file):
+    """
+    Is an H5 file a columnar ribogrid store?
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :return: ``True`` if the file is a columnar ribogrid store
+    :rtype: bool
+    """
+    with h5py.File(h5_file, "r") as h5:
+        return GROUP in h5 and \
+            h5[GROUP].attrs.get(FORMAT_ATTR) == FORMAT
+
+
+def create_columnar(h5, genes, secondary_ids, num_positions, lengths,
+                    dataset="data",
+                    compression=h5_writer.DEFAULT_COMPRESSION,
+                    compression_level=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+                    chunk_positions=CHUNK_POSITIONS):
+    """
+    Create a columnar ribogrid store in an H5 file, with its index
+    and an empty concatenated matrix. Ribogrids can then be added
+    using :py:func:`write_columnar_counts` and attributes using
+    :py:func:`write_columns`.
+
+    :param h5: H5 file
+    :type h5: h5py.File
+    :param genes: Primary gene IDs
+    :type genes: list(str or unicode)
+    :param secondary_ids: Secondary gene IDs, or ``None`` if none
+    :type secondary_ids: list(str or unicode)
+    :param num_positions: Number of positions for each gene
+    :type num_positions: list(int)
+    :param lengths: Read lengths
+    :type lengths: list(int)
+    :param dataset: Dataset name of the per-gene layout
+    :type dataset: str or unicode
+    :param compression: Compression filter, one of \
+    :py:const:`riboviz.h5_writer.COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Number of positions per chunk. If \
+    ``None`` and ``compression`` is ``none`` then the matrix is \
+    stored contiguously and can be memory mapped by \
+    :py:class:`riboviz.ribogrid_reader.RibogridReader`.
+    :type chunk_positions: int
+    :return: Columnar store group
+    :rtype: h5py.Group
+    :raise AssertionError: if ``compression`` is not supported
+    """
+    compression_filter = h5_writer.get_compression_filter(
+        compression, compression_level)
+    num_genes = len(genes)
+    num_lengths = len(lengths)
+    num_positions = np.asarray(num_positions, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(num_positions)[:-1])) \
+        if num_genes else np.zeros(0, dtype=np.int64)
+    total_positions = int(num_positions.sum())
+    chunks = None
+    if chunk_positions is not None:
+        chunks = (max(num_lengths, 1),
+                  max(min(total_positions, chunk_positions), 1))
+    group = h5.create_group(GROUP)
+    group.attrs[FORMAT_ATTR] = FORMAT
+    group.attrs[DATASET_ATTR] = dataset
+    group.create_dataset(
+        DATA,
+        shape=(num_lengths, total_positions),
+        dtype=np.int32,
+        chunks=chunks,
+        **compression_filter)
+    string_dtype = h5py.string_dtype()
+    group.create_dataset(GENES, data=np.array(genes, dtype=object),
+                         dtype=string_dtype)
+    if secondary_ids is None:
+        secondary_ids = [""] * num_genes
+    group.create_dataset(SECONDARY_IDS,
+                         data=np.array([secondary_id or ""
+                                        for secondary_id in secondary_ids],
+                                       dtype=object),
+                         dtype=string_dtype)
+    group.create_dataset(OFFSETS, data=offsets.astype(np.int64))
+    group.create_dataset(NUM_POSITIONS, data=num_positions)
+    group.create_dataset(ribogrid.LENGTHS,
+                         data=np.asarray(lengths, dtype=np.int32))
+    return group
+
+
+def write_columnar_counts(group, offset, counts):
+    """
+    Write the ribogrids of one or more consecutive genes to a
+    columnar store created by :py:func:`create_columnar`. Writing
+    several genes at a time, in blocks of about the chunk size,
+    avoids recompressing chunks.
+
+    :param group: Columnar store group
+    :type group: h5py.Group
+    :param offset: Column at which the first gene starts
+    :type offset: int
+    :param counts: Counts, with one row per read length and one \
+    column per position, with the positions of the genes concatenated
+    :type counts: numpy.ndarray
+    :return: Column after the last gene
+    :rtype: int
+    """
+    end = offset + counts.shape[1]
+    group[DATA][:, offset:end] = counts
+    return end
+
+
+def write_columns(group, columns):
+    """
+    Write per-gene attributes, as columns, to a columnar store
+    created by :py:func:`create_columnar`.
+
+    :param group: Columnar store group
+    :type group: h5py.Group
+    :param columns: Values of :py:const:`SCALAR_COLUMNS` (one value \
+    per gene), :py:const:`CODON_COLUMNS` (three values per gene) and \
+    ``reads_by_len`` (one value per read length per gene)
+    :type columns: dict(str or unicode -> numpy.ndarray)
+    """
+    for name in SCALAR_COLUMNS + CODON_COLUMNS + [ribogrid.READS_BY_LEN]:
+        group.create_dataset(name,
+                             data=np.asarray(columns[name],
+                                             dtype=np.int32))
+
+
+class ColumnarRibogrid:
+    """
+    Reader for a columnar ribogrid store. The index (gene IDs,
+    offsets, number of positions and read lengths) is loaded when the
+    store is opened. Can be used as a context manager::
+
+        with ColumnarRibogrid("sample.h5") as store:
+            counts = store.get_gene_datamatrix("YAL003W")
+    """
+
+    def __init__(self, h5_file):
+        """
+        Open a columnar ribogrid store.
+
+        :param h5_file: H5 file
+        :type h5_file: str or unicode
+        :raise AssertionError: if the file is not a columnar store
+        """
+        self.h5_file = h5_file
+        self.h5 = h5py.File(h5_file, "r")
+        try:
+            assert GROUP in self.h5 and \
+                self.h5[GROUP].attrs.get(FORMAT_ATTR) == FORMAT,\
+                "Not a columnar ribogrid store: %s" % h5_file
+        except AssertionError:
+            self.h5.close()
+            raise
+        self.group = self.h5[GROUP]
+        self.dataset = self.group.attrs[DATASET_ATTR]
+        self.genes = list(self.group[GENES].asstr()[()])
+        self.secondary_ids = list(self.group[SECONDARY_IDS].asstr()[()])
+        self.offsets = self.group[OFFSETS][()]
+        self.num_positions = self.group[NUM_POSITIONS][()]
+        self.lengths = self.group[ribogrid.LENGTHS][()]
+        self.columns = {}
+        self.gene_index = {}
+        for index, secondary_id in enumerate(self.secondary_ids):
+            if secondary_id:
+                self.gene_index[secondary_id] = index
+        for index, gene in enumerate(self.genes):
+            self.gene_index[gene] = index
+
+    def close(self):
+        """
+        Close the store.
+        """
+        self.h5.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_index(self, gene):
+        """
+        Get the index of a gene.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Index
+        :rtype: int
+        :raise KeyError: if ``gene`` is not in the store
+        """
+        return self.gene_index[gene]
+
+    def get_gene_datamatrix(self, gene):
+        """
+        Get a gene's ribogrid.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Counts, with one row per read length and one column \
+        per position, from 5' to 3'
+        :rtype: numpy.ndarray
+        :raise KeyError: if ``gene`` is not in the store
+        """
+        index = self.get_index(gene)
+        offset = self.offsets[index]
+        return self.group[DATA][:, offset:offset +
+                                self.num_positions[index]]
+
+    def get_column(self, name):
+        """
+        Get an attribute for all genes. Attributes are loaded when first
+        requested.
+
+        :param name: Attribute name, one of \
+        :py:const:`SCALAR_COLUMNS`, :py:const:`CODON_COLUMNS` or \
+        ``reads_by_len``
+        :type name: str or unicode
+        :return: Values, one row per gene
+        :rtype: numpy.ndarray
+        :raise KeyError: if ``name`` is not in the store
+        """
+        if name not in self.columns:
+            self.columns[name] = self.group[name][()]
+        return self.columns[name]
+
+    def get_gene_attributes(self, gene):
+        """
+        Get a gene's attributes, as in the per-gene layout.
+
+        :param gene: Primary or secondary gene ID
+        :type gene: str or unicode
+        :return: Attributes
+        :rtype: dict(str or unicode -> numpy.ndarray)
+        :raise KeyError: if ``gene`` is not in the store
+        """
+        index = self.get_index(gene)
+        attributes = {name: np.atleast_1d(self.get_column(name)[index])
+                      for name in SCALAR_COLUMNS + CODON_COLUMNS +
+                      [ribogrid.READS_BY_LEN]}
+        attributes[ribogrid.LENGTHS] = self.lengths
+        return attributes
+
+    def read_all(self):
+        """
+        Read the ribogrids of all genes.
+
+        :return: Counts, with one row per read length and one column \
+        per position, with the positions of all genes concatenated
+        :rtype: numpy.ndarray
+        """
+        return self.group[DATA][()]
+
+
+def read_per_gene_index(h5, dataset):
+    """
+    Get the genes, secondary gene IDs and number of positions and
+    read lengths of each gene in a per-gene H5 file.
+
+    :param h5: H5 file
+    :type h5: h5py.File
+    :param dataset: Dataset name
+    :type dataset: str or unicode
+    :return: Genes, secondary gene IDs, number of positions, read \
+    lengths
+    :rtype: tuple(list(str or unicode), list(str or unicode), \
+    list(int), numpy.ndarray)
+    :raise AssertionError: if genes have different read lengths
+    """
+    genes = []
+    secondary_ids = {}
+    for name in h5:
+        link = h5.get(name, getlink=True)
+        if isinstance(link, h5py.ExternalLink):
+            secondary_ids[link.path.strip("/")] = name
+        else:
+            genes.append(name)
+    num_positions = []
+    lengths = None
+    for gene in genes:
+        reads = h5[ribogrid.READS_FORMAT.format(gene, dataset)]
+        num_positions.append(reads[ribogrid.DATA].shape[0])
+        gene_lengths = reads.attrs[ribogrid.LENGTHS].flatten()
+        if lengths is None:
+            lengths = gene_lengths
+        assert np.array_equal(lengths, gene_lengths),\
+            "Gene %s has different read lengths" % gene
+    if lengths is None:
+        lengths = np.zeros(0, dtype=np.int32)
+    return (genes,
+            [secondary_ids.get(gene) for gene in genes],
+            num_positions,
+            lengths)
+
+
+def per_gene_to_columnar(per_gene_file, columnar_file, dataset="data",
+                         compression=h5_writer.DEFAULT_COMPRESSION,
+                         compression_level=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+                         chunk_positions=CHUNK_POSITIONS):
+    """
+    Convert an H5 file with the per-gene layout into a columnar
+    store. Genes are in the order in which they are listed in the
+    per-gene file.
+
+    :param per_gene_file: H5 file with per-gene layout
+    :type per_gene_file: str or unicode
+    :param columnar_file: Columnar store H5 file (output)
+    :type columnar_file: str or unicode
+    :param dataset: Dataset name
+    :type dataset: str or unicode
+    :param compression: Compression filter, one of \
+    :py:const:`riboviz.h5_writer.COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Number of positions per chunk, or \
+    ``None``, see :py:func:`create_columnar`
+    :type chunk_positions: int
+    :raise AssertionError: if genes have different read lengths or \
+    ``compression`` is not supported
+    """
+    with h5py.File(per_gene_file, "r") as in_h5, \
+            h5py.File(columnar_file, "w") as out_h5:
+        genes, secondary_ids, num_positions, lengths = \
+            read_per_gene_index(in_h5, dataset)
+        group = create_columnar(out_h5, genes, secondary_ids,
+                                num_positions, lengths, dataset,
+                                compression, compression_level,
+                                chunk_positions)
+        columns = {name: [] for name in SCALAR_COLUMNS + CODON_COLUMNS +
+                   [ribogrid.READS_BY_LEN]}
+        offset = 0
+        block = []
+        for gene in genes:
+            reads = in_h5[ribogrid.READS_FORMAT.format(gene, dataset)]
+            block.append(reads[ribogrid.DATA][()].T)
+            if chunk_positions is not None and \
+               sum(counts.shape[1] for counts in block) >= chunk_positions:
+                offset = write_columnar_counts(group, offset,
+                                               np.hstack(block))
+                block = []
+            for name in SCALAR_COLUMNS:
+                columns[name].append(reads.attrs[name].flatten()[0])
+            for name in CODON_COLUMNS + [ribogrid.READS_BY_LEN]:
+                columns[name].append(reads.attrs[name].flatten())
+        if block:
+            write_columnar_counts(group, offset, np.hstack(block))
+        if not genes:
+            columns[ribogrid.READS_BY_LEN] = np.zeros((0, len(lengths)))
+            for name in CODON_COLUMNS:
+                columns[name] = np.zeros((0, 3))
+        write_columns(group, columns)
+
+
+def columnar_to_per_gene(columnar_file, per_gene_file, num_processes=1,
+                         compression=h5_writer.DEFAULT_COMPRESSION,
+                         compression_level=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+                         chunk_positions=None,
+                         chunk_lengths=h5_writer.DEFAULT_CHUNK_LENGTHS):
+    """
+    Convert a columnar store into an H5 file with the per-gene
+    layout, using :py:func:`riboviz.h5_writer.write_genes`.
+
+    :param columnar_file: Columnar store H5 file
+    :type columnar_file: str or unicode
+    :param per_gene_file: H5 file with per-gene layout (output)
+    :type per_gene_file: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param compression: Compression filter, one of \
+    :py:const:`riboviz.h5_writer.COMPRESSIONS`
+    :type compression: str or unicode
+    :param compression_level: Compression level, used for ``gzip`` only
+    :type compression_level: int
+    :param chunk_positions: Maximum number of positions per chunk, \
+    or ``None`` for all positions
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    :raise AssertionError: if the file is not a columnar store or \
+    ``compression`` is not supported
+    """
+    with ColumnarRibogrid(columnar_file) as store:
+        genes = ((ribogrid.READS_FORMAT.format(gene, store.dataset),
+                  np.ascontiguousarray(store.get_gene_datamatrix(gene).T),
+                  {name: np.asarray(value, dtype=np.int32).reshape(-1, 1)
+                   for name, value in
+                   store.get_gene_attributes(gene).items()})
+                 for gene in store.genes)
+        links = {}
+        for gene, secondary_id in zip(store.genes, store.secondary_ids):
+            if secondary_id and secondary_id != gene and \
+               secondary_id not in links:
+                links[secondary_id] = gene
+        h5_writer.write_genes(per_gene_file, genes, ribogrid.DATA, links,
+                              num_processes, compression,
+                              compression_level, chunk_positions,
+                              chunk_lengths)
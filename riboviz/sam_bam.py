@@ -1,8 +1,9 @@
 """
 SAM and BAM-related constants and functions.
 """
-import pysam
 from riboviz import utils
+from riboviz.lazy_import import lazy_import
+pysam = lazy_import("pysam")
 
 PG_TAG = "PG"
 """ SAM file ``PG`` (program) tag. """
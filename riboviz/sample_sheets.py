@@ -3,8 +3,9 @@ Sample sheet-related constants and functions.
 """
 import errno
 import os
-import pandas as pd
 from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
 
 
 SAMPLE_ID = "SampleID"
@@ -119,9 +120,10 @@ def save_deplexed_sample_sheet(sample_sheet,
                              columns=deplexed_sample_sheet.columns)
     deplexed_sample_sheet = deplexed_sample_sheet.append(total_row,
                                                          ignore_index=True)
-    provenance.write_provenance_header(__file__, file_name)
-    deplexed_sample_sheet[list(deplexed_sample_sheet.columns)].to_csv(
-        file_name, mode='a', sep=delimiter, index=False)
+    with open(file_name, 'w') as f:
+        f.write(provenance.get_provenance(__file__))
+        deplexed_sample_sheet[list(deplexed_sample_sheet.columns)].to_csv(
+            f, sep=delimiter, index=False)
 
 
 def get_non_zero_deplexed_samples(sample_sheet):
@@ -0,0 +1,684 @@
+"""
+Simulate large FASTQ files of ribosome footprint reads, for load
+testing and benchmarking.
+
+:py:mod:`riboviz.create_fastq_simdata` creates small files of
+hand-built records to test UMI/deduplication, adaptor trimming, and
+demultiplexing. This module creates files with any number of reads,
+millions if required, whose footprints are sampled from the coding
+sequences (``CDS`` features) of transcripts in a FASTA file and GFF
+file, such as ``vignette/input/yeast_YAL_CDS_w_250utrs.fa`` and
+``vignette/input/yeast_YAL_CDS_w_250utrs.gff3``.
+
+Each read has the same layout as the reads created by
+:py:func:`riboviz.create_fastq_simdata.make_fastq_records`::
+
+    <UMI5><footprint><UMI3><barcode><adaptor><post-adaptor nts>
+
+UMIs and post-adaptor nts are random. If there is more than one
+sample then each read has the barcode of a randomly chosen sample,
+samples' barcodes being random barcodes that differ from each other
+in at least :py:const:`MIN_BARCODE_DISTANCE` nts.
+
+Footprints are sampled as follows:
+
+* A transcript is chosen with probability proportional to a
+  log-normally distributed expression level.
+* A read length is chosen from a read length distribution (default
+  :py:const:`DEFAULT_READ_LENGTHS`).
+* A codon in the transcript's CDS is chosen uniformly and a frame
+  with probabilities from a frame distribution (default
+  :py:const:`DEFAULT_FRAME_WEIGHTS`). The footprint starts
+  :py:const:`P_SITE_OFFSET` nts 5' of that position.
+
+Substitution errors are then introduced at each position in a read
+with a given error rate. Quality scores are sampled from
+:py:const:`riboviz.create_fastq_simdata.QUALITY_MEDIUM` or, at
+positions with errors, :py:const:`QUALITY_LOW`.
+
+Optionally, a second FASTQ file can be written with the same reads
+after adaptor trimming and barcode and UMI extraction, with headers
+extended with the barcode and UMIs as
+:py:func:`riboviz.create_fastq_simdata.make_fastq_records` does.
+This can be demultiplexed using
+:py:mod:`riboviz.tools.demultiplex_fastq`.
+
+Reads are created in chunks of up to :py:const:`CHUNK_SIZE` reads
+using vectorised NumPy sampling. Each chunk has its own random number
+generator seeded by the seed and the chunk's index, so the same files
+are created for a given seed regardless of the number of processes.
+Chunks are created, and, if writing to ``.gz`` files, compressed, in
+parallel, then written in order.
+"""
+import collections
+import gzip
+import multiprocessing
+from riboviz import barcodes_umis
+from riboviz import create_fastq_simdata
+from riboviz import gff_utils
+from riboviz import provenance
+from riboviz import sample_sheets
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+SeqIO = lazy_import("Bio.SeqIO")
+
+NUCLEOTIDES = "ACGT"
+""" Nucleotides. """
+DEFAULT_ADAPTOR = "CTGTAGGCACC"
+""" Default adaptor (that used in vignette data). """
+DEFAULT_UMI5_LENGTH = 4
+""" Default 5' UMI length. """
+DEFAULT_UMI3_LENGTH = 4
+""" Default 3' UMI length. """
+DEFAULT_BARCODE_LENGTH = 6
+""" Default barcode length, if there is more than one sample. """
+DEFAULT_ERROR_RATE = 0.001
+""" Default per-nt substitution error rate. """
+DEFAULT_READ_LENGTHS = {26: 1, 27: 2, 28: 6, 29: 5, 30: 3, 31: 2, 32: 1}
+""" Default footprint read length weights. """
+DEFAULT_FRAME_WEIGHTS = [0.7, 0.15, 0.15]
+""" Default weights of frames 0, 1 and 2 of footprint P-sites. """
+P_SITE_OFFSET = 12
+""" Offset of P-site from 5' end of footprint. """
+MIN_BARCODE_DISTANCE = 3
+""" Minimum Hamming distance between sample barcodes. """
+QUALITY_LOW = list(range(2, 20))
+""" List of low quality scores, used at positions with errors. """
+PHRED_OFFSET = 33
+""" Offset of FASTQ quality characters. """
+CHUNK_SIZE = 100000
+""" Number of reads in each chunk. """
+READ_NAME_PREFIX = "SIM."
+""" Prefix of read names, which is followed by the read index. """
+READ_INDEX_WIDTH = 10
+""" Number of digits of read index in read names. """
+SAMPLE_FORMAT = "Tag{:d}"
+""" Sample name format. """
+GZIP_COMPRESS_LEVEL = 6
+""" Compression level for ``.gz`` files. """
+
+ReferenceTuple = collections.namedtuple(
+    "ReferenceTuple", ["names", "sequence", "offsets", "lengths",
+                       "cds_starts", "num_codons"])
+"""
+Transcripts, from which footprints are sampled.
+
+* ``names``: transcript names (list(str or unicode)).
+* ``sequence``: concatenated upper-case transcript sequences
+  (numpy.ndarray of ``uint8``).
+* ``offsets``: offset of each transcript in ``sequence``
+  (numpy.ndarray).
+* ``lengths``: length of each transcript (numpy.ndarray).
+* ``cds_starts``: 0-indexed start of each transcript's CDS
+  (numpy.ndarray).
+* ``num_codons``: number of codons in each transcript's CDS
+  (numpy.ndarray).
+"""
+
+SimulationTuple = collections.namedtuple(
+    "SimulationTuple", ["reference", "gene_probs", "read_lengths",
+                        "read_length_probs", "frame_probs",
+                        "umi5_length", "umi3_length", "barcodes",
+                        "adaptor", "post_adaptor_length", "error_rate",
+                        "seed", "is_extracted", "is_gz",
+                        "is_extracted_gz"])
+"""
+Simulation settings, shared by all chunks.
+
+* ``reference``: transcripts (ReferenceTuple).
+* ``gene_probs``: probability of sampling each transcript
+  (numpy.ndarray).
+* ``read_lengths``: read lengths (numpy.ndarray).
+* ``read_length_probs``: probability of each read length
+  (numpy.ndarray).
+* ``frame_probs``: probability of each frame (numpy.ndarray).
+* ``umi5_length``: 5' UMI length (int).
+* ``umi3_length``: 3' UMI length (int).
+* ``barcodes``: barcode of each sample, as ASCII codes, with one row
+  per sample (numpy.ndarray of ``uint8``).
+* ``adaptor``: adaptor (str or unicode).
+* ``post_adaptor_length``: number of nts after adaptor (int).
+* ``error_rate``: per-nt substitution error rate (float).
+* ``seed``: seed (int).
+* ``is_extracted``: create reads with barcodes and UMIs extracted
+  (bool).
+* ``is_gz``: compress reads (bool).
+* ``is_extracted_gz``: compress reads with barcodes and UMIs
+  extracted (bool).
+"""
+
+_SETTINGS = None
+""" Simulation settings for worker processes. """
+
+
+def load_reference(fasta_file, gff_file):
+    """
+    Load transcripts, from which footprints are sampled, from a FASTA
+    file and the ``CDS`` features, on the ``+`` strand, of a GFF
+    file. If a transcript has more than one ``CDS`` feature then its
+    CDS is taken to span all of these. Transcripts with no ``CDS``
+    feature, or whose CDS has no complete codon, are ignored.
+
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :return: Transcripts
+    :rtype: ReferenceTuple
+    :raise AssertionError: if there are no transcripts with CDSs
+    """
+    cds_ends = {}
+    for seqname, feature_type, start, end, strand, _ in \
+            gff_utils.read_gff_features(gff_file):
+        if feature_type != "CDS" or strand != "+":
+            continue
+        if seqname in cds_ends:
+            start = min(cds_ends[seqname][0], start)
+            end = max(cds_ends[seqname][1], end)
+        cds_ends[seqname] = (start, end)
+    names = []
+    sequences = []
+    cds_starts = []
+    num_codons = []
+    for record in SeqIO.parse(fasta_file, "fasta"):
+        if record.id not in cds_ends:
+            continue
+        start, end = cds_ends[record.id]
+        sequence = bytes(record.seq).upper()
+        end = min(end, len(sequence))
+        if (end - start + 1) // 3 < 1:
+            continue
+        names.append(record.id)
+        sequences.append(sequence)
+        cds_starts.append(start - 1)
+        num_codons.append((end - start + 1) // 3)
+    assert names, "No transcripts with CDS features in {} and {}".format(
+        fasta_file, gff_file)
+    lengths = np.array([len(sequence) for sequence in sequences],
+                       dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    return ReferenceTuple(names,
+                          np.frombuffer(b"".join(sequences),
+                                        dtype=np.uint8),
+                          offsets,
+                          lengths,
+                          np.array(cds_starts, dtype=np.int64),
+                          np.array(num_codons, dtype=np.int64))
+
+
+def make_barcodes(num_samples, length, rng,
+                  min_distance=MIN_BARCODE_DISTANCE):
+    """
+    Make random barcodes that differ from each other in at least
+    ``min_distance`` nts.
+
+    :param num_samples: Number of barcodes
+    :type num_samples: int
+    :param length: Barcode length
+    :type length: int
+    :param rng: Random number generator
+    :type rng: numpy.random.Generator
+    :param min_distance: Minimum Hamming distance between barcodes
+    :type min_distance: int
+    :return: Barcodes
+    :rtype: list(str or unicode)
+    :raise AssertionError: if ``num_samples`` barcodes cannot be found
+    """
+    codes = np.empty((0, length), dtype=np.int64)
+    max_attempts = 1000 * max(num_samples, 1)
+    attempts = 0
+    while len(codes) < num_samples and attempts < max_attempts:
+        attempts += 1
+        candidate = rng.integers(0, len(NUCLEOTIDES), length)
+        if np.all((codes != candidate).sum(axis=1) >= min_distance):
+            codes = np.vstack([codes, candidate])
+    assert len(codes) == num_samples, \
+        "Could not make {} barcodes of length {} with {} mismatches".format(
+            num_samples, length, min_distance)
+    return ["".join(NUCLEOTIDES[code] for code in row) for row in codes]
+
+
+def to_codes(sequence):
+    """
+    Get ASCII codes of a sequence.
+
+    :param sequence: Sequence
+    :type sequence: str or unicode
+    :return: Codes
+    :rtype: numpy.ndarray
+    """
+    return np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)
+
+
+def get_read_names(first_index, num_reads):
+    """
+    Get read names, as ASCII codes, for reads with consecutive
+    indices. Each name is :py:const:`READ_NAME_PREFIX` followed by
+    the read index, zero-padded to :py:const:`READ_INDEX_WIDTH`
+    digits.
+
+    :param first_index: Index of first read
+    :type first_index: int
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :return: Names, one row per read
+    :rtype: numpy.ndarray
+    """
+    indices = np.arange(first_index, first_index + num_reads,
+                        dtype=np.int64)
+    powers = 10 ** np.arange(READ_INDEX_WIDTH - 1, -1, -1, dtype=np.int64)
+    digits = (indices[:, None] // powers) % 10 + ord("0")
+    prefix = np.broadcast_to(to_codes(READ_NAME_PREFIX),
+                             (num_reads, len(READ_NAME_PREFIX)))
+    return np.hstack([prefix, digits.astype(np.uint8)])
+
+
+def format_fastq(names, sequences, qualities, lengths):
+    """
+    Format reads as FASTQ records.
+
+    :param names: Read names, as ASCII codes, one row per read
+    :type names: numpy.ndarray
+    :param sequences: Sequences, as ASCII codes, one row per read, \
+    padded to the same length
+    :type sequences: numpy.ndarray
+    :param qualities: Quality characters, as ASCII codes, one row \
+    per read, padded to the same length
+    :type qualities: numpy.ndarray
+    :param lengths: Length of each read
+    :type lengths: numpy.ndarray
+    :return: FASTQ records
+    :rtype: bytes
+    """
+    num_reads, name_width = names.shape
+    width = sequences.shape[1]
+    seq_start = name_width + 2
+    qual_start = seq_start + width + 3
+    records = np.empty((num_reads, qual_start + width + 1),
+                       dtype=np.uint8)
+    records[:, 0] = ord("@")
+    records[:, 1:seq_start - 1] = names
+    records[:, seq_start - 1] = ord("\n")
+    records[:, seq_start:seq_start + width] = sequences
+    records[:, seq_start + width:qual_start] = to_codes("\n+\n")
+    records[:, qual_start:qual_start + width] = qualities
+    records[:, -1] = ord("\n")
+    is_read = np.arange(width)[None, :] < lengths[:, None]
+    mask = np.ones(records.shape, dtype=bool)
+    mask[:, seq_start:seq_start + width] = is_read
+    mask[:, qual_start:qual_start + width] = is_read
+    return records[mask].tobytes()
+
+
+def _delimiter(delimiter, num_reads):
+    """
+    Get a delimiter, as ASCII codes, for each read.
+
+    :param delimiter: Delimiter
+    :type delimiter: str or unicode
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :return: Delimiters, one row per read
+    :rtype: numpy.ndarray
+    """
+    return np.broadcast_to(to_codes(delimiter),
+                           (num_reads, len(delimiter)))
+
+
+def simulate_chunk(settings, chunk_index, first_index, num_reads):
+    """
+    Simulate a chunk of reads.
+
+    :param settings: Simulation settings
+    :type settings: SimulationTuple
+    :param chunk_index: Chunk index, used with ``settings.seed`` to \
+    seed the random number generator
+    :type chunk_index: int
+    :param first_index: Index of first read in chunk
+    :type first_index: int
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :return: FASTQ records, FASTQ records with barcode and UMIs \
+    extracted (or ``None`` if ``settings.is_extracted`` is \
+    ``False``), and number of reads for each sample. Records are \
+    compressed if ``settings.is_gz`` or ``settings.is_extracted_gz``.
+    :rtype: tuple(bytes, bytes, numpy.ndarray)
+    """
+    reference = settings.reference
+    rng = np.random.default_rng([settings.seed, chunk_index])
+    nts = to_codes(NUCLEOTIDES)
+    rows = np.arange(num_reads)[:, None]
+
+    # Sample footprints.
+    genes = rng.choice(len(reference.names), size=num_reads,
+                       p=settings.gene_probs)
+    read_lengths = np.minimum(
+        rng.choice(settings.read_lengths, size=num_reads,
+                   p=settings.read_length_probs),
+        reference.lengths[genes])
+    frames = rng.choice(3, size=num_reads, p=settings.frame_probs)
+    codons = rng.integers(0, reference.num_codons[genes])
+    starts = reference.cds_starts[genes] + 3 * codons + frames - \
+        P_SITE_OFFSET
+    starts = np.clip(starts, 0, reference.lengths[genes] - read_lengths)
+    max_length = int(settings.read_lengths.max())
+    positions = np.minimum(
+        (reference.offsets[genes] + starts)[:, None] +
+        np.arange(max_length),
+        len(reference.sequence) - 1)
+    footprints = reference.sequence[positions]
+
+    # Add UMIs, barcode, adaptor and post-adaptor nts.
+    umi5_length = settings.umi5_length
+    umi5 = nts[rng.integers(0, len(nts), (num_reads, umi5_length))]
+    num_samples = len(settings.barcodes)
+    if num_samples > 1:
+        samples = rng.integers(0, num_samples, num_reads)
+        barcodes = settings.barcodes[samples]
+    else:
+        samples = np.zeros(num_reads, dtype=np.int64)
+        barcodes = np.empty((num_reads, 0), dtype=np.uint8)
+    suffix = np.hstack([
+        nts[rng.integers(0, len(nts), (num_reads, settings.umi3_length))],
+        barcodes,
+        np.broadcast_to(to_codes(settings.adaptor),
+                        (num_reads, len(settings.adaptor))),
+        nts[rng.integers(0, len(nts),
+                         (num_reads, settings.post_adaptor_length))]])
+    suffix_length = suffix.shape[1]
+    width = umi5_length + max_length + suffix_length
+    sequences = np.zeros((num_reads, width), dtype=np.uint8)
+    sequences[:, :umi5_length] = umi5
+    sequences[:, umi5_length:umi5_length + max_length] = footprints
+    suffix_positions = (umi5_length + read_lengths)[:, None] + \
+        np.arange(suffix_length)
+    sequences[rows, suffix_positions] = suffix
+    lengths = umi5_length + read_lengths + suffix_length
+
+    # Add substitution errors and quality scores.
+    is_read = np.arange(width)[None, :] < lengths[:, None]
+    qualities = rng.choice(create_fastq_simdata.QUALITY_MEDIUM,
+                           size=(num_reads, width))
+    if settings.error_rate > 0:
+        errors = (rng.random((num_reads, width)) < settings.error_rate) \
+            & is_read
+        num_errors = int(errors.sum())
+        nt_codes = np.zeros(256, dtype=np.int64)
+        nt_codes[nts] = np.arange(len(nts))
+        sequences[errors] = nts[
+            (nt_codes[sequences[errors]] +
+             rng.integers(1, len(nts), num_errors)) % len(nts)]
+        qualities[errors] = rng.choice(QUALITY_LOW, size=num_errors)
+    qualities = (qualities + PHRED_OFFSET).astype(np.uint8)
+
+    names = get_read_names(first_index, num_reads)
+    records = format_fastq(names, sequences, qualities, lengths)
+    if settings.is_gz:
+        records = gzip.compress(records, GZIP_COMPRESS_LEVEL)
+    extracted_records = None
+    if settings.is_extracted:
+        # Extend headers as create_fastq_simdata.make_fastq_records
+        # does, using the UMIs and barcode after errors.
+        umi5 = sequences[:, :umi5_length]
+        suffix = sequences[rows, suffix_positions]
+        umi3 = suffix[:, :settings.umi3_length]
+        barcodes = suffix[:, settings.umi3_length:
+                          settings.umi3_length + barcodes.shape[1]]
+        header = [names]
+        if barcodes.shape[1] > 0:
+            header.append(_delimiter(barcodes_umis.BARCODE_DELIMITER,
+                                     num_reads))
+            header.append(barcodes)
+        umi3_delimiter = barcodes_umis.UMI_DELIMITER
+        if umi5_length > 0:
+            header.append(_delimiter(barcodes_umis.UMI_DELIMITER,
+                                     num_reads))
+            header.append(umi5)
+            umi3_delimiter = ""
+        if settings.umi3_length > 0:
+            header.append(_delimiter(umi3_delimiter, num_reads))
+            header.append(umi3)
+        read_columns = slice(umi5_length, umi5_length + max_length)
+        extracted_records = format_fastq(
+            np.hstack(header), sequences[:, read_columns],
+            qualities[:, read_columns], read_lengths)
+        if settings.is_extracted_gz:
+            extracted_records = gzip.compress(extracted_records,
+                                              GZIP_COMPRESS_LEVEL)
+    counts = np.bincount(samples, minlength=max(num_samples, 1))
+    return records, extracted_records, counts
+
+
+def _init_worker(settings):
+    """
+    Initialise a worker process with simulation settings.
+
+    :param settings: Simulation settings
+    :type settings: SimulationTuple
+    """
+    global _SETTINGS
+    _SETTINGS = settings
+
+
+def _simulate_chunk(chunk):
+    """
+    Simulate a chunk of reads in a worker process, using the settings
+    provided to :py:func:`_init_worker`. See
+    :py:func:`simulate_chunk`.
+
+    :param chunk: Chunk index, index of first read and number of reads
+    :type chunk: tuple(int, int, int)
+    :return: See :py:func:`simulate_chunk`
+    :rtype: tuple(bytes, bytes, numpy.ndarray)
+    """
+    return simulate_chunk(_SETTINGS, *chunk)
+
+
+def get_probs(weights):
+    """
+    Normalise weights into probabilities.
+
+    :param weights: Weights
+    :type weights: list(float)
+    :return: Probabilities
+    :rtype: numpy.ndarray
+    :raise AssertionError: if any weight is negative or the weights \
+    sum to 0
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    assert np.all(weights >= 0) and weights.sum() > 0, \
+        "Weights must be non-negative and not all 0: {}".format(
+            list(weights))
+    return weights / weights.sum()
+
+
+def _write_chunks(chunks, out, extracted, counts):
+    """
+    Write simulated chunks of reads, in order.
+
+    :param chunks: Chunks, see :py:func:`simulate_chunk`
+    :type chunks: iterable(tuple(bytes, bytes, numpy.ndarray))
+    :param out: FASTQ file
+    :type out: io.BufferedWriter
+    :param extracted: FASTQ file for reads with barcode and UMIs \
+    extracted, or ``None``
+    :type extracted: io.BufferedWriter
+    :param counts: Number of reads for each sample, updated in place
+    :type counts: numpy.ndarray
+    """
+    for records, extracted_records, chunk_counts in chunks:
+        out.write(records)
+        if extracted is not None:
+            extracted.write(extracted_records)
+        counts += chunk_counts
+
+
+def simulate_fastq(fasta_file,
+                   gff_file,
+                   num_reads,
+                   output_file,
+                   extracted_file=None,
+                   sample_sheet_file=None,
+                   num_reads_file=None,
+                   num_samples=1,
+                   barcode_length=DEFAULT_BARCODE_LENGTH,
+                   umi5_length=DEFAULT_UMI5_LENGTH,
+                   umi3_length=DEFAULT_UMI3_LENGTH,
+                   adaptor=DEFAULT_ADAPTOR,
+                   post_adaptor_length=0,
+                   error_rate=DEFAULT_ERROR_RATE,
+                   read_lengths=None,
+                   frame_weights=None,
+                   seed=None,
+                   num_processes=1,
+                   chunk_size=CHUNK_SIZE):
+    """
+    Simulate a FASTQ file of ribosome footprint reads. See the
+    module documentation for how reads are simulated.
+
+    If ``num_samples`` is greater than 1 then each read has the
+    barcode of a randomly chosen sample and, if ``sample_sheet_file``
+    is provided, a sample sheet, with columns
+    :py:const:`riboviz.sample_sheets.SAMPLE_ID` and
+    :py:const:`riboviz.sample_sheets.TAG_READ`, is written. If
+    ``num_reads_file`` is provided then the number of reads simulated
+    for each sample are written to it (see
+    :py:func:`riboviz.sample_sheets.save_deplexed_sample_sheet`).
+
+    If ``output_file`` or ``extracted_file`` end in ``.gz`` they are
+    compressed.
+
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :param output_file: FASTQ file
+    :type output_file: str or unicode
+    :param extracted_file: FASTQ file for reads with adaptor trimmed \
+    and barcode and UMIs extracted into headers
+    :type extracted_file: str or unicode
+    :param sample_sheet_file: Sample sheet file
+    :type sample_sheet_file: str or unicode
+    :param num_reads_file: Number of reads per sample file
+    :type num_reads_file: str or unicode
+    :param num_samples: Number of samples
+    :type num_samples: int
+    :param barcode_length: Barcode length, if ``num_samples`` > 1
+    :type barcode_length: int
+    :param umi5_length: 5' UMI length
+    :type umi5_length: int
+    :param umi3_length: 3' UMI length
+    :type umi3_length: int
+    :param adaptor: Adaptor
+    :type adaptor: str or unicode
+    :param post_adaptor_length: Number of random nts after adaptor
+    :type post_adaptor_length: int
+    :param error_rate: Per-nt substitution error rate
+    :type error_rate: float
+    :param read_lengths: Footprint read length weights, if ``None`` \
+    then :py:const:`DEFAULT_READ_LENGTHS` is used
+    :type read_lengths: dict(int -> float)
+    :param frame_weights: Frame 0, 1 and 2 weights, if ``None`` then \
+    :py:const:`DEFAULT_FRAME_WEIGHTS` is used
+    :type frame_weights: list(float)
+    :param seed: Random number generator seed, if ``None`` then a \
+    random seed is used
+    :type seed: int
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param chunk_size: Number of reads in each chunk
+    :type chunk_size: int
+    :return: Number of reads for each sample, with columns \
+    :py:const:`riboviz.sample_sheets.SAMPLE_ID`, \
+    :py:const:`riboviz.sample_sheets.TAG_READ` and \
+    :py:const:`riboviz.sample_sheets.NUM_READS`
+    :rtype: pandas.core.frame.DataFrame
+    :raise AssertionError: if any parameter is invalid
+    """
+    if read_lengths is None:
+        read_lengths = DEFAULT_READ_LENGTHS
+    if frame_weights is None:
+        frame_weights = DEFAULT_FRAME_WEIGHTS
+    assert num_reads >= 0, "Number of reads must be >= 0"
+    assert num_samples >= 1, "Number of samples must be >= 1"
+    assert num_samples == 1 or barcode_length > 0, \
+        "Barcode length must be > 0 if there is more than 1 sample"
+    assert min(umi5_length, umi3_length, post_adaptor_length) >= 0, \
+        "UMI and post-adaptor lengths must be >= 0"
+    assert 0 <= error_rate <= 1, "Error rate must be in [0, 1]"
+    assert read_lengths and min(read_lengths) > 0, \
+        "Read lengths must be > 0"
+    assert len(frame_weights) == 3, "There must be 3 frame weights"
+    assert chunk_size > 0, "Chunk size must be > 0"
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+    rng = np.random.default_rng(seed)
+    reference = load_reference(fasta_file, gff_file)
+    barcode_strs = []
+    if num_samples > 1:
+        barcode_strs = make_barcodes(num_samples, barcode_length, rng)
+    settings = SimulationTuple(
+        reference,
+        get_probs(rng.lognormal(0, 1, len(reference.names))),
+        np.array(sorted(read_lengths), dtype=np.int64),
+        get_probs([read_lengths[length]
+                   for length in sorted(read_lengths)]),
+        get_probs(frame_weights),
+        umi5_length,
+        umi3_length,
+        np.array([to_codes(barcode) for barcode in barcode_strs],
+                 dtype=np.uint8).reshape(len(barcode_strs),
+                                         barcode_length
+                                         if barcode_strs else 0),
+        adaptor.upper(),
+        post_adaptor_length,
+        error_rate,
+        seed,
+        extracted_file is not None,
+        output_file.endswith(".gz"),
+        extracted_file is not None and extracted_file.endswith(".gz"))
+    chunks = [(index, first, min(chunk_size, num_reads - first))
+              for index, first in enumerate(range(0, num_reads,
+                                                  chunk_size))]
+    counts = np.zeros(num_samples, dtype=np.int64)
+    extracted = None
+    with open(output_file, "wb") as out:
+        if extracted_file is not None:
+            extracted = open(extracted_file, "wb")
+        try:
+            if num_processes > 1 and len(chunks) > 1:
+                with multiprocessing.Pool(
+                        min(num_processes, len(chunks)),
+                        initializer=_init_worker,
+                        initargs=(settings,)) as pool:
+                    _write_chunks(pool.imap(_simulate_chunk, chunks),
+                                  out, extracted, counts)
+            else:
+                _write_chunks((simulate_chunk(settings, *chunk)
+                               for chunk in chunks),
+                              out, extracted, counts)
+        finally:
+            if extracted is not None:
+                extracted.close()
+    if num_samples > 1:
+        samples = [SAMPLE_FORMAT.format(index)
+                   for index in range(num_samples)]
+    else:
+        samples = [SAMPLE_FORMAT.format(0)]
+        barcode_strs = [""]
+    sample_sheet = pd.DataFrame({sample_sheets.SAMPLE_ID: samples,
+                                 sample_sheets.TAG_READ: barcode_strs,
+                                 sample_sheets.NUM_READS: counts})
+    if sample_sheet_file is not None and num_samples > 1:
+        with open(sample_sheet_file, "w") as f:
+            f.write(provenance.get_provenance(__file__))
+            sample_sheet[[sample_sheets.SAMPLE_ID,
+                          sample_sheets.TAG_READ]].to_csv(
+                              f, sep="\t", index=False)
+    if num_reads_file is not None:
+        sample_sheets.save_deplexed_sample_sheet(sample_sheet, 0,
+                                                 num_reads_file)
+    return sample_sheet
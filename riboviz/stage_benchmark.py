@@ -0,0 +1,610 @@
+"""
+Workflow stage benchmark functions.
+
+The Python functions that implement workflow stages, or that are used
+to check workflow outputs, are run on datasets of increasing size and
+the wall-clock times taken are recorded. The benchmark cases are
+:py:const:`CASES`:
+
+* ``trim_5p_mismatch``:
+  :py:func:`riboviz.trim_5p_mismatch.trim_5p_mismatch` on a SAM file.
+* ``demultiplex``: :py:func:`riboviz.demultiplex_fastq.demultiplex` on
+  a multiplexed FASTQ file, allowing 1 mismatch.
+* ``barcode_matches``: :py:func:`riboviz.barcodes_umis.barcode_matches`
+  on the header of every read in a multiplexed FASTQ file, for every
+  sample barcode.
+* ``fastq_count_sequences``: :py:func:`riboviz.fastq.count_sequences`
+  on a FASTQ file.
+* ``sam_count_sequences``, ``bam_count_sequences``:
+  :py:func:`riboviz.sam_bam.count_sequences` on a SAM file and a BAM
+  file.
+* ``count_reads_df``: :py:func:`riboviz.count_reads.count_reads_df` on
+  a workflow directory tree with 2 samples.
+* ``compare_fastq``, ``compare_sam``, ``compare_bam``,
+  ``compare_bedgraph``, ``compare_tsv``:
+  :py:func:`riboviz.compare_files.compare_files` on a file and a copy.
+
+The datasets are created by :py:func:`make_dataset` and reused by
+subsequent benchmark runs. FASTQ files are simulated by
+:py:func:`riboviz.simulate_fastq.simulate_fastq` from the vignette
+FASTA and GFF files. SAM files of aligned reads, with mismatches, and
+unaligned reads are simulated by :py:func:`write_sam`.
+
+Results are appended to a tab-separated values file, along with the
+version of RiboViz, so a history of results across commits is built
+up, and can be compared to a baseline to detect regressions (see
+:py:func:`compare_benchmarks`).
+"""
+import collections
+import contextlib
+import datetime
+import io
+import os
+import os.path
+import shutil
+import statistics
+import tempfile
+import time
+import yaml
+import riboviz
+from riboviz import barcodes_umis
+from riboviz import bedgraph
+from riboviz import compare_files
+from riboviz import count_reads
+from riboviz import demultiplex_fastq
+from riboviz import fastq
+from riboviz import params
+from riboviz import provenance
+from riboviz import sam_bam
+from riboviz import sample_sheets
+from riboviz import simulate_fastq
+from riboviz import startup_benchmark
+from riboviz import trim_5p_mismatch
+from riboviz import workflow_files
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pysam = lazy_import("pysam")
+
+FASTA_FILE = os.path.join(riboviz.BASE_PATH, "vignette", "input",
+                          "yeast_YAL_CDS_w_250utrs.fa")
+""" FASTA file from which reads are simulated. """
+GFF_FILE = os.path.join(riboviz.BASE_PATH, "vignette", "input",
+                        "yeast_YAL_CDS_w_250utrs.gff3")
+""" GFF file from which reads are simulated. """
+DEFAULT_SIZES = [10000, 100000, 1000000]
+""" Default dataset sizes, in reads. """
+DEFAULT_REPEATS = 3
+""" Default number of runs of each benchmark case. """
+DEFAULT_SEED = 42
+""" Default seed for simulating datasets. """
+DEFAULT_THRESHOLD = 0.2
+"""
+Default relative increase in median time, over a baseline, above
+which a benchmark case is deemed to have regressed.
+"""
+NUM_SAMPLES = 4
+""" Number of samples in multiplexed FASTQ files. """
+WORKFLOW_SAMPLES = ["S0", "S1"]
+""" Samples in workflow directory trees. """
+DATASET_DIR_FORMAT = "reads_{}"
+""" Dataset directory name format. """
+FASTQ_FILE = "reads.fastq"
+""" Dataset FASTQ file name. """
+MULTIPLEX_FASTQ_FILE = "multiplex.fastq"
+"""
+Dataset multiplexed FASTQ file name, with barcodes and UMIs
+extracted into headers.
+"""
+SAMPLE_SHEET_FILE = "multiplex_barcodes.tsv"
+""" Dataset sample sheet file name. """
+SAM_FILE = workflow_files.ORF_MAP_SAM
+""" Dataset SAM file name. """
+BAM_FILE = "orf_map.bam"
+""" Dataset BAM file name. """
+BEDGRAPH_FILE = workflow_files.PLUS_BEDGRAPH
+""" Dataset bedGraph file name. """
+TSV_FILE = "counts.tsv"
+""" Dataset TSV file name. """
+CONFIG_FILE = "config.yaml"
+""" Dataset workflow configuration file name. """
+WORKFLOW_DIRS = ["input", "tmp", "output"]
+""" Dataset workflow input, temporary and output directory names. """
+SAM_FORMAT = "{}\t{}\t{}\t{}\t255\t{}M\t*\t0\t0\t{}\t{}\tNM:i:{}\tMD:Z:{}\n"
+""" SAM aligned read format. """
+CASE = "Case"
+""" Benchmark results column name (case). """
+NUM_READS = "NumReads"
+""" Benchmark results column name (dataset size in reads). """
+REPEATS = "Repeats"
+""" Benchmark results column name (number of runs). """
+READS_PER_SECOND = "ReadsPerSecond"
+""" Benchmark results column name (reads per second, from median). """
+VERSION = "Version"
+""" Benchmark results column name (RiboViz version). """
+DATE = "Date"
+""" Benchmark results column name (date of run). """
+HEADER = [CASE, NUM_READS, REPEATS, startup_benchmark.MIN_TIME,
+          startup_benchmark.MEDIAN_TIME, startup_benchmark.MAX_TIME,
+          READS_PER_SECOND, VERSION, DATE]
+""" Benchmark results column names. """
+BASELINE_TIME = "BaselineMedianTime"
+""" Benchmark comparison column name (baseline median time). """
+CHANGE = "Change"
+""" Benchmark comparison column name (relative change in median). """
+COMPARISON_HEADER = [CASE, NUM_READS, BASELINE_TIME,
+                     startup_benchmark.MEDIAN_TIME, CHANGE]
+""" Benchmark comparison column names. """
+
+DatasetTuple = collections.namedtuple(
+    "DatasetTuple", ["num_reads", "fastq_file", "multiplex_fastq_file",
+                     "sample_sheet_file", "sam_file", "bam_file",
+                     "bedgraph_file", "tsv_file", "config_file",
+                     "input_dir", "tmp_dir", "output_dir"])
+"""
+Benchmark dataset files.
+
+* ``num_reads``: Number of reads (int).
+* ``fastq_file``: FASTQ file.
+* ``multiplex_fastq_file``: Multiplexed FASTQ file, with barcodes
+  and UMIs extracted into headers.
+* ``sample_sheet_file``: Sample sheet for ``multiplex_fastq_file``.
+* ``sam_file``: SAM file.
+* ``bam_file``: BAM file, sorted and indexed.
+* ``bedgraph_file``: bedGraph file.
+* ``tsv_file``: Tab-separated values file.
+* ``config_file``: Workflow configuration file.
+* ``input_dir``: Workflow input directory.
+* ``tmp_dir``: Workflow temporary directory.
+* ``output_dir``: Workflow output directory.
+"""
+
+
+def write_sam(sam_file, fasta_file, gff_file, num_reads, seed):
+    """
+    Write a SAM file of simulated alignments of reads to the
+    transcripts in a FASTA file (with CDSs in a GFF file, see
+    :py:func:`riboviz.simulate_fastq.load_reference`). Each read is,
+    with probabilities:
+
+    * 0.05: unaligned.
+    * 0.60: aligned with no mismatches.
+    * 0.20: aligned with a mismatch at the 5' end.
+    * 0.05: aligned with mismatches at the two 5' nts.
+    * 0.05: aligned with a mismatch elsewhere.
+    * 0.05: aligned with two mismatches elsewhere.
+
+    Aligned reads are on the minus strand with probability 0.1. Each
+    aligned read has ``MD`` and ``NM`` tags describing its
+    mismatches.
+
+    :param sam_file: SAM file
+    :type sam_file: str or unicode
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :param seed: Random number generator seed
+    :type seed: int
+    """
+    reference = simulate_fastq.load_reference(fasta_file, gff_file)
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(6, size=num_reads,
+                       p=[0.05, 0.6, 0.2, 0.05, 0.05, 0.05])
+    genes = rng.integers(0, len(reference.names), num_reads)
+    lengths = np.minimum(rng.integers(28, 31, num_reads),
+                         reference.lengths[genes])
+    positions = rng.integers(1, reference.lengths[genes] - lengths + 2)
+    is_minus = rng.random(num_reads) < 0.1
+    mismatches = rng.integers(2, 20, (num_reads, 2))
+    nts = np.array(list(simulate_fastq.NUCLEOTIDES))
+    sequences = nts[rng.integers(0, len(nts), (num_reads, 31))]
+    with open(sam_file, "w") as f:
+        f.write("@HD\tVN:1.0\tSO:unsorted\n")
+        for name, length in zip(reference.names, reference.lengths):
+            f.write("@SQ\tSN:{}\tLN:{}\n".format(name, length))
+        for index in range(num_reads):
+            kind = kinds[index]
+            length = int(lengths[index])
+            sequence = "".join(sequences[index, :length])
+            quality = "I" * length
+            name = "{}{:010d}".format(simulate_fastq.READ_NAME_PREFIX,
+                                      index)
+            if kind == 0:
+                f.write("{}\t4\t*\t0\t0\t*\t*\t0\t0\t{}\t{}\n".format(
+                    name, sequence, quality))
+                continue
+            first, second = sorted(mismatches[index])
+            if kind == 1:
+                md_tag, nm_tag = str(length), 0
+            elif kind == 2:
+                md_tag, nm_tag = "0A{}".format(length - 1), 1
+            elif kind == 3:
+                md_tag, nm_tag = "0A0C{}".format(length - 2), 2
+            elif kind == 4:
+                md_tag, nm_tag = "{}G{}".format(
+                    first, length - first - 1), 1
+            else:
+                second = max(second, first + 1)
+                md_tag, nm_tag = "{}G{}T{}".format(
+                    first, second - first - 1, length - second - 1), 2
+            flag = 0
+            if is_minus[index]:
+                flag = 16
+                if kind in [2, 3]:
+                    # Mismatches at the 5' end of a minus strand read
+                    # are at the end of the MD tag.
+                    md_tag = "{}A0".format(length - 1) if kind == 2 \
+                        else "{}C0A0".format(length - 2)
+            f.write(SAM_FORMAT.format(
+                name, flag, reference.names[genes[index]],
+                positions[index], length, sequence, quality, nm_tag,
+                md_tag))
+
+
+def get_dataset(data_dir, num_reads):
+    """
+    Get the files of a benchmark dataset. The files may not exist
+    (see :py:func:`make_dataset`).
+
+    :param data_dir: Datasets directory
+    :type data_dir: str or unicode
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :return: Dataset
+    :rtype: DatasetTuple
+    """
+    dataset_dir = os.path.join(data_dir,
+                               DATASET_DIR_FORMAT.format(num_reads))
+    return DatasetTuple(num_reads,
+                        *[os.path.join(dataset_dir, file_name)
+                          for file_name in [FASTQ_FILE,
+                                            MULTIPLEX_FASTQ_FILE,
+                                            SAMPLE_SHEET_FILE,
+                                            SAM_FILE,
+                                            BAM_FILE,
+                                            BEDGRAPH_FILE,
+                                            TSV_FILE,
+                                            CONFIG_FILE] + WORKFLOW_DIRS])
+
+
+def make_dataset(data_dir, num_reads, seed=DEFAULT_SEED,
+                 fasta_file=FASTA_FILE, gff_file=GFF_FILE):
+    """
+    Make a benchmark dataset, if it does not already exist, in a
+    directory named using :py:const:`DATASET_DIR_FORMAT`.
+
+    The workflow directory tree has, for each of
+    :py:const:`WORKFLOW_SAMPLES`, an input FASTQ file and the FASTQ
+    and SAM files written by the workflow's ``cutadapt``, ``hisat2``
+    and :py:mod:`riboviz.tools.trim_5p_mismatch` steps. These are
+    symbolic links to the dataset's FASTQ and SAM files.
+
+    :param data_dir: Datasets directory
+    :type data_dir: str or unicode
+    :param num_reads: Number of reads
+    :type num_reads: int
+    :param seed: Random number generator seed
+    :type seed: int
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :param gff_file: GFF2/GFF3 file
+    :type gff_file: str or unicode
+    :return: Dataset
+    :rtype: DatasetTuple
+    """
+    dataset = get_dataset(data_dir, num_reads)
+    if all(os.path.exists(file_name) for file_name in dataset[1:]):
+        return dataset
+    dataset_dir = os.path.dirname(dataset.fastq_file)
+    if os.path.exists(dataset_dir):
+        shutil.rmtree(dataset_dir)
+    os.makedirs(dataset_dir)
+    simulate_fastq.simulate_fastq(fasta_file, gff_file, num_reads,
+                                  dataset.fastq_file,
+                                  dataset.multiplex_fastq_file,
+                                  dataset.sample_sheet_file,
+                                  num_samples=NUM_SAMPLES, seed=seed)
+    write_sam(dataset.sam_file, fasta_file, gff_file, num_reads, seed)
+    # As in the workflow, the BAM file has aligned reads only.
+    aligned_bam_file = os.path.join(dataset_dir, "aligned.bam")
+    pysam.view("-b", "-F", "4", "-o", aligned_bam_file, dataset.sam_file,
+               catch_stdout=False)
+    pysam.sort("-o", dataset.bam_file, aligned_bam_file)
+    os.remove(aligned_bam_file)
+    pysam.index(dataset.bam_file)
+    minus_bedgraph_file = os.path.join(dataset_dir,
+                                       workflow_files.MINUS_BEDGRAPH)
+    bedgraph.write_bedgraphs(dataset.bam_file, dataset.bedgraph_file,
+                             minus_bedgraph_file)
+    _, data = bedgraph.load_bedgraph(minus_bedgraph_file)
+    with open(dataset.tsv_file, "w") as f:
+        f.write(provenance.get_provenance(__file__))
+        data.to_csv(f, sep="\t", index=False)
+    for directory in [dataset.input_dir, dataset.tmp_dir,
+                      dataset.output_dir]:
+        os.mkdir(directory)
+    for sample in WORKFLOW_SAMPLES:
+        os.symlink(dataset.fastq_file, os.path.join(
+            dataset.input_dir, fastq.FASTQ_FORMAT.format(sample)))
+        sample_dir = os.path.join(dataset.tmp_dir, sample)
+        os.mkdir(sample_dir)
+        for file_name in [workflow_files.ADAPTER_TRIM_FQ,
+                          workflow_files.NON_RRNA_FQ,
+                          workflow_files.UNALIGNED_FQ]:
+            os.symlink(dataset.fastq_file,
+                       os.path.join(sample_dir, file_name))
+        for file_name in [workflow_files.RRNA_MAP_SAM,
+                          workflow_files.ORF_MAP_SAM,
+                          workflow_files.ORF_MAP_CLEAN_SAM]:
+            os.symlink(dataset.sam_file,
+                       os.path.join(sample_dir, file_name))
+    with open(dataset.config_file, "w") as f:
+        yaml.dump({params.FQ_FILES: {
+            sample: fastq.FASTQ_FORMAT.format(sample)
+            for sample in WORKFLOW_SAMPLES}}, f)
+    return dataset
+
+
+def _copy_for_compare(file_name, work_dir):
+    """
+    Copy a file, and any BAM index file, into a directory, keeping
+    its name, for comparison by
+    :py:func:`riboviz.compare_files.compare_files`.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param work_dir: Directory
+    :type work_dir: str or unicode
+    :return: Copied file name
+    :rtype: str or unicode
+    """
+    copy_dir = os.path.join(work_dir, "copy")
+    os.makedirs(copy_dir, exist_ok=True)
+    copy_file = shutil.copy(file_name, copy_dir)
+    bai_file = sam_bam.BAI_FORMAT.format(file_name)
+    if os.path.exists(bai_file):
+        shutil.copy(bai_file, copy_dir)
+    return copy_file
+
+
+def _barcode_matches_case(dataset):
+    """
+    Get a function that calls
+    :py:func:`riboviz.barcodes_umis.barcode_matches` on the header of
+    every read in a multiplexed FASTQ file, for every sample barcode.
+
+    :param dataset: Dataset
+    :type dataset: DatasetTuple
+    :return: Function
+    :rtype: callable
+    """
+    with open(dataset.multiplex_fastq_file) as f:
+        headers = [line for index, line in enumerate(f) if index % 4 == 0]
+    barcodes = list(sample_sheets.load_sample_sheet(
+        dataset.sample_sheet_file)[sample_sheets.TAG_READ])
+
+    def run():
+        for header in headers:
+            for barcode in barcodes:
+                barcodes_umis.barcode_matches(header, barcode, 1)
+    return run
+
+
+def get_cases():
+    """
+    Get the benchmark cases. Each case is a function that takes a
+    dataset and a working directory and returns a function, with no
+    arguments, to be timed. Any preparation is done before the
+    function is returned.
+
+    :return: Cases, keyed by name
+    :rtype: collections.OrderedDict(str or unicode -> callable)
+    """
+    cases = collections.OrderedDict()
+    cases["trim_5p_mismatch"] = \
+        lambda dataset, work_dir: lambda: trim_5p_mismatch.trim_5p_mismatch(
+            dataset.sam_file, os.path.join(work_dir, "trim.sam"))
+    cases["demultiplex"] = \
+        lambda dataset, work_dir: lambda: demultiplex_fastq.demultiplex(
+            dataset.sample_sheet_file, dataset.multiplex_fastq_file,
+            mismatches=1, out_dir=os.path.join(work_dir, "deplex"))
+    cases["barcode_matches"] = \
+        lambda dataset, work_dir: _barcode_matches_case(dataset)
+    cases["fastq_count_sequences"] = \
+        lambda dataset, work_dir: lambda: fastq.count_sequences(
+            dataset.fastq_file)
+    cases["sam_count_sequences"] = \
+        lambda dataset, work_dir: lambda: sam_bam.count_sequences(
+            dataset.sam_file)
+    cases["bam_count_sequences"] = \
+        lambda dataset, work_dir: lambda: sam_bam.count_sequences(
+            dataset.bam_file)
+    cases["count_reads_df"] = \
+        lambda dataset, work_dir: lambda: count_reads.count_reads_df(
+            dataset.config_file, dataset.input_dir, dataset.tmp_dir,
+            dataset.output_dir)
+    for name, field in [("compare_fastq", "fastq_file"),
+                        ("compare_sam", "sam_file"),
+                        ("compare_bam", "bam_file"),
+                        ("compare_bedgraph", "bedgraph_file"),
+                        ("compare_tsv", "tsv_file")]:
+        cases[name] = _get_compare_case(field)
+    return cases
+
+
+def _get_compare_case(field):
+    """
+    Get a benchmark case that compares a dataset file to a copy using
+    :py:func:`riboviz.compare_files.compare_files`.
+
+    :param field: :py:class:`DatasetTuple` field with file name
+    :type field: str or unicode
+    :return: Case
+    :rtype: callable
+    """
+    def case(dataset, work_dir):
+        file_name = getattr(dataset, field)
+        copy_file = _copy_for_compare(file_name, work_dir)
+        return lambda: compare_files.compare_files(file_name, copy_file)
+    return case
+
+
+CASES = list(get_cases())
+""" Benchmark case names. """
+
+
+def time_case(function, repeats=DEFAULT_REPEATS):
+    """
+    Run a function several times, discarding anything it prints, and
+    get the wall-clock time taken by each run.
+
+    :param function: Function
+    :type function: callable
+    :param repeats: Number of runs
+    :type repeats: int
+    :return: Times, in seconds
+    :rtype: list(float)
+    """
+    times = []
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(data_dir, sizes=None, cases=None,
+                   repeats=DEFAULT_REPEATS, seed=DEFAULT_SEED):
+    """
+    Run benchmark cases on datasets of each size, making the datasets
+    if they do not already exist (see :py:func:`make_dataset`).
+
+    :param data_dir: Datasets directory
+    :type data_dir: str or unicode
+    :param sizes: Dataset sizes, in reads, if ``None`` then \
+    :py:const:`DEFAULT_SIZES` is used
+    :type sizes: list(int)
+    :param cases: Case names, if ``None`` then all of \
+    :py:const:`CASES` are run
+    :type cases: list(str or unicode)
+    :param repeats: Number of runs of each case
+    :type repeats: int
+    :param seed: Random number generator seed for making datasets
+    :type seed: int
+    :return: Benchmark results with columns :py:const:`HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    :raise AssertionError: if any case is not in :py:const:`CASES`
+    """
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    all_cases = get_cases()
+    if cases is None:
+        cases = list(all_cases)
+    unknown = [case for case in cases if case not in all_cases]
+    assert not unknown, "Unknown benchmark cases: {}".format(
+        ", ".join(unknown))
+    version = provenance.get_version(__file__)
+    date = datetime.datetime.now().isoformat(timespec="seconds")
+    rows = []
+    for num_reads in sizes:
+        dataset = make_dataset(data_dir, num_reads, seed)
+        for case in cases:
+            work_dir = tempfile.mkdtemp(prefix="benchmark_",
+                                        dir=data_dir)
+            try:
+                times = time_case(all_cases[case](dataset, work_dir),
+                                  repeats)
+            finally:
+                shutil.rmtree(work_dir)
+            median = statistics.median(times)
+            rows.append([case, num_reads, repeats, min(times), median,
+                         max(times),
+                         num_reads / median if median > 0 else 0.0,
+                         version, date])
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+def load_benchmarks(tsv_file):
+    """
+    Load benchmark results from a tab-separated values file.
+
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :return: Benchmark results with columns :py:const:`HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    :raise AssertionError: if any column is missing
+    """
+    results = pd.read_csv(tsv_file, sep="\t", comment="#")
+    missing = [column for column in HEADER
+               if column not in results.columns]
+    assert not missing, "Missing columns {} in {}".format(
+        ", ".join(missing), tsv_file)
+    return results
+
+
+def save_benchmarks(results, tsv_file):
+    """
+    Append benchmark results to a tab-separated values file, so the
+    file holds a history of results. Any existing results are kept.
+
+    :param results: Benchmark results with columns :py:const:`HEADER`
+    :type results: pandas.core.frame.DataFrame
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :return: All benchmark results in the file
+    :rtype: pandas.core.frame.DataFrame
+    """
+    if os.path.exists(tsv_file):
+        results = pd.concat([load_benchmarks(tsv_file), results],
+                            ignore_index=True)
+    with open(tsv_file, "w") as f:
+        f.write(provenance.get_provenance(__file__))
+        results[HEADER].to_csv(f, sep="\t", index=False,
+                               float_format="%.6f")
+    return results
+
+
+def compare_benchmarks(baseline, results):
+    """
+    Compare benchmark results to a baseline. If the baseline has
+    several results for the same case and dataset size (for example
+    it is a history of results), the last of these is used.
+
+    :param baseline: Baseline benchmark results
+    :type baseline: pandas.core.frame.DataFrame
+    :param results: Benchmark results
+    :type results: pandas.core.frame.DataFrame
+    :return: Comparison, with columns :py:const:`COMPARISON_HEADER`, \
+    for cases and sizes in both, where :py:const:`CHANGE` is the \
+    relative change in median time
+    :rtype: pandas.core.frame.DataFrame
+    """
+    baseline = baseline.drop_duplicates([CASE, NUM_READS], keep="last")
+    baseline = baseline[[CASE, NUM_READS, startup_benchmark.MEDIAN_TIME]]
+    baseline = baseline.rename(
+        columns={startup_benchmark.MEDIAN_TIME: BASELINE_TIME})
+    comparison = baseline.merge(
+        results[[CASE, NUM_READS, startup_benchmark.MEDIAN_TIME]],
+        on=[CASE, NUM_READS])
+    comparison[CHANGE] = comparison[startup_benchmark.MEDIAN_TIME] / \
+        comparison[BASELINE_TIME] - 1
+    return comparison[COMPARISON_HEADER]
+
+
+def get_regressions(comparison, threshold=DEFAULT_THRESHOLD):
+    """
+    Get the benchmark cases whose median time has increased, relative
+    to a baseline, by more than a threshold.
+
+    :param comparison: Comparison, see :py:func:`compare_benchmarks`
+    :type comparison: pandas.core.frame.DataFrame
+    :param threshold: Threshold e.g. 0.2 for a 20% increase
+    :type threshold: float
+    :return: Comparison rows for regressed cases
+    :rtype: pandas.core.frame.DataFrame
+    """
+    return comparison[comparison[CHANGE] > threshold]
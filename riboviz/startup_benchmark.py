@@ -0,0 +1,207 @@
+"""
+Command-line tool start-up time benchmark functions.
+
+Each tool in :py:mod:`riboviz.tools` is run as ``python -m
+riboviz.tools.<tool> --help`` several times, and the wall-clock times
+taken are recorded, along with any of :py:const:`HEAVY_MODULES` that
+were imported. As workflows run tools many times, the start-up time
+of tools matters, and importing any of :py:const:`HEAVY_MODULES`
+when only asked for help indicates a module-level import that should
+use :py:func:`riboviz.lazy_import.lazy_import`.
+"""
+import json
+import os
+import os.path
+import statistics
+import subprocess
+import sys
+import time
+import riboviz
+from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
+
+HEAVY_MODULES = ["Bio", "git", "gffutils", "h5py", "numpy", "pandas",
+                 "pysam"]
+""" Modules that are slow to import. """
+TOOL = "Tool"
+""" Benchmark results column name (tool). """
+MIN_TIME = "MinTime"
+""" Benchmark results column name (minimum time, in seconds). """
+MEDIAN_TIME = "MedianTime"
+""" Benchmark results column name (median time, in seconds). """
+MAX_TIME = "MaxTime"
+""" Benchmark results column name (maximum time, in seconds). """
+HEAVY_IMPORTS = "HeavyImports"
+"""
+Benchmark results column name (comma-separated
+:py:const:`HEAVY_MODULES` imported).
+"""
+HEADER = [TOOL, MIN_TIME, MEDIAN_TIME, MAX_TIME, HEAVY_IMPORTS]
+""" Benchmark results column names. """
+NO_HEAVY_IMPORTS = "-"
+""" :py:const:`HEAVY_IMPORTS` value if there are none. """
+MODULES_MARKER = "RIBOVIZ_STARTUP_MODULES:"
+""" Prefix of line with imported modules output by a tool run. """
+RUN_TOOL_SCRIPT = """
+import json
+import runpy
+import sys
+sys.argv = [{tool!r}] + {args!r}
+try:
+    runpy.run_module({tool!r}, run_name="__main__", alter_sys=True)
+except SystemExit:
+    pass
+print({marker!r} + json.dumps(
+    sorted(name for name in {modules!r} if name in sys.modules)))
+"""
+"""
+Python script to run a tool as ``__main__`` then print the
+:py:const:`HEAVY_MODULES` it imported.
+"""
+
+
+def get_tools():
+    """
+    Get the names of the command-line tools in
+    :py:const:`riboviz.PY_SCRIPTS`.
+
+    :return: Tool names e.g. ``trim_5p_mismatch``
+    :rtype: list(str or unicode)
+    """
+    return sorted(os.path.splitext(name)[0]
+                  for name in os.listdir(riboviz.PY_SCRIPTS)
+                  if name.endswith(".py") and name != "__init__.py")
+
+
+def get_tool_module(tool):
+    """
+    Get the module name of a tool.
+
+    :param tool: Tool name e.g. ``trim_5p_mismatch``
+    :type tool: str or unicode
+    :return: Module name e.g. ``riboviz.tools.trim_5p_mismatch``
+    :rtype: str or unicode
+    """
+    return "riboviz.tools." + tool
+
+
+def get_environment():
+    """
+    Get the environment in which to run tools, with
+    :py:const:`riboviz.BASE_PATH` on the ``PYTHONPATH``.
+
+    :return: Environment
+    :rtype: dict
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [riboviz.BASE_PATH] +
+        ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    return env
+
+
+def get_heavy_imports(tool, args=None):
+    """
+    Run a tool and get the :py:const:`HEAVY_MODULES` it imports.
+
+    :param tool: Tool name e.g. ``trim_5p_mismatch``
+    :type tool: str or unicode
+    :param args: Command-line arguments, default ``["--help"]``
+    :type args: list(str or unicode)
+    :return: Modules imported
+    :rtype: list(str or unicode)
+    :raise AssertionError: if the imported modules cannot be \
+    determined
+    """
+    if args is None:
+        args = ["--help"]
+    script = RUN_TOOL_SCRIPT.format(tool=get_tool_module(tool),
+                                    args=list(args),
+                                    marker=MODULES_MARKER,
+                                    modules=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script],
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL,
+                            env=get_environment(),
+                            universal_newlines=True,
+                            check=False)
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith(MODULES_MARKER):
+            return json.loads(line[len(MODULES_MARKER):])
+    raise AssertionError(
+        "Could not determine modules imported by {}".format(tool))
+
+
+def time_tool(tool, args=None, repeats=5):
+    """
+    Run ``python -m riboviz.tools.<tool>`` several times and get the
+    wall-clock time taken by each run.
+
+    :param tool: Tool name e.g. ``trim_5p_mismatch``
+    :type tool: str or unicode
+    :param args: Command-line arguments, default ``["--help"]``
+    :type args: list(str or unicode)
+    :param repeats: Number of runs
+    :type repeats: int
+    :return: Times, in seconds
+    :rtype: list(float)
+    """
+    if args is None:
+        args = ["--help"]
+    cmd = [sys.executable, "-m", get_tool_module(tool)] + list(args)
+    env = get_environment()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, env=env, check=False)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def benchmark_startup(tools=None, repeats=5):
+    """
+    Benchmark the start-up time of tools, run with ``--help``.
+
+    :param tools: Tool names, if ``None`` then all tools from \
+    :py:func:`get_tools` are benchmarked
+    :type tools: list(str or unicode)
+    :param repeats: Number of runs of each tool
+    :type repeats: int
+    :return: Benchmark results with columns :py:const:`HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    """
+    if tools is None:
+        tools = get_tools()
+    rows = []
+    for tool in tools:
+        times = time_tool(tool, repeats=repeats)
+        modules = get_heavy_imports(tool)
+        rows.append([tool, min(times), statistics.median(times),
+                     max(times),
+                     ",".join(modules) if modules else NO_HEAVY_IMPORTS])
+    return pd.DataFrame(rows, columns=HEADER)
+
+
+def benchmark_startup_to_tsv(tsv_file, tools=None, repeats=5):
+    """
+    Benchmark the start-up time of tools, run with ``--help``, and
+    write the results to a tab-separated values file. See
+    :py:func:`benchmark_startup`.
+
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    :param tools: Tool names, if ``None`` then all tools from \
+    :py:func:`get_tools` are benchmarked
+    :type tools: list(str or unicode)
+    :param repeats: Number of runs of each tool
+    :type repeats: int
+    :return: Benchmark results with columns :py:const:`HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    """
+    results = benchmark_startup(tools, repeats)
+    with open(tsv_file, 'w') as f:
+        f.write(provenance.get_provenance(__file__))
+        results.to_csv(f, sep="\t", index=False, float_format="%.4f")
+    return results
@@ -0,0 +1,316 @@
+"""
+``generate_stats_figs.R`` analysis block constants and functions.
+
+``generate_stats_figs.R`` runs a number of independent analyses, or
+blocks, each of which can be requested via its ``--blocks`` option.
+:py:const:`BLOCKS` declares, for each block:
+
+* The configuration parameters under which it is run.
+* Its input files: the H5 file and any files named by configuration
+  parameters. Blocks that read the ORF GFF file also read the
+  annotation TSV file written to the index directory, if configured
+  (see :py:func:`get_block_files`).
+* The configuration parameters whose values it uses.
+* Its output files.
+
+From these, a fingerprint of each block is calculated, a SHA-256
+digest of the block's name, the content of the R scripts, the content
+of its input files and the values of its parameters. Fingerprints of
+blocks that have run successfully are recorded, in
+:py:const:`FINGERPRINTS_FILE`, in the output directory, so a block
+need only be rerun if its fingerprint changes or any of its output
+files are missing.
+"""
+import collections
+import hashlib
+import json
+import os
+import os.path
+from riboviz import params
+from riboviz import utils
+from riboviz import workflow_files
+from riboviz import workflow_r
+from riboviz.utils import value_in_dict
+
+READ_LENGTHS = "read_lengths"
+""" Distribution of lengths of mapped reads block. """
+PERIODICITY = "periodicity"
+""" Three-nucleotide periodicity block. """
+RIBOGRID = "ribogrid"
+""" Start codon ribogrid block. """
+POS_SP_NT_FREQ = "pos_sp_nt_freq"
+""" Position-specific nucleotide frequency block. """
+FRAMES = "frames"
+""" Read frame for every ORF block. """
+POS_SP = "pos_sp"
+""" Position-specific distribution of reads block. """
+TPMS = "tpms"
+""" TPMs of genes block. """
+FEATURES = "features"
+""" TPMs correlations with features block. """
+CODON_DENSITY = "codon_density"
+""" Codon-specific ribosome densities block. """
+ALL = "all"
+""" ``generate_stats_figs.R`` ``--blocks`` value to run all blocks. """
+
+R_SCRIPTS = [workflow_r.GENERATE_STATS_FIGS_R,
+             "stats_figs_block_functions.R",
+             "read_count_functions.R"]
+""" R scripts whose content contributes to fingerprints. """
+FINGERPRINTS_FILE = "stats_blocks.json"
+""" Block fingerprints file, in the output directory. """
+POS_SP_MRNA_NORM_COVERAGE_TSV = "pos_sp_mrns_norm_coverage.tsv"
+""" ``generate_stats_figs.R`` output file, for mRNA datasets. """
+POS_SP_MRNA_NORM_COVERAGE_PDF = "pos_sp_mrna_norm_coverage.pdf"
+""" ``generate_stats_figs.R`` output file, for mRNA datasets. """
+
+StatsBlockTuple = collections.namedtuple(
+    "StatsBlockTuple", ["name", "conditions", "files", "parameters",
+                        "outputs"])
+"""
+``generate_stats_figs.R`` analysis block.
+
+* ``name``: Block name, as accepted by ``--blocks``.
+* ``conditions``: Configuration parameters, each with the value \
+  (``True`` or ``False``) it must have for the block to run. For \
+  ``True`` the parameter must be present with a non-empty value.
+* ``files``: Configuration parameters naming the block's input files, \
+  in addition to the H5 file.
+* ``parameters``: Configuration parameters whose values the block \
+  uses.
+* ``outputs``: Output files, relative to the output directory. For \
+  :py:const:`POS_SP` these are the outputs for RPF datasets (see \
+  :py:func:`get_block_outputs`).
+"""
+
+BLOCKS = [
+    StatsBlockTuple(READ_LENGTHS, [], [],
+                    [params.DATASET],
+                    [workflow_r.READ_LENGTHS_TSV,
+                     workflow_r.READ_LENGTHS_PDF]),
+    StatsBlockTuple(PERIODICITY, [], [params.ORF_GFF_FILE],
+                    [params.DATASET],
+                    [workflow_r.THREE_NT_PERIODICITY_TSV,
+                     workflow_r.THREE_NT_PERIODICITY_PDF]),
+    StatsBlockTuple(RIBOGRID, [], [params.ORF_GFF_FILE],
+                    [params.DATASET],
+                    [workflow_r.START_CODON_RIBOGRID_PDF,
+                     workflow_r.START_CODON_RIBOGRID_BAR_PDF]),
+    StatsBlockTuple(POS_SP_NT_FREQ, [(params.DO_POS_SP_NT_FREQ, True)],
+                    [params.ORF_FASTA_FILE],
+                    [params.DATASET, params.MIN_READ_LENGTH,
+                     params.MAX_READ_LENGTH,
+                     params.NATIVE_POS_SP_NT_FREQ],
+                    [workflow_r.POS_SP_NT_FREQ_TSV]),
+    StatsBlockTuple(FRAMES, [(params.ASITE_DISP_LENGTH_FILE, True)],
+                    [params.ORF_GFF_FILE, params.ASITE_DISP_LENGTH_FILE],
+                    [params.DATASET, params.MIN_READ_LENGTH,
+                     params.COUNT_THRESHOLD],
+                    [workflow_r.THREE_NT_FRAME_BY_GENE_TSV,
+                     workflow_r.THREE_NT_FRAME_PROP_BY_GENE_PDF]),
+    StatsBlockTuple(POS_SP, [], [],
+                    [params.DATASET, params.RPF, params.BUFFER,
+                     params.MIN_READ_LENGTH, params.MAX_READ_LENGTH,
+                     params.COUNT_THRESHOLD],
+                    [workflow_r.POS_SP_RPF_NORM_READS_TSV,
+                     workflow_r.POS_SP_RPF_NORM_READS_PDF]),
+    StatsBlockTuple(TPMS, [], [],
+                    [params.DATASET],
+                    [workflow_r.TPMS_TSV]),
+    StatsBlockTuple(FEATURES, [(params.FEATURES_FILE, True)],
+                    [params.FEATURES_FILE],
+                    [params.DATASET],
+                    [workflow_r.FEATURES_PDF]),
+    StatsBlockTuple(CODON_DENSITY, [(params.T_RNA_FILE, True),
+                                    (params.CODON_POSITIONS_FILE, True),
+                                    (params.RPF, True)],
+                    [params.T_RNA_FILE, params.CODON_POSITIONS_FILE],
+                    [params.DATASET, params.BUFFER,
+                     params.COUNT_THRESHOLD],
+                    [workflow_r.CODON_RIBODENS_TSV,
+                     workflow_r.CODON_RIBODENS_PDF])
+]
+""" ``generate_stats_figs.R`` analysis blocks. """
+
+
+def get_block_names():
+    """
+    Get the names of all blocks.
+
+    :return: Block names
+    :rtype: list(str or unicode)
+    """
+    return [block.name for block in BLOCKS]
+
+
+def get_blocks(config, names=None):
+    """
+    Get the blocks to be run for a configuration, those whose
+    conditions hold.
+
+    :param config: Workflow configuration
+    :type config: dict
+    :param names: Block names, or ``None`` for all blocks
+    :type names: list(str or unicode)
+    :return: Blocks
+    :rtype: list(StatsBlockTuple)
+    :raise AssertionError: if any name is not a block name
+    """
+    if names is None:
+        names = get_block_names()
+    unknown = set(names) - set(get_block_names())
+    assert not unknown, "Unknown stats blocks: {}".format(
+        ", ".join(sorted(unknown)))
+    return [block for block in BLOCKS
+            if block.name in names and
+            all(bool(value_in_dict(parameter, config)) == value
+                for parameter, value in block.conditions)]
+
+
+def get_block_outputs(block, config):
+    """
+    Get the output files of a block. For the
+    :py:const:`POS_SP` block these depend on whether the dataset is an
+    RPF or mRNA dataset.
+
+    :param block: Block
+    :type block: StatsBlockTuple
+    :param config: Workflow configuration
+    :type config: dict
+    :return: Output files, relative to the output directory
+    :rtype: list(str or unicode)
+    """
+    if block.name == POS_SP and not value_in_dict(params.RPF, config):
+        return [POS_SP_MRNA_NORM_COVERAGE_TSV,
+                POS_SP_MRNA_NORM_COVERAGE_PDF]
+    return list(block.outputs)
+
+
+def get_block_files(block, h5_file, config):
+    """
+    Get the input files of a block: the H5 file and any files named by
+    the block's configuration parameters. If the block reads the ORF
+    GFF file and ``dir_index`` is configured then
+    ``generate_stats_figs.R`` reads the ORF GFF features from
+    :py:const:`riboviz.workflow_files.ORF_FEATURES_TSV` in
+    ``dir_index``, so this file is also an input file.
+
+    :param block: Block
+    :type block: StatsBlockTuple
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :return: Input files
+    :rtype: list(str or unicode)
+    """
+    files = [h5_file]
+    files += [config[parameter] for parameter in block.files
+              if value_in_dict(parameter, config)]
+    if params.ORF_GFF_FILE in block.files and \
+       value_in_dict(params.ORF_GFF_FILE, config) and \
+       value_in_dict(params.INDEX_DIR, config):
+        files.append(os.path.join(config[params.INDEX_DIR],
+                                  workflow_files.ORF_FEATURES_TSV))
+    return files
+
+
+def get_fingerprint(block, h5_file, config, r_scripts, digests=None):
+    """
+    Get the fingerprint of a block, a SHA-256 digest of the block's
+    name, the content of the R scripts, the content of its input
+    files (see :py:func:`get_block_files`) and the values of its
+    parameters.
+
+    :param block: Block
+    :type block: StatsBlockTuple
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param r_scripts: R scripts directory
+    :type r_scripts: str or unicode
+    :param digests: Digests of files already calculated, keyed by \
+    file name, which is updated with any digests calculated
+    :type digests: dict(str or unicode -> str or unicode)
+    :return: Fingerprint, as a hexadecimal string
+    :rtype: str or unicode
+    :raise FileNotFoundError: if a file cannot be found
+    """
+    if digests is None:
+        digests = {}
+
+    def get_digest(file_name):
+        if file_name not in digests:
+            digests[file_name] = utils.get_file_digest(file_name)
+        return digests[file_name]
+    files = [os.path.join(r_scripts, script) for script in R_SCRIPTS]
+    files += get_block_files(block, h5_file, config)
+    description = {
+        "block": block.name,
+        "files": [get_digest(file_name) for file_name in files],
+        "parameters": {parameter: config.get(parameter)
+                       for parameter in block.parameters}
+    }
+    return hashlib.sha256(json.dumps(
+        description, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_fingerprints(out_dir):
+    """
+    Load the fingerprints of blocks that have run successfully.
+
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :return: Fingerprints keyed by block name, empty if there is no \
+    fingerprints file or it cannot be parsed
+    :rtype: dict(str or unicode -> str or unicode)
+    """
+    fingerprints_file = os.path.join(out_dir, FINGERPRINTS_FILE)
+    if not os.path.exists(fingerprints_file):
+        return {}
+    try:
+        with open(fingerprints_file) as f:
+            fingerprints = json.load(f)
+    except ValueError:
+        return {}
+    return fingerprints if isinstance(fingerprints, dict) else {}
+
+
+def save_fingerprints(out_dir, fingerprints):
+    """
+    Save the fingerprints of blocks that have run successfully.
+
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :param fingerprints: Fingerprints keyed by block name
+    :type fingerprints: dict(str or unicode -> str or unicode)
+    """
+    fingerprints_file = os.path.join(out_dir, FINGERPRINTS_FILE)
+    tmp_file = fingerprints_file + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, fingerprints_file)
+
+
+def is_up_to_date(block, fingerprint, fingerprints, out_dir, config):
+    """
+    Is a block up to date, that is, does its recorded fingerprint
+    match and do all its output files exist?
+
+    :param block: Block
+    :type block: StatsBlockTuple
+    :param fingerprint: Block's current fingerprint
+    :type fingerprint: str or unicode
+    :param fingerprints: Recorded fingerprints keyed by block name
+    :type fingerprints: dict(str or unicode -> str or unicode)
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :return: ``True`` if up to date
+    :rtype: bool
+    """
+    return fingerprints.get(block.name) == fingerprint and \
+        all(os.path.exists(os.path.join(out_dir, output))
+            for output in get_block_outputs(block, config))
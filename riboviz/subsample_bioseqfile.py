@@ -1,28 +1,475 @@
 """
 Subsample an input FASTQ (or other sequencing) file, to produce a
 smaller file whose reads are randomly sampled from of the input with a
-fixed probability.
+fixed probability, or a fixed number of reads sampled uniformly at
+random.
+
+Records are not sampled by drawing a random number for every record.
+Instead, the number of records to skip before the next sampled record
+is drawn directly:
+
+* When sampling with a fixed probability ``p`` (Bernoulli sampling),
+  the number of records skipped between sampled records follows a
+  geometric distribution, ``floor(log(U) / log(1 - p))`` for ``U``
+  uniform on ``(0, 1)``.
+* When sampling a fixed number of records ``n`` (reservoir sampling),
+  the first ``n`` records fill a reservoir and the number of records
+  skipped before each replacement is drawn as in Li's "Algorithm L"
+  (K.-H. Li, "Reservoir-sampling algorithms of time complexity
+  O(n(1 + log(N/n)))", ACM TOMS 20(4), 1994). Sampled records are
+  written in the order they occur in the input.
+
+For FASTQ and FASTA files, skipped records are consumed as raw lines
+and sampled records are copied verbatim, so no records are parsed.
+FASTQ files are assumed to have four lines per record. Other file
+types are parsed using ``Bio.SeqIO``.
+
+Paired-end files can be sampled together, in which case the same
+records are sampled from each.
+
+Many files can be subsampled in parallel, see
+:py:func:`subsample_bioseqfiles`. Each file is sampled using a seed
+derived from a master seed and the file name, so the output files do
+not depend on the order in which files are processed. A manifest
+records, for each file, the number of records input and output.
 """
+import collections
+import contextlib
+import glob
 import gzip
+import hashlib
+import itertools
+import math
+import multiprocessing
 import os
 import os.path
-from random import random
-from Bio import SeqIO
+import random
+from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+pd = lazy_import("pandas")
+SeqIO = lazy_import("Bio.SeqIO")
+
+FASTQ_FILE_TYPES = ["fastq", "fastq-sanger", "fastq-solexa",
+                    "fastq-illumina"]
+""" ``Bio.SeqIO`` FASTQ file types whose records are read as lines. """
+FASTA_FILE_TYPES = ["fasta"]
+""" ``Bio.SeqIO`` FASTA file types whose records are read as lines. """
+FASTQ_RECORD_LINES = 4
+""" Number of lines in a FASTQ record. """
+GZ_EXTENSIONS = [".gz", ".gzip"]
+""" Extensions of gzipped files. """
+INPUT_FILE = "InputFile"
+""" Manifest column name (input file). """
+OUTPUT_FILE = "OutputFile"
+""" Manifest column name (output file). """
+SEED = "Seed"
+""" Manifest column name (seed used for file). """
+NUM_INPUT = "NumInput"
+""" Manifest column name (number of records input). """
+NUM_OUTPUT = "NumOutput"
+""" Manifest column name (number of records output). """
+FRACTION = "Fraction"
+""" Manifest column name (fraction of records output). """
+MANIFEST_HEADER = [INPUT_FILE, OUTPUT_FILE, SEED, NUM_INPUT, NUM_OUTPUT,
+                   FRACTION]
+""" Manifest column names. """
+MANIFEST_FILE = "subsample_manifest.tsv"
+""" Default manifest file name, in the output directory. """
+
+SubsampleCountsTuple = collections.namedtuple(
+    "SubsampleCountsTuple", ["num_input", "num_output"])
+"""
+Number of records input and output by
+:py:func:`subsample_bioseqfile`. For paired-end files, these are the
+numbers of records in each file.
+"""
+
+
+def consume(iterator, num_items):
+    """
+    Consume items from an iterator, without keeping them.
+
+    :param iterator: Iterator
+    :type iterator: iterator
+    :param num_items: Number of items
+    :type num_items: int
+    :return: Number of items consumed, less than ``num_items`` \
+    if the iterator is exhausted
+    :rtype: int
+    """
+    last = collections.deque(
+        enumerate(itertools.islice(iterator, num_items), 1), maxlen=1)
+    return last[0][0] if last else 0
+
+
+def get_header_id(header):
+    """
+    Get the record ID from a FASTQ or FASTA header line, the text
+    following the leading ``@`` or ``>`` up to the first whitespace.
+
+    :param header: Header line
+    :type header: str or unicode
+    :return: Record ID
+    :rtype: str or unicode
+    """
+    fields = header[1:].split(None, 1)
+    return fields[0] if fields else ""
+
+
+class FastqRecordReader:
+    """
+    Reader for FASTQ records as raw lines. ``num_records`` holds the
+    number of records skipped or read so far.
+    """
+
+    def __init__(self, handle):
+        """
+        :param handle: Text file handle
+        :type handle: io.TextIOBase
+        """
+        self.handle = handle
+        self.num_records = 0
+
+    def skip(self, num_records):
+        """
+        Skip records.
+
+        :param num_records: Number of records
+        :type num_records: int
+        :return: Number of records skipped, less than ``num_records`` \
+        if the end of the file is reached
+        :rtype: int
+        :raise AssertionError: if the file ends part way through a \
+        record
+        """
+        num_lines = consume(self.handle, num_records * FASTQ_RECORD_LINES)
+        assert num_lines % FASTQ_RECORD_LINES == 0, \
+            "Incomplete FASTQ record at end of file"
+        self.num_records += num_lines // FASTQ_RECORD_LINES
+        return num_lines // FASTQ_RECORD_LINES
+
+    def read(self):
+        """
+        Read a record.
+
+        :return: Record ID and record, or ``None`` if the end of the \
+        file is reached
+        :rtype: tuple(str or unicode, str or unicode)
+        :raise AssertionError: if the record is incomplete or does \
+        not start with ``@``
+        """
+        lines = list(itertools.islice(self.handle, FASTQ_RECORD_LINES))
+        if not lines:
+            return None
+        assert len(lines) == FASTQ_RECORD_LINES, \
+            "Incomplete FASTQ record at end of file"
+        assert lines[0].startswith("@"), \
+            "FASTQ record does not start with '@': {}".format(
+                lines[0].rstrip())
+        if not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        self.num_records += 1
+        return get_header_id(lines[0]), "".join(lines)
+
+
+class FastaRecordReader:
+    """
+    Reader for FASTA records as raw lines. ``num_records`` holds the
+    number of records skipped or read so far.
+    """
+
+    def __init__(self, handle):
+        """
+        :param handle: Text file handle
+        :type handle: io.TextIOBase
+        """
+        self.handle = handle
+        self.num_records = 0
+        self.header = None
+        for line in self.handle:
+            if line.startswith(">"):
+                self.header = line
+                break
+
+    def skip(self, num_records):
+        """
+        Skip records.
+
+        :param num_records: Number of records
+        :type num_records: int
+        :return: Number of records skipped, less than ``num_records`` \
+        if the end of the file is reached
+        :rtype: int
+        """
+        if num_records == 0 or self.header is None:
+            return 0
+        num_headers = 0
+        for line in self.handle:
+            if line.startswith(">"):
+                num_headers += 1
+                if num_headers == num_records:
+                    self.header = line
+                    self.num_records += num_records
+                    return num_records
+        self.header = None
+        self.num_records += num_headers + 1
+        return num_headers + 1
+
+    def read(self):
+        """
+        Read a record.
+
+        :return: Record ID and record, or ``None`` if the end of the \
+        file is reached
+        :rtype: tuple(str or unicode, str or unicode)
+        """
+        if self.header is None:
+            return None
+        lines = [self.header]
+        self.header = None
+        for line in self.handle:
+            if line.startswith(">"):
+                self.header = line
+                break
+            lines.append(line)
+        if not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        self.num_records += 1
+        return get_header_id(lines[0]), "".join(lines)
+
+
+class SeqIORecordReader:
+    """
+    Reader for records of any ``Bio.SeqIO`` file type.
+    ``num_records`` holds the number of records skipped or read so
+    far.
+    """
+
+    def __init__(self, handle, file_type):
+        """
+        :param handle: Text file handle
+        :type handle: io.TextIOBase
+        :param file_type: ``Bio.SeqIO`` file type
+        :type file_type: str or unicode
+        """
+        self.file_type = file_type
+        self.records = SeqIO.parse(handle, file_type)
+        self.num_records = 0
+
+    def skip(self, num_records):
+        """
+        Skip records.
+
+        :param num_records: Number of records
+        :type num_records: int
+        :return: Number of records skipped, less than ``num_records`` \
+        if the end of the file is reached
+        :rtype: int
+        """
+        num_skipped = consume(self.records, num_records)
+        self.num_records += num_skipped
+        return num_skipped
+
+    def read(self):
+        """
+        Read a record.
+
+        :return: Record ID and record, formatted as ``file_type``, \
+        or ``None`` if the end of the file is reached
+        :rtype: tuple(str or unicode, str or unicode)
+        """
+        record = next(self.records, None)
+        if record is None:
+            return None
+        self.num_records += 1
+        return record.id, record.format(self.file_type)
+
+
+def get_record_reader(handle, file_type):
+    """
+    Get a record reader for a file type.
+
+    :param handle: Text file handle
+    :type handle: io.TextIOBase
+    :param file_type: ``Bio.SeqIO`` file type
+    :type file_type: str or unicode
+    :return: Record reader
+    :rtype: FastqRecordReader or FastaRecordReader or \
+    SeqIORecordReader
+    """
+    if file_type in FASTQ_FILE_TYPES:
+        return FastqRecordReader(handle)
+    if file_type in FASTA_FILE_TYPES:
+        return FastaRecordReader(handle)
+    return SeqIORecordReader(handle, file_type)
+
+
+def open_bioseqfile(file_name, mode):
+    """
+    Open a file in text mode, using ``gzip`` if the file has an
+    extension in :py:const:`GZ_EXTENSIONS`.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param mode: ``r`` or ``w``
+    :type mode: str or unicode
+    :return: Text file handle
+    :rtype: io.TextIOBase
+    """
+    ext = os.path.splitext(file_name)[1]
+    if ext in GZ_EXTENSIONS:
+        return gzip.open(file_name, mode + "t")
+    return open(file_name, mode)
+
+
+def skip_records(readers, num_records):
+    """
+    Skip the same number of records in each reader.
+
+    :param readers: Record readers
+    :type readers: list
+    :param num_records: Number of records
+    :type num_records: int
+    :return: Number of records skipped, less than ``num_records`` \
+    if the end of the files is reached
+    :rtype: int
+    :raise AssertionError: if the files have different numbers of \
+    records
+    """
+    skipped = [reader.skip(num_records) for reader in readers]
+    assert len(set(skipped)) == 1, \
+        "Input files have different numbers of records"
+    return skipped[0]
+
+
+def read_records(readers):
+    """
+    Read a record from each reader.
+
+    :param readers: Record readers
+    :type readers: list
+    :return: Record ID and record from each reader, or ``None`` if \
+    the end of the files is reached
+    :rtype: list(tuple(str or unicode, str or unicode))
+    :raise AssertionError: if the files have different numbers of \
+    records
+    """
+    records = [reader.read() for reader in readers]
+    is_end = [record is None for record in records]
+    assert all(is_end) or not any(is_end), \
+        "Input files have different numbers of records"
+    return None if is_end[0] else records
+
+
+def get_uniform(rng):
+    """
+    Get a random number uniform on ``(0, 1)``.
+
+    :param rng: Random number generator
+    :type rng: random.Random
+    :return: Random number
+    :rtype: float
+    """
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def bernoulli_sample(readers, prob, rng):
+    """
+    Sample records with a fixed probability, drawing the number of
+    records to skip between sampled records from a geometric
+    distribution.
+
+    :param readers: Record readers
+    :type readers: list
+    :param prob: Proportion to sample
+    :type prob: float
+    :param rng: Random number generator
+    :type rng: random.Random
+    :return: Record ID and record from each reader, for each sampled \
+    record
+    :rtype: iterator(list(tuple(str or unicode, str or unicode)))
+    """
+    if prob <= 0:
+        return
+    log_q = math.log1p(-prob) if prob < 1 else None
+    while True:
+        if log_q is not None:
+            num_skip = int(math.log(get_uniform(rng)) / log_q)
+            if skip_records(readers, num_skip) < num_skip:
+                return
+        records = read_records(readers)
+        if records is None:
+            return
+        yield records
+
+
+def reservoir_sample(readers, num_records, rng):
+    """
+    Sample a fixed number of records uniformly at random, using
+    reservoir sampling with skips drawn as in "Algorithm L".
+
+    :param readers: Record readers
+    :type readers: list
+    :param num_records: Number of records to sample
+    :type num_records: int
+    :param rng: Random number generator
+    :type rng: random.Random
+    :return: Record ID and record from each reader, for each sampled \
+    record, in input order. If there are fewer than ``num_records`` \
+    records then all are returned.
+    :rtype: list(list(tuple(str or unicode, str or unicode)))
+    """
+    reservoir = []
+    while len(reservoir) < num_records:
+        records = read_records(readers)
+        if records is None:
+            return [records for _, records in reservoir]
+        reservoir.append((len(reservoir), records))
+    if num_records <= 0:
+        return []
+    index = num_records - 1
+    log_w = math.log(get_uniform(rng)) / num_records
+    while True:
+        num_skip = int(math.log(get_uniform(rng)) /
+                       math.log(-math.expm1(log_w)))
+        if skip_records(readers, num_skip) < num_skip:
+            break
+        records = read_records(readers)
+        if records is None:
+            break
+        index += num_skip + 1
+        reservoir[rng.randrange(num_records)] = (index, records)
+        log_w += math.log(get_uniform(rng)) / num_records
+    reservoir.sort(key=lambda item: item[0])
+    return [records for _, records in reservoir]
 
 
 def subsample_bioseqfile(input_file, prob, output_file, file_type,
-                         verbose=False):
+                         verbose=False, num_records=None, seed=None,
+                         input_file2=None, output_file2=None):
     """
     Subsample an input FASTQ (or other sequencing) file, to produce a
     smaller file whose reads are randomly sampled from of the input
-    with a fixed probability.
+    with a fixed probability or, if ``num_records`` is provided, a
+    file with a fixed number of reads sampled uniformly at random.
+
+    If ``input_file2`` is provided, it is subsampled alongside
+    ``input_file``, as paired-end reads, so the reads sampled from
+    each file are at the same positions.
 
     See https://biopython.org/wiki/SeqIO for description of valid
     filetypes (``fastq``, etc).
 
+    Files with extensions in :py:const:`GZ_EXTENSIONS` are read or
+    written using ``gzip``.
+
     :param input_file: Input file
     :type input_file: str or unicode
-    :param prob: Proportion to sample
+    :param prob: Proportion to sample (ignored if ``num_records`` \
+    is provided)
     :type prob: float
     :param output_file: Output file
     :type output_file: str or unicode
@@ -30,23 +477,165 @@ def subsample_bioseqfile(input_file, prob, output_file, file_type,
     :type file_type: str or unicode
     :param verbose: Print progress statements?
     :type verbose: bool
+    :param num_records: Number of records to sample
+    :type num_records: int
+    :param seed: Random number generator seed
+    :type seed: int
+    :param input_file2: Paired-end input file
+    :type input_file2: str or unicode
+    :param output_file2: Paired-end output file
+    :type output_file2: str or unicode
+    :return: Number of records input and output
+    :rtype: SubsampleCountsTuple
+    :raise AssertionError: if only one of ``input_file2`` and \
+    ``output_file2`` is provided, or paired-end input files have \
+    different numbers of records
     """
-    ext = os.path.splitext(input_file)[1]
-    is_gz = ext in [".gz", ".gzip"]
-    if is_gz:
-        open_file = gzip.open
-        open_r = "rt"
-        open_w = "wt"
-    else:
-        open_file = open
-        open_r = "r"
-        open_w = "w"
-    with open_file(input_file, open_r) as in_handle, \
-        open_file(output_file, open_w) as out_handle:
-        for record in SeqIO.parse(in_handle, file_type):
-            if random() < prob:
-                if verbose:
-                    print(record.id)
-                SeqIO.write(record, out_handle, file_type)
+    assert (input_file2 is None) == (output_file2 is None), \
+        "Both or neither of the paired-end input and output files must be provided"
+    input_files = [input_file]
+    output_files = [output_file]
+    if input_file2 is not None:
+        input_files.append(input_file2)
+        output_files.append(output_file2)
+    rng = random.Random(seed)
+    num_sampled = 0
+    with contextlib.ExitStack() as stack:
+        readers = [get_record_reader(
+            stack.enter_context(open_bioseqfile(file_name, "r")),
+            file_type) for file_name in input_files]
+        out_handles = [stack.enter_context(open_bioseqfile(file_name, "w"))
+                       for file_name in output_files]
+        if num_records is not None:
+            samples = reservoir_sample(readers, num_records, rng)
+        else:
+            samples = bernoulli_sample(readers, prob, rng)
+        for records in samples:
+            if verbose:
+                print(records[0][0])
+            for out_handle, (_, record) in zip(out_handles, records):
+                out_handle.write(record)
+            num_sampled += 1
+        # Count any records following the last sampled record.
+        while skip_records(readers, 1 << 20) == 1 << 20:
+            pass
+        num_input = readers[0].num_records
     if verbose:
         print("subsampling complete")
+    return SubsampleCountsTuple(num_input, num_sampled)
+
+
+def get_file_seed(seed, file_name):
+    """
+    Get the seed for a file, derived from a master seed and the file's
+    base name, so the seed does not depend on the order in which
+    files are processed or the directory holding the file.
+
+    :param seed: Master seed, or ``None`` for no seed
+    :type seed: int
+    :param file_name: File name
+    :type file_name: str or unicode
+    :return: Seed, or ``None`` if ``seed`` is ``None``
+    :rtype: int
+    """
+    if seed is None:
+        return None
+    digest = hashlib.sha256("{}:{}".format(
+        seed, os.path.basename(file_name)).encode()).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def expand_input_files(input_files):
+    """
+    Expand glob patterns in input file names. Names that match no
+    files are kept as they are.
+
+    :param input_files: Input files or glob patterns
+    :type input_files: list(str or unicode)
+    :return: Input files, without duplicates, in the order given, \
+    with each pattern's matches sorted
+    :rtype: list(str or unicode)
+    """
+    expanded = []
+    for input_file in input_files:
+        matches = sorted(glob.glob(input_file))
+        expanded += matches if matches else [input_file]
+    return list(dict.fromkeys(expanded))
+
+
+def subsample_bioseqfiles(input_files, prob, output_dir, file_type,
+                          num_records=None, seed=None, num_processes=1,
+                          manifest_file=None):
+    """
+    Subsample many input FASTQ (or other sequencing) files, in
+    parallel, using :py:func:`subsample_bioseqfile`, and write a
+    manifest of the number of records input and output for each
+    file.
+
+    Each output file has the same name as its input file and is
+    written to ``output_dir``. Each file is sampled using a seed from
+    :py:func:`get_file_seed`.
+
+    The manifest is a tab-separated values file with columns
+    :py:const:`MANIFEST_HEADER`, with one row per file in the order
+    given.
+
+    :param input_files: Input files or glob patterns
+    :type input_files: list(str or unicode)
+    :param prob: Proportion to sample (ignored if ``num_records`` \
+    is provided)
+    :type prob: float
+    :param output_dir: Output directory
+    :type output_dir: str or unicode
+    :param file_type: `Bio.SeqIO` file type
+    :type file_type: str or unicode
+    :param num_records: Number of records to sample from each file
+    :type num_records: int
+    :param seed: Master seed
+    :type seed: int
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param manifest_file: Manifest file, if ``None`` then \
+    :py:const:`MANIFEST_FILE` in ``output_dir`` is used
+    :type manifest_file: str or unicode
+    :return: Manifest
+    :rtype: pandas.core.frame.DataFrame
+    :raise AssertionError: if there are no input files, input files \
+    have the same name, or an output file would overwrite its input \
+    file
+    """
+    input_files = expand_input_files(input_files)
+    assert input_files, "No input files"
+    names = [os.path.basename(input_file) for input_file in input_files]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    assert not duplicates, "Input files have the same name: {}".format(
+        ", ".join(duplicates))
+    os.makedirs(output_dir, exist_ok=True)
+    output_files = [os.path.join(output_dir, name) for name in names]
+    for input_file, output_file in zip(input_files, output_files):
+        assert not (os.path.exists(output_file) and
+                    os.path.samefile(input_file, output_file)), \
+            "Output file would overwrite input file: {}".format(input_file)
+    seeds = [get_file_seed(seed, input_file) for input_file in input_files]
+    args = [(input_file, prob, output_file, file_type, False, num_records,
+             file_seed)
+            for input_file, output_file, file_seed
+            in zip(input_files, output_files, seeds)]
+    if num_processes > 1 and len(args) > 1:
+        with multiprocessing.Pool(min(num_processes, len(args))) as pool:
+            counts = pool.starmap(subsample_bioseqfile, args, chunksize=1)
+    else:
+        counts = [subsample_bioseqfile(*arg) for arg in args]
+    manifest = pd.DataFrame(
+        [[input_file, output_file, file_seed, count.num_input,
+          count.num_output,
+          count.num_output / count.num_input if count.num_input else 0.0]
+         for input_file, output_file, file_seed, count
+         in zip(input_files, output_files, seeds, counts)],
+        columns=MANIFEST_HEADER)
+    if manifest_file is None:
+        manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    provenance.write_provenance_header(__file__, manifest_file)
+    manifest.to_csv(manifest_file, mode='a', sep="\t", index=False,
+                    float_format="%.6g", na_rep="NA")
+    return manifest
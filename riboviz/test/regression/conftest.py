@@ -24,6 +24,10 @@ pass onto regression test modules:
 * ``--nextflow``: Run Nextflow-specific tests. Some regression tests
   differ for Nextflow due to differences in file naming. This should
   only be used with ``--skip-workflow``.
+* ``--compare-processes=<N>``: Number of processes used to compare
+  all the expected and actual files before the tests are run (default
+  1, no such comparison). Tests of files found to be equal then pass
+  without comparing the files again.
 """
 import os.path
 import pytest
@@ -43,6 +47,8 @@ CONFIG_FILE = "--config-file"
 """ Configuration file command-line flag. """
 NEXTFLOW = "--nextflow"
 """ Nextflow command-line flag. """
+COMPARE_PROCESSES = "--compare-processes"
+""" Number of processes to compare files command-line flag. """
 
 
 def pytest_addoption(parser):
@@ -72,6 +78,12 @@ def pytest_addoption(parser):
                      action="store_true",
                      required=False,
                      help="Run Nextflow tests")
+    parser.addoption(COMPARE_PROCESSES,
+                     action="store",
+                     type=int,
+                     default=1,
+                     required=False,
+                     help="Number of processes to compare files before running tests")
 
 
 @pytest.fixture(scope="module")
@@ -151,6 +163,32 @@ def nextflow_fixture(request):
     return request.config.getoption(NEXTFLOW)
 
 
+@pytest.fixture(scope="module")
+def check_index_tmp_fixture(request):
+    """
+    Gets value for ``--check-index-tmp`` command-line option.
+
+    :param request: request
+    :type request: _pytest.fixtures.SubRequest
+    :return: flag
+    :rtype: bool
+    """
+    return request.config.getoption(CHECK_INDEX_TMP)
+
+
+@pytest.fixture(scope="module")
+def compare_processes_fixture(request):
+    """
+    Gets value for ``--compare-processes`` command-line option.
+
+    :param request: request
+    :type request: _pytest.fixtures.SubRequest
+    :return: number of processes
+    :rtype: int
+    """
+    return request.config.getoption(COMPARE_PROCESSES)
+
+
 def pytest_generate_tests(metafunc):
     """
     Parametrize tests using information within a configuration file.
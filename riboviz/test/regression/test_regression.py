@@ -14,6 +14,7 @@ Usage::
       [--check-index-tmp]
       [--config-file=FILE]
       [--nextflow]
+      [--compare-processes=N]
 
 The test suite accepts the following command-line parameters:
 
@@ -33,6 +34,10 @@ The test suite accepts the following command-line parameters:
 * ``--nextflow``: Run :py:const:`riboviz.test.NEXTFLOW_WORKFLOW` (via
   Nextflow). Note that some regression tests differ for Nextflow due
   to differences in naming of some temporary files.
+* ``--compare-processes``: Number of processes used to compare all
+  the expected and actual files, in parallel, before the tests are
+  run (default 1, no such comparison). See
+  :py:func:`compare_files_fixture`.
 
 If the configuration specifies samples
 (:py:const:`riboviz.params.FQ_FILES`) then ``--check-index-tmp``
@@ -95,17 +100,34 @@ deduplication and grouping then note that:
   between runs depending on which reads are removed by ``umi_tools
   dedup``, so only the existence of the file is checked.
 
+Files are compared using
+:py:func:`riboviz.compare_files.compare_files`, but files with
+identical content are deemed equal without parsing them, so only
+files that differ in their bytes are subject to slower,
+content-aware, comparisons.
+
+The tests can also be run in parallel using ``pytest-xdist``, for
+example::
+
+    pytest -n 4 riboviz/test/regression/test_regression.py ...
+
+in which case the workflow is run by only one of the ``pytest-xdist``
+workers and ``--compare-processes`` is ignored.
+
 See :py:mod:`riboviz.test.regression.conftest` for information on the
 fixtures used by these tests.
 """
+import fcntl
 import os
 import shutil
 import subprocess
 import tempfile
 import pytest
 import pysam
+import yaml
 from riboviz import h5
 from riboviz import hisat2
+from riboviz import params
 from riboviz import sam_bam
 from riboviz import compare_files
 from riboviz import count_reads
@@ -115,29 +137,148 @@ from riboviz.tools import prep_riboviz
 from riboviz import test
 
 
+XDIST_WORKER = "PYTEST_XDIST_WORKER"
+""" Environment variable defined by ``pytest-xdist`` workers. """
+WORKFLOW_LOCK = "prep_riboviz.lock"
+"""
+File locked by ``pytest-xdist`` workers while the workflow is run.
+"""
+WORKFLOW_EXIT_CODE = "prep_riboviz.exit_code"
+""" File with workflow exit code, shared by ``pytest-xdist`` workers. """
+EQUAL_FILES = set()
+""" Pairs of expected and actual files found to be equal. """
+
+
+def run_workflow(config_file, nextflow):
+    """
+    Run :py:mod:`riboviz.tools.prep_riboviz` or
+    :py:const:`riboviz.test.NEXTFLOW_WORKFLOW` (via Nextflow).
+
+    :param config_file: Configuration file
+    :type config_file: str or unicode
+    :param nextflow: Should Nextflow be run?
+    :type nextflow: bool
+    :return: exit code
+    :rtype: int
+    """
+    if not nextflow:
+        return prep_riboviz.prep_riboviz(config_file)
+    cmd = ["nextflow", "run", test.NEXTFLOW_WORKFLOW,
+           "-params-file", config_file, "-ansi-log", "false"]
+    return subprocess.call(cmd)
+
+
 @pytest.fixture(scope="module")
 def prep_riboviz_fixture(skip_workflow_fixture, config_fixture,
-                         nextflow_fixture):
+                         nextflow_fixture, tmp_path_factory):
     """
     Run :py:mod:`riboviz.tools.prep_riboviz` if
     ``skip_workflow_fixture`` is not ``True``.
 
+    If running under ``pytest-xdist`` then the first worker to get a
+    lock runs the workflow and records its exit code, which the other
+    workers use.
+
     :param skip_workflow_fixture: Should workflow not be run?
     :type skip_workflow_fixture: bool
     :param config_fixture: Configuration file
     :type config_fixture: str or unicode
     :param nextflow_fixture: Should Nextflow be run?
     :type nextflow_fixture: bool
+    :param tmp_path_factory: pytest temporary directory factory
+    :type tmp_path_factory: _pytest.tmpdir.TempPathFactory
     """
-    if not skip_workflow_fixture:
-        if not nextflow_fixture:
-            exit_code = prep_riboviz.prep_riboviz(config_fixture)
-        else:
-            cmd = ["nextflow", "run", test.NEXTFLOW_WORKFLOW,
-                   "-params-file", config_fixture, "-ansi-log", "false"]
-            exit_code = subprocess.call(cmd)
-        assert exit_code == 0, \
-            "prep_riboviz returned non-zero exit code %d" % exit_code
+    if skip_workflow_fixture:
+        return
+    if XDIST_WORKER not in os.environ:
+        exit_code = run_workflow(config_fixture, nextflow_fixture)
+    else:
+        shared_dir = tmp_path_factory.getbasetemp().parent
+        exit_code_file = shared_dir / WORKFLOW_EXIT_CODE
+        with open(shared_dir / WORKFLOW_LOCK, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if exit_code_file.exists():
+                exit_code = int(exit_code_file.read_text())
+            else:
+                exit_code = run_workflow(config_fixture,
+                                         nextflow_fixture)
+                exit_code_file.write_text(str(exit_code))
+    assert exit_code == 0, \
+        "prep_riboviz returned non-zero exit code %d" % exit_code
+
+
+@pytest.fixture(scope="module", autouse=True)
+def compare_files_fixture(prep_riboviz_fixture, expected_fixture,
+                          config_fixture, check_index_tmp_fixture,
+                          compare_processes_fixture):
+    """
+    If ``compare_processes_fixture`` is greater than 1, and not
+    running under ``pytest-xdist``, compare every file in the expected
+    output directory (and index and temporary directories, if
+    ``check_index_tmp_fixture`` is ``True``) to the corresponding
+    actual file, in parallel, using
+    :py:func:`riboviz.compare_files.compare_files_parallel`. Pairs of
+    files found to be equal are added to :py:const:`EQUAL_FILES` so
+    :py:func:`compare_regression_files` does not compare them again.
+    Pairs of files found to differ are compared again by the tests,
+    which may first sort them, for example.
+
+    :param prep_riboviz_fixture: Workflow run
+    :type prep_riboviz_fixture: None
+    :param expected_fixture: Expected data directory
+    :type expected_fixture: str or unicode
+    :param config_fixture: Configuration file
+    :type config_fixture: str or unicode
+    :param check_index_tmp_fixture: Check index and temporary files?
+    :type check_index_tmp_fixture: bool
+    :param compare_processes_fixture: Number of processes
+    :type compare_processes_fixture: int
+    """
+    EQUAL_FILES.clear()
+    if compare_processes_fixture <= 1 or XDIST_WORKER in os.environ:
+        return
+    with open(config_fixture, 'r') as f:
+        config = yaml.load(f, yaml.SafeLoader)
+    directories = [config[params.OUTPUT_DIR]]
+    if check_index_tmp_fixture:
+        directories += [config[params.INDEX_DIR], config[params.TMP_DIR]]
+    file_pairs = []
+    for directory in directories:
+        expected_dir = os.path.join(
+            expected_fixture, os.path.basename(os.path.normpath(directory)))
+        for root, _, files in os.walk(expected_dir):
+            for file_name in files:
+                expected_file = os.path.join(root, file_name)
+                actual_file = os.path.join(
+                    directory, os.path.relpath(expected_file, expected_dir))
+                if os.path.isfile(actual_file):
+                    file_pairs.append((os.path.normpath(expected_file),
+                                       os.path.normpath(actual_file)))
+    messages = compare_files.compare_files_parallel(
+        file_pairs, num_processes=compare_processes_fixture)
+    EQUAL_FILES.update(pair for pair, message in zip(file_pairs, messages)
+                       if message is None)
+
+
+def compare_regression_files(expected_file, actual_file):
+    """
+    Compare expected and actual files for equality, unless they are
+    already known to be equal (see :py:func:`compare_files_fixture`).
+    Files with identical content are deemed equal without parsing
+    them. See :py:func:`riboviz.compare_files.compare_files`.
+
+    :param expected_file: Expected file
+    :type expected_file: str or unicode
+    :param actual_file: Actual file
+    :type actual_file: str or unicode
+    :raise AssertionError: If one or other file does not exist, \
+    is a directory or their contents differ
+    """
+    if (os.path.normpath(expected_file),
+            os.path.normpath(actual_file)) in EQUAL_FILES:
+        return
+    compare_files.compare_files(expected_file, actual_file,
+                                skip_identical=True)
 
 
 @pytest.fixture(scope="function")
@@ -173,7 +314,7 @@ def test_hisat2_build_index(expected_fixture, index_dir, index_prefix,
     """
     file_name = hisat2.HT2_FORMAT.format(index_prefix, index)
     index_dir_name = os.path.basename(os.path.normpath(index_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, index_dir_name, file_name),
         os.path.join(index_dir, file_name))
 
@@ -193,7 +334,7 @@ def test_cutadapt_fq(expected_fixture, tmp_dir, sample):
     :type sample: str or unicode
     """
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.ADAPTER_TRIM_FQ),
         os.path.join(tmp_dir, sample, workflow_files.ADAPTER_TRIM_FQ))
@@ -222,7 +363,7 @@ def test_umitools_extract_fq(extract_umis, expected_fixture, tmp_dir,
     if not extract_umis:
         pytest.skip('Skipped test applicable to UMI extraction')
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.UMI_EXTRACT_FQ),
         os.path.join(tmp_dir, sample, workflow_files.UMI_EXTRACT_FQ))
@@ -248,7 +389,7 @@ def test_hisat_fq(expected_fixture, tmp_dir, sample, file_name):
     :type file_name: str or unicode
     """
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      file_name),
         os.path.join(tmp_dir, sample, file_name))
@@ -276,6 +417,10 @@ def compare_sam_files(expected_directory, directory,
     expected_file = os.path.join(
         expected_directory, dir_name, sample, file_name)
     actual_file = os.path.join(directory, sample, file_name)
+    if (os.path.normpath(expected_file),
+            os.path.normpath(actual_file)) in EQUAL_FILES or \
+            compare_files.identical_files(expected_file, actual_file):
+        return
     expected_copy_dir = os.path.join(scratch_directory, "expected")
     os.mkdir(expected_copy_dir)
     actual_copy_dir = os.path.join(scratch_directory, "actual")
@@ -284,7 +429,7 @@ def compare_sam_files(expected_directory, directory,
     actual_copy_file = os.path.join(actual_copy_dir, file_name)
     pysam.sort("-o", expected_copy_file, expected_file)
     pysam.sort("-o", actual_copy_file, actual_file)
-    compare_files.compare_files(expected_copy_file, actual_copy_file)
+    compare_regression_files(expected_copy_file, actual_copy_file)
 
 
 @pytest.mark.usefixtures("skip_index_tmp_fixture")
@@ -352,7 +497,7 @@ def test_trim5p_mismatch_tsv(expected_fixture, tmp_dir, sample):
     :type sample: str or unicode
     """
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.TRIM_5P_MISMATCH_TSV),
         os.path.join(tmp_dir, sample,
@@ -390,12 +535,12 @@ def test_samtools_view_sort_index_pre_dedup_bam(
     if nextflow_fixture:
         pytest.skip('Skipped test not applicable to Nextflow')
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.PRE_DEDUP_BAM),
         os.path.join(tmp_dir, sample, workflow_files.PRE_DEDUP_BAM))
     bai_file_name = sam_bam.BAI_FORMAT.format(workflow_files.PRE_DEDUP_BAM)
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      bai_file_name),
         os.path.join(tmp_dir, sample, bai_file_name))
@@ -424,12 +569,12 @@ def test_samtools_view_sort_index_orf_map_clean_bam(
     if not nextflow_fixture:
         pytest.skip('Skipped test applicable to Nextflow only')
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.ORF_MAP_CLEAN_BAM),
         os.path.join(tmp_dir, sample, workflow_files.ORF_MAP_CLEAN_BAM))
     bai_file_name = sam_bam.BAI_FORMAT.format(workflow_files.ORF_MAP_CLEAN_BAM)
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      bai_file_name),
         os.path.join(tmp_dir, sample, bai_file_name))
@@ -504,8 +649,8 @@ def test_samtools_view_sort_index(dedup_umis, expected_fixture,
     assert os.path.exists(actual_bai_file)
     if dedup_umis:
         return
-    compare_files.compare_files(expected_file, actual_file)
-    compare_files.compare_files(expected_bai_file, actual_bai_file)
+    compare_regression_files(expected_file, actual_file)
+    compare_regression_files(expected_bai_file, actual_bai_file)
 
 
 @pytest.mark.usefixtures("skip_index_tmp_fixture")
@@ -581,7 +726,7 @@ def test_umitools_pre_dedup_group_tsv(
     if not group_umis:
         pytest.skip('Skipped test applicable to UMI groups')
     tmp_dir_name = os.path.basename(os.path.normpath(tmp_dir))
-    compare_files.compare_files(
+    compare_regression_files(
         os.path.join(expected_fixture, tmp_dir_name, sample,
                      workflow_files.PRE_DEDUP_GROUPS_TSV),
         os.path.join(tmp_dir, sample,
@@ -639,7 +784,7 @@ def test_bedtools_bedgraph(expected_fixture, output_dir, sample,
                                  sample, file_name)
     if not os.path.exists(expected_file):
         pytest.skip('Skipped as expected file does not exist')
-    compare_files.compare_files(
+    compare_regression_files(
         expected_file,
         os.path.join(output_dir, sample, file_name))
 
@@ -663,7 +808,7 @@ def test_bam_to_h5_h5(expected_fixture, output_dir, sample):
                                  sample, file_name)
     if not os.path.exists(expected_file):
         pytest.skip('Skipped as expected file does not exist')
-    compare_files.compare_files(
+    compare_regression_files(
         expected_file,
         os.path.join(output_dir, sample, file_name))
 
@@ -697,7 +842,7 @@ def test_generate_stats_figs_tsv(expected_fixture, output_dir, sample,
                                  sample, file_name)
     if not os.path.exists(expected_file):
         pytest.skip('Skipped as expected file does not exist')
-    compare_files.compare_files(
+    compare_regression_files(
         expected_file,
         os.path.join(output_dir, sample, file_name))
 
@@ -732,7 +877,7 @@ def test_generate_stats_figs_pdf(expected_fixture, output_dir, sample,
                                  sample, file_name)
     if not os.path.exists(expected_file):
         pytest.skip('Skipped as expected file does not exist')
-    compare_files.compare_files(
+    compare_regression_files(
         expected_file,
         os.path.join(output_dir, sample, file_name))
 
@@ -756,7 +901,7 @@ def test_collate_tpms_tsv(expected_fixture, output_dir):
                                  workflow_r.TPMS_COLLATED_TSV)
     if not os.path.exists(expected_file):
         pytest.skip('Skipped as expected file does not exist')
-    compare_files.compare_files(
+    compare_regression_files(
         expected_file,
         os.path.join(output_dir, workflow_r.TPMS_COLLATED_TSV))
 
@@ -0,0 +1,37 @@
+"""
+H5 file test helper functions.
+"""
+import numpy as np
+from riboviz import h5_writer
+from riboviz import ribogrid
+
+
+def write_per_gene(h5_file, counts, attributes=None, links=None):
+    """
+    Write an H5 file with the per-gene layout. Each gene has a
+    ``reads_total`` attribute, the sum of its counts, plus any
+    attributes in ``attributes``, which override ``reads_total``.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param counts: Counts, with one row per read length and one \
+    column per position, for each gene, in the order in which genes \
+    are to be written
+    :type counts: dict(str or unicode -> numpy.ndarray)
+    :param attributes: Attribute values for each gene
+    :type attributes: dict(str or unicode -> dict(str or unicode -> \
+    list(int)))
+    :param links: Links from secondary gene IDs to gene names
+    :type links: dict(str or unicode -> str or unicode)
+    """
+    attributes = attributes or {}
+    genes = []
+    for gene, gene_counts in counts.items():
+        gene_attributes = {ribogrid.READS_TOTAL: [gene_counts.sum()]}
+        gene_attributes.update(attributes.get(gene, {}))
+        genes.append((ribogrid.READS_FORMAT.format(gene, "data"),
+                      np.ascontiguousarray(gene_counts.T),
+                      {name: np.asarray(value, dtype=np.int32)
+                       .reshape(-1, 1)
+                       for name, value in gene_attributes.items()}))
+    h5_writer.write_genes(h5_file, genes, ribogrid.DATA, links)
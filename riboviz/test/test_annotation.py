@@ -0,0 +1,217 @@
+"""
+:py:mod:`riboviz.annotation` tests.
+"""
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from riboviz import annotation
+from riboviz import check_fasta_gff
+from riboviz import gff_utils
+from riboviz import params
+from riboviz import workflow
+from riboviz import workflow_files
+import riboviz.test
+
+GFF = """##gff-version 3
+A\tTest\tUTR5\t1\t10\t.\t+\t.\tName=A;ID=A_UTR5
+A\tTest\tCDS\t11\t19\t.\t+\t0\tName=A;ID=A_CDS
+A\tTest\tUTR3\t20\t24\t.\t+\t.\tName=A;ID=A_UTR3
+B\tTest\tCDS\t1\t6\t.\t-\t0\tName=B;Alias=BB
+B\tTest\tCDS\t10\t12\t.\t-\t0\tName=B;Alias=BB
+B\tTest\tgene\t1\t12\t.\t-\t.\tID=B_gene
+"""
+""" GFF file content. """
+EXPECTED_GENES = [["A", "A", "+", 11, 19, 10, 9, 5],
+                  ["B", "B", "-", 1, 12, 0, 9, 0]]
+""" Expected genes. """
+
+
+@pytest.fixture(scope="function")
+def gff_cache_dir():
+    """
+    Create a GFF file and a cache directory in a temporary directory.
+
+    :return: GFF file and cache directory
+    :rtype: tuple(str or unicode, str or unicode)
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    gff = os.path.join(tmp_dir, "test.gff3")
+    with open(gff, "w") as f:
+        f.write(GFF)
+    yield gff, os.path.join(tmp_dir, "cache")
+    shutil.rmtree(tmp_dir)
+
+
+def test_parse_annotation(gff_cache_dir):
+    """
+    Test :py:func:`riboviz.annotation.parse_annotation` parses
+    features, with attribute columns, and genes.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    """
+    gff, _ = gff_cache_dir
+    features, genes = annotation.parse_annotation(gff,
+                                                  primary_id="Name",
+                                                  secondary_id="Alias")
+    assert list(features.columns) == annotation.FEATURES_HEADER + \
+        ["ID", "Name", "Alias"]
+    assert list(features[annotation.WIDTH]) == [10, 9, 5, 6, 3, 12]
+    assert list(features["ID"]) == ["A_UTR5", "A_CDS", "A_UTR3",
+                                    "", "", "B_gene"]
+    assert list(features["Alias"]) == ["", "", "", "BB", "BB", ""]
+    assert list(genes.columns) == annotation.GENES_HEADER
+    assert genes.values.tolist() == EXPECTED_GENES
+
+
+def test_cache_annotation(gff_cache_dir):
+    """
+    Test :py:func:`riboviz.annotation.cache_annotation` writes a
+    cache file, which :py:func:`riboviz.annotation.load_annotation`
+    loads, that is reused until the GFF file content changes.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    """
+    gff, cache_dir = gff_cache_dir
+    cache_file, is_cached = annotation.cache_annotation(
+        gff, cache_dir, primary_id="Name")
+    assert not is_cached
+    assert os.path.exists(cache_file)
+    expected = annotation.parse_annotation(gff, primary_id="Name")
+    actual = annotation.load_annotation(cache_file)
+    pd.testing.assert_frame_equal(actual.features, expected.features)
+    pd.testing.assert_frame_equal(actual.genes, expected.genes)
+    assert annotation.cache_annotation(gff, cache_dir,
+                                       primary_id="Name") == \
+        (cache_file, True)
+    other_file, is_cached = annotation.cache_annotation(
+        gff, cache_dir, primary_id="Name", secondary_id="Alias")
+    assert not is_cached
+    assert other_file != cache_file
+    with open(gff, "a") as f:
+        f.write("C\tTest\tCDS\t1\t3\t.\t+\t0\tName=C\n")
+    changed = annotation.get_annotation(gff, cache_dir, primary_id="Name")
+    assert list(changed.genes[annotation.GENE]) == ["A", "B", "C"]
+    assert len([file_name for file_name in os.listdir(cache_dir)
+                if file_name.endswith(".h5")]) == 3
+
+
+def test_write_annotation_tsv(gff_cache_dir):
+    """
+    Test :py:func:`riboviz.annotation.write_annotation_tsv` writes
+    features and genes to TSV files.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    """
+    gff, cache_dir = gff_cache_dir
+    features_tsv = os.path.join(os.path.dirname(gff), "features.tsv")
+    genes_tsv = os.path.join(os.path.dirname(gff), "genes.tsv")
+    expected = annotation.get_annotation(gff, cache_dir,
+                                         primary_id="Name")
+    annotation.write_annotation_tsv(expected, features_tsv, genes_tsv)
+    for tsv_file, df in [(features_tsv, expected.features),
+                         (genes_tsv, expected.genes)]:
+        actual = pd.read_csv(tsv_file, sep="\t", comment="#",
+                             keep_default_na=False)
+        pd.testing.assert_frame_equal(actual, df)
+
+
+def test_read_gff_features(gff_cache_dir):
+    """
+    Test :py:func:`riboviz.annotation.read_gff_features` reads the
+    same features from the cache as
+    :py:func:`riboviz.gff_utils.read_gff_features` reads from the GFF
+    file, with the attributes that are cached.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    """
+    gff, cache_dir = gff_cache_dir
+    expected = gff_utils.read_gff_features(gff)
+    assert annotation.read_gff_features(gff) == expected
+    attributes = annotation.get_attributes(secondary_id="Alias")
+    expected = [feature[:5] + ({key: value
+                                for key, value in feature[5].items()
+                                if key in attributes},)
+                for feature in expected]
+    assert annotation.read_gff_features(gff, cache_dir,
+                                        secondary_id="Alias") == expected
+    assert annotation.cache_annotation(gff, cache_dir,
+                                       secondary_id="Alias")[1]
+
+
+@pytest.mark.parametrize("is_native,option", [
+    (False, "--annotation-tsv="),
+    (True, "--cache-dir=")])
+def test_workflow_annotation_options(gff_cache_dir, is_native, option):
+    """
+    Test :py:func:`riboviz.workflow.bam_to_h5` and
+    :py:func:`riboviz.workflow.generate_stats_figs` commands read GFF
+    features from the index directory, if configured.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    :param is_native: Use :py:mod:`riboviz.tools.bam_to_h5`?
+    :type is_native: bool
+    :param option: Expected ``bam_to_h5`` option
+    :type option: str or unicode
+    """
+    gff, index_dir = gff_cache_dir
+    tmp_dir = os.path.dirname(gff)
+    config = {params.SECONDARY_ID: None,
+              params.MIN_READ_LENGTH: 10,
+              params.MAX_READ_LENGTH: 50,
+              params.BUFFER: 250,
+              params.PRIMARY_ID: "Name",
+              params.DATASET: "data",
+              params.IS_RIBOVIZ_GFF: True,
+              params.STOP_IN_CDS: False,
+              params.NATIVE_BAM_TO_H5: is_native,
+              params.ORF_FASTA_FILE: "orfs.fasta",
+              params.ORF_GFF_FILE: gff,
+              params.RPF: True,
+              params.DO_POS_SP_NT_FREQ: False,
+              params.INDEX_DIR: index_dir}
+    run_config = workflow.RunConfigTuple(
+        riboviz.R_SCRIPTS, os.path.join(tmp_dir, "run.sh"), True, 1)
+    log_file = os.path.join(tmp_dir, "run.log")
+    workflow.bam_to_h5("in.bam", "out.h5", gff, config, log_file,
+                       run_config)
+    workflow.generate_stats_figs("out.h5", tmp_dir, config, log_file,
+                                 run_config)
+    with open(run_config.cmd_file) as f:
+        bam_to_h5_cmd, stats_cmd = f.read().splitlines()
+    features_tsv = os.path.join(index_dir, workflow_files.ORF_FEATURES_TSV)
+    if is_native:
+        assert option + index_dir in bam_to_h5_cmd
+    else:
+        assert option + features_tsv in bam_to_h5_cmd
+    assert "--annotation-tsv=" + features_tsv in stats_cmd
+
+
+def test_get_annotation_vignette(gff_cache_dir):
+    """
+    Test :py:func:`riboviz.annotation.get_annotation` with the
+    vignette GFF file, where every gene has 250 nt UTRs, and that
+    :py:func:`riboviz.check_fasta_gff.read_cds_features` reads the
+    same CDS features from the cache as from the GFF file.
+
+    :param gff_cache_dir: GFF file and cache directory
+    :type gff_cache_dir: tuple(str or unicode, str or unicode)
+    """
+    _, cache_dir = gff_cache_dir
+    gff = os.path.join(riboviz.test.VIGNETTE_DIR, "input",
+                       "yeast_YAL_CDS_w_250utrs.gff3")
+    genes = annotation.get_annotation(gff, cache_dir,
+                                      primary_id="Name").genes
+    assert len(genes) == 68
+    assert (genes[annotation.UTR5_WIDTH] == 250).all()
+    assert (genes[annotation.UTR3_WIDTH] == 250).all()
+    assert (genes[annotation.CDS_START] == 251).all()
+    assert (genes[annotation.CDS_WIDTH] % 3 == 0).all()
+    assert check_fasta_gff.read_cds_features(gff, cache_dir) == \
+        check_fasta_gff.read_cds_features(gff)
@@ -0,0 +1,118 @@
+"""
+:py:mod:`riboviz.batch_align` tests.
+"""
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import pytest
+from riboviz import batch_align
+
+SAM_HEADER = "@HD\tVN:1.0\tSO:unsorted\n@SQ\tSN:YAL001C\tLN:100\n"
+""" SAM header. """
+SAM_RECORDS = [
+    "A1\t0\tYAL001C\t10\t1\t4M\t*\t0\t0\tACGT\tIIII\n",
+    "A2\t4\t*\t0\t0\t*\t*\t0\t0\tCCCC\tIIII\n",
+    "A3\t0\tYAL001C\t20\t1\t4M\t*\t0\t0\tGGGG\tIIII\n",
+    "A3\t256\tYAL001C\t30\t1\t4M\t*\t0\t0\tGGGG\tIIII\n",
+    "A1\t4\t*\t0\t0\t*\t*\t0\t0\tTTTT\tIIII\n",
+    "B2\t16\tYAL001C\t40\t1\t4M\t*\t0\t0\tAAAA\tIIII\n"]
+""" SAM records for reads of 2 samples (A1 is in both samples). """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def write_fastq(file_name, names, open_file=open):
+    """
+    Write a FASTQ file with one read per name.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param names: Read names
+    :type names: list(str or unicode)
+    :param open_file: Function to open file
+    :type open_file: callable
+    :return: Records
+    :rtype: list(str or unicode)
+    """
+    records = ["@{} comment\nACGT\n+\nIIII\n".format(name)
+               for name in names]
+    with open_file(file_name, "wt") as f:
+        f.writelines(records)
+    return records
+
+
+@pytest.mark.parametrize("is_no_unal", [True, False])
+def test_split_alignment(tmp_dir, is_no_unal):
+    """
+    Test :py:func:`riboviz.batch_align.split_alignment` splits SAM
+    records and unaligned reads into sample-specific files.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_no_unal: Omit unaligned records from SAM files?
+    :type is_no_unal: bool
+    """
+    fastq_a = os.path.join(tmp_dir, "a.fq")
+    fastq_b = os.path.join(tmp_dir, "b.fq.gz")
+    records_a = write_fastq(fastq_a, ["A1", "A2", "A3/1"])
+    records_b = write_fastq(fastq_b, ["A1", "B2"], gzip.open)
+    sam_files = [os.path.join(tmp_dir, name) for name in ["a.sam", "b.sam"]]
+    unaligned_files = [os.path.join(tmp_dir, name)
+                       for name in ["a_un.fq", "b_un.fq"]]
+    sam_in = io.StringIO(SAM_HEADER + "".join(SAM_RECORDS))
+    summaries = batch_align.split_alignment([fastq_a, fastq_b],
+                                            sam_in,
+                                            sam_files,
+                                            unaligned_files,
+                                            is_no_unal)
+    assert summaries == [
+        {batch_align.NUM_READS: 3,
+         batch_align.NUM_ALIGNED: 2,
+         batch_align.NUM_UNALIGNED: 1},
+        {batch_align.NUM_READS: 2,
+         batch_align.NUM_ALIGNED: 1,
+         batch_align.NUM_UNALIGNED: 1}]
+    if is_no_unal:
+        expected_a = [SAM_RECORDS[0], SAM_RECORDS[2], SAM_RECORDS[3]]
+        expected_b = [SAM_RECORDS[5]]
+    else:
+        expected_a = SAM_RECORDS[0:4]
+        expected_b = SAM_RECORDS[4:]
+    for sam_file, expected in zip(sam_files, [expected_a, expected_b]):
+        with open(sam_file) as f:
+            assert f.read() == SAM_HEADER + "".join(expected)
+    with open(unaligned_files[0]) as f:
+        assert f.read() == records_a[1]
+    with open(unaligned_files[1]) as f:
+        assert f.read() == records_b[0]
+
+
+def test_split_alignment_mismatch(tmp_dir):
+    """
+    Test :py:func:`riboviz.batch_align.split_alignment` raises an
+    error if SAM records do not match the reads in the FASTQ files.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    fastq_a = os.path.join(tmp_dir, "a.fq")
+    write_fastq(fastq_a, ["A1", "A3"])
+    sam_in = io.StringIO(SAM_HEADER + "".join(SAM_RECORDS))
+    with pytest.raises(AssertionError):
+        batch_align.split_alignment([fastq_a],
+                                    sam_in,
+                                    [os.path.join(tmp_dir, "a.sam")],
+                                    [os.path.join(tmp_dir, "a_un.fq")])
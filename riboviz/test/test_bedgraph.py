@@ -0,0 +1,196 @@
+"""
+:py:mod:`riboviz.bedgraph` tests.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pysam
+import pytest
+from riboviz import bedgraph
+
+REFERENCES = [("A", 10), ("B", 6), ("C", 4)]
+""" Reference names and lengths. """
+READS = [
+    # (reference, start, CIGAR, flag)
+    ("A", 1, "3M", 0),
+    ("A", 1, "2M", 0),
+    ("A", 2, "2M1D1M", 16),
+    ("A", 6, "4M", 16),
+    ("A", 7, "2M", 4),
+    ("B", 0, "2M", 16),
+    ("B", 3, "3M", 256),
+]
+"""
+Reads. Reads on reference ``A`` include one with a deletion and one
+unmapped read. Reference ``B`` has only a minus strand read and a
+secondary alignment on the plus strand. Reference ``C`` has no
+reads.
+"""
+EXPECTED_PLUS = [
+    "track type=bedGraph\n",
+    "A\t0\t1\t0\n",
+    "A\t1\t2\t2\n",
+    "A\t2\t10\t0\n",
+    "B\t0\t3\t0\n",
+    "B\t3\t4\t1\n",
+    "B\t4\t6\t0\n",
+    "C\t0\t4\t0\n"]
+""" Expected plus strand bedGraph. """
+EXPECTED_MINUS = [
+    "track type=bedGraph\n",
+    "A\t0\t5\t0\n",
+    "A\t5\t6\t1\n",
+    "A\t6\t9\t0\n",
+    "A\t9\t10\t1\n",
+    "B\t0\t1\t0\n",
+    "B\t1\t2\t1\n",
+    "B\t2\t6\t0\n",
+    "C\t0\t4\t0\n"]
+""" Expected minus strand bedGraph. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def write_bam(bam_file, is_index=True):
+    """
+    Write :py:const:`READS` to a sorted BAM file.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param is_index: Index BAM file?
+    :type is_index: bool
+    """
+    header = {"HD": {"VN": "1.0", "SO": "coordinate"},
+              "SQ": [{"SN": name, "LN": length}
+                     for name, length in REFERENCES]}
+    names = [name for name, _ in REFERENCES]
+    with pysam.AlignmentFile(bam_file, "wb", header=header) as bam:
+        for index, (reference, start, cigar, flag) in enumerate(READS):
+            read = pysam.AlignedSegment()
+            read.query_name = "read{}".format(index)
+            read.flag = flag
+            read.reference_id = names.index(reference)
+            read.reference_start = start
+            read.cigarstring = cigar
+            length = read.infer_query_length()
+            read.query_sequence = "A" * length
+            read.query_qualities = pysam.qualitystring_to_array("I" * length)
+            read.mapping_quality = 1
+            bam.write(read)
+    if is_index:
+        pysam.index(bam_file)
+
+
+def test_counts_to_bedgraph():
+    """
+    Test :py:func:`riboviz.bedgraph.counts_to_bedgraph` merges
+    adjacent positions with equal counts, including zero counts.
+    """
+    rows = bedgraph.counts_to_bedgraph("A", np.array([0, 0, 3, 3, 1, 0]))
+    assert rows == "A\t0\t2\t0\nA\t2\t4\t3\nA\t4\t5\t1\nA\t5\t6\t0\n"
+    assert bedgraph.counts_to_bedgraph("A", np.array([], dtype=int)) == ""
+
+
+def test_counts_to_bedgraph_large_counts():
+    """
+    Test :py:func:`riboviz.bedgraph.counts_to_bedgraph` writes counts
+    of 1e6 or more as exact integers, as ``bedtools genomecov`` does.
+    """
+    rows = bedgraph.counts_to_bedgraph("A", np.array([1234567, 0]))
+    assert rows == "A\t0\t1\t1234567\nA\t1\t2\t0\n"
+
+
+def test_write_bedgraphs_unindexed_chunks(tmp_dir, monkeypatch):
+    """
+    Test :py:func:`riboviz.bedgraph.write_bedgraphs`, for a BAM file
+    which is not indexed, when the 5' end positions of the reads are
+    added to the counts in more than one chunk.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.setattr(bedgraph, "READS_PER_CHUNK", 2)
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    plus_file = os.path.join(tmp_dir, "plus.bedgraph")
+    minus_file = os.path.join(tmp_dir, "minus.bedgraph")
+    write_bam(bam_file, False)
+    bedgraph.write_bedgraphs(bam_file, plus_file, minus_file)
+    with open(plus_file) as f:
+        assert f.readlines() == EXPECTED_PLUS
+    with open(minus_file) as f:
+        assert f.readlines() == EXPECTED_MINUS
+
+
+@pytest.mark.parametrize("is_index,num_processes",
+                         [(True, 1), (True, 2), (False, 1)])
+def test_write_bedgraphs(tmp_dir, is_index, num_processes):
+    """
+    Test :py:func:`riboviz.bedgraph.write_bedgraphs` writes plus and
+    minus strand bedGraphs of 5' ends of reads, whether the BAM file
+    is indexed or not and whether references are processed in
+    parallel or not.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_index: Index BAM file?
+    :type is_index: bool
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    plus_file = os.path.join(tmp_dir, "plus.bedgraph")
+    minus_file = os.path.join(tmp_dir, "minus.bedgraph")
+    write_bam(bam_file, is_index)
+    bedgraph.write_bedgraphs(bam_file, plus_file, minus_file,
+                             num_processes)
+    with open(plus_file) as f:
+        assert f.readlines() == EXPECTED_PLUS
+    with open(minus_file) as f:
+        assert f.readlines() == EXPECTED_MINUS
+    bedgraph.load_bedgraph(plus_file)
+
+
+def test_write_bedgraphs_empty_reference_order(tmp_dir):
+    """
+    Test :py:func:`riboviz.bedgraph.write_bedgraphs` writes
+    references with no reads on a strand after those with reads, as
+    ``bedtools genomecov`` does.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    plus_file = os.path.join(tmp_dir, "plus.bedgraph")
+    minus_file = os.path.join(tmp_dir, "minus.bedgraph")
+    header = {"HD": {"VN": "1.0", "SO": "coordinate"},
+              "SQ": [{"SN": name, "LN": length}
+                     for name, length in REFERENCES]}
+    with pysam.AlignmentFile(bam_file, "wb", header=header) as bam:
+        read = pysam.AlignedSegment()
+        read.query_name = "read"
+        read.reference_id = 1
+        read.reference_start = 0
+        read.cigarstring = "2M"
+        read.query_sequence = "AA"
+        bam.write(read)
+    pysam.index(bam_file)
+    bedgraph.write_bedgraphs(bam_file, plus_file, minus_file)
+    with open(plus_file) as f:
+        assert [line.split("\t")[0] for line in f][1:] == \
+            ["B", "B", "A", "C"]
+    with open(minus_file) as f:
+        assert [line.split("\t")[0] for line in f][1:] == ["A", "B", "C"]
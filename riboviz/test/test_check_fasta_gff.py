@@ -0,0 +1,136 @@
+"""
+:py:mod:`riboviz.check_fasta_gff` tests.
+"""
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from riboviz import check_fasta_gff
+import riboviz.test
+
+FASTA = """>Good description
+CCATGAAATT
+TTAGCC
+>Minus
+GCTACCCCATG
+>Bad
+AAATAAGGGCCC
+>Short
+ATGAA
+"""
+""" FASTA file content. """
+GFF = """##gff-version 3
+Good\tTest\tCDS\t3\t14\t.\t+\t0\tID=Good_CDS
+Minus\tTest\tCDS\t2\t10\t.\t-\t0\tName=Minus_CDS
+Bad\tTest\tCDS\t1\t12\t.\t+\t0\tID=Bad_CDS
+Short\tTest\tCDS\t1\t5\t.\t+\t0\tID=Short_CDS
+Short\tTest\tCDS\t1\t9\t.\t+\t0\tID=Long_CDS
+Missing\tTest\tCDS\t1\t3\t.\t+\t0\tID=Missing_CDS
+Good\tTest\tUTR5\t1\t2\t.\t+\t.\tID=Good_UTR5
+"""
+""" GFF file content. """
+EXPECTED_ISSUES = [
+    ["Bad", "Bad_CDS", check_fasta_gff.NO_START_CODON, "AAA"],
+    ["Bad", "Bad_CDS", check_fasta_gff.NO_STOP_CODON, "CCC"],
+    ["Bad", "Bad_CDS", check_fasta_gff.INTERNAL_STOP_CODON, "2"],
+    ["Short", "Short_CDS", check_fasta_gff.INCOMPLETE_CODON, "5"],
+    ["Short", "Short_CDS", check_fasta_gff.NO_STOP_CODON, "AA"],
+    ["Short", "Long_CDS", check_fasta_gff.OUT_OF_RANGE, "5"],
+    ["Missing", "Missing_CDS", check_fasta_gff.MISSING_SEQUENCE, ""]]
+""" Expected issues: sequence, CDS, issue and details. """
+
+
+@pytest.fixture(scope="function")
+def fasta_gff():
+    """
+    Create FASTA and GFF files in a temporary directory.
+
+    :return: FASTA file and GFF file
+    :rtype: tuple(str or unicode, str or unicode)
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    fasta = os.path.join(tmp_dir, "test.fa")
+    gff = os.path.join(tmp_dir, "test.gff3")
+    with open(fasta, "w") as f:
+        f.write(FASTA)
+    with open(gff, "w") as f:
+        f.write(GFF)
+    yield fasta, gff
+    shutil.rmtree(tmp_dir)
+
+
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_check_fasta_gff_issues(fasta_gff, num_processes):
+    """
+    Test :py:func:`riboviz.check_fasta_gff.check_fasta_gff_issues`
+    reports issues in GFF file order, for CDSs on both strands.
+
+    :param fasta_gff: FASTA file and GFF file
+    :type fasta_gff: tuple(str or unicode, str or unicode)
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    issues = check_fasta_gff.check_fasta_gff_issues(*fasta_gff,
+                                                    num_processes)
+    assert list(issues.columns) == check_fasta_gff.HEADER
+    assert issues[[check_fasta_gff.SEQID,
+                   check_fasta_gff.FEATURE_ID,
+                   check_fasta_gff.ISSUE,
+                   check_fasta_gff.DETAIL]].values.tolist() == \
+        EXPECTED_ISSUES
+
+
+def test_check_fasta_gff(fasta_gff, capsys):
+    """
+    Test :py:func:`riboviz.check_fasta_gff.check_fasta_gff` prints
+    issues and warns about incomplete codons.
+
+    :param fasta_gff: FASTA file and GFF file
+    :type fasta_gff: tuple(str or unicode, str or unicode)
+    :param capsys: Pytest standard output capture fixture
+    :type capsys: _pytest.capture.CaptureFixture
+    """
+    with pytest.warns(UserWarning, match="Short has length"):
+        check_fasta_gff.check_fasta_gff(*fasta_gff)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[2:] == ["Bad doesn't start with ATG.",
+                         "Bad doesn't stop at end.",
+                         "Bad has internal STOP.",
+                         "Short doesn't stop at end.",
+                         "Short has CDS beyond end of sequence.",
+                         "Missing not found in FASTA file."]
+
+
+def test_check_fasta_gff_to_tsv(fasta_gff):
+    """
+    Test :py:func:`riboviz.check_fasta_gff.check_fasta_gff_to_tsv`
+    writes issues to a TSV file.
+
+    :param fasta_gff: FASTA file and GFF file
+    :type fasta_gff: tuple(str or unicode, str or unicode)
+    """
+    fasta, gff = fasta_gff
+    tsv_file = os.path.join(os.path.dirname(fasta), "issues.tsv")
+    issues = check_fasta_gff.check_fasta_gff_to_tsv(fasta, gff, tsv_file)
+    actual = pd.read_csv(tsv_file, sep="\t", comment="#",
+                         keep_default_na=False)
+    assert actual.values.tolist() == issues.values.tolist()
+
+
+def test_check_fasta_gff_vignette():
+    """
+    Test :py:func:`riboviz.check_fasta_gff.check_fasta_gff_issues`
+    with the vignette FASTA and GFF files, where only ``YAL001C``,
+    which has an intron, has issues.
+    """
+    issues = check_fasta_gff.check_fasta_gff_issues(
+        os.path.join(riboviz.test.VIGNETTE_DIR, "input",
+                     "yeast_YAL_CDS_w_250utrs.fa"),
+        os.path.join(riboviz.test.VIGNETTE_DIR, "input",
+                     "yeast_YAL_CDS_w_250utrs.gff3"))
+    assert list(issues[check_fasta_gff.SEQID].unique()) == ["YAL001C"]
+    assert list(issues[check_fasta_gff.ISSUE]) == \
+        [check_fasta_gff.NO_START_CODON,
+         check_fasta_gff.NO_STOP_CODON,
+         check_fasta_gff.INTERNAL_STOP_CODON]
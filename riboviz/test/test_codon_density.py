@@ -0,0 +1,237 @@
+"""
+:py:mod:`riboviz.codon_density` tests.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from riboviz import codon_density
+from riboviz import ribogrid
+from riboviz.test import ribogrid_test_utils
+
+BUFFER = 20
+""" Length of flanking region around the CDS. """
+MIN_READ_LENGTH = 27
+""" Minimum read length. """
+NUM_LENGTHS = 5
+""" Number of read lengths. """
+GENES = [("G1", 700), ("G2", 701), ("G3", 702), ("G4", 300),
+         ("G5", 900), ("G6", 750)]
+""" Genes and number of positions. """
+CODONS = ["AAA", "AAC", "AAG", "TTT"]
+""" Codons. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get random counts for :py:const:`GENES`. ``G6`` has no reads.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    random = np.random.RandomState(42)
+    counts = {gene: random.poisson(0.5, size=(NUM_LENGTHS, num_positions))
+              .astype(np.int32)
+              for gene, num_positions in GENES}
+    counts["G6"][:] = 0
+    return counts
+
+
+def get_codon_positions():
+    """
+    Get random codon positions for :py:const:`GENES` and a gene not
+    in the H5 file, including positions beyond the ends of genes.
+
+    :return: Codon positions
+    :rtype: pandas.core.frame.DataFrame
+    """
+    random = np.random.RandomState(7)
+    rows = [(random.choice(CODONS), gene, random.randint(0, 45))
+            for gene in [gene for gene, _ in GENES] + ["G7"]
+            for _ in range(40)]
+    return pd.DataFrame(rows, columns=[codon_density.CODON,
+                                       codon_density.GENE,
+                                       codon_density.POSITION])
+
+
+def get_attributes():
+    """
+    Get attributes for :py:const:`GENES`.
+
+    :return: Attribute values for each gene
+    :rtype: dict(str or unicode -> dict(str or unicode -> list(int)))
+    """
+    return {gene: {ribogrid.START_CODON_POS: [BUFFER + 1],
+                   ribogrid.STOP_CODON_POS: [num_positions - BUFFER - 2],
+                   ribogrid.LENGTHS: list(range(
+                       MIN_READ_LENGTH, MIN_READ_LENGTH + NUM_LENGTHS))}
+            for gene, num_positions in GENES}
+
+
+def get_r_codon_position_reads(counts, left, right):
+    """
+    Map reads to codons as ``GetCodonPositionReads`` does, including
+    R's recycling of shorter vectors and ``NA`` for out-of-range
+    indices.
+
+    :param counts: Counts, with one row per read length and one \
+    column per position
+    :type counts: numpy.ndarray
+    :param left: 1-indexed position from which to map reads
+    :type left: int
+    :param right: Number of positions, at the end, to exclude
+    :type right: int
+    :return: Codon counts
+    :rtype: list(float)
+    """
+    subset = counts[:, left - 1:counts.shape[1] - right]
+    codon_reads = []
+    for length, shift in codon_density.CODON_READ_LENGTHS:
+        row = subset[length - MIN_READ_LENGTH, shift:]
+        roll = [row[i:i + 3].sum() for i in range(len(row) - 2)]
+        codon_reads.append([roll[i] if i < len(roll) else np.nan
+                            for i in range(0, len(row), 3)])
+    num_codons = max(len(reads) for reads in codon_reads)
+    totals = [sum(reads[j % len(reads)] for reads in codon_reads)
+              for j in range(num_codons)]
+    return totals[:-1]
+
+
+def get_r_site_means(counts, codon_positions, count_threshold):
+    """
+    Calculate codon-specific mean densities at the A, P and E sites
+    as ``CalculateCodonSpecificRibosomeDensity`` does.
+
+    :param counts: Counts for each gene, see :py:func:`get_counts`
+    :type counts: dict(str or unicode -> numpy.ndarray)
+    :param codon_positions: Codon positions
+    :type codon_positions: pandas.core.frame.DataFrame
+    :param count_threshold: Minimum number of reads in a gene's \
+    trimmed codons
+    :type count_threshold: int
+    :return: Means at A, P and E sites for each codon
+    :rtype: dict(str or unicode -> list(float))
+    """
+    norm_out = {}
+    for gene, _ in GENES:
+        reads = get_r_codon_position_reads(
+            counts[gene], BUFFER - codon_density.LEFT_OFFSET,
+            BUFFER + codon_density.RIGHT_OFFSET)
+        if len(reads) <= codon_density.NUM_TRIMMED_CODONS + 1:
+            continue
+        trimmed = np.array(reads[codon_density.NUM_TRIMMED_CODONS:-1])
+        if trimmed.sum() >= count_threshold:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                norm_out[gene] = trimmed / trimmed.mean()
+    means = {}
+    for site, site_offset in codon_density.SITE_OFFSETS.items():
+        means[site] = []
+        for codon in sorted(CODONS):
+            values = []
+            rows = codon_positions[codon_positions[codon_density.CODON]
+                                   == codon]
+            for gene, position in zip(rows[codon_density.GENE],
+                                      rows[codon_density.POSITION]):
+                position += site_offset
+                if gene in norm_out and \
+                        1 <= position <= len(norm_out[gene]):
+                    values.append(norm_out[gene][position - 1])
+            means[site].append(np.nanmean(values) if values else np.nan)
+    return means
+
+
+@pytest.mark.parametrize("num_positions", [60, 61, 62, 63])
+def test_get_codon_position_reads(num_positions):
+    """
+    Test :py:func:`riboviz.codon_density.get_codon_position_reads`
+    for numbers of positions that are, and are not, a multiple of 3
+    plus 1 after excluding the buffers.
+
+    :param num_positions: Number of positions of second gene
+    :type num_positions: int
+    """
+    random = np.random.RandomState(num_positions)
+    gene_counts = [random.poisson(2, size=(NUM_LENGTHS, num))
+                   for num in [50, num_positions]]
+    left = BUFFER - codon_density.LEFT_OFFSET
+    right = BUFFER + codon_density.RIGHT_OFFSET
+    codon_counts, num_codons = codon_density.get_codon_position_reads(
+        np.hstack(gene_counts), [0, 50], [50, num_positions], left, right,
+        MIN_READ_LENGTH)
+    expected = [get_r_codon_position_reads(counts, left, right)
+                for counts in gene_counts]
+    assert list(num_codons) == [len(reads) for reads in expected]
+    np.testing.assert_array_equal(codon_counts,
+                                  np.concatenate(expected))
+
+
+@pytest.mark.parametrize("count_threshold", [0, 64, 1000])
+def test_calculate_codon_densities(tmp_dir, count_threshold):
+    """
+    Test :py:func:`riboviz.codon_density.calculate_codon_densities`
+    gives the same values as ``CalculateCodonSpecificRibosomeDensity``.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param count_threshold: Minimum number of reads in a gene's \
+    trimmed codons
+    :type count_threshold: int
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    counts = get_counts()
+    ribogrid_test_utils.write_per_gene(h5_file, counts, get_attributes())
+    codon_positions = get_codon_positions()
+    actual = codon_density.calculate_codon_densities(
+        h5_file, codon_positions, buffer=BUFFER,
+        min_read_length=MIN_READ_LENGTH, count_threshold=count_threshold)
+    assert list(actual[codon_density.CODON]) == sorted(CODONS)
+    expected = get_r_site_means(counts, codon_positions, count_threshold)
+    for site in codon_density.SITE_OFFSETS:
+        np.testing.assert_allclose(actual[site], expected[site])
+
+
+def test_codon_densities_to_tsv(tmp_dir):
+    """
+    Test :py:func:`riboviz.codon_density.codon_densities_to_tsv`
+    writes the tRNA estimates and the means at the A, P and E sites.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    t_rna_file = os.path.join(tmp_dir, "tRNAs.tsv")
+    codon_positions_file = os.path.join(tmp_dir, "codon_pos.tsv")
+    tsv_file = os.path.join(tmp_dir, "codon_ribodens.tsv")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(), get_attributes())
+    t_rnas = pd.DataFrame({"AA": ["K", "N", "K", "F"],
+                           "Codon": sorted(CODONS),
+                           "tRNA": [7, 10, 14, 6.4]})
+    t_rnas.to_csv(t_rna_file, sep="\t", index=False)
+    get_codon_positions().to_csv(codon_positions_file, sep="\t",
+                                 index=False)
+    codon_density.codon_densities_to_tsv(h5_file, t_rna_file,
+                                         codon_positions_file, tsv_file,
+                                         buffer=BUFFER,
+                                         min_read_length=MIN_READ_LENGTH)
+    with open(tsv_file) as f:
+        assert f.readline().startswith("# Created by: RiboViz")
+    actual = pd.read_csv(tsv_file, sep="\t", comment="#")
+    assert list(actual.columns) == ["AA", "Codon", "tRNA", "A", "P", "E"]
+    assert list(actual["Codon"]) == sorted(CODONS)
+    assert not actual[["A", "P", "E"]].isnull().any().any()
@@ -0,0 +1,150 @@
+"""
+:py:mod:`riboviz.compare_files` tests.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+from riboviz import compare_files
+from riboviz import utils
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def write_tsv(tmp_dir, sub_dir, content, file_name="data.tsv"):
+    """
+    Write a TSV file into a sub-directory of a directory.
+
+    :param tmp_dir: Directory
+    :type tmp_dir: str or unicode
+    :param sub_dir: Sub-directory, created if it does not exist
+    :type sub_dir: str or unicode
+    :param content: File content
+    :type content: str or unicode
+    :param file_name: File name
+    :type file_name: str or unicode
+    :return: File name
+    :rtype: str or unicode
+    """
+    os.makedirs(os.path.join(tmp_dir, sub_dir), exist_ok=True)
+    tsv_file = os.path.join(tmp_dir, sub_dir, file_name)
+    with open(tsv_file, "w") as f:
+        f.write(content)
+    return tsv_file
+
+
+def test_identical_files(tmp_dir):
+    """
+    Test :py:func:`riboviz.compare_files.identical_files` and that
+    :py:func:`riboviz.compare_files.get_digest` digests change when a
+    file is changed.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    file1 = write_tsv(tmp_dir, "a", "A\tB\n1\t2\n")
+    file2 = write_tsv(tmp_dir, "b", "A\tB\n1\t2\n")
+    file3 = write_tsv(tmp_dir, "c", "A\tB\n1\t3\n")
+    assert compare_files.identical_files(file1, file2)
+    assert not compare_files.identical_files(file1, file3)
+    digest = compare_files.get_digest(file2)
+    write_tsv(tmp_dir, "b", "A\tB\n1\t3\n")
+    os.utime(file2, ns=(0, 0))
+    assert compare_files.get_digest(file2) != digest
+    assert compare_files.identical_files(file2, file3)
+
+
+def test_compare_files_skip_identical(tmp_dir):
+    """
+    Test :py:func:`riboviz.compare_files.compare_files` with
+    ``skip_identical`` deems identical files equal without parsing
+    them, but still compares file names.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    file1 = write_tsv(tmp_dir, "a", "Not\tvalid\tTSV\n1\n",
+                      "data.unknown")
+    file2 = write_tsv(tmp_dir, "b", "Not\tvalid\tTSV\n1\n",
+                      "data.unknown")
+    with pytest.raises(AssertionError):
+        compare_files.compare_files(file1, file2)
+    compare_files.compare_files(file1, file2, skip_identical=True)
+    file3 = write_tsv(tmp_dir, "b", "Not\tvalid\tTSV\n1\n",
+                      "other.unknown")
+    with pytest.raises(AssertionError):
+        compare_files.compare_files(file1, file3, skip_identical=True)
+
+
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_compare_files_parallel(tmp_dir, num_processes):
+    """
+    Test :py:func:`riboviz.compare_files.compare_files_parallel`
+    returns results in the order of the pairs of files, with messages
+    for those that are not equal.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    expected = write_tsv(tmp_dir, "expected", "A\tB\n1\t2\n")
+    same = write_tsv(tmp_dir, "same", "A\tB\n1\t2\n")
+    # Different bytes but equal content.
+    equal = write_tsv(tmp_dir, "equal", "# Comment\nA\tB\n1\t2.0\n")
+    different = write_tsv(tmp_dir, "different",
+                          "A\tB\n1\t2\n3\t4\n5\t6\n")
+    missing = os.path.join(tmp_dir, "missing", "data.tsv")
+    results = compare_files.compare_files_parallel(
+        [(expected, same), (expected, different), (expected, equal),
+         (expected, missing)], num_processes=num_processes)
+    assert len(results) == 4
+    assert results[0] is None
+    assert results[1].startswith("AssertionError")
+    assert results[2] is None
+    assert missing in results[3]
+
+
+def test_compare_files_parallel_digests(tmp_dir, monkeypatch):
+    """
+    Test :py:func:`riboviz.compare_files.compare_files_parallel`
+    calculates the digest of each file once, in the calling process,
+    and that these are reused by
+    :py:func:`riboviz.compare_files.identical_files`.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param monkeypatch: MonkeyPatch
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    digested = []
+    original_get_file_digest = utils.get_file_digest
+
+    def get_file_digest(file_name):
+        digested.append(file_name)
+        return original_get_file_digest(file_name)
+    monkeypatch.setattr(utils, "get_file_digest", get_file_digest)
+    file_pairs = [(write_tsv(tmp_dir, "expected", "A\tB\n1\t2\n",
+                             file_name),
+                   write_tsv(tmp_dir, "actual", "A\tB\n1\t2\n",
+                             file_name))
+                  for file_name in ["a.tsv", "b.tsv"]]
+    results = compare_files.compare_files_parallel(file_pairs,
+                                                   num_processes=2)
+    assert results == [None, None]
+    assert sorted(digested) == sorted(file_name for pair in file_pairs
+                                      for file_name in pair)
+    for pair in file_pairs:
+        assert compare_files.identical_files(*pair)
+    assert len(digested) == 4
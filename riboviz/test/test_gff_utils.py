@@ -0,0 +1,16 @@
+"""
+:py:mod:`riboviz.gff_utils` tests.
+"""
+from riboviz import gff_utils
+
+
+def test_parse_gff_attributes():
+    """
+    Test :py:func:`riboviz.gff_utils.parse_gff_attributes` with GFF3
+    and GFF2 attributes.
+    """
+    assert gff_utils.parse_gff_attributes("Name=YAL001C;Note=a%3Bb") == \
+        {"Name": "YAL001C", "Note": "a;b"}
+    assert gff_utils.parse_gff_attributes(
+        'gene_id "g1"; gene_name "ONE";') == \
+        {"gene_id": "g1", "gene_name": "ONE"}
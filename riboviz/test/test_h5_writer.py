@@ -0,0 +1,119 @@
+"""
+:py:mod:`riboviz.h5_writer` tests.
+"""
+import os
+import shutil
+import tempfile
+import h5py
+import numpy as np
+import pytest
+from riboviz import h5_writer
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_genes(num_genes):
+    """
+    Get genes with random datasets, some of which have all-zero
+    regions, and attributes.
+
+    :param num_genes: Number of genes
+    :type num_genes: int
+    :return: Genes, see :py:func:`riboviz.h5_writer.write_genes`
+    :rtype: list(tuple(str or unicode, numpy.ndarray, dict))
+    """
+    random = np.random.RandomState(42)
+    genes = []
+    for index in range(num_genes):
+        data = random.poisson(0.5, size=(10 + index, 4)).astype(np.int32)
+        data[:, index % 4] = 0
+        attributes = {"reads_total": np.array([[data.sum()]],
+                                               dtype=np.int32),
+                      "lengths": np.arange(4, dtype=np.int32).reshape(-1, 1)}
+        genes.append(("G{}/data/reads".format(index), data, attributes))
+    return genes
+
+
+@pytest.mark.parametrize("compression,num_processes",
+                         [(h5_writer.GZIP, 1),
+                          (h5_writer.GZIP, 2),
+                          (h5_writer.LZF, 1),
+                          (h5_writer.NONE, 1)])
+@pytest.mark.parametrize("chunk_positions,chunk_lengths",
+                         [(None, 1), (4, 3)])
+def test_write_genes(tmp_dir, compression, num_processes,
+                     chunk_positions, chunk_lengths):
+    """
+    Test :py:func:`riboviz.h5_writer.write_genes` writes datasets,
+    attributes and links for genes, across several batches, that can
+    be read back.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param compression: Compression filter
+    :type compression: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param chunk_positions: Maximum number of positions per chunk
+    :type chunk_positions: int
+    :param chunk_lengths: Maximum number of read lengths per chunk
+    :type chunk_lengths: int
+    """
+    h5_file = os.path.join(tmp_dir, "test.h5")
+    genes = get_genes(7)
+    h5_writer.write_genes(h5_file, iter(genes), "data",
+                          links={"ALT0": "G0"},
+                          num_processes=num_processes,
+                          compression=compression,
+                          chunk_positions=chunk_positions,
+                          chunk_lengths=chunk_lengths,
+                          batch_size=3)
+    with h5py.File(h5_file, "r") as h5:
+        assert isinstance(h5.get("ALT0", getlink=True), h5py.ExternalLink)
+        for path, data, attributes in genes:
+            dataset = h5[path + "/data"]
+            expected_chunks = h5_writer.get_chunk_shape(
+                data.shape, chunk_positions, chunk_lengths)
+            assert dataset.chunks == expected_chunks
+            if compression == h5_writer.NONE:
+                assert dataset.compression is None
+            else:
+                assert dataset.compression == compression
+            np.testing.assert_array_equal(dataset[()], data)
+            for name, value in attributes.items():
+                np.testing.assert_array_equal(h5[path].attrs[name], value)
+
+
+def test_write_genes_unsupported_compression(tmp_dir):
+    """
+    Test :py:func:`riboviz.h5_writer.write_genes` raises an error if
+    the compression filter is not supported.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    with pytest.raises(AssertionError):
+        h5_writer.write_genes(os.path.join(tmp_dir, "test.h5"),
+                              get_genes(1), "data", compression="zip")
+
+
+def test_compress_chunks_skips_zero_chunks():
+    """
+    Test :py:func:`riboviz.h5_writer.compress_chunks` omits chunks
+    whose values are all zero.
+    """
+    data = np.zeros((5, 3), dtype=np.int32)
+    data[4, 1] = 2
+    compressed = h5_writer.compress_chunks(data, (2, 2), 1)
+    assert [offset for offset, _ in compressed] == [(4, 0)]
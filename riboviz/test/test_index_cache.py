@@ -0,0 +1,161 @@
+"""
+:py:mod:`riboviz.index_cache` tests.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+import yaml
+from riboviz import index_cache
+from riboviz import utils
+from riboviz import workflow
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def test_get_cache_key(tmp_dir):
+    """
+    Test :py:func:`riboviz.index_cache.get_cache_key` depends on
+    both FASTA file content and ``hisat2-build`` version and not on
+    FASTA file name.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    fasta1 = os.path.join(tmp_dir, "a.fa")
+    fasta2 = os.path.join(tmp_dir, "b.fa")
+    for fasta in [fasta1, fasta2]:
+        with open(fasta, "w") as f:
+            f.write(">A\nACGT\n")
+    digest1 = utils.get_file_digest(fasta1)
+    digest2 = utils.get_file_digest(fasta2)
+    assert digest1 == digest2
+    key = index_cache.get_cache_key(digest1, "2.1.0")
+    assert key == index_cache.get_cache_key(digest2, "2.1.0")
+    assert key != index_cache.get_cache_key(digest1, "2.2.0")
+    with open(fasta2, "a") as f:
+        f.write(">B\nTTTT\n")
+    digest2 = utils.get_file_digest(fasta2)
+    assert key != index_cache.get_cache_key(digest2, "2.1.0")
+
+
+def test_add_entry_link_indices(tmp_dir):
+    """
+    Test :py:func:`riboviz.index_cache.add_entry` and
+    :py:func:`riboviz.index_cache.link_indices` add an entry to a
+    cache and link index files into an index directory, replacing
+    existing files.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    cache_dir = os.path.join(tmp_dir, "cache")
+    index_dir = os.path.join(tmp_dir, "index")
+    os.mkdir(cache_dir)
+    os.mkdir(index_dir)
+    key = index_cache.get_cache_key("digest", "2.1.0")
+    entry_dir = index_cache.get_entry_dir(cache_dir, key)
+    assert not index_cache.is_cached(entry_dir)
+    with index_cache.lock_entry(cache_dir, key):
+        build_dir = index_cache.create_entry_tmp_dir(cache_dir, key)
+        for index in [1, 2]:
+            file_name = "{}.{}.ht2".format(index_cache.INDEX_PREFIX, index)
+            with open(os.path.join(build_dir, file_name), "w") as f:
+                f.write(str(index))
+        index_cache.add_entry(build_dir, entry_dir, "a.fa", "digest",
+                              "2.1.0")
+    assert index_cache.is_cached(entry_dir)
+    assert not os.path.exists(build_dir)
+    with open(os.path.join(entry_dir, index_cache.METADATA_FILE)) as f:
+        metadata = yaml.load(f, yaml.SafeLoader)
+    assert metadata[index_cache.FASTA_DIGEST] == "digest"
+    assert metadata[index_cache.HISAT2_BUILD_VERSION] == "2.1.0"
+
+    existing_file = os.path.join(index_dir, "orf.1.ht2")
+    with open(existing_file, "w") as f:
+        f.write("stale")
+    links = index_cache.get_links(entry_dir, index_dir, "orf")
+    assert [link for _, link in links] == \
+        [os.path.join(index_dir, "orf.1.ht2"),
+         os.path.join(index_dir, "orf.2.ht2")]
+    index_cache.link_indices(links)
+    for index, (_, link) in enumerate(links, 1):
+        assert os.path.islink(link)
+        with open(link) as f:
+            assert f.read() == str(index)
+
+
+def test_get_links_not_cached(tmp_dir):
+    """
+    Test :py:func:`riboviz.index_cache.get_links` returns links for
+    the index files ``hisat2-build`` builds for small indices if the
+    cache entry does not exist.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    entry_dir = index_cache.get_entry_dir(tmp_dir, "key")
+    links = index_cache.get_links(entry_dir, "index", "orf")
+    assert len(links) == 8
+    assert links[0] == (
+        os.path.abspath(os.path.join(entry_dir, "index.1.ht2")),
+        os.path.join("index", "orf.1.ht2"))
+
+
+@pytest.mark.parametrize("output,version",
+                         [("/usr/bin/hisat2-build-s version 2.1.0\n"
+                           "64-bit\n", "2.1.0"),
+                          ("hisat2-build 2.2\n", "hisat2-build 2.2"),
+                          ("", "")])
+def test_parse_hisat2_build_version(output, version):
+    """
+    Test :py:func:`riboviz.index_cache.parse_hisat2_build_version`.
+
+    :param output: Output of ``hisat2-build --version``
+    :type output: str or unicode
+    :param version: Expected version
+    :type version: str or unicode
+    """
+    assert index_cache.parse_hisat2_build_version(output) == version
+
+
+def test_build_cached_indices_dry_run(tmp_dir):
+    """
+    Test :py:func:`riboviz.workflow.build_cached_indices` in a dry run
+    records commands, using a placeholder cache entry directory,
+    without running ``hisat2-build`` or reading the FASTA file, which
+    does not exist.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    cmd_file = os.path.join(tmp_dir, "cmd.sh")
+    cache_dir = os.path.join(tmp_dir, "cache")
+    run_config = workflow.RunConfigTuple(None, cmd_file, True, 1)
+    workflow.build_cached_indices("missing.fa", "index", "orf",
+                                  cache_dir, os.path.join(tmp_dir, "log"),
+                                  run_config)
+    entry_dir = index_cache.get_entry_dir(cache_dir,
+                                          index_cache.DRY_RUN_KEY)
+    with open(cmd_file) as f:
+        lines = f.read().splitlines()
+    assert lines[:2] == [
+        "hisat2-build --version",
+        "hisat2-build missing.fa " +
+        os.path.join(entry_dir, index_cache.INDEX_PREFIX)]
+    assert lines[2] == "ln -sf {} {}".format(
+        os.path.abspath(os.path.join(entry_dir, "index.1.ht2")),
+        os.path.join("index", "orf.1.ht2"))
+    assert len(lines) == 10
+    assert not os.path.exists(cache_dir)
@@ -0,0 +1,35 @@
+"""
+:py:mod:`riboviz.lazy_import` tests.
+"""
+import subprocess
+import sys
+import riboviz
+from riboviz import lazy_import
+
+
+def test_lazy_import_loaded():
+    """
+    Test :py:func:`riboviz.lazy_import.lazy_import` returns a module
+    that has already been imported.
+    """
+    assert lazy_import.lazy_import("os") is sys.modules["os"]
+
+
+def test_lazy_import():
+    """
+    Test :py:func:`riboviz.lazy_import.lazy_import` only imports a
+    module when one of its attributes is accessed, in a new
+    interpreter, so that the module has not already been imported.
+    """
+    script = "\n".join([
+        "import sys",
+        "from riboviz.lazy_import import lazy_import",
+        "csv = lazy_import('csv')",
+        "assert 'csv' not in sys.modules",
+        "assert 'not loaded' in repr(csv)",
+        "assert csv.QUOTE_NONE == sys.modules['csv'].QUOTE_NONE",
+        "assert 'QUOTE_NONE' in vars(csv)",
+        "assert csv.__name__ == 'csv'",
+        "assert 'reader' in dir(csv)"])
+    subprocess.run([sys.executable, "-c", script], check=True,
+                   cwd=riboviz.BASE_PATH)
@@ -0,0 +1,294 @@
+"""
+:py:mod:`riboviz.logging_utils` tests.
+"""
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import pytest
+from riboviz import logging_utils
+from riboviz import process_utils
+from riboviz import workflow
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+@pytest.fixture(scope="function")
+def json_log_file(tmp_dir):
+    """
+    Configure JSON-lines logging into a temporary file, at level
+    ``INFO``, and stop JSON-lines logging and restore the root logger
+    level after a test.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :return: JSON-lines log file
+    :rtype: str or unicode
+    """
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.INFO)
+    json_log_file = os.path.join(tmp_dir, "riboviz.jsonl")
+    logging_utils.configure_json_logging(json_log_file)
+    yield json_log_file
+    logging_utils.stop_json_logging()
+    root.setLevel(level)
+
+
+def load_records(json_log_file):
+    """
+    Stop JSON-lines logging and load records from a file.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    :return: Records
+    :rtype: list(dict)
+    """
+    logging_utils.stop_json_logging(json_log_file)
+    with open(json_log_file) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_log_context(json_log_file):
+    """
+    Test :py:func:`riboviz.logging_utils.log_context` adds nested
+    context fields to records and they are removed when the context
+    exits.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    """
+    logger = logging.getLogger("riboviz.test")
+    with logging_utils.log_context(sample="WTnone"):
+        logger.info("In %s", "sample")
+        with logging_utils.log_context(step="map_to_orf", tool="hisat2"):
+            logger.warning("In step")
+        logger.info("Out of step")
+    logger.info("Out of sample")
+    records = load_records(json_log_file)
+    assert [record[logging_utils.MESSAGE] for record in records] == \
+        ["In sample", "In step", "Out of step", "Out of sample"]
+    for record in records:
+        assert set(record) == set(logging_utils.JSON_FIELDS)
+        assert record[logging_utils.LOGGER_NAME] == "riboviz.test"
+        assert record[logging_utils.ELAPSED] >= 0
+    assert [record[logging_utils.SAMPLE] for record in records] == \
+        ["WTnone", "WTnone", "WTnone", None]
+    assert [record[logging_utils.STEP] for record in records] == \
+        [None, "map_to_orf", None, None]
+    assert records[1][logging_utils.TOOL] == "hisat2"
+    assert records[1][logging_utils.LEVEL] == "WARNING"
+    assert records[1][logging_utils.STEP_ELAPSED] >= 0
+    assert records[2][logging_utils.SAMPLE_ELAPSED] >= \
+        records[0][logging_utils.SAMPLE_ELAPSED]
+    assert records[3][logging_utils.SAMPLE_ELAPSED] is None
+
+
+def test_log_context_unknown_field():
+    """
+    Test :py:func:`riboviz.logging_utils.log_context` raises
+    ``AssertionError`` for an unknown field.
+    """
+    with pytest.raises(AssertionError):
+        with logging_utils.log_context(colour="red"):
+            pass
+
+
+def test_json_logging_exception_data(json_log_file):
+    """
+    Test JSON-lines records include exceptions and ``data`` values.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    """
+    logger = logging.getLogger("riboviz.test")
+    try:
+        raise ValueError("Bad value")
+    except ValueError:
+        logger.exception("Failed", extra={logging_utils.DATA: {"n": 1}})
+    records = load_records(json_log_file)
+    assert len(records) == 1
+    assert "ValueError: Bad value" in records[0][logging_utils.EXCEPTION]
+    assert records[0][logging_utils.DATA] == {"n": 1}
+
+
+def test_configure_json_logging_repeated(json_log_file):
+    """
+    Test repeated calls to
+    :py:func:`riboviz.logging_utils.configure_json_logging` for the
+    same file do not duplicate records.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    """
+    logging_utils.configure_json_logging(json_log_file)
+    logging.getLogger("riboviz.test").info("Once")
+    assert len(load_records(json_log_file)) == 1
+
+
+def test_run_logged_command_steps(json_log_file, tmp_dir):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_command` logs a
+    :py:const:`riboviz.logging_utils.STEPS_LOGGER` record with the
+    sample, step, tool and resource usage, and that these records can
+    be summarised across samples.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    log_file = os.path.join(tmp_dir, "cmd.log")
+    cmd = [sys.executable, "-m", "riboviz.tools.count_reads", "--help"]
+    for sample in ["WTnone", "WT3AT"]:
+        with logging_utils.log_context(sample=sample):
+            process_utils.run_logged_command(["echo", sample], log_file,
+                                             step="echo_sample")
+            process_utils.run_logged_command(cmd, log_file,
+                                             step="count_reads")
+    records = load_records(json_log_file)
+    assert len(records) == 4
+    record = records[0]
+    assert record[logging_utils.LOGGER_NAME] == logging_utils.STEPS_LOGGER
+    assert record[logging_utils.SAMPLE] == "WTnone"
+    assert record[logging_utils.STEP] == "echo_sample"
+    assert record[logging_utils.TOOL] == "echo"
+    assert record[logging_utils.DATA][logging_utils.EXIT_CODE] == 0
+    assert record[logging_utils.DATA][logging_utils.DURATION] >= 0
+    assert records[1][logging_utils.TOOL] == "riboviz.tools.count_reads"
+
+    summary = logging_utils.summarise_json_logs(
+        logging_utils.load_json_logs([json_log_file]))
+    assert list(summary.columns) == logging_utils.SUMMARY_HEADER
+    assert list(summary[logging_utils.STEP]) == \
+        ["count_reads", "echo_sample"]
+    assert list(summary[logging_utils.NUM_RECORDS]) == [2, 2]
+    assert list(summary[logging_utils.NUM_SAMPLES]) == [2, 2]
+    assert list(summary[logging_utils.NUM_FAILED]) == [0, 0]
+
+
+def test_log_context_nested_same_value(json_log_file):
+    """
+    Test :py:func:`riboviz.logging_utils.log_context` keeps the time
+    at which a field was set when a nested context sets it to the
+    same value, so step elapsed time is not reset.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    """
+    logger = logging.getLogger("riboviz.test")
+    with logging_utils.log_context(step="map_to_orf"):
+        time.sleep(0.1)
+        with logging_utils.log_context(step="map_to_orf", tool="hisat2"):
+            logger.info("In tool")
+    records = load_records(json_log_file)
+    assert records[0][logging_utils.STEP_ELAPSED] >= 0.1
+
+
+def test_run_logged_pipeline_function_context(json_log_file, tmp_dir):
+    """
+    Test records logged by a Python function stage run by
+    :py:func:`riboviz.process_utils.run_logged_pipeline` have the
+    step and tool.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    def upper(in_handle):
+        logging.getLogger("riboviz.test").info("In function")
+        for line in in_handle:
+            yield line.upper()
+
+    process_utils.run_logged_pipeline(
+        [["echo", "hi"], upper], os.path.join(tmp_dir, "cmd.log"),
+        step="upper")
+    records = [record for record in load_records(json_log_file)
+               if record[logging_utils.MESSAGE] == "In function"]
+    assert len(records) == 1
+    assert records[0][logging_utils.STEP] == "upper"
+    assert records[0][logging_utils.TOOL] == "echo|upper"
+
+
+def test_workflow_step(json_log_file, tmp_dir):
+    """
+    Test :py:func:`riboviz.workflow.workflow_step` runs a step within
+    a log context so records logged by the step, and by the commands
+    it runs, have the step, and the step elapsed time of a command's
+    :py:const:`riboviz.logging_utils.STEPS_LOGGER` record is at least
+    the command's duration.
+
+    :param json_log_file: JSON-lines log file
+    :type json_log_file: str or unicode
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    @workflow.workflow_step
+    def sleep_step(log_file):
+        workflow.LOGGER.info("Sleep. Log: %s", log_file)
+        process_utils.run_logged_command(
+            [sys.executable, "-c", "import time; time.sleep(0.2)"],
+            log_file, step="sleep_step")
+
+    sleep_step(os.path.join(tmp_dir, "cmd.log"))
+    records = load_records(json_log_file)
+    assert len(records) == 2
+    assert [record[logging_utils.STEP] for record in records] == \
+        ["sleep_step", "sleep_step"]
+    assert records[0][logging_utils.TOOL] is None
+    record = records[1]
+    assert record[logging_utils.LOGGER_NAME] == logging_utils.STEPS_LOGGER
+    assert record[logging_utils.TOOL] == os.path.basename(sys.executable)
+    assert record[logging_utils.STEP_ELAPSED] >= \
+        record[logging_utils.DATA][logging_utils.DURATION] >= 0.2
+
+
+def test_log_step_not_configured(tmp_dir, caplog):
+    """
+    Test :py:func:`riboviz.logging_utils.log_step` does not log any
+    record if JSON-lines logging is not configured.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param caplog: Pytest log capture fixture
+    :type caplog: _pytest.logging.LogCaptureFixture
+    """
+    with caplog.at_level(logging.INFO):
+        process_utils.run_logged_command(
+            ["echo", "hi"], os.path.join(tmp_dir, "cmd.log"), step="echo")
+    assert not [record for record in caplog.records
+                if record.name == logging_utils.STEPS_LOGGER]
+
+
+@pytest.mark.parametrize("stage,tool", [
+    (["hisat2", "-x", "index"], "hisat2"),
+    (["/usr/bin/samtools", "view"], "samtools"),
+    (["python", "-m", "riboviz.tools.count_reads", "-h"],
+     "riboviz.tools.count_reads"),
+    (["Rscript", "-m", "x.R"], "Rscript"),
+    (process_utils.get_tool_name, "get_tool_name")])
+def test_get_tool_name(stage, tool):
+    """
+    Test :py:func:`riboviz.process_utils.get_tool_name`.
+
+    :param stage: Command and arguments or Python function
+    :type stage: list(str or unicode) or callable
+    :param tool: Expected tool name
+    :type tool: str or unicode
+    """
+    assert process_utils.get_tool_name(stage) == tool
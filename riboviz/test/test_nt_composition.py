@@ -0,0 +1,202 @@
+"""
+:py:mod:`riboviz.nt_composition` tests.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from riboviz import h5_writer
+from riboviz import nt_composition
+from riboviz import ribogrid
+
+MIN_READ_LENGTH = 4
+""" Minimum read length. """
+MAX_READ_LENGTH = 7
+""" Maximum read length. """
+GENES = [("G1", 60), ("G2", 61), ("G3", 35), ("G4", 8)]
+""" Genes and number of positions. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get random counts for :py:const:`GENES`.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    random = np.random.RandomState(42)
+    num_lengths = MAX_READ_LENGTH - MIN_READ_LENGTH + 1
+    return {gene: random.poisson(0.8, size=(num_lengths, num_positions))
+            .astype(np.int32)
+            for gene, num_positions in GENES}
+
+
+def get_sequences():
+    """
+    Get random sequences for :py:const:`GENES`, with some ``N``
+    characters, and a gene not in the H5 file.
+
+    :return: Sequences
+    :rtype: dict(str or unicode -> str or unicode)
+    """
+    random = np.random.RandomState(7)
+    sequences = {gene: "".join(random.choice(list("ACGTN"),
+                                             p=[0.24] * 4 + [0.04],
+                                             size=num_positions))
+                 for gene, num_positions in GENES}
+    sequences["G5"] = "ACGT" * 10
+    return sequences
+
+
+def write_files(tmp_dir, counts, sequences):
+    """
+    Write an H5 file with the per-gene layout for :py:const:`GENES`
+    and a FASTA file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param counts: Counts for each gene, see :py:func:`get_counts`
+    :type counts: dict(str or unicode -> numpy.ndarray)
+    :param sequences: Sequences, see :py:func:`get_sequences`
+    :type sequences: dict(str or unicode -> str or unicode)
+    :return: H5 file and FASTA file
+    :rtype: tuple(str or unicode, str or unicode)
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    fasta_file = os.path.join(tmp_dir, "orfs.fa")
+    genes = []
+    for gene, _ in GENES:
+        attributes = {
+            ribogrid.READS_TOTAL: [counts[gene].sum()],
+            ribogrid.LENGTHS: list(range(MIN_READ_LENGTH,
+                                         MAX_READ_LENGTH + 1))}
+        genes.append((ribogrid.READS_FORMAT.format(gene, "data"),
+                      np.ascontiguousarray(counts[gene].T),
+                      {name: np.asarray(value, dtype=np.int32)
+                       .reshape(-1, 1)
+                       for name, value in attributes.items()}))
+    h5_writer.write_genes(h5_file, genes, ribogrid.DATA)
+    with open(fasta_file, "w") as f:
+        for gene, sequence in sequences.items():
+            f.write(">{}\n{}\n".format(gene, sequence))
+    return h5_file, fasta_file
+
+
+def get_r_nt_frequencies(counts, sequences):
+    """
+    Calculate position-specific nucleotide frequencies as
+    ``CalculateBiasesInNucleotideComposition`` does, via
+    ``GetNTReadPosition``, ``cons_mat`` and ``comb_freq``.
+
+    :param counts: Counts for each gene, see :py:func:`get_counts`
+    :type counts: dict(str or unicode -> numpy.ndarray)
+    :param sequences: Sequences, see :py:func:`get_sequences`
+    :type sequences: dict(str or unicode -> str or unicode)
+    :return: Frequencies for each read length, frame and position
+    :rtype: list(list(float))
+    """
+    rows = []
+    for lid, read_length in enumerate(range(MIN_READ_LENGTH,
+                                            MAX_READ_LENGTH + 1)):
+        totals = np.zeros((3, read_length, 4))
+        for gene, _ in GENES:
+            reads = counts[gene][lid]
+            reads = reads[:len(reads) - read_length]
+            for position, num in enumerate(reads, 1):
+                for offset in range(read_length):
+                    nt = sequences[gene][position - 1 + offset]
+                    if nt in nt_composition.NUCLEOTIDES:
+                        totals[position % 3, offset,
+                               nt_composition.NUCLEOTIDES.index(nt)] += num
+        for frame in range(3):
+            for offset in range(read_length):
+                total = totals[frame, offset].sum()
+                frequencies = totals[frame, offset] / total if total \
+                    else np.zeros(4)
+                rows.append([read_length, offset + 1, frame] +
+                            [float("%.3g" % value)
+                             for value in frequencies])
+    return rows
+
+
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_calculate_nt_frequencies(tmp_dir, num_processes):
+    """
+    Test :py:func:`riboviz.nt_composition.calculate_nt_frequencies`
+    gives the same values as
+    ``CalculateBiasesInNucleotideComposition``.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    counts = get_counts()
+    sequences = get_sequences()
+    h5_file, fasta_file = write_files(tmp_dir, counts, sequences)
+    actual = nt_composition.calculate_nt_frequencies(
+        h5_file, fasta_file, min_read_length=MIN_READ_LENGTH,
+        max_read_length=MAX_READ_LENGTH, num_processes=num_processes)
+    assert list(actual.columns) == nt_composition.HEADER
+    np.testing.assert_allclose(actual.values,
+                               get_r_nt_frequencies(counts, sequences))
+
+
+def test_calculate_nt_frequencies_block_size(tmp_dir, monkeypatch):
+    """
+    Test :py:func:`riboviz.nt_composition.calculate_nt_frequencies`
+    gives the same values when reads are gathered in several blocks.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    counts = get_counts()
+    sequences = get_sequences()
+    h5_file, fasta_file = write_files(tmp_dir, counts, sequences)
+    monkeypatch.setattr(nt_composition, "BLOCK_SIZE", 20)
+    actual = nt_composition.calculate_nt_frequencies(
+        h5_file, fasta_file, min_read_length=MIN_READ_LENGTH,
+        max_read_length=MAX_READ_LENGTH)
+    np.testing.assert_allclose(actual.values,
+                               get_r_nt_frequencies(counts, sequences))
+
+
+def test_nt_frequencies_to_tsv(tmp_dir):
+    """
+    Test :py:func:`riboviz.nt_composition.nt_frequencies_to_tsv`
+    writes a provenance header and one row per read length, frame and
+    position.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file, fasta_file = write_files(tmp_dir, get_counts(),
+                                      get_sequences())
+    tsv_file = os.path.join(tmp_dir, "pos_sp_nt_freq.tsv")
+    nt_composition.nt_frequencies_to_tsv(h5_file, fasta_file, tsv_file,
+                                         min_read_length=MIN_READ_LENGTH,
+                                         max_read_length=MAX_READ_LENGTH)
+    with open(tsv_file) as f:
+        assert f.readline().startswith("# Created by: RiboViz")
+    actual = pd.read_csv(tsv_file, sep="\t", comment="#")
+    assert list(actual.columns) == nt_composition.HEADER
+    assert len(actual) == 3 * sum(range(MIN_READ_LENGTH,
+                                        MAX_READ_LENGTH + 1))
@@ -0,0 +1,301 @@
+"""
+:py:mod:`riboviz.periodicity` tests.
+"""
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from riboviz import periodicity
+from riboviz import ribogrid
+from riboviz.test import ribogrid_test_utils
+
+BUFFER = 30
+""" Length of flanking region around the CDS. """
+MIN_READ_LENGTH = 27
+""" Minimum read length. """
+NUM_LENGTHS = 5
+""" Number of read lengths. """
+GENES = [("G1", 150), ("G2", 151), ("G3", 152), ("G4", 90), ("G5", 200)]
+""" Genes and number of positions. """
+ASITE_DISPLACEMENTS = {28: 15, 29: 15, 30: 16}
+""" A-site displacement of each read length. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get random counts for :py:const:`GENES`.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    random = np.random.RandomState(42)
+    return {gene: random.poisson(1.5, size=(NUM_LENGTHS, num_positions))
+            .astype(np.int32)
+            for gene, num_positions in GENES}
+
+
+def get_cds_features():
+    """
+    Get CDS features for :py:const:`GENES` and a gene not in the H5
+    file. ``G4`` has a CDS whose end is beyond the end of the gene,
+    ``G5`` has a second CDS feature and ``G3`` is on the ``-``
+    strand.
+
+    :return: CDS features, see \
+    :py:func:`riboviz.periodicity.read_cds_features`
+    :rtype: list(tuple)
+    """
+    features = []
+    for gene, num_positions in GENES:
+        features.append((gene, gene, BUFFER + 1, num_positions - BUFFER,
+                         "-" if gene == "G3" else "+"))
+    features.append(("G4", "G4", 20, 89, "+"))
+    features.append(("G5", "G5", 40, 120, "+"))
+    features.append(("G6", "G6", 31, 120, "+"))
+    return features
+
+
+def get_attributes():
+    """
+    Get attributes for :py:const:`GENES`.
+
+    :return: Attribute values for each gene
+    :rtype: dict(str or unicode -> dict(str or unicode -> list(int)))
+    """
+    return {gene: {ribogrid.START_CODON_POS: [BUFFER + 1],
+                   ribogrid.STOP_CODON_POS: [num_positions - BUFFER - 2],
+                   ribogrid.LENGTHS: list(range(
+                       MIN_READ_LENGTH, MIN_READ_LENGTH + NUM_LENGTHS))}
+            for gene, num_positions in GENES}
+
+
+def get_r_wilcoxon_greater(x, y):
+    """
+    Run a one-sided paired Wilcoxon signed-rank test as
+    ``wilcox.test(x, y, alternative = "greater", paired = TRUE,
+    exact = FALSE)`` does.
+
+    :param x: Values
+    :type x: list(float)
+    :param y: Values
+    :type y: list(float)
+    :return: p-value
+    :rtype: float
+    """
+    d = [a - b for a, b in zip(x, y)
+         if not (np.isnan(a) or np.isnan(b)) and a != b]
+    n = len(d)
+    ranks = pd.Series(np.abs(d), dtype=float).rank(method="average")
+    v = sum(rank for rank, value in zip(ranks, d) if value > 0)
+    ties = pd.Series(np.abs(d), dtype=float).value_counts()
+    sigma = math.sqrt(n * (n + 1) * (2 * n + 1) / 24 -
+                      sum(t ** 3 - t for t in ties) / 48)
+    z = v - n * (n + 1) / 4 - 0.5
+    if sigma == 0:
+        return 1.0
+    return 0.5 * math.erfc(z / sigma / math.sqrt(2))
+
+
+def get_r_read_frame(counts, left, right):
+    """
+    Calculate read frames of a CDS as ``GetGeneReadFrame`` does.
+
+    :param counts: Counts, with one row per read length and one \
+    column per position
+    :type counts: numpy.ndarray
+    :param left: 1-indexed start of CDS
+    :type left: int
+    :param right: 1-indexed end of CDS
+    :type right: int
+    :return: ``Ct_fr0``, ``Ct_fr1``, ``Ct_fr2``, ``pval_fr0vs1`` and \
+    ``pval_fr0vs2``
+    :rtype: list(float)
+    """
+    num_positions = counts.shape[1]
+    asite = np.zeros(num_positions)
+    for read_length, displacement in ASITE_DISPLACEMENTS.items():
+        row = counts[read_length - MIN_READ_LENGTH]
+        asite += [row[i - displacement] if i >= displacement else 0
+                  for i in range(num_positions)]
+    frames = [[asite[p + f - 1] if p + f <= num_positions else np.nan
+               for p in range(left, right + 1, 3)]
+              for f in range(3)]
+    return [sum(frame) for frame in frames] + \
+        [get_r_wilcoxon_greater(frames[0], frames[1]),
+         get_r_wilcoxon_greater(frames[0], frames[2])]
+
+
+def test_wilcoxon_greater():
+    """
+    Test :py:func:`riboviz.periodicity.wilcoxon_greater` against
+    a value calculated using R's ``wilcox.test``, and for a group
+    with only zero differences and an empty group.
+    """
+    differences = [4, 0, 3, 4, -2, 0, 0, np.nan]
+    groups = [0, 0, 0, 0, 0, 1, 1, 0]
+    p_values = periodicity.wilcoxon_greater(differences, groups, 3)
+    np.testing.assert_allclose(p_values, [0.09874, 1, 1], atol=1e-5)
+
+
+def test_combine_p_values():
+    """
+    Test :py:func:`riboviz.periodicity.combine_p_values_stouffer`
+    and :py:func:`riboviz.periodicity.combine_p_values_fisher`
+    against values calculated using R, and with p-values of 0 and 1.
+    """
+    p_values = np.array([[0.05, 0.2], [1, 1], [0, 0.5], [0.5, 0.5]])
+    np.testing.assert_allclose(
+        periodicity.combine_p_values_stouffer(p_values),
+        [0.03936, 1, 0, 0.5], atol=1e-5)
+    np.testing.assert_allclose(
+        periodicity.combine_p_values_fisher(p_values[[0, 3]]),
+        [0.05605, 0.5966], atol=1e-4)
+
+
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_calculate_gene_read_frames(tmp_dir, num_processes):
+    """
+    Test :py:func:`riboviz.periodicity.calculate_gene_read_frames`
+    gives the same values as ``CalculateGeneReadFrames``.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    counts = get_counts()
+    ribogrid_test_utils.write_per_gene(h5_file, counts, get_attributes())
+    cds_features = get_cds_features()
+    actual = periodicity.calculate_gene_read_frames(
+        h5_file, cds_features, min_read_length=MIN_READ_LENGTH,
+        asite_displacements=ASITE_DISPLACEMENTS,
+        num_processes=num_processes)
+    assert list(actual.columns) == periodicity.FRAMES_HEADER
+    in_file = [feature for feature in cds_features
+               if feature[0] in counts]
+    assert list(actual[periodicity.GENE]) == \
+        [gene for gene, _, _, _, _ in in_file]
+    expected = np.array([get_r_read_frame(counts[gene], left, right)
+                         for gene, _, left, right, _ in in_file])
+    np.testing.assert_allclose(
+        actual[periodicity.FRAMES_HEADER[1:6]].values, expected)
+    assert np.isnan(actual[periodicity.CT_FR2].values[len(GENES)])
+
+
+def test_calculate_three_nucleotide_periodicity(tmp_dir):
+    """
+    Test
+    :py:func:`riboviz.periodicity.calculate_three_nucleotide_periodicity`
+    gives the same values as ``CalculateThreeNucleotidePeriodicity``,
+    using the minimum start and maximum end of the ``+`` strand CDSs
+    of each gene.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    counts = get_counts()
+    ribogrid_test_utils.write_per_gene(h5_file, counts, get_attributes())
+    cds_ends = periodicity.get_cds_ends(get_cds_features())
+    assert cds_ends["G4"] == (20, 89)
+    assert cds_ends["G5"] == (BUFFER + 1, 170)
+    assert "G3" not in cds_ends
+    nnt_buffer, nnt_gene = 25, 50
+    actual = periodicity.calculate_three_nucleotide_periodicity(
+        h5_file, cds_ends, nnt_buffer=nnt_buffer, nnt_gene=nnt_gene)
+    assert list(actual.columns) == periodicity.PERIODICITY_HEADER
+    width = nnt_buffer + nnt_gene
+    expected_5 = np.zeros(width)
+    expected_3 = np.zeros(width)
+    for gene in ["G1", "G2", "G4", "G5"]:
+        gene_counts = counts[gene].sum(axis=0)
+        start, end = cds_ends[gene]
+        for i in range(width):
+            position = start - nnt_buffer + i
+            if position >= 1:
+                expected_5[i] += gene_counts[position - 1]
+            position = end - nnt_gene + 1 + i
+            if position <= len(gene_counts):
+                expected_3[i] += gene_counts[position - 1]
+    np.testing.assert_array_equal(actual[periodicity.COUNTS],
+                                  np.concatenate((expected_5, expected_3)))
+    assert list(actual[periodicity.POS]) == \
+        list(range(-nnt_buffer + 1, nnt_gene + 1)) + \
+        list(range(-nnt_gene + 1, nnt_buffer + 1))
+    assert list(actual[periodicity.END]) == \
+        [periodicity.END_5] * width + [periodicity.END_3] * width
+
+
+def test_read_cds_features_cache(tmp_dir):
+    """
+    Test :py:func:`riboviz.periodicity.read_cds_features` reads the
+    same CDS features from an annotation cache as from a GFF file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    gff_file = os.path.join(tmp_dir, "orfs.gff")
+    with open(gff_file, "w") as f:
+        for gene, name, start, end, strand in get_cds_features():
+            f.write("\t".join([gene, "rvz", "CDS", str(start), str(end),
+                               ".", strand, "0", "Name=" + name]) + "\n")
+    expected = periodicity.read_cds_features(gff_file)
+    assert expected == get_cds_features()
+    cache_dir = os.path.join(tmp_dir, "cache")
+    assert periodicity.read_cds_features(gff_file, cache_dir) == expected
+    assert os.listdir(cache_dir)
+
+
+def test_periodicity_to_tsv(tmp_dir):
+    """
+    Test :py:func:`riboviz.periodicity.periodicity_to_tsv` writes
+    both files, with provenance headers, reading CDSs from a GFF file
+    and A-site displacements from a file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    gff_file = os.path.join(tmp_dir, "orfs.gff")
+    asite_file = os.path.join(tmp_dir, "asite.txt")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(), get_attributes())
+    with open(gff_file, "w") as f:
+        for gene, name, start, end, strand in get_cds_features():
+            f.write("\t".join([gene, "rvz", "CDS", str(start), str(end),
+                               ".", strand, "0", "Name=" + name]) + "\n")
+    with open(asite_file, "w") as f:
+        f.write("# A-site displacements\n")
+        f.write("read_length\tasite_displacement\n")
+        for read_length, displacement in ASITE_DISPLACEMENTS.items():
+            f.write("{}\t{}\n".format(read_length, displacement))
+    assert periodicity.load_asite_displacements(asite_file) == \
+        ASITE_DISPLACEMENTS
+    periodicity.periodicity_to_tsv(h5_file, gff_file, tmp_dir, "S_",
+                                   min_read_length=MIN_READ_LENGTH,
+                                   asite_disp_length_file=asite_file)
+    for file_name, header in [
+            (periodicity.PERIODICITY_TSV, periodicity.PERIODICITY_HEADER),
+            (periodicity.FRAMES_TSV, periodicity.FRAMES_HEADER)]:
+        tsv_file = os.path.join(tmp_dir, "S_" + file_name)
+        with open(tsv_file) as f:
+            assert f.readline().startswith("# Created by: RiboViz")
+        actual = pd.read_csv(tsv_file, sep="\t", comment="#")
+        assert list(actual.columns) == header
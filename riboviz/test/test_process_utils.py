@@ -4,6 +4,7 @@
 import os.path
 import tempfile
 import pytest
+from riboviz import logging_utils
 from riboviz import process_utils
 from riboviz import utils
 
@@ -698,3 +699,229 @@ def test_run_logged_pipe_command_error(tmp_stdout_file):
     assert lines[0] == "cat: no-such-file: No such file or directory"
     assert lines[1] == "wc: invalid option -- 'x'"
     assert lines[2] == "Try 'wc --help' for more information."
+
+
+def upper_case(in_handle):
+    """
+    Python pipeline stage which converts its input to upper-case.
+
+    :param in_handle: Input
+    :type in_handle: _io.BufferedReader
+    :return: Output
+    :rtype: generator(bytes)
+    """
+    for line in in_handle:
+        yield line.upper()
+
+
+def test_run_pipeline(tmp_stdout_file, tmp_stderr_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_pipeline` with three
+    commands, each with its own standard error file.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_stderr_file: Error log file
+    :type tmp_stderr_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    num_lines = len([line for line in open(path)])
+    cmds = [["cat", path, path], ["cat"], ["wc", "-l"]]
+    with open(tmp_stdout_file, "w") as out, \
+         open(tmp_stderr_file, "w") as err:
+        results = process_utils.run_pipeline(cmds, out, [err] * 3)
+    lines = [line.rstrip('\n') for line in open(tmp_stdout_file)]
+    assert len(lines) == 1
+    assert str(num_lines * 2) == lines[0]  # Output from wc
+    assert len(results) == 3
+    for cmd, result in zip(cmds, results):
+        assert result.stage == cmd
+        assert result.exit_code == 0
+        assert result.wall_time >= 0
+        assert result.user_time >= 0
+        assert result.system_time >= 0
+
+
+def test_run_pipeline_function(tmp_stdout_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_pipeline` with a Python
+    function stage between two commands.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmds = [["cat", path], upper_case, ["head", "-n", "2"]]
+    with open(tmp_stdout_file, "w") as out:
+        results = process_utils.run_pipeline(cmds, out)
+    lines = [line.rstrip('\n') for line in open(tmp_stdout_file)]
+    assert lines == [line.rstrip('\n').upper()
+                     for line in open(path)][0:2]
+    assert results[1].stage == upper_case
+
+
+def test_run_pipeline_error(tmp_stdout_file, tmp_stderr_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_pipeline` where the first
+    command in the pipeline includes an error and each stage has its
+    own standard error file.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_stderr_file: Error log file
+    :type tmp_stderr_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmds = [["cat", path, "no-such-file", path], ["wc", "-l"]]
+    with open(tmp_stdout_file, "w") as out, \
+         open(tmp_stderr_file, "w") as err:
+        with pytest.raises(AssertionError):
+            process_utils.run_pipeline(cmds, out, [err, out])
+    lines = [line.rstrip('\n') for line in open(tmp_stderr_file)]
+    assert lines == ["cat: no-such-file: No such file or directory"]
+
+
+def test_run_logged_pipeline(tmp_stdout_file, tmp_redirect_file,
+                             tmp_cmd_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_pipeline`
+    with a Python function stage, an output file and a file to
+    capture commands sent to the operating system.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_redirect_file: Output file
+    :type tmp_redirect_file: str or unicode
+    :param tmp_cmd_file: Command file
+    :type tmp_cmd_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmds = [["cat", path], upper_case, ["wc", "-l"]]
+    cmds_to_log = [None, ["tr", "a-z", "A-Z"], None]
+    process_utils.run_logged_pipeline(cmds,
+                                      tmp_stdout_file,
+                                      tmp_cmd_file,
+                                      out=tmp_redirect_file,
+                                      cmds_to_log=cmds_to_log)
+    num_lines = len([line for line in open(path)])
+    lines = [line.rstrip('\n') for line in open(tmp_redirect_file)]
+    assert lines == [str(num_lines)]
+    lines = [line.rstrip('\n') for line in open(tmp_stdout_file)]
+    assert len(lines) == 3
+    assert lines[0].startswith("Stage 1: exit code 0")
+    with open(tmp_cmd_file) as f:
+        actual_cmds = f.readlines()
+    assert len(actual_cmds) == 1
+    expected_cmd = "cat %s | tr a-z A-Z | wc -l > %s" % (
+        path, tmp_redirect_file)
+    assert actual_cmds[0].rstrip('\n') == expected_cmd
+
+
+def test_run_logged_pipeline_error(tmp_stdout_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_pipeline` where
+    both commands in the pipeline includes an error.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmds = [["cat", "no-such-file", path], ["wc", "-l", "-x"]]
+    with pytest.raises(AssertionError):
+        process_utils.run_logged_pipeline(cmds, tmp_stdout_file)
+    lines = [line.rstrip('\n') for line in open(tmp_stdout_file)]
+    assert len(lines) == 5
+    assert lines[0] == "cat: no-such-file: No such file or directory"
+    assert lines[1] == "wc: invalid option -- 'x'"
+    assert lines[2] == "Try 'wc --help' for more information."
+    assert lines[4].startswith("Stage 2: exit code 1")
+
+
+def test_run_logged_pipeline_dry_run(tmp_stdout_file, tmp_cmd_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_pipeline` with
+    the ``dry_run`` parameter set to ``True``.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_cmd_file: Command file
+    :type tmp_cmd_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmds = [["cat", path], ["sort"], ["wc", "-l"]]
+    process_utils.run_logged_pipeline(cmds, tmp_stdout_file,
+                                      tmp_cmd_file, True)
+    with open(tmp_stdout_file) as f:
+        lines = f.readlines()
+    assert len(lines) == 0
+    with open(tmp_cmd_file) as f:
+        actual_cmds = f.readlines()
+    assert actual_cmds == ["cat %s | sort | wc -l\n" % path]
+
+
+def test_run_logged_command_usage_file(tmp_stdout_file, tmp_redirect_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_command` and
+    :py:func:`riboviz.process_utils.run_logged_pipeline` with a file
+    to capture the resource usage of each command.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_redirect_file: Resource usage file
+    :type tmp_redirect_file: str or unicode
+    """
+    path = os.path.realpath(__file__)
+    cmd = ["ls", path]
+    result = process_utils.run_logged_command(cmd,
+                                              tmp_stdout_file,
+                                              usage_file=tmp_redirect_file,
+                                              step="list")
+    assert result.exit_code == 0
+    assert result.max_rss > 0
+    cmds = [["cat", path], ["wc", "-l"]]
+    process_utils.run_logged_pipeline(cmds,
+                                      tmp_stdout_file,
+                                      usage_file=tmp_redirect_file,
+                                      step="count")
+    with open(tmp_redirect_file) as f:
+        rows = [line.rstrip('\n').split("\t") for line in f]
+    assert len(rows) == 4
+    assert rows[0] == process_utils.USAGE_HEADER
+    assert rows[1][0:4] == ["list", tmp_stdout_file,
+                            utils.list_to_str(cmd), "0"]
+    assert rows[2][0:4] == ["count", tmp_stdout_file,
+                            utils.list_to_str(cmds[0]), "0"]
+    assert rows[3][0:4] == ["count", tmp_stdout_file,
+                            utils.list_to_str(cmds[1]), "0"]
+    for row in rows[1:]:
+        assert len(row) == len(process_utils.USAGE_HEADER)
+
+
+def test_run_logged_command_usage_file_context_step(
+        tmp_stdout_file, tmp_redirect_file):
+    """
+    Test :py:func:`riboviz.process_utils.run_logged_command` records
+    the step of the current log context (see
+    :py:func:`riboviz.logging_utils.log_context`) in the resource
+    usage file, if no step is given.
+
+    :param tmp_stdout_file: Output log file
+    :type tmp_stdout_file: str or unicode
+    :param tmp_redirect_file: Resource usage file
+    :type tmp_redirect_file: str or unicode
+    """
+    cmd = ["ls", os.path.realpath(__file__)]
+    with logging_utils.log_context(step="list"):
+        process_utils.run_logged_command(cmd,
+                                         tmp_stdout_file,
+                                         usage_file=tmp_redirect_file)
+        process_utils.run_logged_command(cmd,
+                                         tmp_stdout_file,
+                                         usage_file=tmp_redirect_file,
+                                         step="other")
+    process_utils.run_logged_command(cmd,
+                                     tmp_stdout_file,
+                                     usage_file=tmp_redirect_file)
+    with open(tmp_redirect_file) as f:
+        rows = [line.rstrip('\n').split("\t") for line in f]
+    assert [row[0] for row in rows[1:]] == ["list", "other", ""]
@@ -0,0 +1,140 @@
+"""
+:py:mod:`riboviz.provenance` tests.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+from riboviz import provenance
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+@pytest.fixture(scope="function")
+def clear_caches():
+    """
+    Clear cached version information and templates before and after
+    a test.
+    """
+    provenance.get_directory_version.cache_clear()
+    provenance.get_provenance_template.cache_clear()
+    yield
+    provenance.get_directory_version.cache_clear()
+    provenance.get_provenance_template.cache_clear()
+
+
+def test_get_version_cached(clear_caches, monkeypatch):
+    """
+    Test :py:func:`riboviz.provenance.get_version` queries the Git
+    repository once for files in the same directory.
+
+    :param clear_caches: Cache clearing fixture
+    :type clear_caches: NoneType
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.delenv(provenance.VERSION_ENV, raising=False)
+    version = provenance.get_version(provenance.__file__)
+    assert version == provenance.UNKNOWN_VERSION or \
+        version.startswith("commit ")
+    assert provenance.get_version(os.path.join(
+        os.path.dirname(provenance.__file__), "workflow.py")) == version
+    info = provenance.get_directory_version.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_get_version_not_git(tmp_dir, clear_caches, monkeypatch):
+    """
+    Test :py:func:`riboviz.provenance.get_version` returns
+    :py:const:`riboviz.provenance.UNKNOWN_VERSION` for a file not in
+    a Git repository.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param clear_caches: Cache clearing fixture
+    :type clear_caches: NoneType
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.delenv(provenance.VERSION_ENV, raising=False)
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", os.path.dirname(tmp_dir))
+    assert provenance.get_version(os.path.join(tmp_dir, "file.py")) == \
+        provenance.UNKNOWN_VERSION
+
+
+def test_get_version_env(clear_caches, monkeypatch):
+    """
+    Test :py:func:`riboviz.provenance.get_version` returns the value
+    of :py:const:`riboviz.provenance.VERSION_ENV`, if set, without
+    querying a Git repository.
+
+    :param clear_caches: Cache clearing fixture
+    :type clear_caches: NoneType
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.setenv(provenance.VERSION_ENV, "2.1 (release)")
+    assert provenance.get_version(provenance.__file__) == "2.1 (release)"
+    assert provenance.get_directory_version.cache_info().misses == 0
+
+
+def test_get_provenance(clear_caches, monkeypatch):
+    """
+    Test :py:func:`riboviz.provenance.get_provenance` returns a
+    header with the expected lines and a current date, and that
+    :py:func:`riboviz.provenance.write_provenance_to_str` is
+    consistent with it.
+
+    :param clear_caches: Cache clearing fixture
+    :type clear_caches: NoneType
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.setenv(provenance.VERSION_ENV, "{version}")
+    file_path = "/path/{file}.py"
+    lines = provenance.get_provenance(file_path).splitlines()
+    assert lines[0] == "# Created by: RiboViz"
+    assert lines[1].startswith("# Date: ")
+    assert lines[-2] == "# File: " + file_path
+    assert lines[-1] == "# Version: {version}"
+    second = provenance.get_provenance(file_path).splitlines()
+    assert lines[1] <= second[1]
+    assert lines[2:] == second[2:]
+    assert provenance.get_provenance_template.cache_info().misses == 1
+    header = provenance.write_provenance_to_str(file_path, eol="\r\n")
+    assert header.endswith("Version: {version}\r\n")
+    assert header.split("\r\n")[0] == "Created by: RiboViz"
+
+
+def test_write_provenance_header(tmp_dir, clear_caches, monkeypatch):
+    """
+    Test :py:func:`riboviz.provenance.write_provenance_header` writes
+    the header from :py:func:`riboviz.provenance.get_provenance`.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param clear_caches: Cache clearing fixture
+    :type clear_caches: NoneType
+    :param monkeypatch: Pytest monkeypatch fixture
+    :type monkeypatch: _pytest.monkeypatch.MonkeyPatch
+    """
+    monkeypatch.setenv(provenance.VERSION_ENV, "test")
+    header_file = os.path.join(tmp_dir, "header.txt")
+    provenance.write_provenance_header(__file__, header_file, "## ")
+    with open(header_file) as f:
+        lines = f.read().splitlines()
+    expected = provenance.get_provenance(__file__, "## ").splitlines()
+    assert lines[0] == expected[0]
+    assert lines[2:] == expected[2:]
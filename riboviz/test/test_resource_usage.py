@@ -0,0 +1,73 @@
+"""
+:py:mod:`riboviz.resource_usage` tests.
+"""
+import os
+import tempfile
+import pandas as pd
+import pytest
+from riboviz import process_utils
+from riboviz import resource_usage
+
+
+@pytest.fixture(scope="function")
+def tmp_file():
+    """
+    Create a temporary file with a ``tsv`` suffix.
+
+    :return: path to temporary file
+    :rtype: str or unicode
+    """
+    _, tmp_file = tempfile.mkstemp(prefix="tmp", suffix=".tsv")
+    yield tmp_file
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+
+def test_summarise_usage_df():
+    """
+    Test :py:func:`riboviz.resource_usage.summarise_usage_df`
+    summarises usage by step, in order of first occurrence.
+    """
+    usage = pd.DataFrame(
+        [["map_to_orf", "A/01.log", "hisat2", 0, 2.0, 1.5, 0.5, 100, 10, 20],
+         ["sort_bam", "A/02.log", "samtools", 0, 1.0, 0.5, 0.1, 50, 5, 5],
+         ["map_to_orf", "B/01.log", "hisat2", 0, 3.0, 2.5, 0.5, 200, 1, 2]],
+        columns=process_utils.USAGE_HEADER)
+    summary = resource_usage.summarise_usage_df(usage)
+    assert list(summary.columns) == resource_usage.SUMMARY_HEADER
+    assert list(summary[process_utils.STEP]) == ["map_to_orf", "sort_bam"]
+    row = summary.iloc[0]
+    assert row[resource_usage.NUM_COMMANDS] == 2
+    assert row[resource_usage.TOTAL_WALL_TIME] == 5.0
+    assert row[resource_usage.MAX_WALL_TIME] == 3.0
+    assert row[resource_usage.TOTAL_USER_TIME] == 4.0
+    assert row[resource_usage.TOTAL_SYSTEM_TIME] == 1.0
+    assert row[process_utils.MAX_RSS] == 200
+    assert row[resource_usage.TOTAL_READ_BYTES] == 11
+    assert row[resource_usage.TOTAL_WRITE_BYTES] == 22
+
+
+def test_summarise_usage(tmp_file):
+    """
+    Test :py:func:`riboviz.resource_usage.summarise_usage` using
+    a resource usage file written by
+    :py:func:`riboviz.process_utils.run_logged_command`.
+
+    :param tmp_file: Temporary file
+    :type tmp_file: str or unicode
+    """
+    _, usage_file = tempfile.mkstemp(prefix="tmp", suffix=".tsv")
+    _, log_file = tempfile.mkstemp(prefix="tmp", suffix=".log")
+    try:
+        for step in ["list", "list", "echo"]:
+            process_utils.run_logged_command(["echo", step], log_file,
+                                             usage_file=usage_file,
+                                             step=step)
+        resource_usage.summarise_usage(usage_file, tmp_file)
+    finally:
+        os.remove(usage_file)
+        os.remove(log_file)
+    summary = pd.read_csv(tmp_file, sep="\t", comment="#")
+    assert list(summary.columns) == resource_usage.SUMMARY_HEADER
+    assert list(summary[process_utils.STEP]) == ["list", "echo"]
+    assert list(summary[resource_usage.NUM_COMMANDS]) == [2, 1]
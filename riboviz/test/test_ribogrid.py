@@ -0,0 +1,239 @@
+"""
+:py:mod:`riboviz.ribogrid` tests.
+"""
+import os
+import shutil
+import tempfile
+import h5py
+import numpy as np
+import pysam
+import pytest
+from riboviz import h5_writer
+from riboviz import ribogrid
+
+RIBOVIZ_GFF = """##gff-version 3
+G1\tTest\tUTR5\t1\t5\t.\t+\t.\tName=G1
+G1\tTest\tCDS\t6\t14\t.\t+\t.\tName=G1
+G1\tTest\tUTR3\t15\t19\t.\t+\t.\tName=G1
+"""
+""" GFF3 file with UTR5, CDS and UTR3 elements. """
+RIBOVIZ_READS = [
+    # (start, CIGAR, flag)
+    (0, "3M", 0),
+    (0, "3M", 0),
+    (5, "2M", 0),
+    (5, "5M", 0),
+    (10, "1S2M", 0),
+    (3, "3M", 16),
+    (12, "4M", 256),
+]
+"""
+Reads aligned to ``G1``, including one that is too long, one with a
+soft-clipped base, one on the minus strand and a secondary alignment.
+"""
+GFF = """chr\tTest\texon\t8\t20\t.\t-\t.\tgene_id "g1"; gene_name "ONE";
+chr\tTest\tCDS\t10\t18\t.\t-\t.\tgene_id "g1"; gene_name "ONE";
+other\tTest\tCDS\t10\t18\t.\t+\t.\tgene_id "g2"; gene_name "g2";
+"""
+"""
+GFF2 file with a gene on the minus strand of ``chr`` and a gene on a
+sequence with no reads.
+"""
+MULTI_EXON_GFF = """chr\tTest\tCDS\t1\t5\t.\t+\t.\tgene_id "g1";
+chr\tTest\tCDS\t10\t15\t.\t+\t.\tgene_id "g1";
+"""
+""" GFF2 file with a gene with two exons. """
+READS = [
+    # (start, CIGAR, flag)
+    (15, "3M", 16),
+    (17, "1M2S", 16),
+    (11, "3M", 0),
+    (20, "3M", 16),
+]
+"""
+Reads aligned to ``chr``, including one on the plus strand and one
+outside of ``g1``.
+"""
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def write_bam(bam_file, reference, length, reads, is_index=True):
+    """
+    Write reads aligned to a single reference to a sorted BAM file.
+
+    :param bam_file: BAM file
+    :type bam_file: str or unicode
+    :param reference: Reference name
+    :type reference: str or unicode
+    :param length: Reference length
+    :type length: int
+    :param reads: Reads, each a tuple of 0-indexed start, CIGAR and \
+    flag
+    :type reads: list(tuple(int, str or unicode, int))
+    :param is_index: Index BAM file?
+    :type is_index: bool
+    """
+    header = {"HD": {"VN": "1.0", "SO": "coordinate"},
+              "SQ": [{"SN": reference, "LN": length}]}
+    with pysam.AlignmentFile(bam_file, "wb", header=header) as bam:
+        for index, (start, cigar, flag) in enumerate(sorted(reads)):
+            read = pysam.AlignedSegment()
+            read.query_name = "read{}".format(index)
+            read.flag = flag
+            read.reference_id = 0
+            read.reference_start = start
+            read.cigarstring = cigar
+            query_length = read.infer_query_length()
+            read.query_sequence = "A" * query_length
+            read.mapping_quality = 1
+            bam.write(read)
+    if is_index:
+        pysam.index(bam_file)
+
+
+def get_attributes(h5, path):
+    """
+    Get the attributes of an H5 group as flattened lists.
+
+    :param h5: H5 file
+    :type h5: h5py.File
+    :param path: Group path
+    :type path: str or unicode
+    :return: Attributes
+    :rtype: dict
+    """
+    return {name: list(value.flatten())
+            for name, value in h5[path].attrs.items()}
+
+
+@pytest.mark.parametrize("is_index,num_processes",
+                         [(True, 1), (True, 2), (False, 1)])
+def test_bam_to_h5_riboviz_gff(tmp_dir, is_index, num_processes):
+    """
+    Test :py:func:`riboviz.ribogrid.bam_to_h5` with a GFF file with
+    UTR5, CDS and UTR3 elements.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_index: Index BAM file?
+    :type is_index: bool
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    gff_file = os.path.join(tmp_dir, "test.gff3")
+    h5_file = os.path.join(tmp_dir, "test.h5")
+    write_bam(bam_file, "G1", 19, RIBOVIZ_READS, is_index)
+    with open(gff_file, "w") as f:
+        f.write(RIBOVIZ_GFF)
+    ribogrid.bam_to_h5(bam_file, h5_file, gff_file,
+                       min_read_length=2, max_read_length=4,
+                       primary_id="Name", dataset="test",
+                       num_processes=num_processes)
+    expected = np.zeros((3, 19), dtype=np.int32)
+    expected[0, 5] = 1
+    expected[1, 0] = 2
+    expected[1, 10] = 1
+    expected[2, 12] = 1
+    with h5py.File(h5_file, "r") as h5:
+        assert list(h5.keys()) == ["G1"]
+        data = h5["G1/test/reads/data"]
+        assert data.dtype == np.int32
+        assert data.compression == h5_writer.GZIP
+        np.testing.assert_array_equal(data[()], expected.T)
+        assert get_attributes(h5, "G1/test/reads") == {
+            ribogrid.READS_TOTAL: [5],
+            ribogrid.BUFFER_LEFT: [5],
+            ribogrid.BUFFER_RIGHT: [5],
+            ribogrid.START_CODON_POS: [6, 7, 8],
+            ribogrid.STOP_CODON_POS: [12, 13, 14],
+            ribogrid.LENGTHS: [2, 3, 4],
+            ribogrid.READS_BY_LEN: [1, 3, 1]}
+
+
+@pytest.mark.parametrize("is_index,is_cache",
+                         [(True, False), (False, False), (True, True)])
+def test_bam_to_h5_gff(tmp_dir, is_index, is_cache):
+    """
+    Test :py:func:`riboviz.ribogrid.bam_to_h5` with a GFF file with
+    CDS elements only, a gene on the minus strand, a gene on a sequence
+    with no reads and secondary gene IDs.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_index: Index BAM file?
+    :type is_index: bool
+    :param is_cache: Read GFF features from an annotation cache?
+    :type is_cache: bool
+    """
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    gff_file = os.path.join(tmp_dir, "test.gff")
+    h5_file = os.path.join(tmp_dir, "test.h5")
+    write_bam(bam_file, "chr", 30, READS, is_index)
+    with open(gff_file, "w") as f:
+        f.write(GFF)
+    ribogrid.bam_to_h5(bam_file, h5_file, gff_file,
+                       min_read_length=2, max_read_length=4, buffer=2,
+                       primary_id="gene_id", secondary_id="gene_name",
+                       is_riboviz_gff=False, stop_in_cds=True,
+                       cache_dir=os.path.join(tmp_dir, "cache")
+                       if is_cache else None)
+    expected = np.zeros((3, 13), dtype=np.int32)
+    expected[1, 0] = 1
+    expected[1, 2] = 1
+    with h5py.File(h5_file, "r") as h5:
+        assert sorted(h5.keys()) == ["ONE", "g1", "g2"]
+        assert isinstance(h5.get("ONE", getlink=True), h5py.ExternalLink)
+        np.testing.assert_array_equal(h5["g1/data/reads/data"][()],
+                                      expected.T)
+        np.testing.assert_array_equal(h5["g2/data/reads/data"][()],
+                                      np.zeros((13, 3)))
+        assert get_attributes(h5, "g1/data/reads") == {
+            ribogrid.READS_TOTAL: [2],
+            ribogrid.BUFFER_LEFT: [2],
+            ribogrid.BUFFER_RIGHT: [2],
+            ribogrid.START_CODON_POS: [3, 4, 5],
+            ribogrid.STOP_CODON_POS: [9, 10, 11],
+            ribogrid.LENGTHS: [2, 3, 4],
+            ribogrid.READS_BY_LEN: [0, 2, 0]}
+
+
+def test_bam_to_h5_multi_exon(tmp_dir):
+    """
+    Test :py:func:`riboviz.ribogrid.bam_to_h5` counts a read once for
+    each exon of a gene that it overlaps, as ``bam_to_h5.R`` does.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    bam_file = os.path.join(tmp_dir, "test.bam")
+    gff_file = os.path.join(tmp_dir, "test.gff")
+    h5_file = os.path.join(tmp_dir, "test.h5")
+    # Spliced read, overlapping both exons, and a read overlapping the
+    # second exon only.
+    write_bam(bam_file, "chr", 20, [(3, "2M5N2M", 0), (10, "3M", 0)])
+    with open(gff_file, "w") as f:
+        f.write(MULTI_EXON_GFF)
+    ribogrid.bam_to_h5(bam_file, h5_file, gff_file,
+                       min_read_length=3, max_read_length=4, buffer=0,
+                       is_riboviz_gff=False, stop_in_cds=True)
+    expected = np.zeros((2, 11), dtype=np.int32)
+    expected[1, 3] = 2
+    expected[0, 6] = 1
+    with h5py.File(h5_file, "r") as h5:
+        np.testing.assert_array_equal(h5["g1/data/reads/data"][()],
+                                      expected.T)
+        assert get_attributes(h5, "g1/data/reads")[
+            ribogrid.READS_TOTAL] == [3]
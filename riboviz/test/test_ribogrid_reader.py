@@ -0,0 +1,249 @@
+"""
+:py:mod:`riboviz.ribogrid_reader` tests.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+from riboviz import h5_writer
+from riboviz import ribogrid
+from riboviz import ribogrid_reader
+from riboviz import ribogrid_store
+from riboviz.test import ribogrid_test_utils
+
+NUM_LENGTHS = 2
+""" Number of read lengths. """
+GENES = [("G1", 10), ("G2", 6), ("G3", 8)]
+""" Genes and number of positions. """
+LINKS = {"ALT2": "G2"}
+""" Links from secondary gene IDs to gene names. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get counts for :py:const:`GENES`, each an increasing sequence.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    return {gene: np.arange(1, NUM_LENGTHS * num_positions + 1,
+                            dtype=np.int32).reshape(NUM_LENGTHS, -1)
+            for gene, num_positions in GENES}
+
+
+def get_attributes():
+    """
+    Get attributes for :py:const:`GENES`.
+
+    :return: Attribute values for each gene
+    :rtype: dict(str or unicode -> dict(str or unicode -> list(int)))
+    """
+    counts = get_counts()
+    return {gene: {ribogrid.BUFFER_LEFT: [2],
+                   ribogrid.BUFFER_RIGHT: [2],
+                   ribogrid.START_CODON_POS: [3, 4, 5],
+                   ribogrid.STOP_CODON_POS: [num_positions - 4,
+                                             num_positions - 3,
+                                             num_positions - 2],
+                   ribogrid.LENGTHS: [28, 29],
+                   ribogrid.READS_BY_LEN: counts[gene].sum(axis=1)}
+            for gene, num_positions in GENES}
+
+
+@pytest.fixture(scope="function", params=["per_gene", "columnar",
+                                          "columnar_mmap"])
+def h5_file(tmp_dir, request):
+    """
+    Create an H5 file for :py:const:`GENES` with the per-gene layout,
+    the columnar layout or the columnar layout stored uncompressed
+    and contiguously.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param request: Request, with layout as parameter
+    :type request: _pytest.fixtures.SubRequest
+    :return: H5 file
+    :rtype: str or unicode
+    """
+    per_gene_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(per_gene_file, get_counts(),
+                                       get_attributes(), LINKS)
+    if request.param == "per_gene":
+        return per_gene_file
+    columnar_file = os.path.join(tmp_dir, "columnar.h5")
+    if request.param == "columnar":
+        ribogrid_store.per_gene_to_columnar(per_gene_file, columnar_file)
+    else:
+        ribogrid_store.per_gene_to_columnar(
+            per_gene_file, columnar_file,
+            compression=h5_writer.NONE, chunk_positions=None)
+    return columnar_file
+
+
+def test_get_gene_datamatrix(h5_file):
+    """
+    Test :py:meth:`riboviz.ribogrid_reader.RibogridReader.get_gene_datamatrix`
+    by primary and secondary gene ID.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    """
+    counts = get_counts()
+    with ribogrid_reader.RibogridReader(h5_file) as reader:
+        assert reader.genes == ["G1", "G2", "G3"]
+        for gene, _ in GENES:
+            np.testing.assert_array_equal(
+                reader.get_gene_datamatrix(gene), counts[gene])
+        np.testing.assert_array_equal(reader.get_gene_datamatrix("ALT2"),
+                                      counts["G2"])
+        assert list(reader.get_gene_attributes("ALT2")[
+            ribogrid.READS_TOTAL]) == [counts["G2"].sum()]
+        with pytest.raises(KeyError):
+            reader.get_gene_datamatrix("G4")
+
+
+def test_read_all(h5_file):
+    """
+    Test :py:meth:`riboviz.ribogrid_reader.RibogridReader.read_all`
+    for all genes and for a subset of genes.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    """
+    counts = get_counts()
+    with ribogrid_reader.RibogridReader(h5_file) as reader:
+        reader.get_gene_datamatrix("G2")
+        all_counts, offsets = reader.read_all()
+        np.testing.assert_array_equal(
+            all_counts, np.hstack([counts[gene] for gene, _ in GENES]))
+        assert list(offsets) == [0, 10, 16]
+        some_counts, offsets = reader.read_all(["G3", "ALT2"])
+        np.testing.assert_array_equal(
+            some_counts, np.hstack([counts["G3"], counts["G2"]]))
+        assert list(offsets) == [0, 8]
+
+
+def test_cache(tmp_dir):
+    """
+    Test :py:class:`riboviz.ribogrid_reader.RibogridReader` caches
+    read-only ribogrids and evicts the least-recently used ribogrids
+    when its memory limit is exceeded.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    counts = get_counts()
+    cache_bytes = counts["G2"].nbytes + counts["G3"].nbytes
+    with ribogrid_reader.RibogridReader(h5_file,
+                                        cache_bytes=cache_bytes) as reader:
+        g2_counts = reader.get_gene_datamatrix("G2")
+        assert not g2_counts.flags.writeable
+        assert reader.get_gene_datamatrix("ALT2") is g2_counts
+        reader.get_gene_datamatrix("G3")
+        assert list(reader.cache.keys()) == ["G2", "G3"]
+        reader.get_gene_datamatrix("G2")
+        reader.get_gene_datamatrix("G1")
+        assert list(reader.cache.keys()) == ["G1"]
+        assert reader.cached_bytes == counts["G1"].nbytes
+
+
+def test_mmap(tmp_dir):
+    """
+    Test :py:class:`riboviz.ribogrid_reader.RibogridReader` memory
+    maps an uncompressed, contiguous columnar store.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    per_gene_file = os.path.join(tmp_dir, "per_gene.h5")
+    columnar_file = os.path.join(tmp_dir, "columnar.h5")
+    ribogrid_test_utils.write_per_gene(per_gene_file, get_counts(),
+                                       get_attributes(), LINKS)
+    ribogrid_store.per_gene_to_columnar(per_gene_file, columnar_file,
+                                        compression=h5_writer.NONE,
+                                        chunk_positions=None)
+    with ribogrid_reader.RibogridReader(columnar_file) as reader:
+        counts = reader.get_gene_datamatrix("G3")
+        assert isinstance(counts, np.memmap)
+        np.testing.assert_array_equal(counts, get_counts()["G3"])
+        assert not reader.cache
+
+
+@pytest.mark.parametrize("posn_5start,n_buffer,expected_columns",
+                         [(6, 2, [4, 5, 6, 7, 8, 9, 10]),
+                          (3, 4, [0, 0, 1, 2, 3, 4, 5, 6, 7])])
+def test_get_gene_datamatrix_5start(tmp_dir, posn_5start, n_buffer,
+                                    expected_columns):
+    """
+    Test
+    :py:meth:`riboviz.ribogrid_reader.RibogridReader.get_gene_datamatrix_5start`
+    with and without padding.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param posn_5start: 1-indexed position of start codon
+    :type posn_5start: int
+    :param n_buffer: Number of positions before start codon
+    :type n_buffer: int
+    :param expected_columns: Expected 1-indexed columns, 0 for padding
+    :type expected_columns: list(int)
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    nnt_gene = len(expected_columns) - n_buffer
+    padded = np.hstack([np.zeros((NUM_LENGTHS, 1), dtype=np.int32),
+                        get_counts()["G1"]])
+    with ribogrid_reader.RibogridReader(h5_file) as reader:
+        window = reader.get_gene_datamatrix_5start("G1", posn_5start,
+                                                   n_buffer, nnt_gene)
+    np.testing.assert_array_equal(window, padded[:, expected_columns])
+
+
+@pytest.mark.parametrize("posn_3end,n_buffer,expected_columns",
+                         [(6, 2, [3, 4, 5, 6, 7, 8]),
+                          (8, 4, [5, 6, 7, 8, 9, 10, 0, 0])])
+def test_get_gene_datamatrix_3end(tmp_dir, posn_3end, n_buffer,
+                                  expected_columns):
+    """
+    Test
+    :py:meth:`riboviz.ribogrid_reader.RibogridReader.get_gene_datamatrix_3end`
+    with and without padding.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param posn_3end: 1-indexed position of end of stop codon
+    :type posn_3end: int
+    :param n_buffer: Number of positions after stop codon
+    :type n_buffer: int
+    :param expected_columns: Expected 1-indexed columns, 0 for padding
+    :type expected_columns: list(int)
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    nnt_gene = len(expected_columns) - n_buffer
+    padded = np.hstack([np.zeros((NUM_LENGTHS, 1), dtype=np.int32),
+                        get_counts()["G1"]])
+    with ribogrid_reader.RibogridReader(h5_file) as reader:
+        window = reader.get_gene_datamatrix_3end("G1", posn_3end,
+                                                 n_buffer, nnt_gene)
+    np.testing.assert_array_equal(window, padded[:, expected_columns])
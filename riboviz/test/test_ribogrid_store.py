@@ -0,0 +1,142 @@
+"""
+:py:mod:`riboviz.ribogrid_store` tests.
+"""
+import os
+import shutil
+import tempfile
+import h5py
+import numpy as np
+import pytest
+from riboviz import ribogrid
+from riboviz import ribogrid_store
+from riboviz.test import ribogrid_test_utils
+
+LENGTHS = [10, 11, 12]
+""" Read lengths. """
+GENES = [("G1", 7, None), ("G2", 5, "ALT2"), ("G3", 9, "G3")]
+""" Genes, number of positions and secondary gene IDs. """
+LINKS = {"ALT2": "G2"}
+""" Links from secondary gene IDs to gene names. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get random counts for :py:const:`GENES`.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    random = np.random.RandomState(42)
+    return {gene: random.poisson(1, size=(len(LENGTHS), num_positions))
+            .astype(np.int32)
+            for gene, num_positions, _ in GENES}
+
+
+def get_attributes():
+    """
+    Get attributes for :py:const:`GENES`.
+
+    :return: Attribute values for each gene
+    :rtype: dict(str or unicode -> dict(str or unicode -> list(int)))
+    """
+    counts = get_counts()
+    return {gene: {ribogrid.BUFFER_LEFT: [index],
+                   ribogrid.BUFFER_RIGHT: [index + 1],
+                   ribogrid.START_CODON_POS: [index + 1, index + 2,
+                                              index + 3],
+                   ribogrid.STOP_CODON_POS: [num_positions - 2 - index,
+                                             num_positions - 1 - index,
+                                             num_positions - index],
+                   ribogrid.LENGTHS: LENGTHS,
+                   ribogrid.READS_BY_LEN: counts[gene].sum(axis=1)}
+            for index, (gene, num_positions, _) in enumerate(GENES)}
+
+
+def test_per_gene_to_columnar(tmp_dir):
+    """
+    Test :py:func:`riboviz.ribogrid_store.per_gene_to_columnar` and
+    reading the columnar store with
+    :py:class:`riboviz.ribogrid_store.ColumnarRibogrid`.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    per_gene_file = os.path.join(tmp_dir, "per_gene.h5")
+    columnar_file = os.path.join(tmp_dir, "columnar.h5")
+    counts = get_counts()
+    ribogrid_test_utils.write_per_gene(per_gene_file, counts,
+                                       get_attributes(), LINKS)
+    assert not ribogrid_store.is_columnar(per_gene_file)
+    ribogrid_store.per_gene_to_columnar(per_gene_file, columnar_file,
+                                        chunk_positions=4)
+    assert ribogrid_store.is_columnar(columnar_file)
+    with ribogrid_store.ColumnarRibogrid(columnar_file) as store:
+        assert store.genes == ["G1", "G2", "G3"]
+        assert store.secondary_ids == ["", "ALT2", ""]
+        assert list(store.offsets) == [0, 7, 12]
+        assert list(store.num_positions) == [7, 5, 9]
+        assert list(store.lengths) == LENGTHS
+        for gene, _, _ in GENES:
+            np.testing.assert_array_equal(store.get_gene_datamatrix(gene),
+                                          counts[gene])
+        np.testing.assert_array_equal(store.get_gene_datamatrix("ALT2"),
+                                      counts["G2"])
+        np.testing.assert_array_equal(
+            store.read_all(),
+            np.hstack([counts[gene] for gene, _, _ in GENES]))
+        np.testing.assert_array_equal(
+            store.get_column(ribogrid.READS_TOTAL),
+            [counts[gene].sum() for gene, _, _ in GENES])
+        attributes = store.get_gene_attributes("G2")
+        assert list(attributes[ribogrid.START_CODON_POS]) == [2, 3, 4]
+        assert list(attributes[ribogrid.STOP_CODON_POS]) == [2, 3, 4]
+        assert list(attributes[ribogrid.BUFFER_RIGHT]) == [2]
+        with pytest.raises(KeyError):
+            store.get_index("G4")
+
+
+def test_columnar_to_per_gene(tmp_dir):
+    """
+    Test :py:func:`riboviz.ribogrid_store.columnar_to_per_gene`
+    recreates the per-gene file from which a columnar store was
+    converted.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    per_gene_file = os.path.join(tmp_dir, "per_gene.h5")
+    columnar_file = os.path.join(tmp_dir, "columnar.h5")
+    round_trip_file = os.path.join(tmp_dir, "round_trip.h5")
+    ribogrid_test_utils.write_per_gene(per_gene_file, get_counts(),
+                                       get_attributes(), LINKS)
+    ribogrid_store.per_gene_to_columnar(per_gene_file, columnar_file)
+    ribogrid_store.columnar_to_per_gene(columnar_file, round_trip_file)
+    with h5py.File(per_gene_file, "r") as expected, \
+            h5py.File(round_trip_file, "r") as actual:
+        assert sorted(actual.keys()) == sorted(expected.keys())
+        assert isinstance(actual.get("ALT2", getlink=True),
+                          h5py.ExternalLink)
+        for gene, _, _ in GENES:
+            path = ribogrid.READS_FORMAT.format(gene, "data")
+            np.testing.assert_array_equal(
+                actual[path][ribogrid.DATA][()],
+                expected[path][ribogrid.DATA][()])
+            assert sorted(actual[path].attrs.keys()) == \
+                sorted(expected[path].attrs.keys())
+            for name, value in expected[path].attrs.items():
+                np.testing.assert_array_equal(actual[path].attrs[name],
+                                              value)
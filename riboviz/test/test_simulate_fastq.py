@@ -0,0 +1,208 @@
+"""
+:py:mod:`riboviz.simulate_fastq` tests.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+from Bio import SeqIO
+from riboviz import create_fastq_simdata
+from riboviz import demultiplex_fastq
+from riboviz import sample_sheets
+from riboviz import simulate_fastq
+import riboviz.test
+
+FASTA_FILE = os.path.join(riboviz.test.VIGNETTE_DIR, "input",
+                          "yeast_YAL_CDS_w_250utrs.fa")
+""" Vignette FASTA file. """
+GFF_FILE = os.path.join(riboviz.test.VIGNETTE_DIR, "input",
+                        "yeast_YAL_CDS_w_250utrs.gff3")
+""" Vignette GFF file. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def test_simulate_fastq_layout(tmp_dir):
+    """
+    Test :py:func:`riboviz.simulate_fastq.simulate_fastq` creates
+    reads with the layout of, and extracted reads consistent with,
+    :py:func:`riboviz.create_fastq_simdata.make_fastq_records`, whose
+    footprints are from the transcripts.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    output_file = os.path.join(tmp_dir, "sim.fastq")
+    extracted_file = os.path.join(tmp_dir, "sim_extracted.fastq")
+    read_lengths = {28: 1, 30: 1}
+    num_reads = simulate_fastq.simulate_fastq(
+        FASTA_FILE, GFF_FILE, 200, output_file, extracted_file,
+        num_samples=3, post_adaptor_length=2, error_rate=0,
+        read_lengths=read_lengths, seed=42)
+    assert list(num_reads[sample_sheets.NUM_READS].values) != [0, 0, 0]
+    assert num_reads[sample_sheets.NUM_READS].sum() == 200
+    barcodes = list(num_reads[sample_sheets.TAG_READ])
+    reference = simulate_fastq.load_reference(FASTA_FILE, GFF_FILE)
+    transcripts = reference.sequence.tobytes().decode()
+    adaptor = simulate_fastq.DEFAULT_ADAPTOR
+    records = list(SeqIO.parse(output_file, "fastq"))
+    extracted = list(SeqIO.parse(extracted_file, "fastq"))
+    assert len(records) == 200
+    assert len(extracted) == 200
+    for record, extracted_record in zip(records, extracted):
+        sequence = str(record.seq)
+        length = len(sequence) - (4 + 4 + 6 + len(adaptor) + 2)
+        assert length in read_lengths
+        umi5 = sequence[:4]
+        read = sequence[4:4 + length]
+        umi3 = sequence[4 + length:8 + length]
+        barcode = sequence[8 + length:14 + length]
+        assert barcode in barcodes
+        assert sequence[14 + length:-2] == adaptor
+        assert read in transcripts
+        _, _, expected = create_fastq_simdata.make_fastq_records(
+            record.id, read, create_fastq_simdata.QUALITY_MEDIUM, umi5,
+            umi3, barcode, adaptor, sequence[-2:])
+        assert extracted_record.id == expected.id
+        assert str(extracted_record.seq) == str(expected.seq)
+        assert extracted_record.letter_annotations["phred_quality"] == \
+            record.letter_annotations["phred_quality"][4:4 + length]
+
+
+def test_simulate_fastq_demultiplex(tmp_dir):
+    """
+    Test that demultiplexing reads created by
+    :py:func:`riboviz.simulate_fastq.simulate_fastq`, without errors,
+    using its sample sheet, assigns the simulated number of reads to
+    each sample.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    extracted_file = os.path.join(tmp_dir, "sim_extracted.fastq")
+    sample_sheet_file = os.path.join(tmp_dir, "barcodes.tsv")
+    num_reads_file = os.path.join(tmp_dir, "num_reads.tsv")
+    simulate_fastq.simulate_fastq(
+        FASTA_FILE, GFF_FILE, 500, os.path.join(tmp_dir, "sim.fastq"),
+        extracted_file, sample_sheet_file, num_reads_file,
+        num_samples=4, error_rate=0, seed=1)
+    deplex_dir = os.path.join(tmp_dir, "deplex")
+    demultiplex_fastq.demultiplex(sample_sheet_file, extracted_file,
+                                  mismatches=0, out_dir=deplex_dir)
+    expected = sample_sheets.load_deplexed_sample_sheet(num_reads_file)
+    actual = sample_sheets.load_deplexed_sample_sheet(
+        os.path.join(deplex_dir, demultiplex_fastq.NUM_READS_FILE))
+    assert list(actual[sample_sheets.SAMPLE_ID]) == \
+        list(expected[sample_sheets.SAMPLE_ID])
+    assert list(actual[sample_sheets.NUM_READS]) == \
+        list(expected[sample_sheets.NUM_READS])
+
+
+def test_simulate_fastq_reproducible(tmp_dir):
+    """
+    Test :py:func:`riboviz.simulate_fastq.simulate_fastq` creates the
+    same reads for the same seed regardless of the number of
+    processes and compression, and different reads for a different
+    seed.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    output_file = os.path.join(tmp_dir, "sim.fastq")
+    simulate_fastq.simulate_fastq(FASTA_FILE, GFF_FILE, 250,
+                                  output_file, seed=7, chunk_size=100)
+    output_gz_file = os.path.join(tmp_dir, "sim_parallel.fastq.gz")
+    simulate_fastq.simulate_fastq(FASTA_FILE, GFF_FILE, 250,
+                                  output_gz_file, seed=7, chunk_size=100,
+                                  num_processes=2)
+    other_file = os.path.join(tmp_dir, "sim_other.fastq")
+    simulate_fastq.simulate_fastq(FASTA_FILE, GFF_FILE, 250,
+                                  other_file, seed=8, chunk_size=100)
+    with open(output_file, "rb") as f:
+        expected = f.read()
+    with gzip.open(output_gz_file, "rb") as f:
+        assert f.read() == expected
+    with open(other_file, "rb") as f:
+        assert f.read() != expected
+    records = list(SeqIO.parse(output_file, "fastq"))
+    assert [record.id for record in records] == \
+        ["SIM.{:010d}".format(index) for index in range(250)]
+
+
+def test_simulate_fastq_errors(tmp_dir):
+    """
+    Test :py:func:`riboviz.simulate_fastq.simulate_fastq` with an
+    error rate of 1 changes every nt of the reads simulated with an
+    error rate of 0, and assigns these low quality scores.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    files = []
+    for error_rate in [0, 1]:
+        output_file = os.path.join(tmp_dir, "sim{}.fastq".format(
+            error_rate))
+        simulate_fastq.simulate_fastq(FASTA_FILE, GFF_FILE, 50,
+                                      output_file, error_rate=error_rate,
+                                      seed=3)
+        files.append(list(SeqIO.parse(output_file, "fastq")))
+    for record, error_record in zip(*files):
+        assert len(record.seq) == len(error_record.seq)
+        assert all(nt != error_nt for nt, error_nt
+                   in zip(str(record.seq), str(error_record.seq)))
+        assert max(error_record.letter_annotations["phred_quality"]) \
+            < min(create_fastq_simdata.QUALITY_MEDIUM)
+
+
+def test_make_barcodes():
+    """
+    Test :py:func:`riboviz.simulate_fastq.make_barcodes` makes
+    barcodes that differ by at least
+    :py:const:`riboviz.simulate_fastq.MIN_BARCODE_DISTANCE` nts.
+    """
+    barcodes = simulate_fastq.make_barcodes(
+        20, 6, np.random.default_rng(0))
+    assert len(barcodes) == 20
+    for index, barcode in enumerate(barcodes):
+        assert len(barcode) == 6
+        for other in barcodes[index + 1:]:
+            assert sum(nt != other_nt for nt, other_nt
+                       in zip(barcode, other)) >= \
+                simulate_fastq.MIN_BARCODE_DISTANCE
+
+
+def test_make_barcodes_too_many():
+    """
+    Test :py:func:`riboviz.simulate_fastq.make_barcodes` raises
+    ``AssertionError`` if too many barcodes are requested.
+    """
+    with pytest.raises(AssertionError):
+        simulate_fastq.make_barcodes(5, 2, np.random.default_rng(0))
+
+
+def test_simulate_fastq_no_reads(tmp_dir):
+    """
+    Test :py:func:`riboviz.simulate_fastq.simulate_fastq` with 0
+    reads creates an empty file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    output_file = os.path.join(tmp_dir, "sim.fastq")
+    num_reads = simulate_fastq.simulate_fastq(FASTA_FILE, GFF_FILE, 0,
+                                              output_file, seed=1)
+    assert os.path.getsize(output_file) == 0
+    assert list(num_reads[sample_sheets.NUM_READS]) == [0]
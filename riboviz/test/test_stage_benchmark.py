@@ -0,0 +1,116 @@
+"""
+:py:mod:`riboviz.stage_benchmark` tests.
+"""
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from riboviz import sam_bam
+from riboviz import stage_benchmark
+from riboviz import startup_benchmark
+from riboviz import trim_5p_mismatch
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def test_run_benchmarks(tmp_dir):
+    """
+    Test :py:func:`riboviz.stage_benchmark.run_benchmarks` runs all
+    the cases on a small dataset, and that results can be saved and
+    appended to.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    results = stage_benchmark.run_benchmarks(tmp_dir, [200], repeats=1)
+    assert list(results.columns) == stage_benchmark.HEADER
+    assert list(results[stage_benchmark.CASE]) == stage_benchmark.CASES
+    assert (results[stage_benchmark.NUM_READS] == 200).all()
+    assert (results[startup_benchmark.MEDIAN_TIME] > 0).all()
+    assert sorted(os.listdir(tmp_dir)) == \
+        [stage_benchmark.DATASET_DIR_FORMAT.format(200)]
+    tsv_file = os.path.join(tmp_dir, "stages.tsv")
+    stage_benchmark.save_benchmarks(results, tsv_file)
+    stage_benchmark.save_benchmarks(results, tsv_file)
+    history = stage_benchmark.load_benchmarks(tsv_file)
+    assert len(history) == 2 * len(results)
+
+
+def test_make_dataset(tmp_dir):
+    """
+    Test :py:func:`riboviz.stage_benchmark.make_dataset` creates a
+    dataset with the requested number of reads, whose SAM file has
+    reads that are unaligned, and reads that are trimmed and
+    discarded by :py:func:`riboviz.trim_5p_mismatch.trim_5p_mismatch`,
+    and that the dataset is reused.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    dataset = stage_benchmark.make_dataset(tmp_dir, 500, seed=1)
+    assert dataset == stage_benchmark.get_dataset(tmp_dir, 500)
+    num_sequences, num_mapped = sam_bam.count_sequences(dataset.sam_file)
+    assert num_sequences == 500
+    assert 0 < num_mapped < 500
+    assert sam_bam.count_sequences(dataset.bam_file) == \
+        (num_mapped, num_mapped)
+    summary = trim_5p_mismatch.trim_5p_mismatch(
+        dataset.sam_file, os.path.join(tmp_dir, "trim.sam"))
+    assert summary[trim_5p_mismatch.NUM_TRIMMED] > 0
+    assert summary[trim_5p_mismatch.NUM_DISCARDED] > 0
+    modified = os.path.getmtime(dataset.sam_file)
+    stage_benchmark.make_dataset(tmp_dir, 500, seed=1)
+    assert os.path.getmtime(dataset.sam_file) == modified
+
+
+def test_run_benchmarks_unknown_case(tmp_dir):
+    """
+    Test :py:func:`riboviz.stage_benchmark.run_benchmarks` raises
+    ``AssertionError`` for an unknown case.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    with pytest.raises(AssertionError):
+        stage_benchmark.run_benchmarks(tmp_dir, [10], ["no_such_case"])
+
+
+def test_compare_benchmarks():
+    """
+    Test :py:func:`riboviz.stage_benchmark.compare_benchmarks` uses
+    the most recent baseline result for each case and size, and
+    :py:func:`riboviz.stage_benchmark.get_regressions` detects
+    regressions above the threshold.
+    """
+    def make_results(rows):
+        return pd.DataFrame(
+            [[case, num_reads, 1, time, time, time, num_reads / time,
+              "", ""] for case, num_reads, time in rows],
+            columns=stage_benchmark.HEADER)
+    baseline = make_results([("demultiplex", 10, 9.0),
+                             ("demultiplex", 10, 1.0),
+                             ("demultiplex", 100, 1.0),
+                             ("compare_sam", 10, 1.0)])
+    results = make_results([("demultiplex", 10, 1.1),
+                            ("demultiplex", 100, 1.5),
+                            ("trim_5p_mismatch", 10, 1.0)])
+    comparison = stage_benchmark.compare_benchmarks(baseline, results)
+    assert list(comparison.columns) == stage_benchmark.COMPARISON_HEADER
+    assert list(comparison[stage_benchmark.NUM_READS]) == [10, 100]
+    assert list(comparison[stage_benchmark.BASELINE_TIME]) == [1.0, 1.0]
+    assert list(comparison[stage_benchmark.CHANGE].round(2)) == \
+        [0.1, 0.5]
+    regressions = stage_benchmark.get_regressions(comparison, 0.2)
+    assert list(regressions[stage_benchmark.NUM_READS]) == [100]
@@ -0,0 +1,72 @@
+"""
+:py:mod:`riboviz.startup_benchmark` tests.
+"""
+import os
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from riboviz import startup_benchmark
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+@pytest.mark.parametrize("tool", startup_benchmark.get_tools())
+def test_help_no_heavy_imports(tool):
+    """
+    Test running a tool with ``--help`` imports none of
+    :py:const:`riboviz.startup_benchmark.HEAVY_MODULES`.
+
+    :param tool: Tool name
+    :type tool: str or unicode
+    """
+    assert startup_benchmark.get_heavy_imports(tool) == []
+
+
+def test_get_heavy_imports(tmp_dir):
+    """
+    Test :py:func:`riboviz.startup_benchmark.get_heavy_imports`
+    detects modules imported when a tool does some work.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    tsv_file = os.path.join(tmp_dir, "data.tsv")
+    with open(tsv_file, "w") as f:
+        f.write("A\tB\n1\t2\n")
+    modules = startup_benchmark.get_heavy_imports(
+        "compare_files", ["-1", tsv_file, "-2", tsv_file])
+    assert "pandas" in modules
+
+
+def test_benchmark_startup_to_tsv(tmp_dir):
+    """
+    Test :py:func:`riboviz.startup_benchmark.benchmark_startup_to_tsv`
+    writes a provenance header and one row per tool.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    tsv_file = os.path.join(tmp_dir, "startup.tsv")
+    tools = ["trim_5p_mismatch", "upgrade_config_file"]
+    startup_benchmark.benchmark_startup_to_tsv(tsv_file, tools, 2)
+    with open(tsv_file) as f:
+        assert f.readline().startswith("# Created by: RiboViz")
+    results = pd.read_csv(tsv_file, sep="\t", comment="#")
+    assert list(results.columns) == startup_benchmark.HEADER
+    assert list(results[startup_benchmark.TOOL]) == tools
+    assert (results[startup_benchmark.MIN_TIME] <=
+            results[startup_benchmark.MAX_TIME]).all()
+    assert (results[startup_benchmark.HEAVY_IMPORTS] ==
+            startup_benchmark.NO_HEAVY_IMPORTS).all()
@@ -0,0 +1,239 @@
+"""
+:py:mod:`riboviz.stats_blocks` and
+:py:func:`riboviz.workflow.generate_stats_figs_blocks` tests.
+"""
+import os
+import shutil
+import tempfile
+import pytest
+import riboviz
+from riboviz import params
+from riboviz import stats_blocks
+from riboviz import workflow
+from riboviz import workflow_files
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_config(tmp_dir):
+    """
+    Get a workflow configuration, creating its input files and an H5
+    file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :return: Configuration and H5 file
+    :rtype: tuple(dict, str or unicode)
+    """
+    config = {
+        params.DATASET: "data",
+        params.MIN_READ_LENGTH: 10,
+        params.MAX_READ_LENGTH: 50,
+        params.BUFFER: 250,
+        params.PRIMARY_ID: "Name",
+        params.RPF: True,
+        params.DO_POS_SP_NT_FREQ: True,
+        params.COUNT_THRESHOLD: 64,
+        params.STATS_BLOCKS: True
+    }
+    for parameter in [params.ORF_FASTA_FILE, params.ORF_GFF_FILE,
+                      params.ASITE_DISP_LENGTH_FILE]:
+        config[parameter] = os.path.join(tmp_dir, parameter + ".txt")
+        with open(config[parameter], "w") as f:
+            f.write(parameter)
+    h5_file = os.path.join(tmp_dir, "data.h5")
+    with open(h5_file, "w") as f:
+        f.write("data")
+    return config, h5_file
+
+
+def get_run_config(tmp_dir, is_dry_run):
+    """
+    Get a run configuration.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_dry_run: Is this a dry run?
+    :type is_dry_run: bool
+    :return: Run configuration
+    :rtype: riboviz.workflow.RunConfigTuple
+    """
+    return workflow.RunConfigTuple(riboviz.R_SCRIPTS,
+                                   os.path.join(tmp_dir, "run.sh"),
+                                   is_dry_run, 2)
+
+
+def test_get_blocks(tmp_dir):
+    """
+    Test :py:func:`riboviz.stats_blocks.get_blocks` only returns
+    blocks whose conditions hold.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    config, _ = get_config(tmp_dir)
+    names = [block.name for block in stats_blocks.get_blocks(config)]
+    assert names == [stats_blocks.READ_LENGTHS, stats_blocks.PERIODICITY,
+                     stats_blocks.RIBOGRID, stats_blocks.POS_SP_NT_FREQ,
+                     stats_blocks.FRAMES, stats_blocks.POS_SP,
+                     stats_blocks.TPMS]
+    config[params.DO_POS_SP_NT_FREQ] = False
+    config[params.T_RNA_FILE] = "tRNAs.tsv"
+    config[params.CODON_POSITIONS_FILE] = "codon_pos.tsv"
+    names = [block.name for block in stats_blocks.get_blocks(
+        config, [stats_blocks.POS_SP_NT_FREQ, stats_blocks.CODON_DENSITY])]
+    assert names == [stats_blocks.CODON_DENSITY]
+    config[params.RPF] = False
+    assert stats_blocks.get_blocks(config, [stats_blocks.CODON_DENSITY]) \
+        == []
+    with pytest.raises(AssertionError):
+        stats_blocks.get_blocks(config, ["nosuchblock"])
+
+
+def test_get_fingerprint(tmp_dir):
+    """
+    Test :py:func:`riboviz.stats_blocks.get_fingerprint` changes
+    if, and only if, a block's input files or parameters change.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    config, h5_file = get_config(tmp_dir)
+    blocks = {block.name: block for block in stats_blocks.BLOCKS}
+
+    def get_fingerprints():
+        return {name: stats_blocks.get_fingerprint(
+            block, h5_file, config, riboviz.R_SCRIPTS)
+                for name, block in blocks.items()}
+    original = get_fingerprints()
+    assert len(set(original.values())) == len(blocks)
+    assert get_fingerprints() == original
+    config[params.COUNT_THRESHOLD] = 128
+    changed = get_fingerprints()
+    assert {name for name in blocks
+            if changed[name] != original[name]} == \
+        {stats_blocks.FRAMES, stats_blocks.POS_SP,
+         stats_blocks.CODON_DENSITY}
+    with open(config[params.ORF_GFF_FILE], "w") as f:
+        f.write("changed")
+    assert {name for name, fingerprint in get_fingerprints().items()
+            if fingerprint != changed[name]} == \
+        {stats_blocks.PERIODICITY, stats_blocks.RIBOGRID,
+         stats_blocks.FRAMES}
+
+
+def test_get_fingerprint_annotation_tsv(tmp_dir):
+    """
+    Test :py:func:`riboviz.stats_blocks.get_fingerprint` changes for
+    blocks that read the ORF GFF file if the annotation TSV file in
+    the index directory changes.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    config, h5_file = get_config(tmp_dir)
+    config[params.INDEX_DIR] = tmp_dir
+    annotation_tsv = os.path.join(tmp_dir, workflow_files.ORF_FEATURES_TSV)
+    with open(annotation_tsv, "w") as f:
+        f.write("original")
+    blocks = {block.name: block for block in stats_blocks.BLOCKS}
+    assert annotation_tsv in stats_blocks.get_block_files(
+        blocks[stats_blocks.PERIODICITY], h5_file, config)
+
+    def get_fingerprints():
+        return {name: stats_blocks.get_fingerprint(
+            block, h5_file, config, riboviz.R_SCRIPTS)
+                for name, block in blocks.items()}
+    original = get_fingerprints()
+    with open(annotation_tsv, "w") as f:
+        f.write("changed")
+    assert {name for name, fingerprint in get_fingerprints().items()
+            if fingerprint != original[name]} == \
+        {stats_blocks.PERIODICITY, stats_blocks.RIBOGRID,
+         stats_blocks.FRAMES}
+
+
+def test_generate_stats_figs_blocks_dry_run(tmp_dir):
+    """
+    Test :py:func:`riboviz.workflow.generate_stats_figs` records
+    one command per block in a dry run, using
+    :py:mod:`riboviz.tools.pos_sp_nt_freq` if requested.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    config, h5_file = get_config(tmp_dir)
+    config[params.NATIVE_POS_SP_NT_FREQ] = True
+    run_config = get_run_config(tmp_dir, True)
+    workflow.generate_stats_figs(h5_file, tmp_dir, config,
+                                 os.path.join(tmp_dir, "stats.log"),
+                                 run_config)
+    with open(run_config.cmd_file) as f:
+        cmds = f.read().splitlines()
+    blocks = [name for name in stats_blocks.get_block_names()
+              if name != stats_blocks.POS_SP_NT_FREQ and
+              any("--blocks=" + name in cmd for cmd in cmds)]
+    assert sorted(blocks) == sorted(
+        [stats_blocks.READ_LENGTHS, stats_blocks.PERIODICITY,
+         stats_blocks.RIBOGRID, stats_blocks.FRAMES, stats_blocks.POS_SP,
+         stats_blocks.TPMS])
+    assert len(cmds) == len(blocks) + 1
+    assert len([cmd for cmd in cmds if "riboviz.tools.pos_sp_nt_freq"
+                in cmd]) == 1
+    assert not os.path.exists(os.path.join(tmp_dir,
+                                           stats_blocks.FINGERPRINTS_FILE))
+
+
+def test_generate_stats_figs_blocks_skip(tmp_dir):
+    """
+    Test :py:func:`riboviz.workflow.generate_stats_figs` skips
+    blocks whose fingerprints are unchanged and whose outputs exist.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    config, h5_file = get_config(tmp_dir)
+    out_dir = os.path.join(tmp_dir, "out")
+    os.mkdir(out_dir)
+    run_config = get_run_config(tmp_dir, False)
+    blocks = stats_blocks.get_blocks(config)
+    fingerprints = {}
+    for block in blocks:
+        fingerprints[block.name] = stats_blocks.get_fingerprint(
+            block, h5_file, config, riboviz.R_SCRIPTS)
+        for output in stats_blocks.get_block_outputs(block, config):
+            with open(os.path.join(out_dir, output), "w") as f:
+                f.write(block.name)
+    stats_blocks.save_fingerprints(out_dir, fingerprints)
+    workflow.generate_stats_figs(h5_file, out_dir, config,
+                                 os.path.join(tmp_dir, "stats.log"),
+                                 run_config)
+    assert not os.path.exists(run_config.cmd_file)
+    assert stats_blocks.load_fingerprints(out_dir) == fingerprints
+    # Block with a missing output is rerun, and its fingerprint is
+    # removed when it fails.
+    os.remove(os.path.join(out_dir, stats_blocks.get_block_outputs(
+        blocks[0], config)[0]))
+    cmd_file = os.path.join(tmp_dir, "rerun.sh")
+    with pytest.raises((AssertionError, FileNotFoundError)):
+        workflow.generate_stats_figs(
+            h5_file, out_dir, config, os.path.join(tmp_dir, "stats.log"),
+            workflow.RunConfigTuple(riboviz.R_SCRIPTS, cmd_file, False, 1))
+    with open(cmd_file) as f:
+        cmds = f.read().splitlines()
+    assert len(cmds) == 1
+    assert "--blocks=" + blocks[0].name in cmds[0]
+    recorded = stats_blocks.load_fingerprints(out_dir)
+    assert blocks[0].name not in recorded
+    assert len(recorded) == len(blocks) - 1
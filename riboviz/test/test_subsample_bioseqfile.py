@@ -0,0 +1,340 @@
+"""
+:py:mod:`riboviz.subsample_bioseqfile` tests.
+"""
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import pandas as pd
+import pytest
+from Bio import SeqIO
+from riboviz import subsample_bioseqfile
+
+NUM_RECORDS = 2000
+""" Number of records in test files. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def write_fastq(file_name, num_records, read=1):
+    """
+    Write a FASTQ file whose records are numbered.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param num_records: Number of records
+    :type num_records: int
+    :param read: Read number, for paired-end files
+    :type read: int
+    """
+    with subsample_bioseqfile.open_bioseqfile(file_name, "w") as f:
+        for index in range(num_records):
+            sequence = "ACGT"[index % 4] * (10 + index % 7)
+            f.write("@read{} {}:N:0\n{}\n+\n{}\n".format(
+                index, read, sequence, "I" * len(sequence)))
+
+
+def write_fasta(file_name, num_records):
+    """
+    Write a FASTA file, with multi-line sequences, whose records are
+    numbered.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param num_records: Number of records
+    :type num_records: int
+    """
+    with open(file_name, "w") as f:
+        for index in range(num_records):
+            f.write(">read{} description\n".format(index))
+            for line in range(1 + index % 3):
+                f.write("ACGTN"[(index + line) % 5] * 60 + "\n")
+
+
+def get_ids(file_name, file_type):
+    """
+    Get record IDs from a file, parsed using ``Bio.SeqIO``.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :param file_type: ``Bio.SeqIO`` file type
+    :type file_type: str or unicode
+    :return: Record IDs
+    :rtype: list(str or unicode)
+    """
+    with subsample_bioseqfile.open_bioseqfile(file_name, "r") as f:
+        return [record.id for record in SeqIO.parse(f, file_type)]
+
+
+@pytest.mark.parametrize("file_type,ext", [("fastq", ".fastq"),
+                                           ("fastq", ".fastq.gz"),
+                                           ("fasta", ".fa"),
+                                           ("tab", ".tsv")])
+def test_subsample_bioseqfile(tmp_dir, file_type, ext):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`
+    samples records verbatim, in input order, with the expected
+    frequency, and reproducibly given a seed.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param file_type: ``Bio.SeqIO`` file type
+    :type file_type: str or unicode
+    :param ext: File extension
+    :type ext: str or unicode
+    """
+    input_file = os.path.join(tmp_dir, "input" + ext)
+    if file_type == "fasta":
+        write_fasta(input_file, NUM_RECORDS)
+    elif file_type == "tab":
+        fastq_file = os.path.join(tmp_dir, "input.fastq")
+        write_fastq(fastq_file, NUM_RECORDS)
+        SeqIO.convert(fastq_file, "fastq", input_file, file_type)
+    else:
+        write_fastq(input_file, NUM_RECORDS)
+    output_file = os.path.join(tmp_dir, "output" + ext)
+    num_input, num_sampled = subsample_bioseqfile.subsample_bioseqfile(
+        input_file, 0.1, output_file, file_type, seed=42)
+    assert num_input == NUM_RECORDS
+    with subsample_bioseqfile.open_bioseqfile(input_file, "r") as f:
+        input_records = {record.id: record.format(file_type)
+                         for record in SeqIO.parse(f, file_type)}
+    with subsample_bioseqfile.open_bioseqfile(output_file, "r") as f:
+        output_records = [(record.id, record.format(file_type))
+                          for record in SeqIO.parse(f, file_type)]
+    assert len(output_records) == num_sampled
+    assert 100 < num_sampled < 300
+    for record_id, record in output_records:
+        assert input_records[record_id] == record
+    indices = [int(record_id[len("read"):])
+               for record_id, _ in output_records]
+    assert indices == sorted(set(indices))
+    repeat_file = os.path.join(tmp_dir, "repeat" + ext)
+    subsample_bioseqfile.subsample_bioseqfile(
+        input_file, 0.1, repeat_file, file_type, seed=42)
+    assert get_ids(repeat_file, file_type) == \
+        [record_id for record_id, _ in output_records]
+
+
+@pytest.mark.parametrize("prob,expected", [(0, 0), (1, NUM_RECORDS)])
+def test_subsample_bioseqfile_prob_limits(tmp_dir, prob, expected):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`
+    samples no records for probability 0 and all records for
+    probability 1.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param prob: Proportion to sample
+    :type prob: float
+    :param expected: Expected number of records
+    :type expected: int
+    """
+    input_file = os.path.join(tmp_dir, "input.fastq")
+    output_file = os.path.join(tmp_dir, "output.fastq")
+    write_fastq(input_file, NUM_RECORDS)
+    assert subsample_bioseqfile.subsample_bioseqfile(
+        input_file, prob, output_file, "fastq") == \
+        (NUM_RECORDS, expected)
+    if prob == 1:
+        with open(input_file) as f_in, open(output_file) as f_out:
+            assert f_in.read() == f_out.read()
+
+
+@pytest.mark.parametrize("file_type", ["fastq", "fasta"])
+@pytest.mark.parametrize("num_records", [0, 1, 50, NUM_RECORDS,
+                                         NUM_RECORDS + 5])
+def test_subsample_bioseqfile_num_records(tmp_dir, file_type,
+                                          num_records):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`
+    samples the requested number of distinct records, in input order,
+    or all records if there are fewer.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param file_type: ``Bio.SeqIO`` file type
+    :type file_type: str or unicode
+    :param num_records: Number of records to sample
+    :type num_records: int
+    """
+    input_file = os.path.join(tmp_dir, "input." + file_type)
+    output_file = os.path.join(tmp_dir, "output." + file_type)
+    if file_type == "fasta":
+        write_fasta(input_file, NUM_RECORDS)
+    else:
+        write_fastq(input_file, NUM_RECORDS)
+    expected = min(num_records, NUM_RECORDS)
+    assert subsample_bioseqfile.subsample_bioseqfile(
+        input_file, 0.5, output_file, file_type,
+        num_records=num_records, seed=1) == (NUM_RECORDS, expected)
+    indices = [int(record_id[len("read"):])
+               for record_id in get_ids(output_file, file_type)]
+    assert len(indices) == expected
+    assert indices == sorted(set(indices))
+
+
+def test_reservoir_sample_uniform():
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.reservoir_sample`
+    samples each record with roughly equal frequency.
+    """
+    num_input = 20
+    num_sample = 5
+    num_trials = 4000
+    frequencies = [0] * num_input
+    rng = random.Random(3)
+
+    class ListReader:
+        def __init__(self):
+            self.index = 0
+
+        def skip(self, num_records):
+            skipped = min(num_records, num_input - self.index)
+            self.index += skipped
+            return skipped
+
+        def read(self):
+            if self.index == num_input:
+                return None
+            self.index += 1
+            return str(self.index - 1), ""
+    for _ in range(num_trials):
+        for records in subsample_bioseqfile.reservoir_sample(
+                [ListReader()], num_sample, rng):
+            frequencies[int(records[0][0])] += 1
+    expected = num_trials * num_sample / num_input
+    for frequency in frequencies:
+        assert abs(frequency - expected) < 0.15 * expected
+
+
+@pytest.mark.parametrize("num_records", [None, 100])
+def test_subsample_bioseqfile_paired(tmp_dir, num_records):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`
+    samples the same records from paired-end files.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param num_records: Number of records to sample
+    :type num_records: int
+    """
+    input_files = [os.path.join(tmp_dir, "input_R{}.fastq.gz".format(read))
+                   for read in [1, 2]]
+    output_files = [os.path.join(tmp_dir, "output_R{}.fastq.gz".format(read))
+                    for read in [1, 2]]
+    for read, input_file in enumerate(input_files, 1):
+        write_fastq(input_file, NUM_RECORDS, read)
+    _, num_sampled = subsample_bioseqfile.subsample_bioseqfile(
+        input_files[0], 0.05, output_files[0], "fastq",
+        num_records=num_records, seed=7, input_file2=input_files[1],
+        output_file2=output_files[1])
+    ids = [get_ids(output_file, "fastq") for output_file in output_files]
+    assert len(ids[0]) == num_sampled
+    assert ids[0] == ids[1]
+    with gzip.open(output_files[1], "rt") as f:
+        assert f.readline().rstrip().endswith(" 2:N:0")
+
+
+def test_subsample_bioseqfile_paired_mismatch(tmp_dir):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`
+    raises an error if paired-end files have different numbers of
+    records.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    input_files = [os.path.join(tmp_dir, "input_R{}.fastq".format(read))
+                   for read in [1, 2]]
+    write_fastq(input_files[0], NUM_RECORDS)
+    write_fastq(input_files[1], NUM_RECORDS - 1, 2)
+    with pytest.raises(AssertionError):
+        subsample_bioseqfile.subsample_bioseqfile(
+            input_files[0], 1, os.path.join(tmp_dir, "output_R1.fastq"),
+            "fastq", input_file2=input_files[1],
+            output_file2=os.path.join(tmp_dir, "output_R2.fastq"))
+
+
+@pytest.mark.parametrize("num_processes", [1, 3])
+def test_subsample_bioseqfiles(tmp_dir, num_processes):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfiles`
+    subsamples each file as :py:func:`subsample_bioseqfile` does with
+    a seed derived from the file name, and writes a manifest.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param num_processes: Number of processes
+    :type num_processes: int
+    """
+    input_dir = os.path.join(tmp_dir, "input")
+    os.mkdir(input_dir)
+    sizes = {"a.fastq": 1000, "b.fastq.gz": 3000, "c.fastq": 0}
+    for name, size in sizes.items():
+        write_fastq(os.path.join(input_dir, name), size)
+    output_dir = os.path.join(tmp_dir, "output")
+    manifest = subsample_bioseqfile.subsample_bioseqfiles(
+        [os.path.join(input_dir, "b.fastq.gz"),
+         os.path.join(input_dir, "*.fastq")], 0.2, output_dir, "fastq",
+        seed=11, num_processes=num_processes)
+    names = ["b.fastq.gz", "a.fastq", "c.fastq"]
+    assert list(manifest[subsample_bioseqfile.INPUT_FILE]) == \
+        [os.path.join(input_dir, name) for name in names]
+    assert list(manifest[subsample_bioseqfile.NUM_INPUT]) == \
+        [sizes[name] for name in names]
+    for _, row in manifest.iterrows():
+        seed = subsample_bioseqfile.get_file_seed(
+            11, row[subsample_bioseqfile.INPUT_FILE])
+        assert row[subsample_bioseqfile.SEED] == seed
+        expected_file = os.path.join(tmp_dir, "expected")
+        counts = subsample_bioseqfile.subsample_bioseqfile(
+            row[subsample_bioseqfile.INPUT_FILE], 0.2, expected_file,
+            "fastq", seed=seed)
+        assert row[subsample_bioseqfile.NUM_OUTPUT] == counts.num_output
+        assert get_ids(row[subsample_bioseqfile.OUTPUT_FILE], "fastq") \
+            == get_ids(expected_file, "fastq")
+    manifest_file = os.path.join(output_dir,
+                                 subsample_bioseqfile.MANIFEST_FILE)
+    with open(manifest_file) as f:
+        assert f.readline().startswith("# Created by: RiboViz")
+    actual = pd.read_csv(manifest_file, sep="\t", comment="#")
+    assert list(actual.columns) == subsample_bioseqfile.MANIFEST_HEADER
+    pd.testing.assert_series_equal(
+        actual[subsample_bioseqfile.FRACTION],
+        manifest[subsample_bioseqfile.FRACTION], rtol=1e-5)
+    assert actual[subsample_bioseqfile.FRACTION].iloc[2] == 0
+
+
+def test_subsample_bioseqfiles_same_name(tmp_dir):
+    """
+    Test :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfiles`
+    raises an error if input files have the same name or an output
+    file would overwrite its input file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    input_files = []
+    for directory in ["a", "b"]:
+        os.mkdir(os.path.join(tmp_dir, directory))
+        input_files.append(os.path.join(tmp_dir, directory, "s.fastq"))
+        write_fastq(input_files[-1], 10)
+    with pytest.raises(AssertionError):
+        subsample_bioseqfile.subsample_bioseqfiles(
+            input_files, 0.5, os.path.join(tmp_dir, "output"), "fastq")
+    with pytest.raises(AssertionError):
+        subsample_bioseqfile.subsample_bioseqfiles(
+            input_files[:1], 0.5, os.path.join(tmp_dir, "a"), "fastq")
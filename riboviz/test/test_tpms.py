@@ -0,0 +1,256 @@
+"""
+:py:mod:`riboviz.tpms` tests.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from riboviz import ribogrid
+from riboviz import ribogrid_store
+from riboviz import tpms
+from riboviz.test import ribogrid_test_utils
+
+GENES = [("G1", 100, 20, 80), ("G2", 60, 10, 40), ("G3", 0, 5, 35)]
+"""
+Genes, total reads, start codon position and stop codon position.
+"""
+LINKS = {"ALT2": "G2"}
+""" Links from secondary gene IDs to gene names. """
+
+
+@pytest.fixture(scope="function")
+def tmp_dir():
+    """
+    Create a temporary directory.
+
+    :return: directory
+    :rtype: str or unicode
+    """
+    tmp_dir = tempfile.mkdtemp("tmp")
+    yield tmp_dir
+    shutil.rmtree(tmp_dir)
+
+
+def get_counts():
+    """
+    Get counts for :py:const:`GENES`, with all of a gene's reads at
+    its start codon.
+
+    :return: Counts, with one row per read length and one column \
+    per position, for each gene
+    :rtype: dict(str or unicode -> numpy.ndarray)
+    """
+    counts = {}
+    for gene, reads_total, start_codon_pos, stop_codon_pos in GENES:
+        counts[gene] = np.zeros((1, stop_codon_pos + 10), dtype=np.int32)
+        counts[gene][0, start_codon_pos] = reads_total
+    return counts
+
+
+def get_attributes():
+    """
+    Get attributes for :py:const:`GENES`.
+
+    :return: Attribute values for each gene
+    :rtype: dict(str or unicode -> dict(str or unicode -> list(int)))
+    """
+    return {gene: {ribogrid.BUFFER_LEFT: [start_codon_pos],
+                   ribogrid.BUFFER_RIGHT: [10],
+                   ribogrid.START_CODON_POS: [start_codon_pos,
+                                              start_codon_pos + 1,
+                                              start_codon_pos + 2],
+                   ribogrid.STOP_CODON_POS: [stop_codon_pos,
+                                             stop_codon_pos + 1,
+                                             stop_codon_pos + 2],
+                   ribogrid.LENGTHS: [28],
+                   ribogrid.READS_BY_LEN: [reads_total]}
+            for gene, reads_total, start_codon_pos, stop_codon_pos
+            in GENES}
+
+
+def get_expected_tpms():
+    """
+    Get TPMs for :py:const:`GENES` and ``ALT2``, calculated as
+    ``generate_stats_figs.R`` calculates them.
+
+    :return: TPMs
+    :rtype: pandas.core.frame.DataFrame
+    """
+    rows = {gene: (reads_total,
+                   reads_total / (stop_codon_pos - start_codon_pos +
+                                  tpms.TPM_LENGTH_BUFFER))
+            for gene, reads_total, start_codon_pos, stop_codon_pos
+            in GENES}
+    rows["ALT2"] = rows["G2"]
+    genes = ["ALT2", "G1", "G2", "G3"]
+    rpb = np.array([rows[gene][1] for gene in genes])
+    return pd.DataFrame({tpms.ORF: genes,
+                         tpms.READCOUNT: [rows[gene][0] for gene in genes],
+                         tpms.RPB: rpb,
+                         tpms.TPM: rpb * 1e6 / rpb.sum()},
+                        columns=tpms.HEADER)
+
+
+@pytest.mark.parametrize("is_columnar", [False, True])
+def test_calculate_tpms(tmp_dir, is_columnar):
+    """
+    Test :py:func:`riboviz.tpms.calculate_tpms` for per-gene and
+    columnar H5 files.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param is_columnar: Convert H5 file to columnar layout?
+    :type is_columnar: bool
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    if is_columnar:
+        columnar_file = os.path.join(tmp_dir, "columnar.h5")
+        ribogrid_store.per_gene_to_columnar(h5_file, columnar_file)
+        h5_file = columnar_file
+    actual = tpms.calculate_tpms(h5_file)
+    pd.testing.assert_frame_equal(actual, get_expected_tpms(),
+                                  check_dtype=False)
+    assert actual[tpms.TPM].sum() == pytest.approx(1e6)
+
+
+def test_calculate_tpms_genes(tmp_dir):
+    """
+    Test :py:func:`riboviz.tpms.calculate_tpms` for a subset of
+    genes.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    actual = tpms.calculate_tpms(h5_file, genes=["G3", "G1"])
+    assert list(actual[tpms.ORF]) == ["G3", "G1"]
+    assert list(actual[tpms.TPM]) == [0.0, 1e6]
+
+
+def test_h5_to_tpms(tmp_dir):
+    """
+    Test :py:func:`riboviz.tpms.h5_to_tpms` writes a TSV file with a
+    provenance header.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    h5_file = os.path.join(tmp_dir, "per_gene.h5")
+    tpms_file = os.path.join(tmp_dir, "tpms.tsv")
+    ribogrid_test_utils.write_per_gene(h5_file, get_counts(),
+                                       get_attributes(), LINKS)
+    tpms.h5_to_tpms(h5_file, tpms_file)
+    with open(tpms_file) as f:
+        assert f.readline().startswith("# Created by: RiboViz")
+    actual = pd.read_csv(tpms_file, sep="\t", comment="#")
+    assert list(actual.columns) == tpms.HEADER
+    pd.testing.assert_frame_equal(actual, get_expected_tpms(),
+                                  check_dtype=False)
+
+
+def write_sample_tpms(output_dir, sample, orfs, sample_tpms):
+    """
+    Write a sample's TPMs file, in a sample-specific subdirectory.
+
+    :param output_dir: Output directory
+    :type output_dir: str or unicode
+    :param sample: Sample name
+    :type sample: str or unicode
+    :param orfs: ORFs
+    :type orfs: list(str or unicode)
+    :param sample_tpms: TPMs
+    :type sample_tpms: list(float)
+    """
+    os.mkdir(os.path.join(output_dir, sample))
+    data = pd.DataFrame({tpms.ORF: orfs,
+                         tpms.READCOUNT: 0,
+                         tpms.RPB: 0.0,
+                         tpms.TPM: sample_tpms},
+                        columns=tpms.HEADER)
+    tpms.write_tpms(data, tpms.get_tpms_file_name(output_dir, sample,
+                                                  True))
+
+
+def test_collate_tpms(tmp_dir):
+    """
+    Test :py:func:`riboviz.tpms.collate_tpms` with samples with the
+    same ORFs, differently-ordered ORFs and no TPMs file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    write_sample_tpms(tmp_dir, "S1", ["A", "B", "C"], [1.0, 2.04, 3.06])
+    write_sample_tpms(tmp_dir, "S2", ["C", "A", "D"], [4.0, 5.0, 6.0])
+    with pytest.warns(UserWarning) as record:
+        collated = tpms.collate_tpms(tmp_dir, ["S1", "S2", "S3"], True)
+    assert len(record) == 2
+    assert collated.orfs == ["A", "B", "C"]
+    assert collated.samples == ["S1", "S2"]
+    assert collated.tpms.dtype == np.float32
+    np.testing.assert_allclose(collated.tpms,
+                               [[1.0, 5.0], [2.0, np.nan], [3.1, 4.0]],
+                               rtol=1e-6)
+
+
+@pytest.mark.parametrize("collated_file", ["collated.npz",
+                                           "collated.tsv"])
+def test_collate_tpms_update(tmp_dir, collated_file):
+    """
+    Test :py:func:`riboviz.tpms.collate_tpms` adds samples to
+    collated TPMs, and replaces existing samples, loaded from a
+    ``.npz`` file or a TSV file.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param collated_file: Collated TPMs file
+    :type collated_file: str or unicode
+    """
+    orfs = ["A", "B"]
+    write_sample_tpms(tmp_dir, "S1", orfs, [1.0, 2.0])
+    write_sample_tpms(tmp_dir, "S2", orfs, [3.0, 4.0])
+    collated = tpms.collate_tpms(tmp_dir, ["S1", "S2"], True)
+    collated_file = os.path.join(tmp_dir, collated_file)
+    if collated_file.endswith(".npz"):
+        tpms.save_collated_tpms_npz(collated, collated_file)
+    else:
+        tpms.write_collated_tpms(collated, collated_file)
+    loaded = tpms.load_collated_tpms(collated_file)
+    assert loaded.orfs == orfs
+    assert loaded.samples == ["S1", "S2"]
+    np.testing.assert_array_equal(loaded.tpms, collated.tpms)
+    shutil.rmtree(os.path.join(tmp_dir, "S1"))
+    shutil.rmtree(os.path.join(tmp_dir, "S2"))
+    write_sample_tpms(tmp_dir, "S1", orfs, [5.0, 6.0])
+    write_sample_tpms(tmp_dir, "S3", orfs, [7.0, 8.0])
+    updated = tpms.collate_tpms(tmp_dir, ["S3", "S1"], True,
+                                collated=loaded)
+    assert updated.samples == ["S2", "S3", "S1"]
+    np.testing.assert_array_equal(updated.tpms,
+                                  [[3.0, 7.0, 5.0], [4.0, 8.0, 6.0]])
+
+
+def test_write_collated_tpms(tmp_dir):
+    """
+    Test :py:func:`riboviz.tpms.write_collated_tpms` writes a TSV
+    file with a provenance header, rounded values and missing values
+    as ``NA``.
+
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    """
+    tsv_file = os.path.join(tmp_dir, "collated.tsv")
+    collated = tpms.CollatedTpmsTuple(
+        ["A", "B"], ["S1", "S2"],
+        np.array([[1.25, np.nan], [1000000.0, 0.0]], dtype=np.float32))
+    tpms.write_collated_tpms(collated, tsv_file)
+    with open(tsv_file) as f:
+        lines = f.readlines()
+    assert lines[0].startswith("# Created by: RiboViz")
+    assert [line for line in lines if not line.startswith("#")] == [
+        "ORF\tS1\tS2\n", "A\t1.2\tNA\n", "B\t1000000.0\t0.0\n"]
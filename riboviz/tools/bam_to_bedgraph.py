@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Scan a BAM file once and write bedGraphs of the 5' ends of reads on
+the plus and minus strands.
+
+Usage::
+
+    python -m riboviz.tools.bam_to_bedgraph [-h]
+        -b BAM_FILE -p PLUS_BEDGRAPH_FILE -m MINUS_BEDGRAPH_FILE
+        [-n NUM_PROCESSES]
+
+    -h, --help            show this help message and exit
+    -b BAM_FILE, --bam BAM_FILE
+                          BAM file input
+    -p PLUS_BEDGRAPH_FILE, --plus PLUS_BEDGRAPH_FILE
+                          Plus strand bedGraph file output
+    -m MINUS_BEDGRAPH_FILE, --minus MINUS_BEDGRAPH_FILE
+                          Minus strand bedGraph file output
+    -n NUM_PROCESSES, --num-processes NUM_PROCESSES
+                          Number of processes (default 1)
+
+See :py:func:`riboviz.bedgraph.write_bedgraphs`.
+"""
+import argparse
+from riboviz import bedgraph
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Scan a BAM file once and write bedGraphs of the 5' ends of reads on the plus and minus strands")
+    parser.add_argument("-b",
+                        "--bam",
+                        dest="bam_file",
+                        required=True,
+                        help="BAM file input")
+    parser.add_argument("-p",
+                        "--plus",
+                        dest="plus_bedgraph_file",
+                        required=True,
+                        help="Plus strand bedGraph file output")
+    parser.add_argument("-m",
+                        "--minus",
+                        dest="minus_bedgraph_file",
+                        required=True,
+                        help="Minus strand bedGraph file output")
+    parser.add_argument("-n",
+                        "--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes (default 1)")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_bam_to_bedgraph():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.bedgraph.write_bedgraphs`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    bedgraph.write_bedgraphs(options.bam_file,
+                             options.plus_bedgraph_file,
+                             options.minus_bedgraph_file,
+                             options.num_processes)
+
+
+if __name__ == "__main__":
+    invoke_bam_to_bedgraph()
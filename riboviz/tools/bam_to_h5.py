@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Scan a BAM file once and write length-sensitive alignments of the
+reads to each gene in a GFF file in H5 format. This is a native
+alternative to ``bam_to_h5.R`` which takes the same options.
+
+Usage::
+
+    python -m riboviz.tools.bam_to_h5 [-h]
+        --bam-file BAM_FILE --hd-file H5_FILE
+        --orf-gff-file ORF_GFF_FILE
+        [--num-processes NUM_PROCESSES]
+        [--min-read-length MIN_READ_LENGTH]
+        [--max-read-length MAX_READ_LENGTH]
+        [--buffer BUFFER] [--primary-id PRIMARY_ID]
+        [--secondary-id SECONDARY_ID] [--dataset DATASET]
+        [--is-riboviz-gff IS_RIBOVIZ_GFF]
+        [--stop-in-cds STOP_IN_CDS]
+        [--compression {gzip,lzf,blosc,none}]
+        [--compression-level COMPRESSION_LEVEL]
+        [--chunk-positions CHUNK_POSITIONS]
+        [--chunk-lengths CHUNK_LENGTHS]
+        [--cache-dir CACHE_DIR]
+
+    -h, --help            show this help message and exit
+    --bam-file BAM_FILE   BAM input file
+    --hd-file H5_FILE     H5 output file
+    --orf-gff-file ORF_GFF_FILE
+                          GFF2/GFF3 annotation file
+    --num-processes NUM_PROCESSES
+                          Number of processes (default 1)
+    --min-read-length MIN_READ_LENGTH
+                          Minimum read length in H5 output (default 10)
+    --max-read-length MAX_READ_LENGTH
+                          Maximum read length in H5 output (default 50)
+    --buffer BUFFER       Length of flanking region around the CDS
+                          (default 250)
+    --primary-id PRIMARY_ID
+                          Primary gene IDs to access the data (default
+                          gene_id)
+    --secondary-id SECONDARY_ID
+                          Secondary gene IDs to access the data
+                          (default NULL)
+    --dataset DATASET     Name of the dataset (default data)
+    --is-riboviz-gff IS_RIBOVIZ_GFF
+                          Is the GFF file with UTR5, CDS, and UTR3
+                          elements per gene? (default TRUE)
+    --stop-in-cds STOP_IN_CDS
+                          Are stop codons part of the CDS annotations
+                          in GFF? (default FALSE)
+    --compression {gzip,lzf,blosc,none}
+                          H5 compression filter (default gzip)
+    --compression-level COMPRESSION_LEVEL
+                          H5 gzip compression level (default 7)
+    --chunk-positions CHUNK_POSITIONS
+                          Maximum number of positions per H5 chunk
+                          (default all positions)
+    --chunk-lengths CHUNK_LENGTHS
+                          Maximum number of read lengths per H5 chunk
+                          (default 1)
+    --cache-dir CACHE_DIR
+                          Annotation cache directory. If provided, GFF
+                          features are read from the cache
+
+See :py:func:`riboviz.ribogrid.bam_to_h5`.
+"""
+import argparse
+from riboviz import gff_utils
+from riboviz import h5_writer
+from riboviz import provenance
+from riboviz import ribogrid
+from riboviz import utils
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Scan a BAM file once and write length-sensitive alignments of the reads to each gene in a GFF file in H5 format")
+    parser.add_argument("--bam-file",
+                        dest="bam_file",
+                        required=True,
+                        help="BAM input file")
+    parser.add_argument("--hd-file",
+                        dest="h5_file",
+                        required=True,
+                        help="H5 output file")
+    parser.add_argument("--orf-gff-file",
+                        dest="orf_gff_file",
+                        required=True,
+                        help="GFF2/GFF3 annotation file")
+    parser.add_argument("--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes (default 1)")
+    parser.add_argument("--min-read-length",
+                        dest="min_read_length",
+                        default=10,
+                        type=int,
+                        help="Minimum read length in H5 output (default 10)")
+    parser.add_argument("--max-read-length",
+                        dest="max_read_length",
+                        default=50,
+                        type=int,
+                        help="Maximum read length in H5 output (default 50)")
+    parser.add_argument("--buffer",
+                        dest="buffer",
+                        default=250,
+                        type=int,
+                        help="Length of flanking region around the CDS (default 250)")
+    parser.add_argument("--primary-id",
+                        dest="primary_id",
+                        default=gff_utils.DEFAULT_PRIMARY_ID,
+                        help="Primary gene IDs to access the data (default {})".format(
+                            gff_utils.DEFAULT_PRIMARY_ID))
+    parser.add_argument("--secondary-id",
+                        dest="secondary_id",
+                        default="NULL",
+                        help="Secondary gene IDs to access the data (default NULL)")
+    parser.add_argument("--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Name of the dataset (default data)")
+    parser.add_argument("--is-riboviz-gff",
+                        dest="is_riboviz_gff",
+                        default=True,
+                        type=utils.parse_bool,
+                        help="Is the GFF file with UTR5, CDS, and UTR3 elements per gene? (default TRUE)")
+    parser.add_argument("--stop-in-cds",
+                        dest="stop_in_cds",
+                        default=False,
+                        type=utils.parse_bool,
+                        help="Are stop codons part of the CDS annotations in GFF? (default FALSE)")
+    parser.add_argument("--compression",
+                        dest="compression",
+                        default=h5_writer.DEFAULT_COMPRESSION,
+                        choices=h5_writer.COMPRESSIONS,
+                        help="H5 compression filter (default {})".format(
+                            h5_writer.DEFAULT_COMPRESSION))
+    parser.add_argument("--compression-level",
+                        dest="compression_level",
+                        default=h5_writer.DEFAULT_COMPRESSION_LEVEL,
+                        type=int,
+                        help="H5 gzip compression level (default {})".format(
+                            h5_writer.DEFAULT_COMPRESSION_LEVEL))
+    parser.add_argument("--chunk-positions",
+                        dest="chunk_positions",
+                        default=None,
+                        type=int,
+                        help="Maximum number of positions per H5 chunk (default all positions)")
+    parser.add_argument("--chunk-lengths",
+                        dest="chunk_lengths",
+                        default=h5_writer.DEFAULT_CHUNK_LENGTHS,
+                        type=int,
+                        help="Maximum number of read lengths per H5 chunk (default {})".format(
+                            h5_writer.DEFAULT_CHUNK_LENGTHS))
+    parser.add_argument("--cache-dir",
+                        dest="cache_dir",
+                        default=None,
+                        help="Annotation cache directory. If provided, GFF features are read from the cache")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_bam_to_h5():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.ribogrid.bam_to_h5`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    secondary_id = options.secondary_id
+    if secondary_id == "NULL":
+        secondary_id = None
+    ribogrid.bam_to_h5(options.bam_file,
+                       options.h5_file,
+                       options.orf_gff_file,
+                       options.min_read_length,
+                       options.max_read_length,
+                       options.buffer,
+                       options.primary_id,
+                       secondary_id,
+                       options.dataset,
+                       options.is_riboviz_gff,
+                       options.stop_in_cds,
+                       options.num_processes,
+                       options.compression,
+                       options.compression_level,
+                       options.chunk_positions,
+                       options.chunk_lengths,
+                       options.cache_dir)
+
+
+if __name__ == "__main__":
+    invoke_bam_to_h5()
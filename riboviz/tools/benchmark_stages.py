@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Benchmark the Python functions that implement workflow stages, or
+that are used to check workflow outputs, on simulated datasets of
+increasing size, and append the minimum, median and maximum times to
+a tab-separated values file. Optionally, compare the times to those
+in a baseline file and exit with code 1 if any case has regressed.
+
+Usage::
+
+    python -m riboviz.tools.benchmark_stages [-h]
+        -d DATA_DIR -o OUTPUT_FILE [-n NUM_READS [NUM_READS ...]]
+        [-c CASE [CASE ...]] [-r REPEATS] [-b BASELINE_FILE]
+        [-t THRESHOLD] [--seed SEED]
+
+    -h, --help            show this help message and exit
+    -d DATA_DIR, --data-dir DATA_DIR
+                          Directory for simulated datasets, which are
+                          reused if present
+    -o OUTPUT_FILE, --output-file OUTPUT_FILE
+                          TSV output file, to which results are
+                          appended
+    -n NUM_READS [NUM_READS ...], --num-reads NUM_READS [NUM_READS ...]
+                          Dataset sizes, in reads (default 10000
+                          100000 1000000)
+    -c CASE [CASE ...], --cases CASE [CASE ...]
+                          Cases to benchmark e.g. trim_5p_mismatch
+                          (default all cases)
+    -r REPEATS, --repeats REPEATS
+                          Number of runs of each case (default 3)
+    -b BASELINE_FILE, --baseline-file BASELINE_FILE
+                          TSV file with baseline results to compare
+                          to
+    -t THRESHOLD, --threshold THRESHOLD
+                          Relative increase in median time, over the
+                          baseline, deemed a regression (default 0.2)
+    --seed SEED           Random number generator seed for simulating
+                          datasets (default 42)
+
+See :py:func:`riboviz.stage_benchmark.run_benchmarks` and
+:py:func:`riboviz.stage_benchmark.compare_benchmarks`.
+"""
+import argparse
+import sys
+from riboviz import provenance
+from riboviz import stage_benchmark
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Python functions that implement workflow stages")
+    parser.add_argument("-d",
+                        "--data-dir",
+                        dest="data_dir",
+                        required=True,
+                        help="Directory for simulated datasets, which are reused if present")
+    parser.add_argument("-o",
+                        "--output-file",
+                        dest="output_file",
+                        required=True,
+                        help="TSV output file, to which results are appended")
+    parser.add_argument("-n",
+                        "--num-reads",
+                        dest="num_reads",
+                        nargs="+",
+                        type=int,
+                        default=stage_benchmark.DEFAULT_SIZES,
+                        help="Dataset sizes, in reads (default {})".format(
+                            " ".join(map(str, stage_benchmark.DEFAULT_SIZES))))
+    parser.add_argument("-c",
+                        "--cases",
+                        dest="cases",
+                        nargs="+",
+                        choices=stage_benchmark.CASES,
+                        metavar="CASE",
+                        help="Cases to benchmark e.g. trim_5p_mismatch (default all cases)")
+    parser.add_argument("-r",
+                        "--repeats",
+                        dest="repeats",
+                        default=stage_benchmark.DEFAULT_REPEATS,
+                        type=int,
+                        help="Number of runs of each case (default {})".format(
+                            stage_benchmark.DEFAULT_REPEATS))
+    parser.add_argument("-b",
+                        "--baseline-file",
+                        dest="baseline_file",
+                        help="TSV file with baseline results to compare to")
+    parser.add_argument("-t",
+                        "--threshold",
+                        dest="threshold",
+                        default=stage_benchmark.DEFAULT_THRESHOLD,
+                        type=float,
+                        help="Relative increase in median time, over the baseline, deemed a regression (default {})".format(
+                            stage_benchmark.DEFAULT_THRESHOLD))
+    parser.add_argument("--seed",
+                        dest="seed",
+                        default=stage_benchmark.DEFAULT_SEED,
+                        type=int,
+                        help="Random number generator seed for simulating datasets (default {})".format(
+                            stage_benchmark.DEFAULT_SEED))
+    options = parser.parse_args()
+    return options
+
+
+def invoke_benchmark_stages():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.stage_benchmark.run_benchmarks`,
+    :py:func:`riboviz.stage_benchmark.save_benchmarks` and, if a
+    baseline file is given,
+    :py:func:`riboviz.stage_benchmark.compare_benchmarks`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    baseline = None
+    if options.baseline_file:
+        # Load baseline before saving results in case they are the
+        # same file.
+        baseline = stage_benchmark.load_benchmarks(options.baseline_file)
+    results = stage_benchmark.run_benchmarks(options.data_dir,
+                                             options.num_reads,
+                                             options.cases,
+                                             options.repeats,
+                                             options.seed)
+    stage_benchmark.save_benchmarks(results, options.output_file)
+    print(results.to_string(index=False))
+    if baseline is None:
+        return
+    comparison = stage_benchmark.compare_benchmarks(baseline, results)
+    print(comparison.to_string(index=False))
+    regressions = stage_benchmark.get_regressions(comparison,
+                                                  options.threshold)
+    if not regressions.empty:
+        print("Regressions (median time increase > {}):".format(
+            options.threshold))
+        print(regressions.to_string(index=False))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    invoke_benchmark_stages()
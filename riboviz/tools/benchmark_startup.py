@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark the start-up time of RiboViz command-line tools, by running
+``python -m riboviz.tools.<tool> --help`` several times for each
+tool, and write the minimum, median and maximum times, and any slow
+to import modules imported, to a tab-separated values file.
+
+Usage::
+
+    python -m riboviz.tools.benchmark_startup [-h]
+        -o OUTPUT_FILE [-t TOOL [TOOL ...]] [-r REPEATS]
+
+    -h, --help            show this help message and exit
+    -o OUTPUT_FILE, --output-file OUTPUT_FILE
+                          TSV output file
+    -t TOOL [TOOL ...], --tools TOOL [TOOL ...]
+                          Tools to benchmark e.g. trim_5p_mismatch
+                          (default all tools)
+    -r REPEATS, --repeats REPEATS
+                          Number of runs of each tool (default 5)
+
+See :py:func:`riboviz.startup_benchmark.benchmark_startup_to_tsv`.
+"""
+import argparse
+from riboviz import provenance
+from riboviz import startup_benchmark
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the start-up time of RiboViz command-line tools")
+    parser.add_argument("-o",
+                        "--output-file",
+                        dest="output_file",
+                        required=True,
+                        help="TSV output file")
+    parser.add_argument("-t",
+                        "--tools",
+                        dest="tools",
+                        nargs="+",
+                        help="Tools to benchmark e.g. trim_5p_mismatch (default all tools)")
+    parser.add_argument("-r",
+                        "--repeats",
+                        dest="repeats",
+                        default=5,
+                        type=int,
+                        help="Number of runs of each tool (default 5)")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_benchmark_startup():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.startup_benchmark.benchmark_startup_to_tsv`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    results = startup_benchmark.benchmark_startup_to_tsv(
+        options.output_file, options.tools, options.repeats)
+    print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    invoke_benchmark_startup()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Parse a GFF file into features and genes, cache these in a directory,
+unless they are already cached, and, optionally, write these to
+tab-separated values files.
+
+Usage::
+
+    python -m riboviz.tools.cache_annotation [-h] -g GFF -d CACHE_DIR
+        [--primary-id PRIMARY_ID] [--secondary-id SECONDARY_ID]
+        [--features-tsv FEATURES_TSV] [--genes-tsv GENES_TSV]
+
+    -h, --help            show this help message and exit
+    -g GFF, --gff GFF     GFF file input
+    -d CACHE_DIR, --cache-dir CACHE_DIR
+                          Cache directory
+    --primary-id PRIMARY_ID
+                          Primary gene IDs attribute (default gene_id)
+    --secondary-id SECONDARY_ID
+                          Secondary gene IDs attribute
+    --features-tsv FEATURES_TSV
+                          Features TSV file output
+    --genes-tsv GENES_TSV
+                          Genes TSV file output
+
+See :py:mod:`riboviz.annotation`.
+"""
+import argparse
+from riboviz import annotation
+from riboviz import gff_utils
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Parse a GFF file into features and genes and cache these in a directory")
+    parser.add_argument("-g",
+                        "--gff",
+                        dest="gff",
+                        required=True,
+                        help="GFF file input")
+    parser.add_argument("-d",
+                        "--cache-dir",
+                        dest="cache_dir",
+                        required=True,
+                        help="Cache directory")
+    parser.add_argument("--primary-id",
+                        dest="primary_id",
+                        default=gff_utils.DEFAULT_PRIMARY_ID,
+                        help="Primary gene IDs attribute (default {})".format(
+                            gff_utils.DEFAULT_PRIMARY_ID))
+    parser.add_argument("--secondary-id",
+                        dest="secondary_id",
+                        default=None,
+                        help="Secondary gene IDs attribute")
+    parser.add_argument("--features-tsv",
+                        dest="features_tsv",
+                        help="Features TSV file output")
+    parser.add_argument("--genes-tsv",
+                        dest="genes_tsv",
+                        help="Genes TSV file output")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_cache_annotation():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.annotation.cache_annotation` and
+    :py:func:`riboviz.annotation.write_annotation_tsv`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    cache_file, is_cached = annotation.cache_annotation(
+        options.gff, options.cache_dir, options.primary_id,
+        options.secondary_id)
+    print("{} annotation: {}".format(
+        "Cached" if is_cached else "Created", cache_file))
+    if options.features_tsv or options.genes_tsv:
+        annotation.write_annotation_tsv(
+            annotation.load_annotation(cache_file),
+            options.features_tsv, options.genes_tsv)
+
+
+if __name__ == "__main__":
+    invoke_cache_annotation()
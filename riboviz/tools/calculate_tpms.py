@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Calculate transcripts per million (TPMs) of the genes in an H5 file,
+as output by ``bam_to_h5.R`` or :py:mod:`riboviz.tools.bam_to_h5`,
+and write these to a tab-separated values file with the same columns
+as the ``tpms.tsv`` file output by ``generate_stats_figs.R``.
+
+Usage::
+
+    python -m riboviz.tools.calculate_tpms [-h]
+        -i H5_FILE -o TPMS_FILE [-d DATASET]
+
+    -h, --help            show this help message and exit
+    -i H5_FILE, --input H5_FILE
+                          H5 input file
+    -o TPMS_FILE, --output TPMS_FILE
+                          TPMs TSV output file
+    -d DATASET, --dataset DATASET
+                          Dataset name (default data)
+
+See :py:func:`riboviz.tpms.h5_to_tpms`.
+"""
+import argparse
+from riboviz import provenance
+from riboviz import tpms
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate transcripts per million (TPMs) of the genes in an H5 file")
+    parser.add_argument("-i",
+                        "--input",
+                        dest="h5_file",
+                        required=True,
+                        help="H5 input file")
+    parser.add_argument("-o",
+                        "--output",
+                        dest="tpms_file",
+                        required=True,
+                        help="TPMs TSV output file")
+    parser.add_argument("-d",
+                        "--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Dataset name (default data)")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_calculate_tpms():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.tpms.h5_to_tpms`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    tpms.h5_to_tpms(options.h5_file, options.tpms_file, options.dataset)
+
+
+if __name__ == "__main__":
+    invoke_calculate_tpms()
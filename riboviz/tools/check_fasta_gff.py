@@ -1,15 +1,23 @@
 #!/usr/bin/env python
 """
-Check FASTA and GFF files for compatibility.
+Check FASTA and GFF files for compatibility and print any issues
+and, optionally, write these to a tab-separated values file.
 
 Usage::
 
     python -m riboviz.tools.check_fasta_gff.py [-h] -f FASTA -g GFF
+        [-o OUTPUT_FILE] [-n NUM_PROCESSES] [-d CACHE_DIR]
 
     -h, --help            show this help message and exit
     -f FASTA, --fasta FASTA
                           fasta file input
     -g GFF, --gff GFF     gff3 file input
+    -o OUTPUT_FILE, --output-file OUTPUT_FILE
+                          TSV file output with issues
+    -n NUM_PROCESSES, --num-processes NUM_PROCESSES
+                          Number of processes (default 1)
+    -d CACHE_DIR, --cache-dir CACHE_DIR
+                          Parsed GFF annotation cache directory
 
 See :py:func:`riboviz.check_fasta_gff.check_fasta_gff`.
 """
@@ -37,6 +45,20 @@ def parse_command_line_options():
                         dest="gff",
                         required=True,
                         help="gff3 file input")
+    parser.add_argument("-o",
+                        "--output-file",
+                        dest="output_file",
+                        help="TSV file output with issues")
+    parser.add_argument("-n",
+                        "--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes (default 1)")
+    parser.add_argument("-d",
+                        "--cache-dir",
+                        dest="cache_dir",
+                        help="Parsed GFF annotation cache directory")
     options = parser.parse_args()
     return options
 
@@ -46,11 +68,15 @@ def invoke_check_fasta_gff():
     Parse command-line options then invoke
     :py:func:`riboviz.check_fasta_gff.check_fasta_gff`.
     """
-    print(provenance.write_provenance_to_str(__file__))
     options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
     fasta = options.fasta
     gff = options.gff
-    check_fasta_gff.check_fasta_gff(fasta, gff)
+    issues = check_fasta_gff.check_fasta_gff(fasta, gff,
+                                             options.num_processes,
+                                             options.cache_dir)
+    if options.output_file:
+        check_fasta_gff.write_issues(issues, options.output_file)
 
 
 if __name__ == "__main__":
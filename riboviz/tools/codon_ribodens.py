@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""
+Calculate codon-specific mean ribosome densities at the A, P and E
+sites, from an H5 file, as output by ``bam_to_h5.R`` or
+:py:mod:`riboviz.tools.bam_to_h5`, and write these, alongside tRNA
+estimates, to a tab-separated values file with the same columns as the
+``codon_ribodens.tsv`` file output by ``generate_stats_figs.R``.
+
+Usage::
+
+    python -m riboviz.tools.codon_ribodens [-h]
+        --hd-file H5_FILE --t-rna-file T_RNA_FILE
+        --codon-positions-file CODON_POSITIONS_FILE
+        --output-file OUTPUT_FILE [--dataset DATASET]
+        [--buffer BUFFER] [--min-read-length MIN_READ_LENGTH]
+        [--count-threshold COUNT_THRESHOLD]
+
+    -h, --help            show this help message and exit
+    --hd-file H5_FILE     H5 input file
+    --t-rna-file T_RNA_FILE
+                          tRNA estimates TSV file
+    --codon-positions-file CODON_POSITIONS_FILE
+                          Codon positions TSV file, with columns
+                          Codon, Gene and Position
+    --output-file OUTPUT_FILE
+                          TSV output file
+    --dataset DATASET     Name of the dataset (default data)
+    --buffer BUFFER       Length of flanking region around the CDS
+                          (default 250)
+    --min-read-length MIN_READ_LENGTH
+                          Minimum read length in H5 file (default 10)
+    --count-threshold COUNT_THRESHOLD
+                          Threshold for count of reads per gene to be
+                          included (default 64)
+
+An ``.RData`` codon positions file, as used by
+``generate_stats_figs.R``, can be converted into a TSV file using
+``rscripts/codon_positions_to_tsv.R``.
+
+See :py:func:`riboviz.codon_density.codon_densities_to_tsv`.
+"""
+import argparse
+from riboviz import codon_density
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate codon-specific mean ribosome densities at the A, P and E sites")
+    parser.add_argument("--hd-file",
+                        dest="h5_file",
+                        required=True,
+                        help="H5 input file")
+    parser.add_argument("--t-rna-file",
+                        dest="t_rna_file",
+                        required=True,
+                        help="tRNA estimates TSV file")
+    parser.add_argument("--codon-positions-file",
+                        dest="codon_positions_file",
+                        required=True,
+                        help="Codon positions TSV file, with columns Codon, Gene and Position")
+    parser.add_argument("--output-file",
+                        dest="output_file",
+                        required=True,
+                        help="TSV output file")
+    parser.add_argument("--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Name of the dataset (default data)")
+    parser.add_argument("--buffer",
+                        dest="buffer",
+                        default=250,
+                        type=int,
+                        help="Length of flanking region around the CDS (default 250)")
+    parser.add_argument("--min-read-length",
+                        dest="min_read_length",
+                        default=10,
+                        type=int,
+                        help="Minimum read length in H5 file (default 10)")
+    parser.add_argument("--count-threshold",
+                        dest="count_threshold",
+                        default=codon_density.DEFAULT_COUNT_THRESHOLD,
+                        type=int,
+                        help="Threshold for count of reads per gene to be included (default {})".format(codon_density.DEFAULT_COUNT_THRESHOLD))
+    options = parser.parse_args()
+    return options
+
+
+def invoke_codon_ribodens():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.codon_density.codon_densities_to_tsv`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    codon_density.codon_densities_to_tsv(options.h5_file,
+                                         options.t_rna_file,
+                                         options.codon_positions_file,
+                                         options.output_file,
+                                         options.dataset,
+                                         options.buffer,
+                                         options.min_read_length,
+                                         options.count_threshold)
+
+
+if __name__ == "__main__":
+    invoke_codon_ribodens()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Collate TPMs across samples. This is a native alternative to
+``collate_tpms.R`` which takes the same options plus options to save
+the collated TPMs as a NumPy ``.npz`` file and to add samples to
+previously collated TPMs.
+
+Usage::
+
+    python -m riboviz.tools.collate_tpms [-h]
+        [--output-dir OUTPUT_DIR] [--tpms-file TPMS_FILE]
+        [--sample-subdirs SAMPLE_SUBDIRS] [--orf-fasta ORF_FASTA]
+        [--npz-file NPZ_FILE] [--update UPDATE]
+        [SAMPLE [SAMPLE ...]]
+
+    -h, --help            show this help message and exit
+    --output-dir OUTPUT_DIR
+                          Output directory (default ./)
+    --tpms-file TPMS_FILE
+                          Output file, relative to output directory
+                          (default TPMs_collated.tsv)
+    --sample-subdirs SAMPLE_SUBDIRS
+                          Are samples in sample-specific
+                          subdirectories of output directory?
+                          (default FALSE)
+    --orf-fasta ORF_FASTA
+                          ORF file that was aligned to
+    --npz-file NPZ_FILE   NumPy .npz output file, relative to output
+                          directory
+    --update UPDATE       Add samples to the TPMs already collated in
+                          the .npz output file, if it exists, or else
+                          the TSV output file, if it exists? (default
+                          FALSE)
+    SAMPLE                Sample names
+
+See :py:func:`riboviz.tpms.collate_tpms`.
+"""
+import argparse
+import os
+from riboviz import provenance
+from riboviz import tpms
+from riboviz import utils
+from riboviz import workflow_r
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Collate TPMs across samples")
+    parser.add_argument("--output-dir",
+                        dest="output_dir",
+                        default="./",
+                        help="Output directory (default ./)")
+    parser.add_argument("--tpms-file",
+                        dest="tpms_file",
+                        default=workflow_r.TPMS_COLLATED_TSV,
+                        help="Output file, relative to output directory (default {})".format(workflow_r.TPMS_COLLATED_TSV))
+    parser.add_argument("--sample-subdirs",
+                        dest="sample_subdirs",
+                        default=False,
+                        type=utils.parse_bool,
+                        help="Are samples in sample-specific subdirectories of output directory? (default FALSE)")
+    parser.add_argument("--orf-fasta",
+                        dest="orf_fasta",
+                        default=None,
+                        help="ORF file that was aligned to")
+    parser.add_argument("--npz-file",
+                        dest="npz_file",
+                        default=None,
+                        help="NumPy .npz output file, relative to output directory")
+    parser.add_argument("--update",
+                        dest="update",
+                        default=False,
+                        type=utils.parse_bool,
+                        help="Add samples to the TPMs already collated in the .npz output file, if it exists, or else the TSV output file, if it exists? (default FALSE)")
+    parser.add_argument("samples",
+                        metavar="SAMPLE",
+                        nargs="*",
+                        help="Sample names")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_collate_tpms():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.tpms.collate_tpms`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    tsv_file = os.path.join(options.output_dir, options.tpms_file)
+    npz_file = None
+    if options.npz_file is not None:
+        npz_file = os.path.join(options.output_dir, options.npz_file)
+    orfs = None
+    if options.orf_fasta is not None:
+        orfs = tpms.load_fasta_names(options.orf_fasta)
+    collated = None
+    if options.update:
+        if npz_file is not None and os.path.exists(npz_file):
+            collated = tpms.load_collated_tpms(npz_file)
+        elif os.path.exists(tsv_file):
+            collated = tpms.load_collated_tpms(tsv_file)
+    collated = tpms.collate_tpms(options.output_dir,
+                                 options.samples,
+                                 options.sample_subdirs,
+                                 orfs,
+                                 collated)
+    tpms.write_collated_tpms(collated, tsv_file)
+    if npz_file is not None:
+        tpms.save_collated_tpms_npz(collated, npz_file)
+
+
+if __name__ == "__main__":
+    invoke_collate_tpms()
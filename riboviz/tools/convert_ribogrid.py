@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Convert an H5 file between the per-gene layout, as output by
+``bam_to_h5.R`` and :py:mod:`riboviz.tools.bam_to_h5`, and the
+columnar ribogrid store layout.
+
+Usage::
+
+    python -m riboviz.tools.convert_ribogrid [-h]
+        -i INPUT_FILE -o OUTPUT_FILE [-d DATASET]
+        [-n NUM_PROCESSES]
+
+    -h, --help            show this help message and exit
+    -i INPUT_FILE, --input INPUT_FILE
+                          H5 input file
+    -o OUTPUT_FILE, --output OUTPUT_FILE
+                          H5 output file
+    -d DATASET, --dataset DATASET
+                          Dataset name of per-gene layout input file
+                          (default data)
+    -n NUM_PROCESSES, --num-processes NUM_PROCESSES
+                          Number of processes, when converting to the
+                          per-gene layout (default 1)
+
+If the input file is a columnar ribogrid store then it is converted
+to the per-gene layout, otherwise it is converted to a columnar
+ribogrid store.
+
+See :py:func:`riboviz.ribogrid_store.per_gene_to_columnar` and
+:py:func:`riboviz.ribogrid_store.columnar_to_per_gene`.
+"""
+import argparse
+from riboviz import provenance
+from riboviz import ribogrid_store
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert an H5 file between the per-gene layout and the columnar ribogrid store layout")
+    parser.add_argument("-i",
+                        "--input",
+                        dest="input_file",
+                        required=True,
+                        help="H5 input file")
+    parser.add_argument("-o",
+                        "--output",
+                        dest="output_file",
+                        required=True,
+                        help="H5 output file")
+    parser.add_argument("-d",
+                        "--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Dataset name of per-gene layout input file (default data)")
+    parser.add_argument("-n",
+                        "--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes, when converting to the per-gene layout (default 1)")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_convert_ribogrid():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.ribogrid_store.columnar_to_per_gene` or
+    :py:func:`riboviz.ribogrid_store.per_gene_to_columnar`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    if ribogrid_store.is_columnar(options.input_file):
+        ribogrid_store.columnar_to_per_gene(options.input_file,
+                                            options.output_file,
+                                            options.num_processes)
+    else:
+        ribogrid_store.per_gene_to_columnar(options.input_file,
+                                            options.output_file,
+                                            options.dataset)
+
+
+if __name__ == "__main__":
+    invoke_convert_ribogrid()
@@ -97,8 +97,8 @@ def invoke_count_reads():
     Parse command-line options then invoke
     :py:func:`riboviz.count_reads.count_reads`.
     """
-    print(provenance.write_provenance_to_str(__file__))
     options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
     config_file = options.config_file
     input_dir = options.input_dir
     tmp_dir = options.tmp_dir
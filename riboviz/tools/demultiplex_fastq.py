@@ -133,8 +133,8 @@ def invoke_demultiplex_fastq():
     Parse command-line options then invoke
     :py:func:`riboviz.demultiplex_fastq.demultiplex`.
     """
-    print(provenance.write_provenance_to_str(__file__))
     options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
     sample_sheet_file = options.sample_sheet_file
     read1_file = options.read1_file
     read2_file = options.read2_file
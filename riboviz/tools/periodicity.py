@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Calculate three-nucleotide periodicity around start and stop codons
+and, optionally, counts of reads in each frame of each CDS with
+tests that frame 0 has more reads than frames 1 and 2, from an H5
+file, as output by ``bam_to_h5.R`` or
+:py:mod:`riboviz.tools.bam_to_h5`, and write these to
+tab-separated values files with the same names and columns as the
+``3nt_periodicity.tsv`` and ``3ntframe_bygene.tsv`` files output by
+``generate_stats_figs.R``.
+
+Usage::
+
+    python -m riboviz.tools.periodicity [-h]
+        --hd-file H5_FILE --orf-gff-file ORF_GFF_FILE
+        --output-dir OUTPUT_DIR [--output-prefix OUTPUT_PREFIX]
+        [--dataset DATASET] [--min-read-length MIN_READ_LENGTH]
+        [--nnt-buffer NNT_BUFFER] [--nnt-gene NNT_GENE]
+        [--asite-disp-length-file ASITE_DISP_LENGTH_FILE]
+        [--num-processes NUM_PROCESSES] [--cache-dir CACHE_DIR]
+
+    -h, --help            show this help message and exit
+    --hd-file H5_FILE     H5 input file
+    --orf-gff-file ORF_GFF_FILE
+                          ORF GFF2/GFF3 file
+    --output-dir OUTPUT_DIR
+                          Output directory
+    --output-prefix OUTPUT_PREFIX
+                          Prefix for output file names (default '')
+    --dataset DATASET     Name of the dataset (default data)
+    --min-read-length MIN_READ_LENGTH
+                          Minimum read length in H5 file (default 10)
+    --nnt-buffer NNT_BUFFER
+                          Number of nucleotides of UTR around start
+                          and stop codons (default 25)
+    --nnt-gene NNT_GENE   Number of nucleotides of gene around start
+                          and stop codons (default 50)
+    --asite-disp-length-file ASITE_DISP_LENGTH_FILE
+                          A-site displacement file, with columns
+                          read_length and asite_displacement. If
+                          provided, read frames are calculated
+    --num-processes NUM_PROCESSES
+                          Number of processes to calculate read frames
+                          (default 1)
+    --cache-dir CACHE_DIR
+                          Annotation cache directory. If provided, GFF
+                          features are read from the cache
+
+See :py:func:`riboviz.periodicity.periodicity_to_tsv`.
+"""
+import argparse
+from riboviz import periodicity
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate three-nucleotide periodicity and read frames")
+    parser.add_argument("--hd-file",
+                        dest="h5_file",
+                        required=True,
+                        help="H5 input file")
+    parser.add_argument("--orf-gff-file",
+                        dest="orf_gff_file",
+                        required=True,
+                        help="ORF GFF2/GFF3 file")
+    parser.add_argument("--output-dir",
+                        dest="output_dir",
+                        required=True,
+                        help="Output directory")
+    parser.add_argument("--output-prefix",
+                        dest="output_prefix",
+                        default="",
+                        help="Prefix for output file names (default '')")
+    parser.add_argument("--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Name of the dataset (default data)")
+    parser.add_argument("--min-read-length",
+                        dest="min_read_length",
+                        default=10,
+                        type=int,
+                        help="Minimum read length in H5 file (default 10)")
+    parser.add_argument("--nnt-buffer",
+                        dest="nnt_buffer",
+                        default=periodicity.DEFAULT_NNT_BUFFER,
+                        type=int,
+                        help="Number of nucleotides of UTR around start and stop codons (default {})".format(periodicity.DEFAULT_NNT_BUFFER))
+    parser.add_argument("--nnt-gene",
+                        dest="nnt_gene",
+                        default=periodicity.DEFAULT_NNT_GENE,
+                        type=int,
+                        help="Number of nucleotides of gene around start and stop codons (default {})".format(periodicity.DEFAULT_NNT_GENE))
+    parser.add_argument("--asite-disp-length-file",
+                        dest="asite_disp_length_file",
+                        default=None,
+                        help="A-site displacement file, with columns read_length and asite_displacement. If provided, read frames are calculated")
+    parser.add_argument("--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes to calculate read frames (default 1)")
+    parser.add_argument("--cache-dir",
+                        dest="cache_dir",
+                        default=None,
+                        help="Annotation cache directory. If provided, GFF features are read from the cache")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_periodicity():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.periodicity.periodicity_to_tsv`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    periodicity.periodicity_to_tsv(options.h5_file,
+                                   options.orf_gff_file,
+                                   options.output_dir,
+                                   options.output_prefix,
+                                   options.dataset,
+                                   options.min_read_length,
+                                   options.nnt_buffer,
+                                   options.nnt_gene,
+                                   options.asite_disp_length_file,
+                                   options.num_processes,
+                                   options.cache_dir)
+
+
+if __name__ == "__main__":
+    invoke_periodicity()
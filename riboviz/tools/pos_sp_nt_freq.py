@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Calculate position-specific nucleotide frequencies along mapped
+reads, for each read length and frame, from an H5 file, as output by
+``bam_to_h5.R`` or :py:mod:`riboviz.tools.bam_to_h5`, and an ORF
+FASTA file, and write these to a tab-separated values file with the
+same columns as the ``pos_sp_nt_freq.tsv`` file output by
+``generate_stats_figs.R``.
+
+Usage::
+
+    python -m riboviz.tools.pos_sp_nt_freq [-h]
+        --hd-file H5_FILE --orf-fasta-file ORF_FASTA_FILE
+        --output-file OUTPUT_FILE [--dataset DATASET]
+        [--min-read-length MIN_READ_LENGTH]
+        [--max-read-length MAX_READ_LENGTH]
+        [--num-processes NUM_PROCESSES]
+
+    -h, --help            show this help message and exit
+    --hd-file H5_FILE     H5 input file
+    --orf-fasta-file ORF_FASTA_FILE
+                          ORF FASTA file
+    --output-file OUTPUT_FILE
+                          TSV output file
+    --dataset DATASET     Name of the dataset (default data)
+    --min-read-length MIN_READ_LENGTH
+                          Minimum read length in H5 file (default 10)
+    --max-read-length MAX_READ_LENGTH
+                          Maximum read length in H5 file (default 50)
+    --num-processes NUM_PROCESSES
+                          Number of processes (default 1)
+
+See :py:func:`riboviz.nt_composition.nt_frequencies_to_tsv`.
+"""
+import argparse
+from riboviz import nt_composition
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Calculate position-specific nucleotide frequencies along mapped reads")
+    parser.add_argument("--hd-file",
+                        dest="h5_file",
+                        required=True,
+                        help="H5 input file")
+    parser.add_argument("--orf-fasta-file",
+                        dest="orf_fasta_file",
+                        required=True,
+                        help="ORF FASTA file")
+    parser.add_argument("--output-file",
+                        dest="output_file",
+                        required=True,
+                        help="TSV output file")
+    parser.add_argument("--dataset",
+                        dest="dataset",
+                        default="data",
+                        help="Name of the dataset (default data)")
+    parser.add_argument("--min-read-length",
+                        dest="min_read_length",
+                        default=10,
+                        type=int,
+                        help="Minimum read length in H5 file (default 10)")
+    parser.add_argument("--max-read-length",
+                        dest="max_read_length",
+                        default=50,
+                        type=int,
+                        help="Maximum read length in H5 file (default 50)")
+    parser.add_argument("--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes (default 1)")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_pos_sp_nt_freq():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.nt_composition.nt_frequencies_to_tsv`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    nt_composition.nt_frequencies_to_tsv(options.h5_file,
+                                         options.orf_fasta_file,
+                                         options.output_file,
+                                         options.dataset,
+                                         options.min_read_length,
+                                         options.max_read_length,
+                                         options.num_processes)
+
+
+if __name__ == "__main__":
+    invoke_pos_sp_nt_freq()
@@ -82,6 +82,8 @@ Operation is as follows.
   ``collate_tpms.R``.
 * Counts the reads at each step using
   :py:mod:`riboviz.tools.count_reads`.
+* Summarises the resource usage of each workflow step across all
+  samples.
 
 :py:func:`process_samples`:
 
@@ -93,6 +95,12 @@ Operation is as follows.
 * The number of successfully and unsuccessfully processed samples are
   counted and the number of successfully processed samples is
   returned.
+* If batched alignment has been requested then the samples are
+  processed using :py:func:`process_samples_batch` instead. This
+  applies the same steps as :py:func:`process_sample` but aligns the
+  reads of all the samples using a single ``hisat2`` invocation per
+  index, splitting the output into sample-specific files using
+  :py:mod:`riboviz.tools.split_alignment`.
 
 :py:func:`process_sample`:
 
@@ -121,7 +129,7 @@ Operation is as follows.
     - Outputs UMI groups post-deduplication using ``umi_tools group``,
       if requested.
 * Exports bedgraph files for plus and minus strands, if requested,
-  using ``bedtools genomecov``.
+  using :py:mod:`riboviz.tools.bam_to_bedgraph`.
 * Makes length-sensitive alignments in compressed h5 format using
   ``bam_to_h5.R``.
 * Generates summary statistics, and analyses and QC plots for both RPF
@@ -148,6 +156,7 @@ The script can parallelize parts of its operation over many processes
   be used.
 """
 import argparse
+import collections
 from datetime import datetime
 import errno
 import logging
@@ -162,6 +171,7 @@ from riboviz import h5
 from riboviz import logging_utils
 from riboviz import params
 from riboviz import provenance
+from riboviz import resource_usage
 from riboviz import sam_bam
 from riboviz import sample_sheets
 from riboviz import utils
@@ -195,78 +205,26 @@ LOGGER = logging.getLogger(__name__)
 """ Logger. """
 
 
-def process_sample(sample, sample_fastq, index_dir, r_rna_index,
-                   orf_index, is_trimmed, config, tmp_dir, out_dir,
+def prepare_sample(sample_fastq, is_trimmed, config, tmp_dir,
                    logs_dir, run_config):
     """
-    Process a single FASTQ sample file.
+    Prepare a single FASTQ sample file for alignment.
 
     (relevant configuration parameters are shown in brackets).
 
-    * Processes a single FASTQ sample file.
     * Uses a step counter to number step-specific log files.
     * Cuts out sequencing library adapters (``adapters``) using \
       ``cutadapt`` (via :py:func:`riboviz.workflow.cut_adapters`).
-        - If the samples arise from demultiplexed FASTQ file then this
-          step is skipped as the adapters have already been cut.
     * Extracts barcodes and UMIs using ``umi_tools extract``, if \
       requested (``extract_umis``), using a UMI-tools-compliant \
       regular expression pattern (``umi_regexp``) (via \
       :py:func:`riboviz.workflow.extract_barcodes_umis`).
-        - If the samples arise from demultiplexed FASTQ file then this
-          step is skipped as thew barcodes and UMIs have already been
-          extracted.
-    * Removes rRNA or other contaminating reads by alignment to rRNA
-      index files (``rrna_index_prefix``) using ``hisat2`` (via
-      :py:func:`riboviz.workflow.map_to_r_rna`).
-    * Aligns remaining reads to ORFs index files
-      (``orf_index_prefix``). using ``hisat2`` (via
-      :py:func:`riboviz.workflow.map_to_orf`).
-    * Trims 5' mismatches from reads and remove reads with more than 2
-      mismatches using :py:mod:`riboviz.tools.trim_5p_mismatch` (via
-      :py:func:`riboviz.workflow.trim_5p_mismatches`).
-    * Sorts resultant BAM file using ``samtools view | samtools sort``
-      (via :py:func:`riboviz.workflow.sort_bam`).
-    * Indexes resultant BAM file using ``samtools index`` (via
-      :py:func:`riboviz.workflow.index_bam`).
-    * If deduplication has been requested (``dedup_umis``):
-        - Outputs UMI groups pre-deduplication using ``umi_tools
-          group`` if requested (``group_umis``) (via
-          :py:func:`riboviz.workflow.group_umis`).
-        - Deduplicates UMIs using ``umi_tools dedup`` (via
-          :py:func:`riboviz.workflow.deduplicate_umis`), and
-          outputs deduplication statistics, if requested
-          (``dedup_stats``).
-        - Indexes resultant BAM file using ``samtools index`` (via
-          :py:func:`riboviz.workflow.index_bam`).
-        - Outputs UMI groups post-deduplication using ``umi_tools
-          group``, if requested (``group_umis``) (via
-          :py:func:`riboviz.workflow.group_umis`).
-    * Exports bedgraph files for plus and minus strands, if requested
-      (``make_bedgraph``), using ``bedtools genomecov``. (via
-      :py:func:`riboviz.workflow.make_bedgraph`).
-    * Makes length-sensitive alignments in compressed h5 format using
-      ``bam_to_h5.R``. (via :py:func:`riboviz.workflow.bam_to_h5`).
-    * Generates summary statistics, and analyses and QC plots for both
-      RPF and mRNA datasets using ``generate_stats_figs.R``. This
-      includes estimated read counts, reads per base, and transcripts
-      per million for each ORF in each sample. (via
-      :py:func:`riboviz.workflow.generate_stats_figs`).
-    * Writes intermediate files produced above into a sample-specific
-      temporary directory.
-    * Writes output files produced above into a sample-specific output
-      directory.
+    * If the samples arise from demultiplexed FASTQ file then these
+      steps are skipped as the adapters have already been cut and
+      the barcodes and UMIs have already been extracted.
 
-    :param sample: Sample name
-    :type sample: str or unicode
     :param sample_fastq: Sample FASTQ file
     :type sample_fastq: str or unicode
-    :param index_dir: Index directory
-    :type index_dir: str or unicode
-    :param r_rna_index: Prefix of rRNA HT2 index files
-    :type r_rna_index: str or unicode
-    :param orf_index: Prefix of ORF HT2 index files
-    :type orf_index: str or unicode
     :param is_trimmed: Have adapters been cut and barcodes \
     and UMIs extracted?
     :type is_trimmed: bool
@@ -274,21 +232,19 @@ def process_sample(sample, sample_fastq, index_dir, r_rna_index,
     :type config: dict
     :param tmp_dir: Temporary directory
     :type tmp_dir: str or unicode
-    :param out_dir: Output directory
-    :type out_dir: str or unicode
     :param logs_dir: Logs directory
     :type logs_dir: str or unicode
     :param run_config: Run-related configuration
     :type run_config: RunConfigTuple
+    :return: FASTQ file to be aligned and number of next step
+    :rtype: tuple(str or unicode, int)
     :raise FileNotFoundError: if ``sample_fastq`` or a third-party \
     tool cannot be found
     :raise AssertionError: if invocation of a third-party tool \
     returns non-zero exit code
     :raise KeyError: if ``config`` is missing required configuration
     """
-    LOGGER.info("Processing sample: %s", sample)
     step = 1
-    LOGGER.info("Processing file: %s", sample_fastq)
     is_extract_umis = value_in_dict(params.EXTRACT_UMIS, config)
     if is_trimmed:
         LOGGER.info("Skipping adaptor trimming and barcode/UMI extraction")
@@ -315,25 +271,40 @@ def process_sample(sample, sample_fastq, index_dir, r_rna_index,
                                            run_config)
             trim_fq = extract_trim_fq
             step += 1
+    return trim_fq, step
 
-    non_r_rna_trim_fq = os.path.join(tmp_dir, workflow_files.NON_RRNA_FQ)
-    r_rna_map_sam = os.path.join(tmp_dir, workflow_files.RRNA_MAP_SAM)
-    log_file = os.path.join(logs_dir,
-                            LOG_FORMAT.format(step, "hisat2_rrna.log"))
-    workflow.map_to_r_rna(trim_fq, index_dir, r_rna_index,
-                          r_rna_map_sam, non_r_rna_trim_fq, log_file,
-                          run_config)
-    step += 1
 
-    orf_map_sam = os.path.join(tmp_dir, workflow_files.ORF_MAP_SAM)
-    unaligned_fq = os.path.join(tmp_dir, workflow_files.UNALIGNED_FQ)
-    log_file = os.path.join(logs_dir,
-                            LOG_FORMAT.format(step, "hisat2_orf.log"))
-    workflow.map_to_orf(non_r_rna_trim_fq, index_dir,
-                        orf_index, orf_map_sam, unaligned_fq,
-                        log_file, run_config)
-    step += 1
+def post_process_sample(sample, config, tmp_dir, out_dir, logs_dir,
+                        step, run_config):
+    """
+    Process a single sample once its reads have been aligned to ORFs
+    (the aligned reads are expected to be in
+    :py:const:`riboviz.workflow_files.ORF_MAP_SAM` within ``tmp_dir``).
+    See :py:func:`process_sample` for the steps applied, from
+    trimming 5' mismatches onwards.
 
+    :param sample: Sample name
+    :type sample: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :param logs_dir: Logs directory
+    :type logs_dir: str or unicode
+    :param step: Number of next step, used to number step-specific \
+    log files
+    :type step: int
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if a third-party tool cannot be found
+    :raise AssertionError: if invocation of a third-party tool \
+    returns non-zero exit code
+    :raise KeyError: if ``config`` is missing required configuration
+    """
+    is_extract_umis = value_in_dict(params.EXTRACT_UMIS, config)
+    orf_map_sam = os.path.join(tmp_dir, workflow_files.ORF_MAP_SAM)
     orf_map_sam_clean = os.path.join(tmp_dir, workflow_files.ORF_MAP_CLEAN_SAM)
     trim_5p_mismatch_tsv = os.path.join(
         tmp_dir, workflow_files.TRIM_5P_MISMATCH_TSV)
@@ -417,18 +388,11 @@ def process_sample(sample, sample_fastq, index_dir, r_rna_index,
     if is_make_bedgraph:
         log_file = os.path.join(
             logs_dir,
-            LOG_FORMAT.format(step, "bedtools_genome_cov_plus.log"))
+            LOG_FORMAT.format(step, "bam_to_bedgraph.log"))
         plus_bedgraph = os.path.join(out_dir, workflow_files.PLUS_BEDGRAPH)
-        workflow.make_bedgraph(sample_out_bam, plus_bedgraph,
-                               True, log_file, run_config)
-        step += 1
-
-        log_file = os.path.join(
-            logs_dir,
-            LOG_FORMAT.format(step, "bedtools_genome_cov_minus.log"))
         minus_bedgraph = os.path.join(out_dir, workflow_files.MINUS_BEDGRAPH)
-        workflow.make_bedgraph(sample_out_bam, minus_bedgraph,
-                               False, log_file, run_config)
+        workflow.make_bedgraphs(sample_out_bam, plus_bedgraph,
+                                minus_bedgraph, log_file, run_config)
         step += 1
 
     orf_gff_file = config[params.ORF_GFF_FILE]
@@ -445,6 +409,125 @@ def process_sample(sample, sample_fastq, index_dir, r_rna_index,
     workflow.generate_stats_figs(sample_out_h5, out_dir,
                                  config, log_file, run_config)
 
+
+def process_sample(sample, sample_fastq, index_dir, r_rna_index,
+                   orf_index, is_trimmed, config, tmp_dir, out_dir,
+                   logs_dir, run_config):
+    """
+    Process a single FASTQ sample file.
+
+    (relevant configuration parameters are shown in brackets).
+
+    * Processes a single FASTQ sample file.
+    * Uses a step counter to number step-specific log files.
+    * Cuts out sequencing library adapters (``adapters``) using \
+      ``cutadapt`` (via :py:func:`riboviz.workflow.cut_adapters`).
+        - If the samples arise from demultiplexed FASTQ file then this
+          step is skipped as the adapters have already been cut.
+    * Extracts barcodes and UMIs using ``umi_tools extract``, if \
+      requested (``extract_umis``), using a UMI-tools-compliant \
+      regular expression pattern (``umi_regexp``) (via \
+      :py:func:`riboviz.workflow.extract_barcodes_umis`).
+        - If the samples arise from demultiplexed FASTQ file then this
+          step is skipped as thew barcodes and UMIs have already been
+          extracted.
+    * Removes rRNA or other contaminating reads by alignment to rRNA
+      index files (``rrna_index_prefix``) using ``hisat2`` (via
+      :py:func:`riboviz.workflow.map_to_r_rna`).
+    * Aligns remaining reads to ORFs index files
+      (``orf_index_prefix``). using ``hisat2`` (via
+      :py:func:`riboviz.workflow.map_to_orf`).
+    * Trims 5' mismatches from reads and remove reads with more than 2
+      mismatches using :py:mod:`riboviz.tools.trim_5p_mismatch` (via
+      :py:func:`riboviz.workflow.trim_5p_mismatches`).
+    * Sorts resultant BAM file using ``samtools view | samtools sort``
+      (via :py:func:`riboviz.workflow.sort_bam`).
+    * Indexes resultant BAM file using ``samtools index`` (via
+      :py:func:`riboviz.workflow.index_bam`).
+    * If deduplication has been requested (``dedup_umis``):
+        - Outputs UMI groups pre-deduplication using ``umi_tools
+          group`` if requested (``group_umis``) (via
+          :py:func:`riboviz.workflow.group_umis`).
+        - Deduplicates UMIs using ``umi_tools dedup`` (via
+          :py:func:`riboviz.workflow.deduplicate_umis`), and
+          outputs deduplication statistics, if requested
+          (``dedup_stats``).
+        - Indexes resultant BAM file using ``samtools index`` (via
+          :py:func:`riboviz.workflow.index_bam`).
+        - Outputs UMI groups post-deduplication using ``umi_tools
+          group``, if requested (``group_umis``) (via
+          :py:func:`riboviz.workflow.group_umis`).
+    * Exports bedgraph files for plus and minus strands, if requested
+      (``make_bedgraph``), using
+      :py:mod:`riboviz.tools.bam_to_bedgraph`, which scans the BAM
+      file once for both strands (via
+      :py:func:`riboviz.workflow.make_bedgraphs`).
+    * Makes length-sensitive alignments in compressed h5 format using
+      ``bam_to_h5.R``. (via :py:func:`riboviz.workflow.bam_to_h5`).
+    * Generates summary statistics, and analyses and QC plots for both
+      RPF and mRNA datasets using ``generate_stats_figs.R``. This
+      includes estimated read counts, reads per base, and transcripts
+      per million for each ORF in each sample. (via
+      :py:func:`riboviz.workflow.generate_stats_figs`).
+    * Writes intermediate files produced above into a sample-specific
+      temporary directory.
+    * Writes output files produced above into a sample-specific output
+      directory.
+
+    :param sample: Sample name
+    :type sample: str or unicode
+    :param sample_fastq: Sample FASTQ file
+    :type sample_fastq: str or unicode
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param r_rna_index: Prefix of rRNA HT2 index files
+    :type r_rna_index: str or unicode
+    :param orf_index: Prefix of ORF HT2 index files
+    :type orf_index: str or unicode
+    :param is_trimmed: Have adapters been cut and barcodes \
+    and UMIs extracted?
+    :type is_trimmed: bool
+    :param config: Workflow configuration
+    :type config: dict
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :param logs_dir: Logs directory
+    :type logs_dir: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``sample_fastq`` or a third-party \
+    tool cannot be found
+    :raise AssertionError: if invocation of a third-party tool \
+    returns non-zero exit code
+    :raise KeyError: if ``config`` is missing required configuration
+    """
+    LOGGER.info("Processing sample: %s", sample)
+    LOGGER.info("Processing file: %s", sample_fastq)
+    trim_fq, step = prepare_sample(sample_fastq, is_trimmed, config,
+                                   tmp_dir, logs_dir, run_config)
+
+    non_r_rna_trim_fq = os.path.join(tmp_dir, workflow_files.NON_RRNA_FQ)
+    r_rna_map_sam = os.path.join(tmp_dir, workflow_files.RRNA_MAP_SAM)
+    log_file = os.path.join(logs_dir,
+                            LOG_FORMAT.format(step, "hisat2_rrna.log"))
+    workflow.map_to_r_rna(trim_fq, index_dir, r_rna_index,
+                          r_rna_map_sam, non_r_rna_trim_fq, log_file,
+                          run_config)
+    step += 1
+
+    orf_map_sam = os.path.join(tmp_dir, workflow_files.ORF_MAP_SAM)
+    unaligned_fq = os.path.join(tmp_dir, workflow_files.UNALIGNED_FQ)
+    log_file = os.path.join(logs_dir,
+                            LOG_FORMAT.format(step, "hisat2_orf.log"))
+    workflow.map_to_orf(non_r_rna_trim_fq, index_dir,
+                        orf_index, orf_map_sam, unaligned_fq,
+                        log_file, run_config)
+    step += 1
+
+    post_process_sample(sample, config, tmp_dir, out_dir, logs_dir,
+                        step, run_config)
     LOGGER.info("Finished processing sample: %s", sample_fastq)
 
 
@@ -470,6 +553,9 @@ def process_samples(samples, in_dir, index_dir, r_rna_index,
     * The number of successfully and unsuccessfully processed samples
       are counted and the number of successfully processed samples is
       returned.
+    * If batched alignment has been requested (``batch_align``) then
+      the samples are processed using :py:func:`process_samples_batch`
+      instead.
 
     :param samples: Sample names and files
     :type samples: dict
@@ -499,36 +585,207 @@ def process_samples(samples, in_dir, index_dir, r_rna_index,
     :return: Names of successfully-processed samples
     :rtype: list(str or unicode)
     """
+    if value_in_dict(params.BATCH_ALIGN, config):
+        return process_samples_batch(samples, in_dir, index_dir,
+                                     r_rna_index, orf_index, is_trimmed,
+                                     config, tmp_dir, out_dir, logs_dir,
+                                     run_config, check_samples_exist)
     LOGGER.info("Processing samples")
     successes = []
     num_samples = len(samples)
     for sample in list(samples.keys()):
+        with logging_utils.log_context(sample=sample):
+            try:
+                sample_fastq = os.path.join(in_dir, samples[sample])
+                if check_samples_exist:
+                    if not os.path.exists(sample_fastq):
+                        raise FileNotFoundError(
+                            errno.ENOENT, os.strerror(errno.ENOENT),
+                            sample_fastq)
+                sample_tmp_dir = os.path.join(tmp_dir, sample)
+                sample_out_dir = os.path.join(out_dir, sample)
+                sample_logs_dir = os.path.join(logs_dir, sample)
+                for directory in [sample_tmp_dir,
+                                  sample_out_dir,
+                                  sample_logs_dir]:
+                    workflow.create_directory(directory,
+                                              run_config.cmd_file,
+                                              run_config.is_dry_run)
+                process_sample(sample, sample_fastq, index_dir,
+                               r_rna_index, orf_index, is_trimmed,
+                               config, sample_tmp_dir, sample_out_dir,
+                               sample_logs_dir, run_config)
+                successes.append(sample)
+            except FileNotFoundError as e:
+                LOGGER.error("File not found: %s", e.filename)
+            except Exception:
+                LOGGER.error("Problem processing sample: %s", sample)
+                exc_type, _, _ = sys.exc_info()
+                LOGGER.exception(exc_type.__name__)
+    num_failed = num_samples - len(successes)
+    LOGGER.info("Finished processing %d samples, %d failed",
+                num_samples, num_failed)
+    return successes
+
+
+def process_samples_batch(samples, in_dir, index_dir, r_rna_index,
+                          orf_index, is_trimmed, config, tmp_dir,
+                          out_dir, logs_dir, run_config,
+                          check_samples_exist=True):
+    """
+    Process FASTQ sample files, aligning the reads of all the samples
+    using a single ``hisat2`` invocation per index, rather than one
+    per sample. Any exceptions in the processing of any sample are
+    logged but are not thrown from this function.
+
+    (relevant configuration parameters are shown in brackets).
+
+    * For each sample:
+        - Checks that the sample exists (if doing a dry run with
+          multiplexed data this check is skipped as the file won't
+          exist).
+        - Creates sample-specific temporary, output and logs
+          directories (via
+          :py:func:`riboviz.workflow.create_directory`).
+        - Prepares the sample for alignment using
+          :py:func:`prepare_sample`.
+    * For all samples prepared successfully:
+        - Removes rRNA or other contaminating reads by alignment to
+          rRNA index files (``rrna_index_prefix``) using ``hisat2``
+          (via :py:func:`riboviz.workflow.map_to_r_rna_batch`).
+        - Aligns remaining reads to ORFs index files
+          (``orf_index_prefix``). using ``hisat2`` (via
+          :py:func:`riboviz.workflow.map_to_orf_batch`).
+        - The aligned and unaligned reads are split into the same
+          sample-specific temporary files as are produced by
+          :py:func:`process_sample`. The logs of these steps are
+          written into the logs directory, not a sample-specific logs
+          directory.
+        - If any errors arise during alignment, the error is logged
+          and no sample is processed further.
+    * For each sample aligned successfully, processes the sample
+      using :py:func:`post_process_sample`.
+    * If any errors arise when processing a sample, the error is
+      logged but processing continues onto the other samples.
+    * The number of successfully and unsuccessfully processed samples
+      are counted and the number of successfully processed samples is
+      returned.
+
+    :param samples: Sample names and files
+    :type samples: dict
+    :param in_dir: Directory with sample files
+    :type in_dir: str or unicode
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param r_rna_index: Prefix of rRNA HT2 index files
+    :type r_rna_index: str or unicode
+    :param orf_index: Prefix of ORF HT2 index files
+    :type orf_index: str or unicode
+    :param is_trimmed: Have adapters been cut and barcodes \
+    and UMIs extracted?
+    :type is_trimmed: bool
+    :param config: Workflow configuration
+    :type config: dict
+    :param tmp_dir: Temporary directory
+    :type tmp_dir: str or unicode
+    :param out_dir: Output directory
+    :type out_dir: str or unicode
+    :param logs_dir: Logs directory
+    :type logs_dir: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :param check_samples_exist: If ``run_config.is_dry_run`` \
+    is ``True``, should a check be made for the existence of sample \
+    files?
+    :type check_samples_exist: bool
+    :return: Names of successfully-processed samples
+    :rtype: list(str or unicode)
+    """
+    LOGGER.info("Processing samples with batched alignment")
+    num_samples = len(samples)
+    prepared = collections.OrderedDict()
+    for sample in list(samples.keys()):
+        with logging_utils.log_context(sample=sample):
+            try:
+                sample_fastq = os.path.join(in_dir, samples[sample])
+                if check_samples_exist:
+                    if not os.path.exists(sample_fastq):
+                        raise FileNotFoundError(
+                            errno.ENOENT, os.strerror(errno.ENOENT),
+                            sample_fastq)
+                sample_tmp_dir = os.path.join(tmp_dir, sample)
+                sample_out_dir = os.path.join(out_dir, sample)
+                sample_logs_dir = os.path.join(logs_dir, sample)
+                for directory in [sample_tmp_dir,
+                                  sample_out_dir,
+                                  sample_logs_dir]:
+                    workflow.create_directory(directory,
+                                              run_config.cmd_file,
+                                              run_config.is_dry_run)
+                LOGGER.info("Processing sample: %s", sample)
+                LOGGER.info("Processing file: %s", sample_fastq)
+                prepared[sample] = prepare_sample(
+                    sample_fastq, is_trimmed, config, sample_tmp_dir,
+                    sample_logs_dir, run_config)
+            except FileNotFoundError as e:
+                LOGGER.error("File not found: %s", e.filename)
+            except Exception:
+                LOGGER.error("Problem processing sample: %s", sample)
+                exc_type, _, _ = sys.exc_info()
+                LOGGER.exception(exc_type.__name__)
+
+    successes = []
+    if prepared:
+        sample_tmp_dirs = [os.path.join(tmp_dir, sample)
+                           for sample in prepared]
+        trim_fqs = [trim_fq for trim_fq, _ in prepared.values()]
+        non_r_rna_trim_fqs = [
+            os.path.join(sample_tmp_dir, workflow_files.NON_RRNA_FQ)
+            for sample_tmp_dir in sample_tmp_dirs]
+        r_rna_map_sams = [
+            os.path.join(sample_tmp_dir, workflow_files.RRNA_MAP_SAM)
+            for sample_tmp_dir in sample_tmp_dirs]
+        orf_map_sams = [
+            os.path.join(sample_tmp_dir, workflow_files.ORF_MAP_SAM)
+            for sample_tmp_dir in sample_tmp_dirs]
+        unaligned_fqs = [
+            os.path.join(sample_tmp_dir, workflow_files.UNALIGNED_FQ)
+            for sample_tmp_dir in sample_tmp_dirs]
         try:
-            sample_fastq = os.path.join(in_dir, samples[sample])
-            if check_samples_exist:
-                if not os.path.exists(sample_fastq):
-                    raise FileNotFoundError(
-                        errno.ENOENT, os.strerror(errno.ENOENT), sample_fastq)
-            sample_tmp_dir = os.path.join(tmp_dir, sample)
-            sample_out_dir = os.path.join(out_dir, sample)
-            sample_logs_dir = os.path.join(logs_dir, sample)
-            for directory in [sample_tmp_dir,
-                              sample_out_dir,
-                              sample_logs_dir]:
-                workflow.create_directory(directory,
-                                          run_config.cmd_file,
-                                          run_config.is_dry_run)
-            process_sample(sample, sample_fastq, index_dir,
-                           r_rna_index, orf_index, is_trimmed,
-                           config, sample_tmp_dir, sample_out_dir,
-                           sample_logs_dir, run_config)
-            successes.append(sample)
+            log_file = os.path.join(logs_dir, "hisat2_rrna.log")
+            workflow.map_to_r_rna_batch(trim_fqs, index_dir, r_rna_index,
+                                        r_rna_map_sams, non_r_rna_trim_fqs,
+                                        log_file, run_config)
+            log_file = os.path.join(logs_dir, "hisat2_orf.log")
+            workflow.map_to_orf_batch(non_r_rna_trim_fqs, index_dir,
+                                      orf_index, orf_map_sams,
+                                      unaligned_fqs, log_file, run_config)
         except FileNotFoundError as e:
             LOGGER.error("File not found: %s", e.filename)
+            prepared.clear()
         except Exception:
-            LOGGER.error("Problem processing sample: %s", sample)
+            LOGGER.error("Problem aligning samples: %s",
+                         ", ".join(prepared))
             exc_type, _, _ = sys.exc_info()
             LOGGER.exception(exc_type.__name__)
+            prepared.clear()
+
+    for sample, (_, step) in prepared.items():
+        with logging_utils.log_context(sample=sample):
+            try:
+                post_process_sample(sample, config,
+                                    os.path.join(tmp_dir, sample),
+                                    os.path.join(out_dir, sample),
+                                    os.path.join(logs_dir, sample),
+                                    step, run_config)
+                LOGGER.info("Finished processing sample: %s", sample)
+                successes.append(sample)
+            except FileNotFoundError as e:
+                LOGGER.error("File not found: %s", e.filename)
+            except Exception:
+                LOGGER.error("Problem processing sample: %s", sample)
+                exc_type, _, _ = sys.exc_info()
+                LOGGER.exception(exc_type.__name__)
     num_failed = num_samples - len(successes)
     LOGGER.info("Finished processing %d samples, %d failed",
                 num_samples, num_failed)
@@ -566,10 +823,25 @@ def run_workflow(config_file, is_dry_run=False):
           commands which allow the number of processeses to use to be
           specified.
         - R scripts directory.
+        - The resource usage file
+          (:py:const:`riboviz.workflow_files.RESOURCE_USAGE_TSV`), in
+          the logs directory, into which the resource usage of each
+          command sent to the operating system is to be recorded.
     * Builds HISAT2 indices, if requested (``build_indices``), using
       ``hisat2 build``` and writes these into the index directory
       (``dir_index``) (via
-      :py:func:`riboviz.workflow.build_indices`).
+      :py:func:`riboviz.workflow.build_indices`). If an index cache
+      directory (``dir_index_cache``) is specified then indices are
+      built within, or reused from, the cache and the index directory
+      is populated with symbolic links to the cached index files (via
+      :py:func:`riboviz.workflow.build_cached_indices`).
+    * Parses the ORF GFF file (``orf_gff_file``) into features and
+      genes, caches these in the index directory (``dir_index``),
+      keyed by the GFF file content, and writes these to
+      tab-separated values files
+      (:py:const:`riboviz.workflow_files.ORF_FEATURES_TSV`,
+      :py:const:`riboviz.workflow_files.ORF_GENES_TSV`) in the index
+      directory (via :py:func:`riboviz.workflow.cache_annotation`).
     * Checks if non-multiplexed FASTQ sample files (``fq_files``) or a
       multiplexed FASTQ sample file (``multiplex_fq_files``) have been
       specified.
@@ -597,11 +869,17 @@ def run_workflow(config_file, is_dry_run=False):
           :py:func:`process_samples`.
         - Raises an error if no sample was processed successfully.
     * Collates TPMs across all processed samples using
-      ``collate_tpms.R``  and writes these into the output directory
+      ``collate_tpms.R`` (or, if requested, ``native_collate_tpms``,
+      :py:mod:`riboviz.tools.collate_tpms`) and writes these into
+      the output directory
       (via :py:mod:`riboviz.workflow.collate_tpms`).
     * Counts the reads at each step using
       :py:mod:`riboviz.tools.count_reads`) and writes these into the
       output directory (via :py:mod:`riboviz.workflow.count_reads`).
+    * Summarises the resource usage of each workflow step, across all
+      samples, and writes this into the logs directory (via
+      :py:func:`riboviz.resource_usage.summarise_usage`), if this is
+      not a dry run.
 
     :param config_file: Configuration file path
     :type config_file: str or unicode
@@ -665,11 +943,14 @@ def run_workflow(config_file, is_dry_run=False):
                                         os.strerror(errno.ENOENT),
                                         input_file)
 
+    usage_file = os.path.join(logs_dir, workflow_files.RESOURCE_USAGE_TSV)
+    LOGGER.info("Resource usage file: %s", usage_file)
     run_config = workflow.RunConfigTuple(
         riboviz.R_SCRIPTS,
         cmd_file,
         is_dry_run,
-        nprocesses)
+        nprocesses,
+        usage_file)
 
     in_dir = config[params.INPUT_DIR]
     LOGGER.info("Build indices for alignment, if necessary/requested")
@@ -678,13 +959,33 @@ def run_workflow(config_file, is_dry_run=False):
     is_build_indices = value_in_dict(params.BUILD_INDICES, config)
     if is_build_indices:
         r_rna_fasta = config[params.RRNA_FASTA_FILE]
-        log_file = os.path.join(logs_dir, "hisat2_build_r_rna.log")
-        workflow.build_indices(r_rna_fasta, index_dir, r_rna_index,
-                               log_file, run_config)
         orf_fasta = config[params.ORF_FASTA_FILE]
-        log_file = os.path.join(logs_dir, "hisat2_build_orf.log")
-        workflow.build_indices(orf_fasta, index_dir, orf_index,
-                               log_file, run_config)
+        r_rna_log_file = os.path.join(logs_dir, "hisat2_build_r_rna.log")
+        orf_log_file = os.path.join(logs_dir, "hisat2_build_orf.log")
+        if value_in_dict(params.INDEX_CACHE_DIR, config):
+            index_cache_dir = config[params.INDEX_CACHE_DIR]
+            LOGGER.info("Index cache directory: %s", index_cache_dir)
+            workflow.create_directory(index_cache_dir, cmd_file,
+                                      is_dry_run)
+            workflow.build_cached_indices(r_rna_fasta, index_dir,
+                                          r_rna_index, index_cache_dir,
+                                          r_rna_log_file, run_config)
+            workflow.build_cached_indices(orf_fasta, index_dir,
+                                          orf_index, index_cache_dir,
+                                          orf_log_file, run_config)
+        else:
+            workflow.build_indices(r_rna_fasta, index_dir, r_rna_index,
+                                   r_rna_log_file, run_config)
+            workflow.build_indices(orf_fasta, index_dir, orf_index,
+                                   orf_log_file, run_config)
+
+    LOGGER.info("Cache ORF GFF annotation, if necessary")
+    workflow.cache_annotation(
+        config[params.ORF_GFF_FILE], index_dir,
+        os.path.join(index_dir, workflow_files.ORF_FEATURES_TSV),
+        os.path.join(index_dir, workflow_files.ORF_GENES_TSV),
+        config, os.path.join(logs_dir, "cache_annotation.log"),
+        run_config)
 
     is_sample_files = value_in_dict(params.FQ_FILES, config)
     is_multiplex_files = value_in_dict(params.MULTIPLEX_FQ_FILES, config)
@@ -782,7 +1083,8 @@ def run_workflow(config_file, is_dry_run=False):
             raise Exception("No samples were processed successfully")
 
     log_file = os.path.join(logs_dir, "collate_tpms.log")
-    workflow.collate_tpms(out_dir, processed_samples, log_file, run_config)
+    workflow.collate_tpms(out_dir, processed_samples, config, log_file,
+                          run_config)
 
     if value_in_dict(params.COUNT_READS, config):
         log_file = os.path.join(logs_dir, "count_reads.log")
@@ -790,6 +1092,13 @@ def run_workflow(config_file, is_dry_run=False):
                                         workflow_files.READ_COUNTS_FILE)
         workflow.count_reads(config_file, in_dir, tmp_dir, out_dir,
                              read_counts_file, log_file, run_config)
+
+    if not is_dry_run:
+        usage_summary_file = os.path.join(
+            logs_dir, workflow_files.RESOURCE_USAGE_SUMMARY_TSV)
+        LOGGER.info("Summarise resource usage by workflow step: %s",
+                    usage_summary_file)
+        resource_usage.summarise_usage(usage_file, usage_summary_file)
     LOGGER.info("Completed")
 
 
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""
+Simulate a large FASTQ file of ribosome footprint reads, sampled from
+the coding sequences of transcripts, with UMIs, barcodes, adaptors
+and errors, for load testing and benchmarking.
+
+Usage::
+
+    python -m riboviz.tools.simulate_fastq [-h]
+        -f FASTA_FILE -g GFF_FILE -n NUM_READS -o OUTPUT_FILE
+        [-x EXTRACTED_FILE] [-s SAMPLE_SHEET_FILE]
+        [-r NUM_READS_FILE] [--num-samples NUM_SAMPLES]
+        [--barcode-length BARCODE_LENGTH]
+        [--umi5-length UMI5_LENGTH] [--umi3-length UMI3_LENGTH]
+        [-a ADAPTOR] [--post-adaptor-length POST_ADAPTOR_LENGTH]
+        [-e ERROR_RATE] [-l READ_LENGTHS] [--frame-weights
+        FRAME_WEIGHTS] [--seed SEED]
+        [--num-processes NUM_PROCESSES] [--chunk-size CHUNK_SIZE]
+
+    -h, --help            show this help message and exit
+    -f FASTA_FILE, --fasta FASTA_FILE
+                          FASTA file
+    -g GFF_FILE, --gff GFF_FILE
+                          GFF file, with CDS features
+    -n NUM_READS, --num-reads NUM_READS
+                          Number of reads
+    -o OUTPUT_FILE, --output OUTPUT_FILE
+                          FASTQ file (.fastq, .fq, .fastq.gz or
+                          .fq.gz)
+    -x EXTRACTED_FILE, --extracted-output EXTRACTED_FILE
+                          FASTQ file for reads with adaptor trimmed
+                          and barcode and UMIs extracted into headers
+    -s SAMPLE_SHEET_FILE, --sample-sheet SAMPLE_SHEET_FILE
+                          Sample sheet file, if NUM_SAMPLES > 1
+    -r NUM_READS_FILE, --num-reads-file NUM_READS_FILE
+                          Number of reads simulated per sample file
+    --num-samples NUM_SAMPLES
+                          Number of samples (default 1)
+    --barcode-length BARCODE_LENGTH
+                          Barcode length, if NUM_SAMPLES > 1 (default
+                          6)
+    --umi5-length UMI5_LENGTH
+                          5' UMI length (default 4)
+    --umi3-length UMI3_LENGTH
+                          3' UMI length (default 4)
+    -a ADAPTOR, --adaptor ADAPTOR
+                          Adaptor (default CTGTAGGCACC)
+    --post-adaptor-length POST_ADAPTOR_LENGTH
+                          Number of random nts after adaptor (default
+                          0)
+    -e ERROR_RATE, --error-rate ERROR_RATE
+                          Per-nt substitution error rate (default
+                          0.001)
+    -l READ_LENGTHS, --read-lengths READ_LENGTHS
+                          Read length weights, as comma-separated
+                          LENGTH:WEIGHT pairs (default
+                          26:1,27:2,28:6,29:5,30:3,31:2,32:1)
+    --frame-weights FRAME_WEIGHTS
+                          Frame 0, 1 and 2 weights, as comma-separated
+                          values (default 0.7,0.15,0.15)
+    --seed SEED           Random number generator seed
+    --num-processes NUM_PROCESSES
+                          Number of processes (default 1)
+    --chunk-size CHUNK_SIZE
+                          Number of reads simulated by each process at
+                          a time (default 100000)
+
+Example, simulating 10 million reads for 8 multiplexed samples::
+
+    python -m riboviz.tools.simulate_fastq
+        -f vignette/input/yeast_YAL_CDS_w_250utrs.fa
+        -g vignette/input/yeast_YAL_CDS_w_250utrs.gff3
+        -n 10000000 --num-samples 8 --seed 42 --num-processes 4
+        -o tmp/sim_umi_barcode_adaptor.fastq.gz
+        -x tmp/sim_multiplex.fastq.gz
+        -s tmp/sim_barcodes.tsv -r tmp/sim_num_reads.tsv
+
+See :py:mod:`riboviz.simulate_fastq` for information on how reads
+are simulated.
+"""
+import argparse
+from riboviz import provenance
+from riboviz import simulate_fastq
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Simulate a large FASTQ file of ribosome footprint reads, sampled from the coding sequences of transcripts, with UMIs, barcodes, adaptors and errors, for load testing and benchmarking")
+    parser.add_argument("-f",
+                        "--fasta",
+                        dest="fasta_file",
+                        required=True,
+                        help="FASTA file")
+    parser.add_argument("-g",
+                        "--gff",
+                        dest="gff_file",
+                        required=True,
+                        help="GFF file, with CDS features")
+    parser.add_argument("-n",
+                        "--num-reads",
+                        dest="num_reads",
+                        type=int,
+                        required=True,
+                        help="Number of reads")
+    parser.add_argument("-o",
+                        "--output",
+                        dest="output_file",
+                        required=True,
+                        help="FASTQ file (.fastq, .fq, .fastq.gz or .fq.gz)")
+    parser.add_argument("-x",
+                        "--extracted-output",
+                        dest="extracted_file",
+                        help="FASTQ file for reads with adaptor trimmed and barcode and UMIs extracted into headers")
+    parser.add_argument("-s",
+                        "--sample-sheet",
+                        dest="sample_sheet_file",
+                        help="Sample sheet file, if NUM_SAMPLES > 1")
+    parser.add_argument("-r",
+                        "--num-reads-file",
+                        dest="num_reads_file",
+                        help="Number of reads simulated per sample file")
+    parser.add_argument("--num-samples",
+                        dest="num_samples",
+                        type=int,
+                        default=1,
+                        help="Number of samples (default 1)")
+    parser.add_argument("--barcode-length",
+                        dest="barcode_length",
+                        type=int,
+                        default=simulate_fastq.DEFAULT_BARCODE_LENGTH,
+                        help="Barcode length, if NUM_SAMPLES > 1 (default {})".format(
+                            simulate_fastq.DEFAULT_BARCODE_LENGTH))
+    parser.add_argument("--umi5-length",
+                        dest="umi5_length",
+                        type=int,
+                        default=simulate_fastq.DEFAULT_UMI5_LENGTH,
+                        help="5' UMI length (default {})".format(
+                            simulate_fastq.DEFAULT_UMI5_LENGTH))
+    parser.add_argument("--umi3-length",
+                        dest="umi3_length",
+                        type=int,
+                        default=simulate_fastq.DEFAULT_UMI3_LENGTH,
+                        help="3' UMI length (default {})".format(
+                            simulate_fastq.DEFAULT_UMI3_LENGTH))
+    parser.add_argument("-a",
+                        "--adaptor",
+                        dest="adaptor",
+                        default=simulate_fastq.DEFAULT_ADAPTOR,
+                        help="Adaptor (default {})".format(
+                            simulate_fastq.DEFAULT_ADAPTOR))
+    parser.add_argument("--post-adaptor-length",
+                        dest="post_adaptor_length",
+                        type=int,
+                        default=0,
+                        help="Number of random nts after adaptor (default 0)")
+    parser.add_argument("-e",
+                        "--error-rate",
+                        dest="error_rate",
+                        type=float,
+                        default=simulate_fastq.DEFAULT_ERROR_RATE,
+                        help="Per-nt substitution error rate (default {})".format(
+                            simulate_fastq.DEFAULT_ERROR_RATE))
+    parser.add_argument("-l",
+                        "--read-lengths",
+                        dest="read_lengths",
+                        help="Read length weights, as comma-separated LENGTH:WEIGHT pairs (default {})".format(
+                            ",".join("{}:{}".format(length, weight)
+                                     for length, weight in
+                                     simulate_fastq.DEFAULT_READ_LENGTHS.items())))
+    parser.add_argument("--frame-weights",
+                        dest="frame_weights",
+                        help="Frame 0, 1 and 2 weights, as comma-separated values (default {})".format(
+                            ",".join(str(weight) for weight in
+                                     simulate_fastq.DEFAULT_FRAME_WEIGHTS)))
+    parser.add_argument("--seed",
+                        dest="seed",
+                        type=int,
+                        help="Random number generator seed")
+    parser.add_argument("--num-processes",
+                        dest="num_processes",
+                        type=int,
+                        default=1,
+                        help="Number of processes (default 1)")
+    parser.add_argument("--chunk-size",
+                        dest="chunk_size",
+                        type=int,
+                        default=simulate_fastq.CHUNK_SIZE,
+                        help="Number of reads simulated by each process at a time (default {})".format(
+                            simulate_fastq.CHUNK_SIZE))
+    options = parser.parse_args()
+    try:
+        if options.read_lengths is not None:
+            options.read_lengths = {
+                int(length): float(weight)
+                for length, weight in
+                (pair.split(":") for pair in options.read_lengths.split(","))}
+        if options.frame_weights is not None:
+            options.frame_weights = [
+                float(weight) for weight in options.frame_weights.split(",")]
+    except ValueError:
+        parser.error("invalid --read-lengths or --frame-weights")
+    return options
+
+
+def invoke_simulate_fastq():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.simulate_fastq.simulate_fastq`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    num_reads = simulate_fastq.simulate_fastq(
+        options.fasta_file,
+        options.gff_file,
+        options.num_reads,
+        options.output_file,
+        options.extracted_file,
+        options.sample_sheet_file,
+        options.num_reads_file,
+        options.num_samples,
+        options.barcode_length,
+        options.umi5_length,
+        options.umi3_length,
+        options.adaptor,
+        options.post_adaptor_length,
+        options.error_rate,
+        options.read_lengths,
+        options.frame_weights,
+        options.seed,
+        options.num_processes,
+        options.chunk_size)
+    print(num_reads.to_string(index=False))
+
+
+if __name__ == "__main__":
+    invoke_simulate_fastq()
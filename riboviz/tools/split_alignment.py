@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Split SAM records output by a batched ``hisat2 --reorder`` invocation
+over several sample FASTQ files into sample-specific SAM files and
+sample-specific FASTQ files of unaligned reads.
+
+Usage::
+
+    python -m riboviz.tools.split_alignment [-h]
+        -i FASTQ_FILE [FASTQ_FILE ...]
+        -o SAM_FILE [SAM_FILE ...]
+        -u UNALIGNED_FILE [UNALIGNED_FILE ...]
+        [-s SAM_FILE_IN] [--no-unal]
+
+    -h, --help            show this help message and exit
+    -i FASTQ_FILE [FASTQ_FILE ...], --input FASTQ_FILE [FASTQ_FILE ...]
+                          Sample FASTQ files, in the order given to
+                          hisat2
+    -o SAM_FILE [SAM_FILE ...], --output SAM_FILE [SAM_FILE ...]
+                          Sample SAM files output, one per FASTQ file
+    -u UNALIGNED_FILE [UNALIGNED_FILE ...],
+    --unaligned UNALIGNED_FILE [UNALIGNED_FILE ...]
+                          Sample unaligned FASTQ files output, one per
+                          FASTQ file
+    -s SAM_FILE_IN, --sam SAM_FILE_IN
+                          SAM file input (default "-", standard input)
+    --no-unal             Omit unaligned records from sample SAM files
+
+See :py:func:`riboviz.batch_align.split_alignment_file`.
+"""
+import argparse
+from riboviz import batch_align
+from riboviz import provenance
+
+
+def parse_command_line_options():
+    """
+    Parse command-line options.
+
+    :returns: command-line options
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description="Split SAM records output by a batched hisat2 --reorder invocation over several sample FASTQ files into sample-specific SAM files and sample-specific FASTQ files of unaligned reads")
+    parser.add_argument("-i",
+                        "--input",
+                        dest="fastq_files",
+                        required=True,
+                        nargs="+",
+                        help="Sample FASTQ files, in the order given to hisat2")
+    parser.add_argument("-o",
+                        "--output",
+                        dest="sam_files",
+                        required=True,
+                        nargs="+",
+                        help="Sample SAM files output, one per FASTQ file")
+    parser.add_argument("-u",
+                        "--unaligned",
+                        dest="unaligned_files",
+                        required=True,
+                        nargs="+",
+                        help="Sample unaligned FASTQ files output, one per FASTQ file")
+    parser.add_argument("-s",
+                        "--sam",
+                        dest="sam_file_in",
+                        default="-",
+                        help="SAM file input (default \"-\", standard input)")
+    parser.add_argument("--no-unal",
+                        dest="is_no_unal",
+                        action="store_true",
+                        help="Omit unaligned records from sample SAM files")
+    options = parser.parse_args()
+    return options
+
+
+def invoke_split_alignment():
+    """
+    Parse command-line options then invoke
+    :py:func:`riboviz.batch_align.split_alignment_file`.
+    """
+    options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
+    batch_align.split_alignment_file(options.fastq_files,
+                                     options.sam_file_in,
+                                     options.sam_files,
+                                     options.unaligned_files,
+                                     options.is_no_unal)
+
+
+if __name__ == "__main__":
+    invoke_split_alignment()
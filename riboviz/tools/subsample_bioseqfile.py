@@ -2,23 +2,49 @@
 """
 Subsample an input FASTQ (or other sequencing) file, to produce a
 smaller file whose reads are randomly sampled from of the input with a
-fixed probability.
+fixed probability, or a fixed number of reads sampled uniformly at
+random. Paired-end files can be subsampled together.
+
+If ``--output-dir`` is provided then many input files, or glob
+patterns, can be given and these are subsampled in parallel, each
+with a seed derived from the ``--seed`` and the file name, and a
+manifest of the numbers of records input and output is written.
 
 Usage::
 
     python -m riboviz.tools.subsample_bioseqfile [-h]
-        -i INPUT_FILE -o OUTPUT_FILE
-        [-t FILE_TYPE] [-p PROB] [-v]
+        -i INPUT_FILE [INPUT_FILE ...]
+        [-o OUTPUT_FILE] [-d OUTPUT_DIR] [-m MANIFEST_FILE]
+        [-t FILE_TYPE] [-p PROB] [-n NUM_RECORDS] [-s SEED]
+        [--input2 INPUT_FILE2] [--output2 OUTPUT_FILE2]
+        [--num-processes NUM_PROCESSES] [-v]
 
     -h, --help            show this help message and exit
-    -i INPUT_FILE, --input INPUT_FILE
-                          SeqIO file input
+    -i INPUT_FILE [INPUT_FILE ...], --input INPUT_FILE [INPUT_FILE ...]
+                          SeqIO file input, or, if --output-dir is
+                          provided, SeqIO file inputs or glob patterns
     -o OUTPUT_FILE, --output OUTPUT_FILE
                           SeqIO file output
+    -d OUTPUT_DIR, --output-dir OUTPUT_DIR
+                          Output directory, to subsample many input
+                          files
+    -m MANIFEST_FILE, --manifest MANIFEST_FILE
+                          Manifest file, if --output-dir is provided
+                          (default OUTPUT_DIR/subsample_manifest.tsv)
     -t FILE_TYPE, --type FILE_TYPE
                           SeqIO file type (default 'fastq')
     -p PROB, --probability PROB
                           proportion to sample (default 0.01)
+    -n NUM_RECORDS, --number NUM_RECORDS
+                          number of records to sample, instead of
+                          sampling with a fixed probability
+    -s SEED, --seed SEED  random number generator seed
+    --input2 INPUT_FILE2  SeqIO file input, paired-end reads
+    --output2 OUTPUT_FILE2
+                          SeqIO file output, paired-end reads
+    --num-processes NUM_PROCESSES
+                          Number of processes, if --output-dir is
+                          provided (default 1)
     -v, --verbose         print progress statements
 
 Examples::
@@ -36,7 +62,20 @@ Examples::
         -o vignette/tmp/SRR1042855_s10.fastq.gz
         -t fastq
 
-See :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`.
+    python -m riboviz.tools.subsample_bioseqfile
+        -i sample_R1.fastq.gz --input2 sample_R2.fastq.gz
+        -n 100000 -s 42
+        -o sample_R1_s.fastq.gz --output2 sample_R2_s.fastq.gz
+        -t fastq
+
+    python -m riboviz.tools.subsample_bioseqfile
+        -i "data/simdata/*.fastq"
+        -p 0.1 -s 42
+        -d tmp/simdata_s
+        --num-processes 4
+
+See :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile` and
+:py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfiles`.
 """
 import argparse
 from riboviz import provenance
@@ -51,17 +90,26 @@ def parse_command_line_options():
     :rtype: argparse.Namespace
     """
     parser = argparse.ArgumentParser(
-        description="Subsample an input FASTQ (or other sequencing) file, to produce a smaller file whose reads are randomly sampled from of the input with a fixed probability")
+        description="Subsample an input FASTQ (or other sequencing) file, to produce a smaller file whose reads are randomly sampled from of the input with a fixed probability, or a fixed number of reads sampled uniformly at random")
     parser.add_argument("-i",
                         "--input",
-                        dest="input_file",
+                        dest="input_files",
+                        nargs="+",
                         required=True,
-                        help="SeqIO file input")
+                        help="SeqIO file input, or, if --output-dir is provided, SeqIO file inputs or glob patterns")
     parser.add_argument("-o",
                         "--output",
                         dest="output_file",
-                        required=True,
                         help="SeqIO file output")
+    parser.add_argument("-d",
+                        "--output-dir",
+                        dest="output_dir",
+                        help="Output directory, to subsample many input files")
+    parser.add_argument("-m",
+                        "--manifest",
+                        dest="manifest_file",
+                        help="Manifest file, if --output-dir is provided (default OUTPUT_DIR/{})".format(
+                            subsample_bioseqfile.MANIFEST_FILE))
     parser.add_argument("-t",
                         "--type",
                         dest="file_type",
@@ -73,23 +121,66 @@ def parse_command_line_options():
                         type=float,
                         default=0.01,
                         help="proportion to sample (default 0.01)")
+    parser.add_argument("-n",
+                        "--number",
+                        dest="num_records",
+                        type=int,
+                        help="number of records to sample, instead of sampling with a fixed probability")
+    parser.add_argument("-s",
+                        "--seed",
+                        dest="seed",
+                        type=int,
+                        help="random number generator seed")
+    parser.add_argument("--input2",
+                        dest="input_file2",
+                        help="SeqIO file input, paired-end reads")
+    parser.add_argument("--output2",
+                        dest="output_file2",
+                        help="SeqIO file output, paired-end reads")
+    parser.add_argument("--num-processes",
+                        dest="num_processes",
+                        default=1,
+                        type=int,
+                        help="Number of processes, if --output-dir is provided (default 1)")
     parser.add_argument("-v",
                         "--verbose",
                         dest="verbose",
                         action="store_true",
                         help="print progress statements")
     options = parser.parse_args()
+    if options.output_dir is None:
+        if options.output_file is None or len(options.input_files) > 1:
+            parser.error("one input file and --output, or --output-dir, are required")
+    elif options.output_file is not None or \
+            options.input_file2 is not None or \
+            options.output_file2 is not None:
+        parser.error("--output-dir cannot be used with --output, --input2 or --output2")
     return options
 
 
 def invoke_subsample_bioseqfile():
     """
     Parse command-line options then invoke
-    :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile`.
+    :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfile` or,
+    if an output directory is provided,
+    :py:func:`riboviz.subsample_bioseqfile.subsample_bioseqfiles`.
     """
-    print(provenance.write_provenance_to_str(__file__))
     options = parse_command_line_options()
-    input_file = options.input_file
+    print(provenance.write_provenance_to_str(__file__))
+    if options.output_dir is not None:
+        manifest = subsample_bioseqfile.subsample_bioseqfiles(
+            options.input_files,
+            options.prob,
+            options.output_dir,
+            options.file_type,
+            options.num_records,
+            options.seed,
+            options.num_processes,
+            options.manifest_file)
+        if options.verbose:
+            print(manifest.to_string(index=False))
+        return
+    input_file = options.input_files[0]
     output_file = options.output_file
     file_type = options.file_type
     prob = options.prob
@@ -98,7 +189,11 @@ def invoke_subsample_bioseqfile():
                                               prob,
                                               output_file,
                                               file_type,
-                                              verbose)
+                                              verbose,
+                                              options.num_records,
+                                              options.seed,
+                                              options.input_file2,
+                                              options.output_file2)
 
 
 if __name__ == "__main__":
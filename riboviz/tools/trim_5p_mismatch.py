@@ -84,8 +84,8 @@ def invoke_trim_5p_mismatch():
     Parse command-line options then invoke
     :py:func:`riboviz.trim_5p_mismatch.trim_5p_mismatch_file`.
     """
-    print(provenance.write_provenance_to_str(__file__))
     options = parse_command_line_options()
+    print(provenance.write_provenance_to_str(__file__))
     sam_file_in = options.sam_file_in
     sam_file_out = options.sam_file_out
     fivep_remove = options.fivep_remove
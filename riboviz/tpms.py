@@ -0,0 +1,339 @@
+"""
+Transcripts per million (TPM) constants and functions.
+
+:py:func:`calculate_tpms` provides a native alternative to
+``CalculateGeneTranscriptsPerMillion`` in
+``stats_figs_block_functions.R``. Rather than opening the H5 file
+once per gene per attribute, it reads the ``reads_total``,
+``start_codon_pos`` and ``stop_codon_pos`` attributes of all genes in
+one pass, via :py:class:`riboviz.ribogrid_reader.RibogridReader`
+(which, for a columnar ribogrid store, reads one column per
+attribute), then computes the TPMs with NumPy. The values are the
+same as those calculated by ``generate_stats_figs.R``, namely:
+
+* ``readcount``: ``reads_total``.
+* ``rpb``: reads per base, ``reads_total / (stop_codon_pos -
+  start_codon_pos + TPM_LENGTH_BUFFER)``, using the first of the
+  start and stop codon positions.
+* ``tpm``: ``rpb * 1e6 / sum(rpb)``.
+
+As ``generate_stats_figs.R`` lists genes using ``rhdf5::h5ls``, the
+TPMs of all names at the root of the H5 file, in name order,
+including secondary gene IDs, are calculated by default.
+
+:py:func:`collate_tpms` provides a native alternative to
+``collate_tpms.R``. It streams the ``tpm`` column of each sample's
+``tpms.tsv`` file into a preallocated matrix, with one ``float32``
+row per ORF and one column per sample, using an index of the ORFs to
+place each value. TPMs are rounded to :py:const:`COLLATED_DECIMALS`
+decimal places, as in ``TPMs_collated.tsv``. The collated TPMs can be
+saved as a NumPy ``.npz`` file, alongside the TSV file, and samples
+can be added to previously collated TPMs, loaded from either file,
+without reloading the samples already collated.
+"""
+import collections
+import os
+import warnings
+from riboviz import provenance
+from riboviz import ribogrid
+from riboviz import ribogrid_reader
+from riboviz import workflow_r
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+SeqIO = lazy_import("Bio.SeqIO")
+
+ORF = "ORF"
+""" ``tpms.tsv`` column name. """
+READCOUNT = "readcount"
+""" ``tpms.tsv`` column name. """
+RPB = "rpb"
+""" ``tpms.tsv`` column name. """
+TPM = "tpm"
+""" ``tpms.tsv`` column name. """
+HEADER = [ORF, READCOUNT, RPB, TPM]
+""" ``tpms.tsv`` column names. """
+TPM_LENGTH_BUFFER = 50
+"""
+Number of positions added to gene lengths when calculating reads per
+base, as in ``GetGeneReadDensity`` in ``read_count_functions.R``.
+"""
+FLOAT_FORMAT = "%.15g"
+"""
+Format of floating point values, matching the precision of R's
+``write.table``.
+"""
+COLLATED_DECIMALS = 1
+""" Number of decimal places of collated TPMs. """
+COLLATED_FLOAT_FORMAT = "%.{}f".format(COLLATED_DECIMALS)
+""" Format of collated TPMs. """
+MISSING_VALUE = "NA"
+""" Value of a missing collated TPM. """
+NPZ_ORFS = "orfs"
+""" ``.npz`` file array name. """
+NPZ_SAMPLES = "samples"
+""" ``.npz`` file array name. """
+NPZ_TPMS = "tpms"
+""" ``.npz`` file array name. """
+
+CollatedTpmsTuple = collections.namedtuple(
+    "CollatedTpmsTuple", ["orfs", "samples", "tpms"])
+"""
+Collated TPMs:
+
+* ``orfs``: ORFs (``list(str or unicode)``).
+* ``samples``: Samples (``list(str or unicode)``).
+* ``tpms``: TPMs, one row per ORF and one column per sample, ``NaN``
+  if a sample has no TPM for an ORF (``numpy.ndarray``, ``float32``).
+"""
+
+
+def calculate_tpms(h5_file, dataset="data", genes=None):
+    """
+    Calculate the TPMs of genes in an H5 file. See module
+    documentation.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    :param genes: Primary or secondary gene IDs, or ``None`` for all \
+    names at the root of the H5 file
+    :type genes: list(str or unicode)
+    :return: TPMs, with columns :py:const:`HEADER`
+    :rtype: pandas.core.frame.DataFrame
+    :raise KeyError: if any gene is not in the file
+    """
+    with ribogrid_reader.RibogridReader(h5_file, dataset) as reader:
+        if genes is None:
+            genes = sorted(reader.gene_index)
+        columns = reader.get_attribute_columns(
+            [ribogrid.READS_TOTAL, ribogrid.START_CODON_POS,
+             ribogrid.STOP_CODON_POS], genes)
+    reads_total = columns[ribogrid.READS_TOTAL][:, 0]
+    start_codon_pos = columns[ribogrid.START_CODON_POS][:, 0]
+    stop_codon_pos = columns[ribogrid.STOP_CODON_POS][:, 0]
+    lengths = stop_codon_pos.astype(np.int64) - start_codon_pos
+    rpb = reads_total / (lengths + TPM_LENGTH_BUFFER)
+    tpm = rpb * 1e6 / rpb.sum()
+    return pd.DataFrame({ORF: genes,
+                         READCOUNT: reads_total.astype(np.int64),
+                         RPB: rpb,
+                         TPM: tpm},
+                        columns=HEADER)
+
+
+def write_tpms(tpms, tpms_file):
+    """
+    Write TPMs, as returned by :py:func:`calculate_tpms`, to a
+    tab-separated values file, with a provenance header.
+
+    :param tpms: TPMs
+    :type tpms: pandas.core.frame.DataFrame
+    :param tpms_file: TSV file
+    :type tpms_file: str or unicode
+    """
+    provenance.write_provenance_header(__file__, tpms_file)
+    tpms[HEADER].to_csv(tpms_file, mode='a', sep="\t", index=False,
+                        float_format=FLOAT_FORMAT)
+
+
+def h5_to_tpms(h5_file, tpms_file, dataset="data"):
+    """
+    Calculate the TPMs of all genes in an H5 file and write them to
+    a tab-separated values file.
+
+    :param h5_file: H5 file
+    :type h5_file: str or unicode
+    :param tpms_file: TSV file
+    :type tpms_file: str or unicode
+    :param dataset: Dataset name, for the per-gene layout
+    :type dataset: str or unicode
+    """
+    write_tpms(calculate_tpms(h5_file, dataset), tpms_file)
+
+
+def get_tpms_file_name(output_dir, sample, sample_subdirs,
+                       tpms_file=workflow_r.TPMS_TSV):
+    """
+    Get the name of a sample's TPMs file, as ``collate_tpms.R``
+    does.
+
+    :param output_dir: Output directory
+    :type output_dir: str or unicode
+    :param sample: Sample name
+    :type sample: str or unicode
+    :param sample_subdirs: Are samples in sample-specific \
+    subdirectories of ``output_dir``?
+    :type sample_subdirs: bool
+    :param tpms_file: TPMs file name
+    :type tpms_file: str or unicode
+    :return: File name
+    :rtype: str or unicode
+    """
+    if sample_subdirs:
+        return os.path.join(output_dir, sample, tpms_file)
+    return os.path.join(output_dir, sample + "_" + tpms_file)
+
+
+def load_tpms(tpms_file):
+    """
+    Load the ORFs and TPMs from a TPMs file, as output by
+    :py:func:`write_tpms` or ``generate_stats_figs.R``.
+
+    :param tpms_file: TSV file
+    :type tpms_file: str or unicode
+    :return: ORFs and TPMs
+    :rtype: tuple(numpy.ndarray, numpy.ndarray)
+    """
+    data = pd.read_csv(tpms_file, sep="\t", comment="#",
+                       usecols=[ORF, TPM], dtype={ORF: str})
+    return data[ORF].to_numpy(), data[TPM].to_numpy(dtype=np.float64)
+
+
+def load_fasta_names(fasta_file):
+    """
+    Load the names of the sequences in a FASTA file, as
+    ``Biostrings::readDNAStringSet`` names them.
+
+    :param fasta_file: FASTA file
+    :type fasta_file: str or unicode
+    :return: Names
+    :rtype: list(str or unicode)
+    """
+    return [record.description
+            for record in SeqIO.parse(fasta_file, "fasta")]
+
+
+def collate_tpms(output_dir, samples, sample_subdirs=False, orfs=None,
+                 collated=None, tpms_file=workflow_r.TPMS_TSV):
+    """
+    Collate the TPMs of samples. See module documentation.
+
+    The ORFs used are, in order of precedence, ``orfs``, those of
+    ``collated`` or those in the first sample's TPMs file. A warning
+    is raised if a sample's TPMs file does not exist, in which case
+    the sample is omitted, or if its ORFs differ from those used, in
+    which case TPMs of ORFs not used are omitted. If a sample is in
+    ``collated`` then its TPMs are replaced.
+
+    :param output_dir: Output directory
+    :type output_dir: str or unicode
+    :param samples: Sample names
+    :type samples: list(str or unicode)
+    :param sample_subdirs: Are samples in sample-specific \
+    subdirectories of ``output_dir``?
+    :type sample_subdirs: bool
+    :param orfs: ORFs or ``None``
+    :type orfs: list(str or unicode)
+    :param collated: Previously collated TPMs or ``None``
+    :type collated: CollatedTpmsTuple
+    :param tpms_file: TPMs file name
+    :type tpms_file: str or unicode
+    :return: Collated TPMs
+    :rtype: CollatedTpmsTuple
+    :raise AssertionError: if no ORFs can be determined
+    """
+    tpms_files = [get_tpms_file_name(output_dir, sample, sample_subdirs,
+                                     tpms_file)
+                  for sample in samples]
+    if orfs is None and collated is not None:
+        orfs = collated.orfs
+    if orfs is None:
+        existing = [file_name for file_name in tpms_files
+                    if os.path.exists(file_name)]
+        assert existing, "No TPMs files found in {}".format(output_dir)
+        orfs, _ = load_tpms(existing[0])
+    orfs = list(orfs)
+    orf_index = pd.Index(orfs)
+    old_samples = [] if collated is None else \
+        [sample for sample in collated.samples if sample not in samples]
+    all_samples = old_samples + list(samples)
+    all_tpms = np.full((len(orfs), len(all_samples)), np.nan,
+                       dtype=np.float32)
+    columns = list(range(len(old_samples)))
+    if old_samples:
+        rows = orf_index.get_indexer(collated.orfs)
+        is_used = rows >= 0
+        old_columns = [list(collated.samples).index(sample)
+                       for sample in old_samples]
+        all_tpms[rows[is_used], :len(old_samples)] = \
+            collated.tpms[is_used][:, old_columns]
+    for column, file_name in enumerate(tpms_files, len(old_samples)):
+        if not os.path.exists(file_name):
+            warnings.warn("{} does not exist, omitting sample".format(
+                file_name))
+            continue
+        sample_orfs, sample_tpms = load_tpms(file_name)
+        rows = orf_index.get_indexer(sample_orfs)
+        if len(rows) != len(orfs) or \
+                not np.array_equal(rows, np.arange(len(orfs))):
+            warnings.warn("ORF names are not right in {}".format(
+                file_name))
+        is_used = rows >= 0
+        all_tpms[rows[is_used], column] = np.round(
+            sample_tpms[is_used], COLLATED_DECIMALS)
+        columns.append(column)
+    if len(columns) < len(all_samples):
+        all_tpms = all_tpms[:, columns]
+    return CollatedTpmsTuple(orfs,
+                             [all_samples[column] for column in columns],
+                             all_tpms)
+
+
+def write_collated_tpms(collated, tsv_file):
+    """
+    Write collated TPMs to a tab-separated values file, with a
+    provenance header, in the format output by ``collate_tpms.R``.
+
+    :param collated: Collated TPMs
+    :type collated: CollatedTpmsTuple
+    :param tsv_file: TSV file
+    :type tsv_file: str or unicode
+    """
+    data = pd.DataFrame(collated.tpms, columns=collated.samples)
+    data.insert(0, ORF, collated.orfs)
+    provenance.write_provenance_header(__file__, tsv_file)
+    data.to_csv(tsv_file, mode='a', sep="\t", index=False,
+                float_format=COLLATED_FLOAT_FORMAT,
+                na_rep=MISSING_VALUE)
+
+
+def save_collated_tpms_npz(collated, npz_file):
+    """
+    Save collated TPMs to a NumPy ``.npz`` file.
+
+    :param collated: Collated TPMs
+    :type collated: CollatedTpmsTuple
+    :param npz_file: ``.npz`` file
+    :type npz_file: str or unicode
+    """
+    np.savez_compressed(npz_file,
+                        **{NPZ_ORFS: np.array(collated.orfs, dtype=str),
+                           NPZ_SAMPLES: np.array(collated.samples,
+                                                 dtype=str),
+                           NPZ_TPMS: collated.tpms})
+
+
+def load_collated_tpms(collated_file):
+    """
+    Load collated TPMs from a NumPy ``.npz`` file, as saved by
+    :py:func:`save_collated_tpms_npz`, or a TSV file, as written by
+    :py:func:`write_collated_tpms` or ``collate_tpms.R``.
+
+    :param collated_file: ``.npz`` or TSV file
+    :type collated_file: str or unicode
+    :return: Collated TPMs
+    :rtype: CollatedTpmsTuple
+    """
+    if collated_file.endswith(".npz"):
+        with np.load(collated_file) as data:
+            return CollatedTpmsTuple(data[NPZ_ORFS].tolist(),
+                                     data[NPZ_SAMPLES].tolist(),
+                                     data[NPZ_TPMS])
+    data = pd.read_csv(collated_file, sep="\t", comment="#",
+                       dtype={ORF: str}, na_values=[MISSING_VALUE])
+    samples = [column for column in data.columns if column != ORF]
+    return CollatedTpmsTuple(list(data[ORF]),
+                             samples,
+                             data[samples].to_numpy(dtype=np.float32))
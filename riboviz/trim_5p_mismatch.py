@@ -2,9 +2,10 @@
 Trim 5' reads constants and functions.
 """
 import re
-import pysam
-import pandas as pd
 from riboviz import provenance
+from riboviz.lazy_import import lazy_import
+pysam = lazy_import("pysam")
+pd = lazy_import("pandas")
 
 
 NUM_PROCESSED = "num_processed"
@@ -208,7 +209,8 @@ def trim_5p_mismatch_file(sam_file_in,
                                sam_file_out,
                                fivep_remove,
                                max_mismatches)
-    provenance.write_provenance_header(__file__, summary_file)
     summary_df = pd.DataFrame.from_dict([summary])
-    summary_df[list(summary_df.columns)].to_csv(
-        summary_file, mode='a', sep="\t", index=False)
+    with open(summary_file, 'w') as f:
+        f.write(provenance.get_provenance(__file__))
+        summary_df[list(summary_df.columns)].to_csv(
+            f, sep="\t", index=False)
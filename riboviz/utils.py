@@ -1,10 +1,16 @@
 """
 Useful functions.
 """
+import argparse
+import hashlib
 import os
 import os.path
-import numpy as np
-import pandas as pd
+from riboviz.lazy_import import lazy_import
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+BUFFER_SIZE = 1024 * 1024
+""" Number of bytes to read at a time when hashing a file. """
 
 
 def value_in_dict(key, dictionary, allow_false_empty=False):
@@ -56,6 +62,25 @@ def value_in_dict(key, dictionary, allow_false_empty=False):
     return is_in
 
 
+def parse_bool(value):
+    """
+    Parse an R-style ``TRUE``/``FALSE`` value, as used by
+    ``bam_to_h5.R`` and ``collate_tpms.R``.
+
+    :param value: Value
+    :type value: str or unicode
+    :return: Value
+    :rtype: bool
+    :raise argparse.ArgumentTypeError: if ``value`` is not a boolean
+    """
+    if value.upper() in ["TRUE", "T"]:
+        return True
+    if value.upper() in ["FALSE", "F"]:
+        return False
+    raise argparse.ArgumentTypeError(
+        "Expected TRUE or FALSE, found: " + value)
+
+
 def list_to_str(lst):
     """
     Convert list to space-delimited string.
@@ -68,6 +93,23 @@ def list_to_str(lst):
     return ' '.join(map(str, lst))
 
 
+def get_file_digest(file_name):
+    """
+    Get SHA-256 digest of the content of a file.
+
+    :param file_name: File name
+    :type file_name: str or unicode
+    :return: Digest, as a hexadecimal string
+    :rtype: str or unicode
+    :raise FileNotFoundError: if ``file_name`` cannot be found
+    """
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for block in iter(lambda: f.read(BUFFER_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 def get_file_ext(file_name):
     """
     Given a file name return full file extension, everything after the
@@ -13,6 +13,10 @@ Each function takes in the following arguments:
   which provides each function with common configuration, notably:
     - The command file in which the commands sent to the operating
       system are to be written.
+    - The resource usage file in which the elapsed time, CPU time,
+      memory and I/O of each command sent to the operating system is
+      to be recorded, together with the name of the function (the
+      workflow step) that ran it.
     - Whether the invocation is part of a dry run? If so the commands
       are recorded in the command file but are not submitted to the
       operating system.
@@ -22,6 +26,8 @@ Each function takes in the following arguments:
 
 Each function applies a single step in the workflow:
 
+* :py:func:`workflow_step` runs the function within a log context \
+  whose step is the name of the function.
 * :py:const:`LOGGER` is used to log information about the step in the
   workflow log file.
 * Lists with each element of the commands (command name and \
@@ -30,11 +36,11 @@ Each function applies a single step in the workflow:
       ``--version`` flag to ensure information about the tool's
       version is logged (e.g. ``hisat2``).
     - Invocations of piped commands e.g. ``samtools view | samtools
-      sort`` require two command lists.
+      sort`` require a list of command lists, one per stage.
 * The command list(s) are then submitted to the operating system \
   using the helper functions in :py:mod:`riboviz.process_utils`:
     - :py:func:`riboviz.process_utils.run_logged_command`.
-    - :py:func:`riboviz.process_utils.run_logged_pipe_command`.
+    - :py:func:`riboviz.process_utils.run_logged_pipeline`.
     - :py:func:`riboviz.process_utils.run_logged_redirect_command`.
 
 :py:func:`create_directory` is a simplified version of the above, used
@@ -42,15 +48,29 @@ to create directories and to record ``mkdir`` commands in the command
 file.
 """
 import collections
+import concurrent.futures
+import contextvars
+import functools
 import logging
 import os
 import os.path
+import shutil
+from riboviz import index_cache
 from riboviz import params
 from riboviz import process_utils
 from riboviz import logging_utils
+from riboviz import stats_blocks
+from riboviz import utils
+from riboviz import workflow_files
 from riboviz import workflow_r
+from riboviz.tools import bam_to_bedgraph as bam_to_bedgraph_tools_module
+from riboviz.tools import bam_to_h5 as bam_to_h5_tools_module
+from riboviz.tools import cache_annotation as cache_annotation_tools_module
+from riboviz.tools import collate_tpms as collate_tpms_tools_module
 from riboviz.tools import count_reads as count_reads_module
 from riboviz.tools import demultiplex_fastq as demultiplex_fastq_tools_module
+from riboviz.tools import pos_sp_nt_freq as pos_sp_nt_freq_tools_module
+from riboviz.tools import split_alignment as split_alignment_tools_module
 from riboviz.tools import trim_5p_mismatch as trim_5p_mismatch_tools_module
 from riboviz.utils import value_in_dict
 
@@ -59,7 +79,9 @@ RunConfigTuple = collections.namedtuple(
     "RunConfigTuple", ["r_scripts",
                        "cmd_file",
                        "is_dry_run",
-                       "nprocesses"])
+                       "nprocesses",
+                       "usage_file"])
+RunConfigTuple.__new__.__defaults__ = (None,)
 """
 Run-related configuration.
 
@@ -68,6 +90,9 @@ Run-related configuration.
 * ``is_dry_run``: Is this a dry run? (if ``True`` workflow commands \
    should not be submitted to the operating system for execution)
 * ``nprocesses``: Number of processes available.
+* ``usage_file``: File into which the resource usage of each command \
+  submitted to the operating system is to be recorded (see \
+  :py:func:`riboviz.process_utils.write_usage`), or ``None``.
 """
 
 logging_utils.configure_logging()
@@ -75,6 +100,26 @@ LOGGER = logging.getLogger(__name__)
 """ Logger. """
 
 
+def workflow_step(function):
+    """
+    Decorate a workflow step function so that it runs within a log
+    context (see :py:func:`riboviz.logging_utils.log_context`) whose
+    step is the name of the function. Log records emitted while the
+    step runs, including those emitted by the commands it runs, then
+    include the step and the time elapsed since the step was entered.
+
+    :param function: Workflow step function
+    :type function: callable
+    :return: Decorated function
+    :rtype: callable
+    """
+    @functools.wraps(function)
+    def run_step(*args, **kwargs):
+        with logging_utils.log_context(step=function.__name__):
+            return function(*args, **kwargs)
+    return run_step
+
+
 def create_directory(directory, cmd_file, is_dry_run=False):
     """
     Add bash command to create ``directory`` to ``cmd_file`` and, if
@@ -94,6 +139,7 @@ def create_directory(directory, cmd_file, is_dry_run=False):
             os.makedirs(directory)
 
 
+@workflow_step
 def build_indices(fasta, index_dir, ht_prefix, log_file, run_config):
     """
     Build indices for alignment using ``hisat2-build``.
@@ -120,14 +166,156 @@ def build_indices(fasta, index_dir, ht_prefix, log_file, run_config):
     cmd = ["hisat2-build", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     index_file_path = os.path.join(index_dir, ht_prefix)
     cmd = ["hisat2-build", fasta, index_file_path]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
+def build_cached_indices(fasta, index_dir, ht_prefix, cache_dir,
+                         log_file, run_config):
+    """
+    Build indices for alignment using ``hisat2-build`` within an index
+    cache, if they are not already cached, and link the index files
+    within ``index_dir`` to those in the cache. See
+    :py:mod:`riboviz.index_cache`.
+
+    ``hisat2-build --version`` is invoked both to log the version of
+    ``hisat2-build``, as for :py:func:`build_indices`, and as the
+    version, parsed from the output written into the log file, forms
+    part of the cache key.
+
+    A lock is held on the cache entry while checking for, and
+    building, the indices so concurrent workflow runs do not build
+    the same indices more than once. The ``hisat2-build`` command is
+    recorded in the command file as building directly into the cache
+    entry directory, though indices are built within a temporary
+    directory then moved into the cache entry directory.
+
+    If this is a dry run then no commands are run and the FASTA file
+    is not read, so the cache key is not calculated. The
+    ``hisat2-build`` command and the links to the index files are
+    recorded in the command file using a placeholder cache entry
+    directory, named after :py:const:`riboviz.index_cache.DRY_RUN_KEY`.
+
+    :param fasta: FASTA file (input)
+    :type fasta: str or unicode
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param ht_prefix: Prefix of HT2 index files (output)
+    :type ht_prefix: str or unicode
+    :param cache_dir: Index cache directory
+    :type cache_dir: str or unicode
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``hisat2-build`` cannot be found
+    :raise AssertionError: if ``hisat2-build`` returns a non-zero \
+    exit code
+    """
+    LOGGER.info("Build indices for alignment (%s) in cache %s. Log: %s",
+                fasta, cache_dir, log_file)
+    log_offset = os.path.getsize(log_file) \
+        if os.path.exists(log_file) else 0
+    cmd = ["hisat2-build", "--version"]
+    process_utils.run_logged_command(cmd, log_file,
+                                     run_config.cmd_file,
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+    if run_config.is_dry_run:
+        entry_dir = index_cache.get_entry_dir(cache_dir,
+                                              index_cache.DRY_RUN_KEY)
+        cmd = ["hisat2-build", fasta,
+               os.path.join(entry_dir, index_cache.INDEX_PREFIX)]
+        process_utils.run_logged_command(cmd, log_file,
+                                         run_config.cmd_file,
+                                         True)
+        links = index_cache.get_links(entry_dir, index_dir, ht_prefix)
+    else:
+        with open(log_file) as f:
+            f.seek(log_offset)
+            version = index_cache.parse_hisat2_build_version(f.read())
+        fasta_digest = utils.get_file_digest(fasta)
+        key = index_cache.get_cache_key(fasta_digest, version)
+        entry_dir = index_cache.get_entry_dir(cache_dir, key)
+        cmd_to_log = ["hisat2-build", fasta,
+                      os.path.join(entry_dir, index_cache.INDEX_PREFIX)]
+        with index_cache.lock_entry(cache_dir, key):
+            if index_cache.is_cached(entry_dir):
+                LOGGER.info("Using cached indices: %s", entry_dir)
+            else:
+                tmp_dir = index_cache.create_entry_tmp_dir(cache_dir, key)
+                try:
+                    cmd = ["hisat2-build", fasta,
+                           os.path.join(tmp_dir, index_cache.INDEX_PREFIX)]
+                    process_utils.run_logged_command(
+                        cmd, log_file,
+                        run_config.cmd_file,
+                        cmd_to_log=cmd_to_log,
+                        usage_file=run_config.usage_file)
+                    index_cache.add_entry(tmp_dir, entry_dir, fasta,
+                                          fasta_digest, version)
+                finally:
+                    if os.path.exists(tmp_dir):
+                        shutil.rmtree(tmp_dir)
+                LOGGER.info("Cached indices: %s", entry_dir)
+            links = index_cache.get_links(entry_dir, index_dir, ht_prefix)
+            index_cache.link_indices(links)
+    if run_config.cmd_file is not None:
+        with open(run_config.cmd_file, "a") as f:
+            for index_file, link in links:
+                f.write("ln -sf %s %s\n" % (index_file, link))
+
+
+@workflow_step
+def cache_annotation(gff, index_dir, features_tsv, genes_tsv, config,
+                     log_file, run_config):
+    """
+    Parse a GFF file into features and genes, cache these in the index
+    directory, unless they are already cached, and write these to
+    tab-separated values files, using
+    :py:mod:`riboviz.tools.cache_annotation`. See
+    :py:mod:`riboviz.annotation`.
+
+    :param gff: GFF file (input)
+    :type gff: str or unicode
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param features_tsv: Features TSV file (output)
+    :type features_tsv: str or unicode
+    :param genes_tsv: Genes TSV file (output)
+    :type genes_tsv: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``python`` cannot be found
+    :raise AssertionError: if ``python`` returns a non-zero exit \
+    code
+    """
+    LOGGER.info("Cache ORF GFF annotation. Log: %s", log_file)
+    cmd = ["python", "-m", cache_annotation_tools_module.__name__,
+           "-g", gff, "-d", index_dir,
+           "--features-tsv", features_tsv, "--genes-tsv", genes_tsv]
+    for flag, parameter in [("--primary-id", params.PRIMARY_ID),
+                            ("--secondary-id", params.SECONDARY_ID)]:
+        if value_in_dict(parameter, config):
+            cmd += [flag, str(config[parameter])]
+    process_utils.run_logged_command(cmd, log_file,
+                                     run_config.cmd_file,
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+
+
+@workflow_step
 def cut_adapters(adapter, original_fq, trimmed_fq,
                  log_file, run_config):
     """
@@ -152,9 +340,11 @@ def cut_adapters(adapter, original_fq, trimmed_fq,
     cmd += ["-j", str(0)]  # Request all available processors
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def extract_barcodes_umis(original_fq, extract_fq, regexp,
                           log_file, run_config):
     """
@@ -208,9 +398,11 @@ def extract_barcodes_umis(original_fq, extract_fq, regexp,
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
                                      run_config.is_dry_run,
-                                     cmd_to_log)
+                                     cmd_to_log,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def map_to_r_rna(fastq, index_dir, ht_prefix, mapped_sam,
                  unmapped_fastq, log_file, run_config):
     """
@@ -244,7 +436,8 @@ def map_to_r_rna(fastq, index_dir, ht_prefix, mapped_sam,
     cmd = ["hisat2", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     index_file_path = os.path.join(index_dir, ht_prefix)
     cmd = ["hisat2", "-p", str(run_config.nprocesses), "-N", "1",
            "-k", "1",
@@ -252,9 +445,11 @@ def map_to_r_rna(fastq, index_dir, ht_prefix, mapped_sam,
            "-S", mapped_sam, "-U", fastq]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def map_to_orf(fastq, index_dir, ht_prefix, mapped_sam,
                unmapped_fastq, log_file, run_config):
     """
@@ -287,7 +482,8 @@ def map_to_orf(fastq, index_dir, ht_prefix, mapped_sam,
     cmd = ["hisat2", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     index_file_path = os.path.join(index_dir, ht_prefix)
     cmd = ["hisat2", "-p", str(run_config.nprocesses), "-k", "2",
            "--no-spliced-alignment", "--rna-strandness",
@@ -296,9 +492,129 @@ def map_to_orf(fastq, index_dir, ht_prefix, mapped_sam,
            "-U", fastq]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+
 
+@workflow_step
+def map_to_r_rna_batch(fastqs, index_dir, ht_prefix, mapped_sams,
+                       unmapped_fastqs, log_file, run_config):
+    """
+    Remove rRNA or other contaminating reads by alignment to rRNA
+    index files using a single ``hisat2`` invocation for several
+    samples, piped into :py:mod:`riboviz.tools.split_alignment` to
+    split the output into sample-specific files. See
+    :py:mod:`riboviz.batch_align`.
 
+    The sample-specific files are equivalent to those output by
+    :py:func:`map_to_r_rna` for each sample.
+
+    ``hisat2 --version`` is also invoked as ``hisat2`` does not log
+    its own version when it is run.
+
+    :param fastqs: FASTQ files, one per sample (input)
+    :type fastqs: list(str or unicode)
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param ht_prefix: Prefix of HT2 index files (input)
+    :type ht_prefix: str or unicode
+    :param mapped_sams: SAM files for mapped reads, one per sample \
+    (output)
+    :type mapped_sams: list(str or unicode)
+    :param unmapped_fastqs: FASTQ files for unmapped reads, one per \
+    sample (output)
+    :type unmapped_fastqs: list(str or unicode)
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``hisat2`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``hisat2`` or ``python`` returns a \
+    non-zero exit code
+    """
+    LOGGER.info(
+        "Remove rRNA or other contaminating reads by alignment to rRNA index files for %d samples. Log: %s",
+        len(fastqs), log_file)
+    cmd = ["hisat2", "--version"]
+    process_utils.run_logged_command(cmd, log_file,
+                                     run_config.cmd_file,
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+    index_file_path = os.path.join(index_dir, ht_prefix)
+    cmd_align = ["hisat2", "-p", str(run_config.nprocesses), "-N", "1",
+                 "-k", "1", "--reorder",
+                 "-x", index_file_path, "-U", ",".join(fastqs)]
+    cmd_split = ["python", "-m", split_alignment_tools_module.__name__,
+                 "-i"] + fastqs + ["-o"] + mapped_sams + \
+        ["-u"] + unmapped_fastqs
+    process_utils.run_logged_pipeline([cmd_align, cmd_split], log_file,
+                                      run_config.cmd_file,
+                                      run_config.is_dry_run,
+                                      usage_file=run_config.usage_file)
+
+
+@workflow_step
+def map_to_orf_batch(fastqs, index_dir, ht_prefix, mapped_sams,
+                     unmapped_fastqs, log_file, run_config):
+    """
+    Align remaining reads to ORF index files using a single ``hisat2``
+    invocation for several samples, piped into
+    :py:mod:`riboviz.tools.split_alignment` to split the output into
+    sample-specific files. See :py:mod:`riboviz.batch_align`.
+
+    The sample-specific files are equivalent to those output by
+    :py:func:`map_to_orf` for each sample. ``hisat2`` is run without
+    ``--no-unal`` and unaligned records are instead omitted when the
+    output is split.
+
+    ``hisat2 --version`` is also invoked as ``hisat2`` does not log
+    its own version when it is run.
+
+    :param fastqs: FASTQ files, one per sample (input)
+    :type fastqs: list(str or unicode)
+    :param index_dir: Index directory
+    :type index_dir: str or unicode
+    :param ht_prefix: Prefix of HT2 index files (input)
+    :type ht_prefix: str or unicode
+    :param mapped_sams: SAM files for mapped reads, one per sample \
+    (output)
+    :type mapped_sams: list(str or unicode)
+    :param unmapped_fastqs: FASTQ files for unmapped reads, one per \
+    sample (output)
+    :type unmapped_fastqs: list(str or unicode)
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``hisat2`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``hisat2`` or ``python`` returns a \
+    non-zero exit code
+    """
+    LOGGER.info(
+        "Align remaining reads to ORFs index files using hisat2 for %d samples. Log: %s",
+        len(fastqs), log_file)
+    cmd = ["hisat2", "--version"]
+    process_utils.run_logged_command(cmd, log_file,
+                                     run_config.cmd_file,
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+    index_file_path = os.path.join(index_dir, ht_prefix)
+    cmd_align = ["hisat2", "-p", str(run_config.nprocesses), "-k", "2",
+                 "--no-spliced-alignment", "--rna-strandness",
+                 "F", "--reorder",
+                 "-x", index_file_path, "-U", ",".join(fastqs)]
+    cmd_split = ["python", "-m", split_alignment_tools_module.__name__,
+                 "--no-unal", "-i"] + fastqs + ["-o"] + mapped_sams + \
+        ["-u"] + unmapped_fastqs
+    process_utils.run_logged_pipeline([cmd_align, cmd_split], log_file,
+                                      run_config.cmd_file,
+                                      run_config.is_dry_run,
+                                      usage_file=run_config.usage_file)
+
+
+@workflow_step
 def trim_5p_mismatches(orf_map_sam, orf_map_sam_clean, summary_file,
                        log_file, run_config):
     """
@@ -326,9 +642,11 @@ def trim_5p_mismatches(orf_map_sam, orf_map_sam_clean, summary_file,
            "-m", "2", "-i", orf_map_sam, "-o", orf_map_sam_clean,
            "-s", summary_file]
     process_utils.run_logged_command(
-        cmd, log_file, run_config.cmd_file, run_config.is_dry_run)
+        cmd, log_file, run_config.cmd_file, run_config.is_dry_run,
+        usage_file=run_config.usage_file)
 
 
+@workflow_step
 def sort_bam(sam_file, bam_file, log_file, run_config):
     """
     Convert SAM to BAM and sort on genome using ``samtools view`` and
@@ -353,16 +671,19 @@ def sort_bam(sam_file, bam_file, log_file, run_config):
     cmd = ["samtools", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     cmd_view = ["samtools", "view", "-b", sam_file]
     cmd_sort = ["samtools", "sort", "-@", str(run_config.nprocesses),
                 "-O", "bam", "-o", bam_file, "-"]
-    process_utils.run_logged_pipe_command(cmd_view, cmd_sort,
-                                          log_file,
-                                          run_config.cmd_file,
-                                          run_config.is_dry_run)
+    process_utils.run_logged_pipeline([cmd_view, cmd_sort],
+                                      log_file,
+                                      run_config.cmd_file,
+                                      run_config.is_dry_run,
+                                      usage_file=run_config.usage_file)
 
 
+@workflow_step
 def index_bam(bam_file, log_file, run_config):
     """
     Index BAM file using ``samtools index``.
@@ -383,13 +704,16 @@ def index_bam(bam_file, log_file, run_config):
     cmd = ["samtools", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     cmd = ["samtools", "index", bam_file]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def group_umis(bam_file, groups_file, log_file, run_config):
     """
     Idenfity UMI groups using ``umi_tools group``.
@@ -411,9 +735,11 @@ def group_umis(bam_file, groups_file, log_file, run_config):
            "--group-out", groups_file]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def deduplicate_umis(bam_file, dedup_bam_file,
                      stats_prefix, log_file, run_config):
     """
@@ -444,9 +770,11 @@ def deduplicate_umis(bam_file, dedup_bam_file,
                "-S", dedup_bam_file]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def make_bedgraph(bam_file, bedgraph_file, is_plus,
                   log_file, run_config):
     """
@@ -481,20 +809,65 @@ def make_bedgraph(bam_file, bedgraph_file, is_plus,
     cmd = ["bedtools", "--version"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
     cmd = ["bedtools", "genomecov", "-ibam", bam_file,
            "-trackline", "-bga", "-5", "-strand", strand]
     process_utils.run_logged_redirect_command(cmd, bedgraph_file,
                                               log_file,
                                               run_config.cmd_file,
-                                              run_config.is_dry_run)
+                                              run_config.is_dry_run,
+                                              usage_file=run_config.usage_file)
 
 
+@workflow_step
+def make_bedgraphs(bam_file, plus_bedgraph_file, minus_bedgraph_file,
+                   log_file, run_config):
+    """
+    Calculate transcriptome coverage for both plus and minus strands,
+    from a single scan of a BAM file, and save as bedgraphs using
+    :py:mod:`riboviz.tools.bam_to_bedgraph`. The bedgraphs are the same
+    as those created by :py:func:`make_bedgraph`.
+
+    :param bam_file: BAM file (input)
+    :type bam_file: str or unicode
+    :param plus_bedgraph_file: Plus strand bedgraph file (output)
+    :type plus_bedgraph_file: str or unicode
+    :param minus_bedgraph_file: Minus strand bedgraph file (output)
+    :type minus_bedgraph_file: str or unicode
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise FileNotFoundError: if ``python`` cannot be found
+    :raise AssertionError: if ``python`` returns a non-zero exit code
+    """
+    LOGGER.info(
+        "Calculate transcriptome coverage for + and - strands and save as bedgraphs. Log: %s",
+        log_file)
+    cmd = ["python", "-m", bam_to_bedgraph_tools_module.__name__,
+           "-b", bam_file, "-p", plus_bedgraph_file,
+           "-m", minus_bedgraph_file,
+           "-n", str(run_config.nprocesses)]
+    process_utils.run_logged_command(cmd, log_file,
+                                     run_config.cmd_file,
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+
+
+@workflow_step
 def bam_to_h5(bam_file, h5_file, orf_gff_file, config,
               log_file, run_config):
     """
     Make length-sensitive alignments in H5 format using
-    ``bam_to_h5.R``.
+    ``bam_to_h5.R`` or, if requested (``native_bam_to_h5``), using
+    :py:mod:`riboviz.tools.bam_to_h5`, which takes the same options.
+
+    If ``dir_index`` is configured then the ORF GFF features are read
+    from the annotation cached by :py:func:`cache_annotation` rather
+    than by parsing the GFF file: ``bam_to_h5.R`` reads
+    :py:const:`riboviz.workflow_files.ORF_FEATURES_TSV` and
+    :py:mod:`riboviz.tools.bam_to_h5` reads the cache in ``dir_index``.
 
     :param bam_file: BAM file (input)
     :type bam_file: str or unicode
@@ -509,40 +882,55 @@ def bam_to_h5(bam_file, h5_file, orf_gff_file, config,
     :param run_config: Run-related configuration
     :type run_config: RunConfigTuple
     :raise KeyError: if a configuration parameter is mssing
-    :raise FileNotFoundError: if ``Rscript`` cannot be found
-    :raise AssertionError: if ``Rscript`` returns a non-zero exit \
-    code
+    :raise FileNotFoundError: if ``Rscript`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``Rscript`` or ``python`` returns a \
+    non-zero exit code
     """
     LOGGER.info("Make length-sensitive alignments in H5 format. Log: %s",
                 log_file)
     secondary_id = config[params.SECONDARY_ID]
     if secondary_id is None:
         secondary_id = "NULL"
-    cmd = ["Rscript", "--vanilla",
-           os.path.join(run_config.r_scripts,
-                        workflow_r.BAM_TO_H5_R),
-           "--num-processes=" + str(run_config.nprocesses),
-           "--min-read-length=" + str(config[params.MIN_READ_LENGTH]),
-           "--max-read-length=" + str(config[params.MAX_READ_LENGTH]),
-           "--buffer=" + str(config[params.BUFFER]),
-           "--primary-id=" + config[params.PRIMARY_ID],
-           "--secondary-id=" + secondary_id,
-           "--dataset=" + config[params.DATASET],
-           "--bam-file=" + bam_file,
-           "--hd-file=" + h5_file,
-           "--orf-gff-file=" + orf_gff_file,
-           "--is-riboviz-gff=" + str(config[params.IS_RIBOVIZ_GFF]),
-           "--stop-in-cds=" + str(config[params.STOP_IN_CDS])]
+    if value_in_dict(params.NATIVE_BAM_TO_H5, config):
+        cmd = ["python", "-m", bam_to_h5_tools_module.__name__]
+    else:
+        cmd = ["Rscript", "--vanilla",
+               os.path.join(run_config.r_scripts,
+                            workflow_r.BAM_TO_H5_R)]
+    cmd += ["--num-processes=" + str(run_config.nprocesses),
+            "--min-read-length=" + str(config[params.MIN_READ_LENGTH]),
+            "--max-read-length=" + str(config[params.MAX_READ_LENGTH]),
+            "--buffer=" + str(config[params.BUFFER]),
+            "--primary-id=" + config[params.PRIMARY_ID],
+            "--secondary-id=" + secondary_id,
+            "--dataset=" + config[params.DATASET],
+            "--bam-file=" + bam_file,
+            "--hd-file=" + h5_file,
+            "--orf-gff-file=" + orf_gff_file,
+            "--is-riboviz-gff=" + str(config[params.IS_RIBOVIZ_GFF]),
+            "--stop-in-cds=" + str(config[params.STOP_IN_CDS])]
+    if value_in_dict(params.INDEX_DIR, config):
+        if value_in_dict(params.NATIVE_BAM_TO_H5, config):
+            cmd.append("--cache-dir=" + config[params.INDEX_DIR])
+        else:
+            cmd.append("--annotation-tsv=" + os.path.join(
+                config[params.INDEX_DIR], workflow_files.ORF_FEATURES_TSV))
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
-def generate_stats_figs(h5_file, out_dir, config, log_file,
-                        run_config):
+def get_generate_stats_figs_cmd(h5_file, out_dir, config, run_config,
+                                do_pos_sp_nt_freq, num_processes,
+                                blocks=None):
     """
-    Create summary statistics, and analyses and QC plots for both RPF
-    and mRNA datasets using ``generate_stats_figs.R``.
+    Get ``generate_stats_figs.R`` command. If ``orf_gff_file`` and
+    ``dir_index`` are configured then ``generate_stats_figs.R`` reads
+    the ORF GFF features from
+    :py:const:`riboviz.workflow_files.ORF_FEATURES_TSV`, written by
+    :py:func:`cache_annotation`, rather than by parsing the GFF file.
 
     :param h5_file: H5 file (input)
     :type h5_file: str or unicode
@@ -550,22 +938,24 @@ def generate_stats_figs(h5_file, out_dir, config, log_file,
     :type out_dir: str or unicode
     :param config: Workflow configuration
     :type config: dict
-    :param log_file: Log file (output)
-    :type log_file: str or unicode
     :param run_config: Run-related configuration
     :type run_config: RunConfigTuple
+    :param do_pos_sp_nt_freq: Calculate position-specific nucleotide \
+    frequencies?
+    :type do_pos_sp_nt_freq: bool
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :param blocks: Analysis blocks to run (if ``None`` then all \
+    blocks are run)
+    :type blocks: list(str or unicode)
+    :return: Command
+    :rtype: list(str or unicode)
     :raise KeyError: if a configuration parameter is mssing
-    :raise FileNotFoundError: if ``Rscript`` cannot be found
-    :raise AssertionError: if ``Rscript`` returns a non-zero exit \
-    code
     """
-    LOGGER.info(
-        "Create summary statistics, and analyses and QC plots for both RPF and mRNA datasets. Log: %s",
-        log_file)
     cmd = ["Rscript", "--vanilla",
            os.path.join(run_config.r_scripts,
                         workflow_r.GENERATE_STATS_FIGS_R),
-           "--num-processes=" + str(run_config.nprocesses),
+           "--num-processes=" + str(num_processes),
            "--min-read-length=" + str(config[params.MIN_READ_LENGTH]),
            "--max-read-length=" + str(config[params.MAX_READ_LENGTH]),
            "--buffer=" + str(config[params.BUFFER]),
@@ -575,7 +965,7 @@ def generate_stats_figs(h5_file, out_dir, config, log_file,
            "--orf-fasta-file=" + config[params.ORF_FASTA_FILE],
            "--rpf=" + str(config[params.RPF]),
            "--output-dir=" + out_dir,
-           "--do-pos-sp-nt-freq=" + str(config[params.DO_POS_SP_NT_FREQ])]
+           "--do-pos-sp-nt-freq=" + str(do_pos_sp_nt_freq)]
     # Add optional flags and values.
     flags = zip([params.T_RNA_FILE, params.CODON_POSITIONS_FILE,
                  params.FEATURES_FILE, params.ORF_GFF_FILE,
@@ -587,22 +977,219 @@ def generate_stats_figs(h5_file, out_dir, config, log_file,
         if value_in_dict(flag, config):
             flag_file = config[flag]
             cmd.append("--" + parameter + "=" + flag_file)
+    if value_in_dict(params.ORF_GFF_FILE, config) and \
+       value_in_dict(params.INDEX_DIR, config):
+        cmd.append("--annotation-tsv=" + os.path.join(
+            config[params.INDEX_DIR], workflow_files.ORF_FEATURES_TSV))
     if value_in_dict(params.COUNT_THRESHOLD, config):
         cmd.append("--count-threshold=" +
                    str(config[params.COUNT_THRESHOLD]))
+    if blocks is not None:
+        cmd.append("--blocks=" + ",".join(blocks))
+    return cmd
+
+
+def get_pos_sp_nt_freq_cmd(h5_file, out_dir, config, num_processes):
+    """
+    Get :py:mod:`riboviz.tools.pos_sp_nt_freq` command.
+
+    :param h5_file: H5 file (input)
+    :type h5_file: str or unicode
+    :param out_dir: Directory for output files
+    :type out_dir: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param num_processes: Number of processes
+    :type num_processes: int
+    :return: Command
+    :rtype: list(str or unicode)
+    :raise KeyError: if a configuration parameter is mssing
+    """
+    return ["python", "-m", pos_sp_nt_freq_tools_module.__name__,
+            "--hd-file=" + h5_file,
+            "--orf-fasta-file=" + config[params.ORF_FASTA_FILE],
+            "--output-file=" + os.path.join(out_dir,
+                                            workflow_r.POS_SP_NT_FREQ_TSV),
+            "--dataset=" + config[params.DATASET],
+            "--min-read-length=" + str(config[params.MIN_READ_LENGTH]),
+            "--max-read-length=" + str(config[params.MAX_READ_LENGTH]),
+            "--num-processes=" + str(num_processes)]
+
+
+@workflow_step
+def generate_stats_figs(h5_file, out_dir, config, log_file,
+                        run_config):
+    """
+    Create summary statistics, and analyses and QC plots for both RPF
+    and mRNA datasets using ``generate_stats_figs.R``. If requested
+    (``native_pos_sp_nt_freq``), position-specific nucleotide
+    frequencies are calculated using
+    :py:mod:`riboviz.tools.pos_sp_nt_freq` rather than
+    ``generate_stats_figs.R``. If requested (``stats_blocks``), the
+    analyses are run as separate blocks, using
+    :py:func:`generate_stats_figs_blocks`.
+
+    :param h5_file: H5 file (input)
+    :type h5_file: str or unicode
+    :param out_dir: Directory for output files
+    :type out_dir: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise KeyError: if a configuration parameter is mssing
+    :raise FileNotFoundError: if ``Rscript`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``Rscript`` or ``python`` returns a \
+    non-zero exit code
+    """
+    if value_in_dict(params.STATS_BLOCKS, config):
+        generate_stats_figs_blocks(h5_file, out_dir, config, log_file,
+                                   run_config)
+        return
+    LOGGER.info(
+        "Create summary statistics, and analyses and QC plots for both RPF and mRNA datasets. Log: %s",
+        log_file)
+    is_native_nt_freq = config[params.DO_POS_SP_NT_FREQ] and \
+        value_in_dict(params.NATIVE_POS_SP_NT_FREQ, config)
+    cmd = get_generate_stats_figs_cmd(
+        h5_file, out_dir, config, run_config,
+        config[params.DO_POS_SP_NT_FREQ] and not is_native_nt_freq,
+        run_config.nprocesses)
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
-
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
+    if not is_native_nt_freq:
+        return
+    cmd = get_pos_sp_nt_freq_cmd(h5_file, out_dir, config,
+                                 run_config.nprocesses)
+    with logging_utils.log_context(step="pos_sp_nt_freq"):
+        process_utils.run_logged_command(cmd, log_file,
+                                         run_config.cmd_file,
+                                         run_config.is_dry_run,
+                                         usage_file=run_config.usage_file)
+
+
+@workflow_step
+def generate_stats_figs_blocks(h5_file, out_dir, config, log_file,
+                               run_config):
+    """
+    Create summary statistics, and analyses and QC plots for both RPF
+    and mRNA datasets, running each analysis block (see
+    :py:mod:`riboviz.stats_blocks`) as a separate invocation of
+    ``generate_stats_figs.R``, or, for position-specific nucleotide
+    frequencies, if requested (``native_pos_sp_nt_freq``),
+    :py:mod:`riboviz.tools.pos_sp_nt_freq`.
+
+    Blocks whose fingerprints match those recorded when they last
+    ran successfully, and whose output files exist, are skipped. The
+    remaining blocks are run in parallel, with up to
+    ``run_config.nprocesses`` blocks running at once, each logging
+    to a block-specific log file, named after ``log_file``. The
+    fingerprints of blocks that run successfully are then recorded.
+    If this is a dry run then the commands for all blocks are
+    recorded and no fingerprints are calculated.
 
-def collate_tpms(out_dir, samples, log_file, run_config, tpms_file=None):
+    :param h5_file: H5 file (input)
+    :type h5_file: str or unicode
+    :param out_dir: Directory for output files
+    :type out_dir: str or unicode
+    :param config: Workflow configuration
+    :type config: dict
+    :param log_file: Log file (output)
+    :type log_file: str or unicode
+    :param run_config: Run-related configuration
+    :type run_config: RunConfigTuple
+    :raise KeyError: if a configuration parameter is mssing
+    :raise FileNotFoundError: if ``Rscript`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``Rscript`` or ``python`` returns a \
+    non-zero exit code for any block
+    """
+    blocks = stats_blocks.get_blocks(config)
+    fingerprints = {}
+    recorded = {}
+    if not run_config.is_dry_run:
+        digests = {}
+        fingerprints = {block.name: stats_blocks.get_fingerprint(
+            block, h5_file, config, run_config.r_scripts, digests)
+                        for block in blocks}
+        recorded = stats_blocks.load_fingerprints(out_dir)
+        for block in [block for block in blocks
+                      if stats_blocks.is_up_to_date(
+                          block, fingerprints[block.name], recorded,
+                          out_dir, config)]:
+            LOGGER.info("Skip unchanged analysis block: %s", block.name)
+            blocks.remove(block)
+        for block in blocks:
+            recorded.pop(block.name, None)
+        stats_blocks.save_fingerprints(out_dir, recorded)
+    if not blocks:
+        return
+    max_workers = max(min(run_config.nprocesses, len(blocks)), 1)
+    num_processes = max(run_config.nprocesses // max_workers, 1)
+    is_native_nt_freq = value_in_dict(params.NATIVE_POS_SP_NT_FREQ,
+                                      config)
+    log_root, log_ext = os.path.splitext(log_file)
+
+    def run_block(block):
+        block_log_file = "{}_{}{}".format(log_root, block.name, log_ext)
+        LOGGER.info("Run analysis block: %s. Log: %s", block.name,
+                    block_log_file)
+        if block.name == stats_blocks.POS_SP_NT_FREQ and is_native_nt_freq:
+            cmd = get_pos_sp_nt_freq_cmd(h5_file, out_dir, config,
+                                         num_processes)
+        else:
+            cmd = get_generate_stats_figs_cmd(
+                h5_file, out_dir, config, run_config,
+                config[params.DO_POS_SP_NT_FREQ], num_processes,
+                [block.name])
+        with logging_utils.log_context(
+                step="generate_stats_figs_" + block.name):
+            process_utils.run_logged_command(
+                cmd, block_log_file, run_config.cmd_file,
+                run_config.is_dry_run, usage_file=run_config.usage_file)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        # Run each block in a copy of the current context so log
+        # records include the sample (see logging_utils.log_context).
+        futures = {executor.submit(contextvars.copy_context().run,
+                                   run_block, block): block
+                   for block in blocks}
+        errors = []
+        for future in concurrent.futures.as_completed(futures):
+            block = futures[future]
+            try:
+                future.result()
+                recorded[block.name] = fingerprints.get(block.name)
+            except (AssertionError, FileNotFoundError) as e:
+                LOGGER.error("Analysis block %s failed: %s", block.name, e)
+                errors.append(e)
+    if not run_config.is_dry_run:
+        stats_blocks.save_fingerprints(out_dir, recorded)
+    if errors:
+        raise errors[0]
+
+
+@workflow_step
+def collate_tpms(out_dir, samples, config, log_file, run_config,
+                 tpms_file=None):
     """
-    Collate TPMs across sample results ``using collate_tpms.R``.
+    Collate TPMs across sample results ``using collate_tpms.R`` or,
+    if requested (``native_collate_tpms``), using
+    :py:mod:`riboviz.tools.collate_tpms`, which takes the same
+    options and also saves the collated TPMs as a NumPy ``.npz``
+    file.
 
     :param out_dir: Output directory
     :type out_dir: str or unicode
     :param samples: Sample names
     :type samples: list(str or unicode)
+    :param config: Workflow configuration
+    :type config: dict
     :param log_file: Log file (output)
     :type log_file: str or unicode
     :param run_config: Run-related configuration
@@ -610,24 +1197,31 @@ def collate_tpms(out_dir, samples, log_file, run_config, tpms_file=None):
     :param tpms_file: TPMS file relative to ``out_dir`` (if omitted \
     then default, chosen by ``collate_tpms.R``, is used) (output)
     :type tpms_file: str or unicode
-    :raise FileNotFoundError: if ``Rscript`` cannot be found
-    :raise AssertionError: if ``Rscript`` returns a non-zero exit \
-    code
+    :raise FileNotFoundError: if ``Rscript`` or ``python`` cannot be \
+    found
+    :raise AssertionError: if ``Rscript`` or ``python`` returns a \
+    non-zero exit code
     """
     LOGGER.info("Collate TPMs across sample results. Log: %s", log_file)
-    cmd = ["Rscript", "--vanilla",
-           os.path.join(run_config.r_scripts,
-                        workflow_r.COLLATE_TPMS_R),
-           "--sample-subdirs=" + str(True),
-           "--output-dir=" + out_dir]
+    if value_in_dict(params.NATIVE_COLLATE_TPMS, config):
+        cmd = ["python", "-m", collate_tpms_tools_module.__name__,
+               "--npz-file=" + workflow_r.TPMS_COLLATED_NPZ]
+    else:
+        cmd = ["Rscript", "--vanilla",
+               os.path.join(run_config.r_scripts,
+                            workflow_r.COLLATE_TPMS_R)]
+    cmd += ["--sample-subdirs=" + str(True),
+            "--output-dir=" + out_dir]
     if tpms_file is not None:
         cmd.append("--tpms-file=" + tpms_file)
     cmd += samples
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def demultiplex_fastq(fastq, barcodes_file, deplex_dir, log_file,
                       run_config):
     """
@@ -654,9 +1248,11 @@ def demultiplex_fastq(fastq, barcodes_file, deplex_dir, log_file,
            "-m", "2"]
     process_utils.run_logged_command(cmd, log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
 
 
+@workflow_step
 def count_reads(config_file, input_dir, tmp_dir, output_dir,
                 read_counts_file, log_file, run_config):
     """
@@ -690,4 +1286,5 @@ def count_reads(config_file, input_dir, tmp_dir, output_dir,
     process_utils.run_logged_command(cmd,
                                      log_file,
                                      run_config.cmd_file,
-                                     run_config.is_dry_run)
+                                     run_config.is_dry_run,
+                                     usage_file=run_config.usage_file)
@@ -42,7 +42,15 @@ MINUS_BEDGRAPH = "minus.bedgraph"
 """ Reads from minus strand bedgraph file name."""
 PLUS_BEDGRAPH = "plus.bedgraph"
 """ Reads from plus strand bedgraph file name."""
+ORF_FEATURES_TSV = "orf_features.tsv"
+""" ORF GFF features file name. """
+ORF_GENES_TSV = "orf_genes.tsv"
+""" ORF GFF genes, with CDS and UTR widths, file name. """
 READ_COUNTS_FILE = "read_counts.tsv"
 """ Read counts file name. """
 DEFAULT_CMD_FILE = "run_riboviz_vignette.sh"
 """ Default bash commands file name. """
+RESOURCE_USAGE_TSV = "resource_usage.tsv"
+""" Resource usage of each command file name. """
+RESOURCE_USAGE_SUMMARY_TSV = "resource_usage_summary.tsv"
+""" Resource usage by workflow step summary file name. """
@@ -45,3 +45,5 @@ THREE_NT_FRAME_PROP_BY_GENE_PDF = "3ntframe_propbygene.pdf"
 
 TPMS_COLLATED_TSV = "TPMs_collated.tsv"
 """ ``collate_tpms.R`` output file. """
+TPMS_COLLATED_NPZ = "TPMs_collated.npz"
+""" :py:mod:`riboviz.tools.collate_tpms` NumPy ``.npz`` output file. """